@@ -0,0 +1,129 @@
+"""
+PARS - Admission Control
+Latency-budget-aware admission for /predict.
+
+Each request's queueing delay (time from arrival in the ASGI app to the moment
+its handler starts on a worker thread) and the number of requests currently in
+full ML processing are tracked. When the smoothed queueing delay crosses the
+budget, or the ML path is saturated, non-critical requests are answered on the
+degraded path (rule-based scoring + keyword-only routing) instead of queueing
+behind TF/torch inference. Guardrail-critical patients always get the full path
+and are not limited by the in-flight cap.
+
+Environment:
+  - PARS_ADMIT_MAX_QUEUE_MS     queueing-delay budget before degrading (default: 250)
+  - PARS_ADMIT_MAX_INFLIGHT     concurrent full-path requests before degrading (default: 16)
+  - PARS_ADMISSION              set to 0 to disable admission control (default: 1)
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# perf_counter() at which the request entered the app (set by ArrivalTimeMiddleware)
+REQUEST_ARRIVAL = contextvars.ContextVar("pars_request_arrival", default=None)
+
+FULL = "full"
+DEGRADED = "degraded"
+
+
+class ArrivalTimeMiddleware:
+    """
+    Pure ASGI middleware stamping the arrival time; the context is copied into
+    the threadpool, so sync handlers can read their own queueing delay.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            REQUEST_ARRIVAL.set(time.perf_counter())
+        await self.app(scope, receive, send)
+
+
+def queue_delay() -> float:
+    arrival = REQUEST_ARRIVAL.get()
+    return time.perf_counter() - arrival if arrival is not None else 0.0
+
+
+class AdmissionController:
+    def __init__(self, max_queue_ms=250.0, max_inflight=16, smoothing=0.2, enabled=True):
+        self.max_queue = max_queue_ms / 1000
+        self.max_inflight = max_inflight
+        self.smoothing = smoothing
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.delay_ewma = 0.0
+        self.counters = {"full": 0, "critical_full": 0, "degraded": 0}
+        self.degraded_reasons = {"queue_delay": 0, "inflight": 0}
+        self.last_degraded = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_queue_ms=float(os.getenv("PARS_ADMIT_MAX_QUEUE_MS", "250")),
+            max_inflight=int(os.getenv("PARS_ADMIT_MAX_INFLIGHT", "16")),
+            enabled=os.getenv("PARS_ADMISSION", "1") == "1",
+        )
+
+    def decide(self, critical: bool, delay: float = None):
+        """
+        Returns (mode, reason). Critical patients are always admitted to the full path.
+        """
+        delay = queue_delay() if delay is None else delay
+        with self._lock:
+            self.delay_ewma += self.smoothing * (delay - self.delay_ewma)
+            if critical:
+                self.counters["critical_full"] += 1
+                return FULL, None
+            if not self.enabled:
+                self.counters["full"] += 1
+                return FULL, None
+
+            reason = None
+            # A single very late request degrades immediately; otherwise use the smoothed delay
+            if self.delay_ewma > self.max_queue or delay > 2 * self.max_queue:
+                reason = "queue_delay"
+            elif self.inflight >= self.max_inflight:
+                reason = "inflight"
+
+            if reason:
+                self.counters["degraded"] += 1
+                self.degraded_reasons[reason] += 1
+                self.last_degraded = time.time()
+                return DEGRADED, reason
+            self.counters["full"] += 1
+            return FULL, None
+
+    @contextmanager
+    def full_path(self):
+        """
+        Count a request as in-flight on the ML path.
+        """
+        with self._lock:
+            self.inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def stats(self) -> dict:
+        total = sum(self.counters.values())
+        return {
+            "enabled": self.enabled,
+            "max_queue_ms": self.max_queue * 1000,
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "queue_delay_ewma_ms": round(self.delay_ewma * 1000, 2),
+            "requests": total,
+            **self.counters,
+            "degraded_ratio": round(self.counters["degraded"] / total, 4) if total else 0.0,
+            "degraded_reasons": dict(self.degraded_reasons),
+            "last_degraded": self.last_degraded,
+        }
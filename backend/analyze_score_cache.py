@@ -0,0 +1,111 @@
+"""
+Offline analysis for the score cache (score_cache.py) on patients_data.csv:
+how many distinct cache keys the records produce (i.e. the hit ratio an
+unbounded cache would reach replaying them in order) and the score error that
+clinical binning introduces against exact scoring, for several bin widths.
+
+Records are scored as the API sees them: columns the API does not collect
+(the CSV index and BMI) take the same defaults as in production, and rows
+caught by a guardrail are left out because they never reach the network.
+
+Usage:
+  python analyze_score_cache.py [--csv ../patients_data.csv] [--scales 0.5,1,2,4]
+                                [--bins "Age=10,Heart_Rate=5"] [--rows N]
+"""
+import sys
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+from feature_schema import FIELD_ALIASES
+from rule_engine import RULES
+from score_cache import DEFAULT_BINS, ScoreCache, parse_bins
+
+
+def load_columns(path, rows=None):
+    df = pd.read_csv(path)
+    if rows:
+        df = df.head(rows)
+    # Not collected by the API: the model sees its defaults in production
+    df = df.drop(columns=["Unnamed: 0", "BMI"], errors="ignore").rename(columns=FIELD_ALIASES)
+    columns = {c: df[c].to_numpy() for c in df.columns}
+    return columns, len(df)
+
+
+def score(model, columns, n):
+    X = model.schema.build_columns(columns, n=n)
+    return np.array([model._score_from_prediction(row) for row in model._infer(X)]), X
+
+
+def analyze(model, columns, n, exact_scores, bins, name):
+    cache = ScoreCache("binned", max_entries=n, bins=bins)
+    binned_scores, X = score(model, cache.columns(columns), n)
+    distinct = len({row.tobytes() for row in X})
+    error = np.abs(binned_scores - exact_scores)
+    exact_labels = RULES.label_for(exact_scores)
+    flips = int((RULES.label_for(binned_scores) != exact_labels).sum())
+    return {
+        "config": name,
+        "distinct_keys": distinct,
+        "hit_ratio": 1 - distinct / n,
+        "max_error": float(error.max()),
+        "p99_error": float(np.percentile(error, 99)),
+        "mean_error": float(error.mean()),
+        "label_flips": flips,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join(os.path.dirname(base_dir), "patients_data.csv"))
+    parser.add_argument("--scales", default="0.5,1,2,4",
+                        help="multipliers applied to the default bin widths")
+    parser.add_argument("--bins", default="", help="extra configuration to evaluate, e.g. Age=10,Heart_Rate=5")
+    parser.add_argument("--rows", type=int, default=None)
+    args = parser.parse_args()
+
+    from ml_service import TriageModel
+    model = TriageModel(score_cache=False)
+    model._load_resources_if_needed()
+
+    columns, n = load_columns(args.csv, args.rows)
+    scored = ~RULES.critical_mask(RULES.column_matrix(columns, n), count=False)
+    columns = {c: v[scored] for c, v in columns.items()}
+    n = int(scored.sum())
+    print(f"{n} records reach the network ({int((~scored).sum())} guardrail overrides skipped), "
+          f"backend={model.backend}")
+
+    started = time.perf_counter()
+    exact_scores, X = score(model, columns, n)
+    elapsed = time.perf_counter() - started
+    exact_distinct = len({row.tobytes() for row in X})
+
+    rows = [{
+        "config": "exact", "distinct_keys": exact_distinct, "hit_ratio": 1 - exact_distinct / n,
+        "max_error": 0.0, "p99_error": 0.0, "mean_error": 0.0, "label_flips": 0,
+    }]
+    for scale in (float(s) for s in args.scales.split(",") if s.strip()):
+        bins = {field: width * scale for field, width in DEFAULT_BINS.items()}
+        rows.append(analyze(model, columns, n, exact_scores, bins, f"binned x{scale:g}"))
+    if args.bins:
+        bins = {**DEFAULT_BINS, **parse_bins(args.bins)}
+        rows.append(analyze(model, columns, n, exact_scores, bins, f"binned {args.bins}"))
+
+    print(f"Exact scoring: {elapsed * 1e3:.0f} ms for {n} rows")
+    print(f"Default bins: {', '.join(f'{f}={w:g}' for f, w in DEFAULT_BINS.items())}")
+    print("-" * 107)
+    print(f"{'config':<28}{'distinct':>10}{'hit ratio':>11}{'max err':>10}{'p99 err':>10}{'mean err':>10}"
+          f"{'label flips':>13}{'flip rate':>11}")
+    for r in rows:
+        print(f"{r['config']:<28}{r['distinct_keys']:>10}{r['hit_ratio']:>11.1%}{r['max_error']:>10.4f}"
+              f"{r['p99_error']:>10.4f}{r['mean_error']:>10.4f}{r['label_flips']:>13}{r['label_flips'] / n:>11.2%}")
+
+
+if __name__ == "__main__":
+    main()
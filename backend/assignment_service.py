@@ -0,0 +1,318 @@
+"""
+PARS - Assignment Service
+Load-aware doctor assignment for referrals.
+
+Keeps the doctor rosters in memory with per-doctor counters of active patients,
+and one heap per department ordered by
+
+    cost = (active + 1) / (1 + EXPERIENCE_WEIGHT * experience_years)
+
+i.e. the load a doctor would carry after taking the patient, relative to a
+capacity that grows with experience (ties go to the more experienced doctor).
+Picking the best doctor is O(log n): stale heap entries (load or availability
+changed since they were pushed) are skipped lazily and the heap is compacted
+when they pile up. Rosters are reconciled with the data store in a background
+thread, so requests never scan department tables.
+
+The data store is resolved and the first reconcile runs in that thread, started
+from the app's startup hook (after prefork workers fork), so importing main.py
+opens no client or SQLite connection. Until the first load completes, recommend
+and assign return None and referrals fall back to the store.
+
+Environment:
+  - PARS_ASSIGN_EXPERIENCE_WEIGHT    capacity added per year of experience (default: 0.05)
+  - PARS_ASSIGN_RECONCILE_SECONDS    roster refresh interval (default: 30)
+"""
+
+import os
+import time
+import heapq
+import threading
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+
+class DoctorState:
+    __slots__ = ("key", "department", "name", "experience", "available", "active", "version")
+
+    def __init__(self, key, department, name, experience, available):
+        self.key = key
+        self.department = department
+        self.name = name
+        self.experience = experience or 0
+        self.available = bool(available)
+        self.active = 0
+        self.version = 0
+
+    def public(self) -> dict:
+        return {
+            "name": self.name,
+            "experience": self.experience,
+            "available": self.available,
+            "active_patients": self.active,
+        }
+
+
+class _DepartmentHeap:
+    def __init__(self):
+        self.doctors = {}   # key -> DoctorState
+        self.heap = []      # (cost, -experience, key, version)
+        self.lock = threading.Lock()
+
+
+class AssignmentEngine:
+    def __init__(self, store=None, departments=(), experience_weight=0.05, reconcile_interval=30.0,
+                 store_factory=None):
+        self.store = store
+        self.store_factory = store_factory
+        self.departments = list(departments)
+        self.experience_weight = experience_weight
+        self.reconcile_interval = reconcile_interval
+        self._depts = {}           # department (lower) -> _DepartmentHeap
+        self._names = {}           # department (lower) -> canonical name
+        self._assigned = {}        # patient_id -> DoctorState
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._thread = None
+
+        self.assignments = 0
+        self.releases = 0
+        self.reconciles = 0
+        self.last_reconcile = None
+        self.last_error = None
+
+    @classmethod
+    def from_env(cls, store=None, departments=(), store_factory=None):
+        return cls(
+            store,
+            departments,
+            experience_weight=float(os.getenv("PARS_ASSIGN_EXPERIENCE_WEIGHT", "0.05")),
+            reconcile_interval=float(os.getenv("PARS_ASSIGN_RECONCILE_SECONDS", "30")),
+            store_factory=store_factory,
+        )
+
+    # --------------------------------------------------------
+    # Heap maintenance
+    # --------------------------------------------------------
+
+    def _cost(self, doctor) -> float:
+        return (doctor.active + 1) / (1 + self.experience_weight * doctor.experience)
+
+    def _push(self, dept, doctor):
+        doctor.version += 1
+        if doctor.available:
+            heapq.heappush(dept.heap, (self._cost(doctor), -doctor.experience, doctor.key, doctor.version))
+        # Lazy deletion leaves stale entries behind; rebuild once they dominate
+        if len(dept.heap) > 2 * len(dept.doctors) + 16:
+            dept.heap = [
+                (self._cost(d), -d.experience, d.key, d.version)
+                for d in dept.doctors.values() if d.available
+            ]
+            heapq.heapify(dept.heap)
+
+    def _best(self, dept):
+        """
+        Valid top of a department heap (stale entries popped), or None.
+        """
+        heap = dept.heap
+        while heap:
+            _, _, key, version = heap[0]
+            doctor = dept.doctors.get(key)
+            if doctor is not None and doctor.version == version and doctor.available:
+                return doctor
+            heapq.heappop(heap)
+        return None
+
+    def _department(self, department):
+        # Never blocks a request: before the first load there is nothing to pick from
+        self.start()
+        return self._depts.get((department or "").lower())
+
+    # --------------------------------------------------------
+    # Assignment
+    # --------------------------------------------------------
+
+    def recommend(self, department):
+        """
+        Best doctor for the department right now, without assigning.
+        """
+        dept = self._department(department)
+        if dept is None:
+            return None
+        with dept.lock:
+            doctor = self._best(dept)
+            return doctor.public() if doctor else None
+
+    def assign(self, department, patient_id):
+        """
+        Assign the patient to the best available doctor and count them as active.
+        Re-triaging a patient within the same department keeps their doctor.
+        The whole check-release-pick sequence holds the engine lock, so concurrent
+        requests for the same patient cannot both take a slot.
+        """
+        dept = self._department(department)
+        with self._lock:
+            current = self._assigned.get(patient_id)
+            if current is not None:
+                if current.department.lower() == (department or "").lower():
+                    return current.public()
+                self._release_locked(patient_id)
+            if dept is None:
+                return None
+            with dept.lock:
+                doctor = self._best(dept)
+                if doctor is None:
+                    return None
+                doctor.active += 1
+                self._push(dept, doctor)
+                assigned = doctor.public()
+            self._assigned[patient_id] = doctor
+            self.assignments += 1
+            return assigned
+
+    def release(self, patient_id) -> bool:
+        """
+        Patient called, discharged or moved: free their slot on the doctor's load.
+        Idempotent; returns False if the patient holds no slot.
+        """
+        with self._lock:
+            return self._release_locked(patient_id)
+
+    def _release_locked(self, patient_id) -> bool:
+        doctor = self._assigned.pop(patient_id, None)
+        if doctor is None:
+            return False
+        dept = self._depts.get(doctor.department.lower())
+        if dept is not None:
+            with dept.lock:
+                doctor.active = max(0, doctor.active - 1)
+                if dept.doctors.get(doctor.key) is doctor:
+                    self._push(dept, doctor)
+        self.releases += 1
+        return True
+
+    def roster(self, department):
+        """
+        In-memory roster for referrals (available first, most experienced first),
+        or None if the department isn't known yet.
+        """
+        dept = self._department(department)
+        if dept is None:
+            return None
+        with dept.lock:
+            doctors = sorted(dept.doctors.values(), key=lambda d: (not d.available, -d.experience))
+            return [d.public() for d in doctors]
+
+    # --------------------------------------------------------
+    # Reconciliation with the store
+    # --------------------------------------------------------
+
+    def reconcile(self):
+        """
+        Refresh rosters from the store. Store reads happen outside the department locks;
+        active-patient counters survive the refresh.
+        """
+        if self.store is None and self.store_factory is not None:
+            self.store = self.store_factory()
+        if self.store is None:
+            self._loaded.set()
+            return
+        fetched = {}
+        for department in self.departments:
+            try:
+                fetched[department] = self.store.doctors(department)
+            except Exception as e:
+                self.last_error = f"{department}: {e}"
+
+        for department, rows in fetched.items():
+            dept_key = department.lower()
+            with self._lock:
+                dept = self._depts.get(dept_key)
+                if dept is None:
+                    dept = self._depts[dept_key] = _DepartmentHeap()
+                    self._names[dept_key] = department
+            with dept.lock:
+                seen = set()
+                for row in rows:
+                    key = row.get("id") if row.get("id") is not None else row["name"]
+                    seen.add(key)
+                    doctor = dept.doctors.get(key)
+                    if doctor is None:
+                        doctor = dept.doctors[key] = DoctorState(
+                            key, department, row["name"], row["experience"], row["available"])
+                    else:
+                        doctor.name = row["name"]
+                        doctor.experience = row["experience"] or 0
+                        doctor.available = bool(row["available"])
+                    self._push(dept, doctor)
+                for key in set(dept.doctors) - seen:
+                    # Removed from the roster: no longer assignable (patients keep their record)
+                    dept.doctors.pop(key).available = False
+
+        self.reconciles += 1
+        self.last_reconcile = time.time()
+        self._loaded.set()
+
+    def start(self):
+        """
+        Starts the reconcile thread, whose first pass loads the rosters
+        (startup hook; also started on first use). Idempotent.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="pars-assignment-reconcile", daemon=True)
+        self._thread.start()
+
+    def wait_loaded(self, timeout=None) -> bool:
+        return self._loaded.wait(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                self.last_error = str(e)
+                log.warning("Assignment reconcile failed: %s", e)
+            time.sleep(self.reconcile_interval)
+
+    # --------------------------------------------------------
+    # Reporting
+    # --------------------------------------------------------
+
+    def stats(self) -> dict:
+        departments = {}
+        for key, dept in sorted(self._depts.items()):
+            with dept.lock:
+                departments[self._names[key]] = {
+                    "doctors": len(dept.doctors),
+                    "available": sum(d.available for d in dept.doctors.values()),
+                    "active_patients": sum(d.active for d in dept.doctors.values()),
+                    "heap_entries": len(dept.heap),
+                }
+        return {
+            "loaded": self._loaded.is_set(),
+            "assignments": self.assignments,
+            "releases": self.releases,
+            "active_assignments": len(self._assigned),
+            "reconciles": self.reconciles,
+            "last_reconcile": self.last_reconcile,
+            "last_error": self.last_error,
+            "departments": departments,
+        }
+
+
+def create_assignment_engine():
+    """
+    Engine over the configured data store. The store is only resolved by the
+    reconcile thread (see AssignmentEngine.start), never at import.
+    """
+    from data_store import get_data_store
+    from dept_service import DEPARTMENTS
+
+    departments = [d.split(" (")[0].strip() for d in DEPARTMENTS]
+    return AssignmentEngine.from_env(departments=departments, store_factory=get_data_store)
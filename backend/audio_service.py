@@ -1,38 +1,373 @@
+"""
+PARS - Audio Service
+Whisper transcription with a voice-activity front end.
+
+Ward recordings are often half silence or background noise, and Whisper's cost
+grows with the number of 30 s windows it decodes. Before transcription the
+audio is decoded to 16 kHz mono and an energy VAD finds the speech regions:
+frame energies are compared to the recording's own noise floor, short gaps are
+bridged, blips are dropped and each region is padded. Regions longer than one
+Whisper window are split at their quietest frame. The speech regions are then
+packed (with a short silence between them) into as few <=30 s chunks as
+possible and the chunks are transcribed one after another. A recording with no
+speech never reaches the model.
+
+PARS_AUDIO_BATCHED=1 decodes the chunks together in batches instead (one
+whisper.decode pass per batch). It is experimental and off by default: its
+transcripts have not yet been compared with sequential decoding on real
+recordings (bench_audio_vad.py --files does that when Whisper is installed).
+
+stats() reports how much audio was skipped and the resulting reduction in
+Whisper windows; bench_audio_vad.py measures the wall-clock speedup.
+
+Environment:
+  - PARS_AUDIO_VAD              set to 0 to transcribe whole recordings (default: 1)
+  - PARS_VAD_MARGIN_DB          speech threshold above the noise floor (default: 12)
+  - PARS_VAD_MIN_DB             frames quieter than this are never speech (default: -50)
+  - PARS_VAD_MIN_SPEECH_MS      shorter regions are dropped (default: 200)
+  - PARS_VAD_MIN_SILENCE_MS     shorter gaps are bridged (default: 400)
+  - PARS_VAD_PAD_MS             padding kept around each region (default: 200)
+  - PARS_AUDIO_BATCHED          decode chunks in batches, experimental (default: 0)
+  - PARS_AUDIO_BATCH            chunks per batch when batched (default: 8)
+"""
+
 import os
+import time
+import wave
+import threading
 import warnings
 
+import numpy as np
+
+from model_manager import MANAGER
+from log_config import get_logger
+
+log = get_logger(__name__)
+
 # Suppress warnings (like FP16 on CPU)
 warnings.filterwarnings("ignore")
 
+SAMPLE_RATE = 16000
+# Whisper decodes fixed 30 s windows
+WINDOW_SECONDS = 30
+WINDOW_SAMPLES = WINDOW_SECONDS * SAMPLE_RATE
+# Silence inserted between packed speech regions so words do not run together
+CHUNK_GAP_SECONDS = 0.3
+
+
+# ============================================================
+# ------------------- AUDIO DECODING -------------------------
+# ============================================================
+
+def load_audio(file_path: str) -> np.ndarray:
+    """
+    16 kHz mono float32 samples. Uses Whisper's ffmpeg loader when Whisper is
+    installed (any format); otherwise PCM WAV is read with the standard library.
+    """
+    try:
+        import whisper
+    except ImportError:
+        whisper = None
+    if whisper is not None:
+        return whisper.load_audio(file_path)
+    return _read_wav(file_path)
+
+
+def _read_wav(file_path):
+    with wave.open(file_path, "rb") as wav:
+        width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    if width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = "<i2" if width == 2 else "<i4"
+        audio = np.frombuffer(frames, dtype=dtype).astype(np.float32) / float(2 ** (8 * width - 1))
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(audio), rate / SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+
+# ============================================================
+# ------------------- VOICE ACTIVITY DETECTION ---------------
+# ============================================================
+
+class VoiceActivityDetector:
+    """
+    Energy VAD with a per-recording noise floor. segments() returns speech
+    regions as (start, end) sample offsets.
+    """
+
+    def __init__(self, frame_ms=20, margin_db=12.0, min_db=-50.0, min_speech_ms=200,
+                 min_silence_ms=400, pad_ms=200, max_segment_seconds=WINDOW_SECONDS - 1):
+        self.frame = SAMPLE_RATE * frame_ms // 1000
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.min_speech = max(1, min_speech_ms // frame_ms)
+        self.min_silence = max(1, min_silence_ms // frame_ms)
+        self.pad = pad_ms // frame_ms
+        self.max_segment = int(max_segment_seconds * 1000) // frame_ms
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            margin_db=float(os.getenv("PARS_VAD_MARGIN_DB", "12")),
+            min_db=float(os.getenv("PARS_VAD_MIN_DB", "-50")),
+            min_speech_ms=int(os.getenv("PARS_VAD_MIN_SPEECH_MS", "200")),
+            min_silence_ms=int(os.getenv("PARS_VAD_MIN_SILENCE_MS", "400")),
+            pad_ms=int(os.getenv("PARS_VAD_PAD_MS", "200")),
+        )
+
+    def frame_db(self, audio):
+        n = len(audio) // self.frame
+        frames = audio[:n * self.frame].reshape(n, self.frame).astype(np.float64)
+        return 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+    def speech_frames(self, db):
+        """
+        Boolean speech mask over frames.
+        """
+        if len(db) == 0:
+            return np.zeros(0, dtype=bool)
+        floor, peak = np.percentile(db, 10), np.percentile(db, 95)
+        spread = peak - floor
+        if peak < self.min_db or spread < self.margin_db / 2:
+            # Silence, or steady noise (fans, hum): speech always modulates the level
+            return np.zeros(len(db), dtype=bool)
+        if spread < self.margin_db:
+            # Modulated but never clearly above the floor (speech over loud
+            # noise, or no pauses): keep everything rather than lose words
+            return db >= self.min_db
+        return db >= max(floor + self.margin_db, self.min_db)
+
+    def segments(self, audio):
+        db = self.frame_db(audio)
+        runs = _runs(self.speech_frames(db))
+        if not runs:
+            return []
+
+        # Bridge short gaps, then drop blips
+        merged = [list(runs[0])]
+        for start, end in runs[1:]:
+            if start - merged[-1][1] < self.min_silence:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end])
+        merged = [(s, e) for s, e in merged if e - s >= self.min_speech]
+
+        # Pad, merging regions the padding makes overlap
+        padded = []
+        for start, end in merged:
+            start, end = max(0, start - self.pad), min(len(db), end + self.pad)
+            if padded and start <= padded[-1][1]:
+                padded[-1] = (padded[-1][0], end)
+            else:
+                padded.append((start, end))
+
+        # Split regions longer than one Whisper window at their quietest frame
+        result = []
+        for start, end in padded:
+            while end - start > self.max_segment:
+                lo, hi = start + self.max_segment // 2, start + self.max_segment
+                cut = lo + int(np.argmin(db[lo:hi]))
+                result.append((start, cut))
+                start = cut
+            result.append((start, end))
+
+        n = len(audio)
+        return [(s * self.frame, min(e * self.frame, n)) for s, e in result]
+
+
+def _runs(mask):
+    """
+    (start, end) frame ranges where mask is True.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def pack_segments(audio, segments, max_samples=WINDOW_SAMPLES, gap=CHUNK_GAP_SECONDS):
+    """
+    Concatenates speech regions (in order, separated by `gap` seconds of
+    silence) into as few chunks of at most max_samples as possible.
+    """
+    silence = np.zeros(int(gap * SAMPLE_RATE), dtype=np.float32)
+    chunks, current, length = [], [], 0
+    for start, end in segments:
+        piece = audio[start:end]
+        extra = len(piece) + (len(silence) if current else 0)
+        if current and length + extra > max_samples:
+            chunks.append(np.concatenate(current))
+            current, length = [], 0
+            extra = len(piece)
+        if current:
+            current.append(silence)
+        current.append(piece)
+        length += extra
+    if current:
+        chunks.append(np.concatenate(current))
+    return chunks
+
+
+# ============================================================
+# ------------------- TRANSCRIPTION --------------------------
+# ============================================================
+
 class AudioService:
     def __init__(self):
         self.model = None
-        
+        self.vad = VoiceActivityDetector.from_env() if os.getenv("PARS_AUDIO_VAD", "1") == "1" else None
+        self.batched = os.getenv("PARS_AUDIO_BATCHED", "0") == "1"
+        self.batch_size = int(os.getenv("PARS_AUDIO_BATCH", "8"))
+        self._lock = threading.Lock()
+        self.counters = {
+            "files": 0, "silent_files": 0, "audio_seconds": 0.0, "speech_seconds": 0.0,
+            "segments": 0, "windows_full": 0, "windows_decoded": 0, "batches": 0,
+            "fallback_decodes": 0, "vad_seconds": 0.0, "whisper_seconds": 0.0,
+        }
+        MANAGER.register("whisper", self._load_model, self.unload, lambda: self.model is not None)
+
+    def unload(self):
+        self.model = None
+
     def _load_model(self):
         if self.model:
             return
 
-        print("[PARS] Loading Whisper model (Lazy Load)...")
+        log.info("Loading Whisper model (Lazy Load)...")
         try:
             import whisper
             # "base" is a good balance of speed vs accuracy for English
             self.model = whisper.load_model("base")
-            print("[PARS] Whisper model loaded successfully.")
+            log.info("Whisper model loaded successfully.")
         except Exception as e:
-            print(f"[PARS] CRITICAL: Failed to load Whisper model: {e}")
+            log.critical("Failed to load Whisper model: %s", e)
             self.model = None
 
+    def speech_chunks(self, audio):
+        """
+        VAD + packing: (chunks to decode, speech segments). Records the counters.
+        """
+        started = time.perf_counter()
+        segments = self.vad.segments(audio)
+        chunks = pack_segments(audio, segments)
+        elapsed = time.perf_counter() - started
+        duration = len(audio) / SAMPLE_RATE
+        with self._lock:
+            c = self.counters
+            c["files"] += 1
+            c["silent_files"] += not segments
+            c["audio_seconds"] += duration
+            c["speech_seconds"] += sum(e - s for s, e in segments) / SAMPLE_RATE
+            c["segments"] += len(segments)
+            c["windows_full"] += int(np.ceil(len(audio) / WINDOW_SAMPLES)) if len(audio) else 0
+            c["windows_decoded"] += len(chunks)
+            c["vad_seconds"] += elapsed
+        return chunks, segments
+
     def transcribe(self, file_path: str) -> str:
-        self._load_model()
-        
-        if not self.model:
-            return "Error: Document processing unavailable (Model not loaded)."
-        
+        if self.vad is None:
+            return self._transcribe_file(file_path)
         try:
-            # fp16=False is safer for CPU inference
-            result = self.model.transcribe(file_path, fp16=False)
-            text = result.get("text", "").strip()
-            return text
+            audio = load_audio(file_path)
         except Exception as e:
-            print(f"[PARS] Transcription error: {e}")
+            log.warning("Could not decode %s for VAD, transcribing whole file: %s", file_path, e)
+            return self._transcribe_file(file_path)
+
+        chunks, segments = self.speech_chunks(audio)
+        log.debug("VAD kept %d segment(s), %.1fs of %.1fs audio in %d chunk(s)",
+                  len(segments), sum(e - s for s, e in segments) / SAMPLE_RATE, len(audio) / SAMPLE_RATE, len(chunks))
+        if not chunks:
+            # Nothing but silence / noise: the model is never loaded
             return ""
+
+        with MANAGER.use("whisper"):
+            self._load_model()
+            model = self.model
+
+            if not model:
+                return "Error: Document processing unavailable (Model not loaded)."
+
+            started = time.perf_counter()
+            decode = self._decode_batched if self.batched else self._decode_sequential
+            try:
+                return " ".join(t for t in decode(model, chunks) if t)
+            except Exception as e:
+                log.error("Transcription error: %s", e)
+                return ""
+            finally:
+                with self._lock:
+                    self.counters["whisper_seconds"] += time.perf_counter() - started
+
+    def _transcribe_file(self, file_path):
+        with MANAGER.use("whisper"):
+            self._load_model()
+            model = self.model
+
+            if not model:
+                return "Error: Document processing unavailable (Model not loaded)."
+
+            try:
+                # fp16=False is safer for CPU inference
+                result = model.transcribe(file_path, fp16=False)
+                text = result.get("text", "").strip()
+                return text
+            except Exception as e:
+                log.error("Transcription error: %s", e)
+                return ""
+
+    def _decode_sequential(self, model, chunks):
+        """
+        Transcribes the <=30 s chunks one at a time (Whisper's own decoding,
+        temperature fallback included).
+        """
+        return [model.transcribe(chunk, fp16=False).get("text", "").strip() for chunk in chunks]
+
+    def _decode_batched(self, model, chunks):
+        """
+        Decodes <=30 s chunks in batches (one encoder/decoder pass per batch).
+        Chunks that fail Whisper's own quality checks are re-run through
+        transcribe(), which retries with temperature fallback.
+        """
+        import torch
+        import whisper
+
+        options = whisper.DecodingOptions(fp16=False)
+        texts = []
+        for first in range(0, len(chunks), self.batch_size):
+            batch = chunks[first:first + self.batch_size]
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), model.dims.n_mels) for chunk in batch
+            ]).to(model.device)
+            results = whisper.decode(model, mel, options)
+            with self._lock:
+                self.counters["batches"] += 1
+            for chunk, result in zip(batch, results):
+                if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+                    continue
+                if result.compression_ratio > 2.4 or result.avg_logprob < -1.0:
+                    with self._lock:
+                        self.counters["fallback_decodes"] += 1
+                    texts.append(model.transcribe(chunk, fp16=False).get("text", "").strip())
+                else:
+                    texts.append(result.text.strip())
+        return texts
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self.counters)
+        audio = c["audio_seconds"]
+        return {
+            "vad": self.vad is not None,
+            "batched": self.batched,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in c.items()},
+            "skipped_seconds": round(audio - c["speech_seconds"], 3),
+            "skipped_pct": round(100 * (1 - c["speech_seconds"] / audio), 1) if audio else 0.0,
+            # Whisper's cost is per 30 s window decoded
+            "window_speedup": round(c["windows_full"] / c["windows_decoded"], 2) if c["windows_decoded"] else None,
+            "realtime_factor": round(audio / (c["vad_seconds"] + c["whisper_seconds"]), 1)
+                               if c["whisper_seconds"] else None,
+        }
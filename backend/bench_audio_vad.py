@@ -0,0 +1,133 @@
+"""
+Benchmark: Whisper on whole recordings vs the VAD front end (audio_service.py),
+with the speech chunks decoded sequentially (default) or in batches
+(PARS_AUDIO_BATCHED). All paths share one loaded model; each file is
+transcribed once per path after a warmup, and the audio skipped, Whisper
+windows and wall-clock time are compared, along with how far the batched
+transcripts differ from the sequential ones. Run it on real recordings
+(--files) before enabling batched decoding.
+
+Without Whisper installed only the VAD side is measured (skipped audio and the
+reduction in 30 s windows), which is what the wall-clock speedup tracks.
+
+Usage:
+  python bench_audio_vad.py [--files "recordings/*.wav"] [--synthetic 20] [--seed 0]
+"""
+import sys
+import os
+import glob
+import time
+import difflib
+import argparse
+import tempfile
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+from audio_service import AudioService, load_audio, SAMPLE_RATE
+
+
+def synthetic_files(n, seed, out_dir):
+    """
+    Ward-like recordings: 20-180 s, mostly background noise with bursts of
+    speech-like audio (synth_patients.speech_like_wav segments).
+    """
+    import io
+    import wave
+    import numpy as np
+    from synth_patients import speech_like_wav
+
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n):
+        pieces = []
+        total = rng.uniform(20, 180)
+        while sum(len(p) for p in pieces) < total * SAMPLE_RATE:
+            pieces.append(rng.normal(0, rng.uniform(0.003, 0.02), int(rng.uniform(2, 15) * SAMPLE_RATE)))
+            burst = speech_like_wav(rng.uniform(1, 8), seed=seed + i * 100 + len(pieces), speech_ratio=0.9)
+            with wave.open(io.BytesIO(burst)) as wav:
+                pieces.append(np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2") / 32768)
+        audio = np.concatenate(pieces)
+        path = os.path.join(out_dir, f"ward_{i:03d}.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper with and without VAD")
+    parser.add_argument("--files", help="glob of recordings to transcribe")
+    parser.add_argument("--synthetic", type=int, default=20, help="synthetic recordings when --files is not given")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = sorted(glob.glob(args.files)) if args.files else synthetic_files(args.synthetic, args.seed, tmp)
+        if not files:
+            raise SystemExit("No recordings found.")
+
+        service = AudioService()
+        if service.vad is None:
+            raise SystemExit("PARS_AUDIO_VAD=0; nothing to compare.")
+        started = time.perf_counter()
+        for path in files:
+            service.speech_chunks(load_audio(path))
+        vad_seconds = time.perf_counter() - started
+        stats = service.stats()
+        print(f"{len(files)} recordings, {stats['audio_seconds']:.0f} s of audio")
+        print(f"  speech kept:     {stats['speech_seconds']:.0f} s ({100 - stats['skipped_pct']:.1f}%), "
+              f"{stats['silent_files']} recording(s) with no speech")
+        print(f"  Whisper windows: {stats['windows_full']} whole-file -> {stats['windows_decoded']} packed "
+              f"({stats['window_speedup']}x fewer)")
+        print(f"  VAD cost:        {1e3 * vad_seconds / len(files):.1f} ms per recording (decode + detect)")
+
+        try:
+            import whisper  # noqa: F401
+        except ImportError:
+            print("Whisper is not installed; wall-clock comparison skipped.")
+            return
+
+        service._load_model()
+        if service.model is None:
+            raise SystemExit("Whisper model failed to load.")
+        service.transcribe(files[0])
+
+        def vad(batched):
+            def run(path):
+                service.batched = batched
+                return service.transcribe(path)
+            return run
+
+        timings, transcripts = {}, {}
+        runs = (("whole recording", service._transcribe_file), ("VAD sequential", vad(False)),
+                ("VAD batched", vad(True)))
+        for name, run in runs:
+            started = time.perf_counter()
+            transcripts[name] = [run(path) for path in files]
+            timings[name] = time.perf_counter() - started
+        print("=" * 60)
+        for name, seconds in timings.items():
+            print(f"  {name:<16} {seconds:8.1f} s  ({stats['audio_seconds'] / seconds:6.1f}x realtime)")
+        print(f"  Speedup (VAD sequential): {timings['whole recording'] / timings['VAD sequential']:.2f}x")
+        print(f"  Speedup (VAD batched):    {timings['whole recording'] / timings['VAD batched']:.2f}x")
+
+        # Batched decoding is only worth enabling if it transcribes like the sequential path
+        print("=" * 60)
+        print("Batched vs sequential transcripts:")
+        identical, ratios = 0, []
+        for path, sequential, batched in zip(files, transcripts["VAD sequential"], transcripts["VAD batched"]):
+            ratio = difflib.SequenceMatcher(None, sequential.lower().split(), batched.lower().split()).ratio()
+            identical += sequential == batched
+            ratios.append(ratio)
+            if sequential != batched:
+                print(f"  {os.path.basename(path)}: word similarity {ratio:.3f}")
+                print(f"    sequential: {sequential[:200]}")
+                print(f"    batched:    {batched[:200]}")
+        print(f"  identical: {identical}/{len(files)}, mean word similarity {sum(ratios) / len(ratios):.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Accuracy + latency/memory comparison of department-router encoders (torch vs int8 ONNX).
+Each backend runs in a fresh subprocess so import/load cost and RSS are isolated.
+Run onnx_encoder.py first to export the ONNX model.
+
+Usage:
+  python bench_dept_encoder.py [--repeat 20]
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(backend, repeat):
+    os.environ["PARS_DEPT_ENCODER"] = backend
+    sys.path.append(base_dir)
+    import io
+    import contextlib
+    import numpy as np
+    from router_cases import ROUTER_CASES
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    import dept_service
+    model = dept_service.get_active_model()
+    load_s = time.perf_counter() - start
+    if model is None:
+        raise SystemExit(f"{backend} encoder failed to load")
+    rss_loaded = rss_mb()
+
+    # Accuracy of the full hybrid router (keyword + NLP); silence its per-call logging
+    predictions = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for complaint, _ in ROUTER_CASES:
+            predictions.append(dept_service.get_department(complaint))
+    correct = sum(p == expected for p, (_, expected) in zip(predictions, ROUTER_CASES))
+
+    # Encoder latency per complaint
+    complaints = [c for c, _ in ROUTER_CASES]
+    latencies = []
+    for _ in range(repeat):
+        for c in complaints:
+            t0 = time.perf_counter()
+            model.encode(c)
+            latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1e3
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        model.encode(complaints)
+    batch_per_s = repeat * len(complaints) / (time.perf_counter() - t0)
+
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_s,
+        "rss_load_mb": rss_loaded - rss_before,
+        "rss_total_mb": rss_mb(),
+        "accuracy": correct / len(ROUTER_CASES),
+        "predictions": predictions,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "batch_per_s": batch_per_s,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare department-router encoders")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--child", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeat)
+        return
+
+    sys.path.append(base_dir)
+    from router_cases import ROUTER_CASES
+
+    results = []
+    for backend in ("torch", "onnx"):
+        print(f"Benchmarking {backend} encoder...")
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--repeat", str(args.repeat)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(f"❌ {backend} failed:\n{out.stderr[-2000:]}")
+            continue
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print("\n" + "=" * 92)
+    print(f"{'encoder':<8} {'accuracy':>9} {'load (s)':>9} {'load RSS (MB)':>14} {'total RSS (MB)':>15} "
+          f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'batch/s':>9}")
+    print("-" * 92)
+    for r in results:
+        print(f"{r['backend']:<8} {r['accuracy'] * 100:>8.1f}% {r['load_s']:>9.2f} {r['rss_load_mb']:>14.1f} "
+              f"{r['rss_total_mb']:>15.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['batch_per_s']:>9.0f}")
+    print("=" * 92)
+
+    if len(results) == 2:
+        torch_preds, onnx_preds = results[0]["predictions"], results[1]["predictions"]
+        disagreements = [
+            (complaint, expected, t, o)
+            for (complaint, expected), t, o in zip(ROUTER_CASES, torch_preds, onnx_preds)
+            if t != o
+        ]
+        print(f"\nRouting agreement torch vs onnx: {len(ROUTER_CASES) - len(disagreements)}/{len(ROUTER_CASES)}")
+        for complaint, expected, t, o in disagreements:
+            print(f"  - '{complaint}' (expected {expected}): torch={t}, onnx={o}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: Keras (TensorFlow) backend vs ONNX Runtime backend for TriageModel.
+Each backend is measured in a fresh subprocess so load time and RSS are not shared.
+
+Usage:
+  python bench_onnx.py [--rows 2000] [--threads 1]
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(backend, rows, threads):
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(os.path.join(os.path.dirname(base_dir), "patients_data.csv")).head(rows)
+    records = df.rename(columns={
+        "Temp": "Temperature", "History_Diabetes": "Diabetes",
+        "History_Hypertension": "Hypertension", "History_Heart_Disease": "Heart_Disease",
+    }).to_dict("records")
+    rss_before = rss_mb()
+
+    sys.path.append(base_dir)
+    start = time.perf_counter()
+    from ml_service import TriageModel
+    model = TriageModel(backend=backend, intra_op_threads=threads)
+    model._load_resources_if_needed()
+    load_s = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    # Warm up, then time single-row predict() (guardrails + features + network)
+    for r in records[:20]:
+        model.predict(r)
+    latencies = []
+    for r in records:
+        t0 = time.perf_counter()
+        model.predict(r)
+        latencies.append(time.perf_counter() - t0)
+    latencies = np.array(latencies) * 1e6
+
+    t0 = time.perf_counter()
+    model.predict_batch(records)
+    batch_s = time.perf_counter() - t0
+
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_s,
+        "rss_load_mb": rss_loaded - rss_before,
+        "rss_total_mb": rss_mb(),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "batch_rows_per_s": len(records) / batch_s,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TriageModel backends")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--child", choices=["keras", "onnx"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows, args.threads)
+        return
+
+    results = []
+    for backend in ("keras", "onnx"):
+        print(f"Benchmarking {backend}...")
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--rows", str(args.rows), "--threads", str(args.threads)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(f"❌ {backend} failed:\n{out.stderr[-2000:]}")
+            continue
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print("\n" + "=" * 86)
+    print(f"{'backend':<8} {'load (s)':>9} {'load RSS (MB)':>14} {'total RSS (MB)':>15} "
+          f"{'p50 (us)':>9} {'p99 (us)':>9} {'batch rows/s':>13}")
+    print("-" * 86)
+    for r in results:
+        print(f"{r['backend']:<8} {r['load_s']:>9.2f} {r['rss_load_mb']:>14.1f} {r['rss_total_mb']:>15.1f} "
+              f"{r['p50_us']:>9.1f} {r['p99_us']:>9.1f} {r['batch_rows_per_s']:>13.0f}")
+    print("=" * 86)
+
+
+if __name__ == "__main__":
+    main()
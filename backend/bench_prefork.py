@@ -0,0 +1,140 @@
+"""
+Benchmark the pre-fork server as workers scale: per-worker incremental memory
+(private RSS / PSS from /proc/<pid>/smaps_rollup) and aggregate /predict throughput.
+
+Usage:
+  python bench_prefork.py [--workers 1,2,4] [--seconds 10] [--concurrency 16] [--port 8765]
+"""
+import sys
+import os
+import json
+import time
+import signal
+import argparse
+import threading
+import subprocess
+import http.client
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+from prefork_server import read_smaps_rollup
+
+PAYLOAD = json.dumps({
+    "Age": 58, "Gender": "M", "Heart_Rate": 112, "Systolic_BP": 96, "Diastolic_BP": 60,
+    "O2_Saturation": 93.0, "Temperature": 38.4, "Respiratory_Rate": 24, "Pain_Score": 6,
+    "GCS_Score": 15, "Arrival_Mode": "Ambulance", "Diabetes": True, "Hypertension": True,
+    "Heart_Disease": False, "Chief_Complaint": "chest pain and shortness of breath",
+})
+
+
+def wait_ready(port, timeout=180):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def worker_pids(parent_pid):
+    try:
+        with open(f"/proc/{parent_pid}/task/{parent_pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def drive(port, seconds, concurrency):
+    """
+    Closed-loop load: `concurrency` keep-alive clients posting /predict for `seconds`.
+    """
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+    stop_at = time.time() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.time() < stop_at:
+            try:
+                conn.request("POST", "/predict", PAYLOAD, {"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status == 200:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except OSError:
+                errors[i] += 1
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pre-fork worker scaling")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--preload", default="triage,nlp")
+    args = parser.parse_args()
+
+    results = []
+    for n in [int(w) for w in args.workers.split(",")]:
+        print(f"Starting pre-fork server with {n} worker(s)...")
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(base_dir, "prefork_server.py"), "--host", "127.0.0.1",
+             "--port", str(args.port), "--workers", str(n), "--preload", args.preload,
+             # Only /predict is measured; the diverging per-worker queues don't matter here
+             "--allow-split-state"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_ready(args.port):
+                print(f"❌ Server with {n} workers did not become ready")
+                continue
+
+            # Warm every worker (lazy loads, first-inference allocations) before measuring
+            drive(args.port, 3, args.concurrency)
+            throughput, errors = drive(args.port, args.seconds, args.concurrency)
+
+            parent = read_smaps_rollup(proc.pid)
+            workers = [read_smaps_rollup(pid) for pid in worker_pids(proc.pid)]
+            results.append({
+                "workers": n,
+                "throughput": throughput,
+                "errors": errors,
+                "parent_rss": parent.get("rss", 0.0),
+                "worker_private": sum(w.get("private", 0.0) for w in workers) / max(1, len(workers)),
+                "worker_rss": sum(w.get("rss", 0.0) for w in workers) / max(1, len(workers)),
+                "total_pss": parent.get("pss", 0.0) + sum(w.get("pss", 0.0) for w in workers),
+            })
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    print("\n" + "=" * 96)
+    print(f"{'workers':>7} {'req/s':>9} {'errors':>7} {'parent RSS':>11} {'worker RSS':>11} "
+          f"{'worker private (incremental)':>28} {'total PSS':>10}")
+    print("-" * 96)
+    for r in results:
+        print(f"{r['workers']:>7} {r['throughput']:>9.1f} {r['errors']:>7} {r['parent_rss']:>9.1f}MB "
+              f"{r['worker_rss']:>9.1f}MB {r['worker_private']:>26.1f}MB {r['total_pss']:>8.1f}MB")
+    print("=" * 96)
+
+
+if __name__ == "__main__":
+    main()
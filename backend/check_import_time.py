@@ -0,0 +1,111 @@
+"""
+Import-time budget check for the backend.
+Imports main.py in a fresh interpreter with `python -X importtime`, reports the
+per-module import cost, and fails if the total exceeds the budget or if any
+heavy ML/SDK package is imported eagerly.
+
+Usage:
+  python check_import_time.py [--budget-ms 1500] [--top 20]
+"""
+import sys
+import os
+import argparse
+import subprocess
+
+# Packages that must only be imported on first use (lazy loading)
+HEAVY_MODULES = [
+    "tensorflow",
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "whisper",
+    "supabase",
+    "google.generativeai",
+    "onnxruntime",
+]
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(module="main"):
+    """
+    Returns [(module, self_us, cumulative_us, depth)] in import order.
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=base_dir, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        print(out.stderr[-2000:])
+        raise SystemExit(f"❌ Importing {module} failed")
+
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check backend import-time budget")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    by_name = {name: (self_us, cum_us) for name, self_us, cum_us, _ in rows}
+    total_ms = by_name.get(args.module, (0, 0))[1] / 1000
+
+    # First-party backend modules
+    local = sorted(
+        (name for name in by_name if os.path.exists(os.path.join(base_dir, f"{name}.py"))),
+        key=lambda n: -by_name[n][1],
+    )
+    print("=" * 60)
+    print(f"{'backend module':<30} {'self (ms)':>12} {'cumulative (ms)':>16}")
+    print("-" * 60)
+    for name in local:
+        self_us, cum_us = by_name[name]
+        print(f"{name:<30} {self_us / 1000:>12.1f} {cum_us / 1000:>16.1f}")
+
+    # Heaviest top-level third-party imports
+    print("\n" + "=" * 60)
+    print(f"{'top imports (cumulative)':<30} {'self (ms)':>12} {'cumulative (ms)':>16}")
+    print("-" * 60)
+    top = sorted((r for r in rows if r[0] not in local), key=lambda r: -r[2])
+    shown = set()
+    for name, self_us, cum_us, depth in top:
+        root = name.split(".")[0]
+        if root in shown:
+            continue
+        shown.add(root)
+        print(f"{name:<30} {self_us / 1000:>12.1f} {cum_us / 1000:>16.1f}")
+        if len(shown) >= args.top:
+            break
+
+    failures = []
+    eager = [m for m in HEAVY_MODULES if m in by_name]
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+
+    print("\n" + "=" * 60)
+    print(f"Total import time for '{args.module}': {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    if failures:
+        for f in failures:
+            print(f"❌ {f}")
+        sys.exit(1)
+    print("✅ Within import-time budget, no heavy modules imported eagerly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+PARS - Complaint Index
+Nearest-neighbour index of historical chief complaints and the department they
+were sent to, used for kNN-vote routing in dept_service (PARS_DEPT_ROUTER=knn).
+
+Index directory (append-only files, memory-mapped read-only when serving):
+  meta.json       dim, dtype, count, departments, encoder, IVF settings
+  vectors.bin     (count, dim) unit-norm embeddings as int8 with per-row
+                  scales in scales.bin (float32), or float16
+  labels.bin      (count,) uint8 department ids
+  weights.bin     (count,) float32 visit counts (repeated complaints are stored once)
+  lists.bin       (count,) uint16 IVF list per row (only when nlist > 0)
+  centroids.npy   (nlist, dim) float32 IVF centroids (spherical k-means)
+
+With IVF a query scans the `nprobe` closest lists only; rows are written grouped
+by list, so each list is a contiguous run of the mapped file, converted straight
+into one float32 buffer for a single matmul. int8 is the default because NumPy
+upcasts it several times faster than float16 (and it is half the size). Appends go to the
+end of every file and are assigned to the nearest existing centroid; meta.json
+(the row count) is replaced last, so a crash mid-append leaves the index as it was.
+
+Build / maintain offline:
+  python complaint_index.py build [--csv ../patients_data.csv] [--from-store]
+                                  [--out complaint_index] [--dtype int8|float16] [--nlist N]
+  python complaint_index.py append --csv visits.csv [--out complaint_index]
+  python complaint_index.py query "crushing chest pain" [--out complaint_index]
+
+Labels come from a Department column in the CSV and/or patients.department in the
+data store. CSV complaints without a department are weak-labelled with the current
+hybrid router (route_batch); those labels only reproduce today's routing, so prefer
+clinician-confirmed departments when they are available. Rows labelled with a
+department the router does not know are skipped and reported.
+
+meta.json records the encoder the embeddings came from (dept_service.encoder_id());
+the server refuses to route with an index built by a different encoder, and
+`append` refuses to extend one.
+
+Environment:
+  - PARS_COMPLAINT_INDEX    index directory (default: complaint_index)
+  - PARS_KNN_K              neighbours per vote (default: 10)
+  - PARS_KNN_NPROBE         IVF lists scanned per query (default: 8)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+META_FILE = "meta.json"
+DTYPES = ("int8", "float16")
+# Below this many rows a flat scan is already sub-millisecond
+IVF_MIN_ROWS = 4096
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 12, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means (cosine) over unit-norm float32 vectors; returns unit-norm centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~np.isin(np.arange(nlist), assign)
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.clip(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12, None)
+    return centroids.astype(np.float32)
+
+
+def _quantize(vectors: np.ndarray, dtype: str):
+    """
+    float32 rows -> (stored rows, per-row scales or None).
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.clip(np.abs(vectors).max(axis=1), 1e-12, None) / 127.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def _append_file(path, array: np.ndarray):
+    with open(path, "ab") as f:
+        f.write(np.ascontiguousarray(array).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_meta(path, meta: dict):
+    tmp = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+class ComplaintIndex:
+    def __init__(self, path, k=10, nprobe=8):
+        self.path = path
+        self.k = k
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.appended = 0
+        self._open()
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("PARS_COMPLAINT_INDEX", "complaint_index")
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return None
+        return cls(
+            path,
+            k=int(os.getenv("PARS_KNN_K", "10")),
+            nprobe=int(os.getenv("PARS_KNN_NPROBE", "8")),
+        )
+
+    # --------------------------------------------------------
+    # Building
+    # --------------------------------------------------------
+
+    @classmethod
+    def create(cls, path, embeddings, labels, weights, departments, dtype="int8", nlist=None, encoder=None):
+        """
+        Write a new index. `embeddings` are unit-norm float32 rows, `labels`
+        department indices into `departments`, `weights` visit counts per row.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown index dtype: {dtype} (expected one of {DTYPES})")
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        labels = np.asarray(labels, dtype=np.uint8)
+        weights = np.asarray(weights, dtype=np.float32)
+        if nlist is None:
+            nlist = int(np.sqrt(len(embeddings))) if len(embeddings) >= IVF_MIN_ROWS else 0
+        nlist = min(nlist, len(embeddings))
+
+        os.makedirs(path, exist_ok=True)
+        for name in ("vectors.bin", "scales.bin", "labels.bin", "weights.bin", "lists.bin", "centroids.npy"):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+        if nlist:
+            centroids = _kmeans(embeddings, nlist)
+            lists = np.argmax(embeddings @ centroids.T, axis=1).astype(np.uint16)
+            # Rows grouped by list: each list is one contiguous range of the mapped file
+            order = np.argsort(lists, kind="stable")
+            embeddings, labels, weights, lists = embeddings[order], labels[order], weights[order], lists[order]
+            np.save(os.path.join(path, "centroids.npy"), centroids)
+            _append_file(os.path.join(path, "lists.bin"), lists)
+
+        stored, scales = _quantize(embeddings, dtype)
+        _append_file(os.path.join(path, "vectors.bin"), stored)
+        if scales is not None:
+            _append_file(os.path.join(path, "scales.bin"), scales)
+        _append_file(os.path.join(path, "labels.bin"), labels)
+        _append_file(os.path.join(path, "weights.bin"), weights)
+
+        _write_meta(path, {
+            "dim": int(embeddings.shape[1]),
+            "dtype": dtype,
+            "count": int(len(embeddings)),
+            # Rows written here are grouped by IVF list; appended rows follow unordered
+            "grouped_count": int(len(embeddings)),
+            "departments": list(departments),
+            "nlist": int(nlist),
+            "encoder": encoder,
+            "created": time.time(),
+        })
+
+    # --------------------------------------------------------
+    # Loading
+    # --------------------------------------------------------
+
+    def _map(self, name, dtype, shape):
+        if not shape[0]:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    def _open(self):
+        with open(os.path.join(self.path, META_FILE)) as f:
+            meta = json.load(f)
+        count, dim = meta["count"], meta["dim"]
+        vectors = self._map("vectors.bin", np.float16 if meta["dtype"] == "float16" else np.int8, (count, dim))
+        scales = self._map("scales.bin", np.float32, (count,)) if meta["dtype"] == "int8" else None
+        labels = self._map("labels.bin", np.uint8, (count,))
+        weights = self._map("weights.bin", np.float32, (count,))
+
+        centroids, lists = None, None
+        if meta["nlist"]:
+            centroids = np.load(os.path.join(self.path, "centroids.npy"))
+            row_lists = np.asarray(self._map("lists.bin", np.uint16, (count,)))
+            grouped = meta.get("grouped_count", 0)
+            # Grouped rows: one contiguous (start, end) span per list; appended rows: index arrays
+            bounds = np.searchsorted(row_lists[:grouped], np.arange(meta["nlist"] + 1))
+            tail = row_lists[grouped:]
+            order = np.argsort(tail, kind="stable")
+            tail_bounds = np.searchsorted(tail[order], np.arange(meta["nlist"] + 1))
+            lists = [
+                (int(bounds[i]), int(bounds[i + 1]), grouped + order[tail_bounds[i]:tail_bounds[i + 1]])
+                for i in range(meta["nlist"])
+            ]
+
+        # Swapped in one assignment so concurrent queries see a consistent view
+        self._view = (meta, vectors, scales, labels, weights, centroids, lists)
+        self.departments = meta["departments"]
+        self.encoder = meta.get("encoder")
+        self.dim = dim
+
+    @property
+    def count(self) -> int:
+        return self._view[0]["count"]
+
+    # --------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------
+
+    def search(self, query: np.ndarray, k: int = None):
+        """
+        k nearest rows to one unit-norm query: (row indices, cosine similarities).
+        """
+        meta, vectors, scales, labels, weights, centroids, lists = self._view
+        k = k or self.k
+        if lists is None:
+            rows = np.arange(meta["count"])
+            candidates = np.asarray(vectors, dtype=np.float32)
+        else:
+            probe = [lists[i] for i in np.argsort(-(centroids @ query))[:self.nprobe]]
+            probe.sort(key=lambda span: span[0])
+            extra = np.sort(np.concatenate([appended for _, _, appended in probe]))
+            rows = np.concatenate([np.arange(start, end) for start, end, _ in probe] + [extra])
+            # Convert each span straight into one float32 buffer (no intermediate gather)
+            candidates = np.empty((len(rows), meta["dim"]), dtype=np.float32)
+            offset = 0
+            for start, end, _ in probe:
+                candidates[offset:offset + end - start] = vectors[start:end]
+                offset += end - start
+            if len(extra):
+                candidates[offset:] = vectors[extra]
+        sims = candidates @ query
+        if scales is not None:
+            sims *= scales[rows]
+        if len(sims) > k:
+            top = np.argpartition(-sims, k)[:k]
+        else:
+            top = np.arange(len(sims))
+        top = top[np.argsort(-sims[top])]
+        return rows[top], sims[top]
+
+    def vote(self, embeddings: np.ndarray, k: int = None):
+        """
+        Similarity- and visit-weighted department votes for N unit-norm queries.
+        Returns ((N, departments) vote shares, (N,) best neighbour similarity).
+        """
+        _, _, _, labels, weights, _, _ = self._view
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        votes = np.zeros((len(embeddings), len(self.departments)), dtype=np.float64)
+        nearest = np.zeros(len(embeddings), dtype=np.float64)
+        if not self.count:
+            return votes, nearest
+        for i, query in enumerate(embeddings):
+            rows, sims = self.search(query, k)
+            np.add.at(votes[i], labels[rows], np.clip(sims, 0.0, None) * weights[rows])
+            nearest[i] = sims[0] if len(sims) else 0.0
+        totals = votes.sum(axis=1, keepdims=True)
+        np.divide(votes, totals, out=votes, where=totals > 0)
+        self.queries += len(embeddings)
+        return votes, nearest
+
+    # --------------------------------------------------------
+    # Appends
+    # --------------------------------------------------------
+
+    def append(self, embeddings, departments, weights=None):
+        """
+        Add labelled visits (unit-norm embeddings + department names) to the index.
+        `weights` are visit counts per row (default: 1 each).
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        ids = {name: i for i, name in enumerate(self.departments)}
+        unknown = sorted({d for d in departments if d not in ids})
+        if unknown:
+            raise ValueError(f"Unknown departments: {unknown}")
+        labels = np.array([ids[d] for d in departments], dtype=np.uint8)
+
+        with self._lock:
+            meta, _, _, _, _, centroids, _ = self._view
+            count = meta["count"]
+            # Drop any tail left by an interrupted append before writing
+            for name, itemsize in self._row_files(meta):
+                with open(os.path.join(self.path, name), "ab") as f:
+                    f.truncate(count * itemsize)
+
+            stored, scales = _quantize(embeddings, meta["dtype"])
+            _append_file(os.path.join(self.path, "vectors.bin"), stored)
+            if scales is not None:
+                _append_file(os.path.join(self.path, "scales.bin"), scales)
+            _append_file(os.path.join(self.path, "labels.bin"), labels)
+            weights = np.ones(len(labels)) if weights is None else weights
+            _append_file(os.path.join(self.path, "weights.bin"), np.asarray(weights, dtype=np.float32))
+            if centroids is not None:
+                lists = np.argmax(embeddings @ centroids.T, axis=1).astype(np.uint16)
+                _append_file(os.path.join(self.path, "lists.bin"), lists)
+
+            _write_meta(self.path, {**meta, "count": count + len(labels), "updated": time.time()})
+            self._open()
+            self.appended += len(labels)
+        return self.count
+
+    @staticmethod
+    def _row_files(meta):
+        files = [("vectors.bin", meta["dim"] * (2 if meta["dtype"] == "float16" else 1)),
+                 ("labels.bin", 1), ("weights.bin", 4)]
+        if meta["dtype"] == "int8":
+            files.append(("scales.bin", 4))
+        if meta["nlist"]:
+            files.append(("lists.bin", 2))
+        return files
+
+    def stats(self) -> dict:
+        meta = self._view[0]
+        label_counts = np.bincount(np.asarray(self._view[3]), minlength=len(self.departments))
+        return {
+            "enabled": True,
+            "path": self.path,
+            "rows": meta["count"],
+            "dim": meta["dim"],
+            "dtype": meta["dtype"],
+            "nlist": meta["nlist"],
+            "nprobe": self.nprobe if meta["nlist"] else None,
+            "k": self.k,
+            "encoder": meta.get("encoder"),
+            "bytes": sum(
+                os.path.getsize(os.path.join(self.path, name))
+                for name, _ in self._row_files(meta) if os.path.exists(os.path.join(self.path, name))
+            ),
+            "rows_per_department": {d: int(c) for d, c in zip(self.departments, label_counts)},
+            "queries": self.queries,
+            "appended": self.appended,
+        }
+
+
+# ============================================================
+# ------------------- OFFLINE BUILDER ------------------------
+# ============================================================
+
+def _labelled_rows(args):
+    """
+    (complaint, department or None) pairs from the CSV and/or the data store.
+    """
+    rows = []
+    if args.csv:
+        import pandas as pd
+        df = pd.read_csv(args.csv)
+        department_column = next((c for c in ("Department", "department") if c in df.columns), None)
+        for _, row in df.iterrows():
+            complaint = row.get("Chief_Complaint")
+            if isinstance(complaint, str) and complaint.strip():
+                department = row.get(department_column) if department_column else None
+                rows.append((complaint.strip(), department if isinstance(department, str) else None))
+    if getattr(args, "from_store", False):
+        from data_store import get_data_store
+        store = get_data_store()
+        if store is None:
+            log.warning("Data store unavailable; skipping stored visits.")
+        else:
+            rows += [(r["complaint"], r["department"]) for r in store.labelled_complaints()]
+    return rows
+
+
+def _prepare(rows):
+    """
+    Weak-label rows without a department, drop rows labelled with a department
+    the router does not know (reported, not fatal), then merge repeated
+    (complaint, department) pairs into one weighted row.
+    """
+    import dept_service
+
+    unlabelled = sorted({c for c, d in rows if not d})
+    if unlabelled:
+        routed = dept_service.route_batch(unlabelled, top_k=1)
+        weak = {c: r["department"] for c, r in zip(unlabelled, routed)}
+        log.info("Weak-labelled %d distinct complaints with the hybrid router.", len(unlabelled))
+        rows = [(c, d or weak[c]) for c, d in rows]
+
+    known = set(dept_service.DEPARTMENT_NAMES)
+    unknown = {}
+    for _, department in rows:
+        if department not in known:
+            unknown[department] = unknown.get(department, 0) + 1
+    if unknown:
+        log.warning("Skipping %d visits with unknown departments: %s", sum(unknown.values()),
+                    ", ".join(f"{d} ({n})" for d, n in sorted(unknown.items(), key=lambda kv: -kv[1])))
+        rows = [(c, d) for c, d in rows if d in known]
+
+    merged = {}
+    for complaint, department in rows:
+        key = (complaint.lower(), department)
+        merged[key] = merged.get(key, 0) + 1
+    texts = [c for c, _ in merged]
+    departments = [d for _, d in merged]
+    return texts, departments, np.array(list(merged.values()), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("build", "append", "query"))
+    parser.add_argument("text", nargs="?", help="complaint to look up (query)")
+    parser.add_argument("--csv", default=None)
+    parser.add_argument("--from-store", action="store_true", help="include patients rows from the data store")
+    parser.add_argument("--out", default=os.getenv("PARS_COMPLAINT_INDEX", "complaint_index"))
+    parser.add_argument("--dtype", default="int8", choices=DTYPES)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: sqrt(rows) above 4096 rows)")
+    args = parser.parse_args()
+
+    sys.path.append(base_dir)
+    import dept_service
+
+    path = args.out if os.path.isabs(args.out) else os.path.join(base_dir, args.out)
+
+    if args.command == "query":
+        index = ComplaintIndex(path)
+        embedding = dept_service.encode_complaints([args.text])[0]
+        started = time.perf_counter()
+        rows, sims = index.search(embedding)
+        elapsed = (time.perf_counter() - started) * 1e3
+        labels = np.asarray(index._view[3])
+        for row, sim in zip(rows, sims):
+            print(f"  {sim:.3f}  {index.departments[labels[row]]}")
+        votes, _ = index.vote(embedding[None, :])
+        best = int(np.argmax(votes[0]))
+        print(f"Vote: {index.departments[best]} ({votes[0, best]:.2f}), search {elapsed:.3f} ms")
+        return
+
+    if args.command == "append":
+        index = ComplaintIndex(path)
+        if index.encoder != dept_service.encoder_id():
+            print(f"Index was built with encoder {index.encoder}, current encoder is {dept_service.encoder_id()}; "
+                  "rebuild it instead of appending.")
+            sys.exit(1)
+
+    if args.csv is None and not args.from_store:
+        args.csv = os.path.join(os.path.dirname(base_dir), "patients_data.csv")
+    texts, departments, weights = _prepare(_labelled_rows(args))
+    if not texts:
+        print("No labelled complaints found.")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    embeddings = dept_service.encode_complaints(texts)
+    if embeddings is None:
+        print("Department encoder unavailable; cannot embed complaints.")
+        sys.exit(1)
+    print(f"Encoded {len(texts)} complaints in {time.perf_counter() - started:.1f} s")
+
+    if args.command == "append":
+        count = index.append(embeddings, departments, weights)
+        print(f"Appended {int(weights.sum())} visits as {len(texts)} rows -> {count} rows")
+        return
+
+    ComplaintIndex.create(
+        path, embeddings, [dept_service.DEPARTMENT_NAMES.index(d) for d in departments], weights,
+        dept_service.DEPARTMENT_NAMES, dtype=args.dtype, nlist=args.nlist,
+        encoder=dept_service.encoder_id(),
+    )
+    print(json.dumps(ComplaintIndex(path).stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+PARS - Complaint Normalizer
+Cleans typed / transcribed chief complaints before routing so they hit the cheap
+MEDICAL_KEYWORDS substring path: lowercases and strips punctuation, expands
+clinical abbreviations (SOB, CP, LOC, N/V...), folds British spellings and a few
+colloquial phrasings onto the keyword vocabulary, and corrects typos
+("chest pian", "vomitting", "breathlessnes") with a symmetric-delete (SymSpell)
+index precomputed from the keyword vocabulary.
+
+Only tokens that are not English words are corrected: a token found in the
+English word-frequency list of pyspellchecker (at least LEXICON_MIN_COUNT
+occurrences) is kept as typed, so "heat", "strike" or "fear" are never turned
+into "heart", "stroke" or "ear". The lexicon is loaded on the first correction;
+without pyspellchecker installed no typo correction is done (abbreviations,
+spellings and phrases still are), because the vocabulary alone cannot tell a
+typo from a real word.
+
+A lookup generates the deletes of one token and intersects them with the
+precomputed index, so correcting a token costs microseconds; corrections are
+also memoised per token.
+
+Environment:
+  - PARS_COMPLAINT_NORMALIZER    "0" disables normalization in dept_service (default: enabled)
+"""
+
+import re
+import threading
+from functools import lru_cache
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+# Occurrences in the English frequency list above which a token is a real word
+LEXICON_MIN_COUNT = 20
+
+# Clinical shorthand -> words the keyword tables know
+ABBREVIATIONS = {
+    "sob": "shortness of breath",
+    "dib": "breathing difficulty",
+    "doe": "shortness of breath on exertion",
+    "cp": "chest pain",
+    "loc": "loss of consciousness",
+    "h/a": "headache",
+    "n/v": "nausea vomiting",
+    "n/v/d": "nausea vomiting diarrhea",
+    "abd": "abdominal",
+    "bp": "blood pressure",
+    "htn": "hypertension",
+    "palps": "palpitations",
+    "sz": "seizure",
+    "cva": "stroke",
+    "ams": "confusion",
+    "od": "overdose",
+    "gsw": "gunshot wound",
+    "mva": "car accident",
+    "mvc": "car accident",
+    "rta": "car accident",
+    "fx": "fracture",
+    "lbp": "lower back pain",
+    "uri": "upper respiratory infection",
+    "si": "suicidal ideation",
+    "c/o": "complains of",
+    "pt": "patient",
+    "w/": "with",
+    "hx": "history",
+}
+
+# British spellings -> the American forms used in MEDICAL_KEYWORDS
+SPELLINGS = {
+    "diarrhoea": "diarrhea",
+    "haemorrhage": "hemorrhage",
+    "haemorrhaging": "hemorrhaging",
+    "haematoma": "hematoma",
+    "haematuria": "hematuria",
+    "anaemia": "anemia",
+    "anaemic": "anemic",
+    "oedema": "edema",
+    "oesophagus": "esophagus",
+    "dyspnoea": "dyspnea",
+    "apnoea": "apnea",
+    "ischaemia": "ischemia",
+    "orthopaedic": "orthopedic",
+    "paediatric": "pediatric",
+    "tumour": "tumor",
+    "faeces": "feces",
+    "leukaemia": "leukemia",
+    "septicaemia": "septicemia",
+    "anaesthesia": "anesthesia",
+    "foetal": "fetal",
+    "paralysed": "paralyzed",
+}
+
+# Colloquial phrasings -> keyword phrases (applied after token cleanup)
+PHRASES = {
+    "breathlessness": "shortness of breath",
+    "breathless": "shortness of breath",
+    "short of breath": "shortness of breath",
+    "difficulty breathing": "breathing difficulty",
+    "trouble breathing": "breathing difficulty",
+    "throwing up": "vomiting",
+    "threw up": "vomiting",
+    "passed out": "fainting",
+    "blacked out": "loss of consciousness",
+    "tummy ache": "stomach pain",
+    "stomach ache": "stomach pain",
+    "stomachache": "stomach pain",
+}
+
+# Correct English that sits within a couple of edits of a clinical word
+# (e.g. "could" -> "cold"); never "corrected"
+COMMON_WORDS = frozenset("""
+    a about after again all also am an and any are arm arms as at back bad be been before being
+    belly better bit blood body both breathe broke but by came can cannot cant chest child could
+    day days did does doing dont down during each ear ears eat eye eyes face fall feel feeling
+    feels feet felt few finger fingers foot for from get gets getting go going good got had hard
+    has have having he head hear heard her here high him his home hour hours how hurt hurts i im
+    in into is it its just knee knees last left leg legs like little low lower made make many me
+    mild more morning most mouth much my near neck new night no nose not now of off on one only
+    or other our out over pain painful past patient really right same says see seen severe she
+    should side since so some started still stop sudden suddenly than that the their them then
+    there they this those three throat through time to today toe toes too took two up upper very
+    was wake walk walking want was way we week weeks well went were what when where which while
+    who whole why will with woke worse worst would year years yesterday you your
+""".split())
+
+# Clinical words worth correcting towards besides the keyword/department vocabulary
+CLINICAL_WORDS = (
+    "pain ache aching bite bitten sting stung broken bleeding bleed swelling swollen burning "
+    "burn vomit vomiting nausea dizzy dizziness fever cough coughing breath breathing breathless "
+    "breathlessness wound injury fracture sprained twisted numb rash itchy itching headache "
+    "unconscious fainted fainting seizures chest abdominal abdomen stomach diarrhea constipated "
+    "urinating urination period periods pregnant bleeding discharge anxious depressed suicidal "
+    "overdosed poisoned swallowed drank alcohol consciousness palpitations hypertension"
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:/[a-z0-9]*)*")
+
+
+def load_lexicon(min_count=LEXICON_MIN_COUNT):
+    """
+    English words (pyspellchecker's frequency list), or None if it is not installed.
+    """
+    try:
+        from spellchecker import SpellChecker
+    except ImportError:
+        return None
+    counts = SpellChecker(distance=1).word_frequency.dictionary
+    return frozenset(word for word, count in counts.items() if count >= min_count)
+
+
+def _osa_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein + adjacent transpositions),
+    or limit + 1 once it is certain to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def _deletes(word: str, distance: int) -> set:
+    out, frontier = {word}, {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))} - out
+        out |= frontier
+    return out
+
+
+def max_edits(word: str) -> int:
+    """
+    Edit budget by length: short tokens are never corrected, long ones allow two edits.
+    """
+    if len(word) < 4:
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+class ComplaintNormalizer:
+    def __init__(self, vocabulary: dict, lexicon=load_lexicon):
+        """
+        vocabulary: word -> weight (the highest keyword weight the word appears in),
+        used to break ties between equally distant corrections.
+        lexicon: set of real English words never corrected, or a loader
+        returning it (called on the first correction; None disables correction).
+        """
+        self.vocabulary = dict(vocabulary)
+        self._lexicon = lexicon
+        self._lexicon_lock = threading.Lock()
+        self.protected = COMMON_WORDS | set(self.vocabulary) | set(ABBREVIATIONS) | set(SPELLINGS)
+        self._index = {}
+        for word in self.vocabulary:
+            for key in _deletes(word, max_edits(word)):
+                self._index.setdefault(key, []).append(word)
+        phrases = sorted(PHRASES, key=len, reverse=True)
+        self._phrases = re.compile(r"\b(" + "|".join(re.escape(p) for p in phrases) + r")\b")
+        self.correct = lru_cache(maxsize=8192)(self._correct)
+        self.normalized = 0
+        self.changed = 0
+        self.corrections = 0
+
+    @classmethod
+    def from_keywords(cls, keywords: dict, departments=()):
+        """
+        Vocabulary from the MEDICAL_KEYWORDS phrases, DEPARTMENTS synonyms,
+        abbreviation/phrase expansions and CLINICAL_WORDS.
+        """
+        vocabulary = {}
+
+        def add(text, weight):
+            for word in _TOKEN.findall(text.lower()):
+                if not word.isdigit() and "/" not in word:
+                    vocabulary[word] = max(vocabulary.get(word, 0.0), weight)
+
+        for phrases in keywords.values():
+            for phrase, weight in phrases.items():
+                add(phrase, weight)
+        for dept_full in departments:
+            add(dept_full.replace("_", " ").replace("(", ",").replace(")", ""), 0.5)
+        for text in (*ABBREVIATIONS.values(), *SPELLINGS.values(), *PHRASES.values(), CLINICAL_WORDS):
+            add(text, 0.5)
+        return cls(vocabulary)
+
+    @property
+    def lexicon(self):
+        if callable(self._lexicon):
+            with self._lexicon_lock:
+                if callable(self._lexicon):
+                    lexicon = self._lexicon()
+                    if lexicon is None:
+                        log.warning("pyspellchecker not installed: complaint typo correction disabled.")
+                    self._lexicon = lexicon
+        return self._lexicon
+
+    def _correct(self, token: str) -> str:
+        """
+        Closest vocabulary word within the token's edit budget (ties: higher
+        keyword weight, then alphabetical), or the token itself. Real English
+        words are never corrected.
+        """
+        if token in self.protected or not token.isalpha():
+            return token
+        limit = max_edits(token)
+        if limit == 0:
+            return token
+        lexicon = self.lexicon
+        if lexicon is None or token in lexicon:
+            return token
+        best, best_key = token, None
+        seen = set()
+        for key in _deletes(token, limit):
+            for word in self._index.get(key, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = _osa_distance(token, word, limit)
+                if distance <= limit:
+                    rank = (distance, -self.vocabulary[word], word)
+                    if best_key is None or rank < best_key:
+                        best, best_key = word, rank
+        return best
+
+    def normalize(self, complaint: str) -> str:
+        """
+        Lowercased, abbreviation-expanded, spelling-folded and typo-corrected
+        complaint as space-separated words.
+        """
+        self.normalized += 1
+        words = []
+        for token in _TOKEN.findall((complaint or "").lower()):
+            if token in ABBREVIATIONS:
+                words.append(ABBREVIATIONS[token])
+                continue
+            # Unknown slash groups ("nausea/vomiting") are separate words
+            for part in filter(None, token.split("/")):
+                if part in ABBREVIATIONS:
+                    words.append(ABBREVIATIONS[part])
+                    continue
+                fixed = SPELLINGS.get(part) or self.correct(part)
+                if fixed != part:
+                    self.corrections += 1
+                words.append(fixed)
+        text = self._phrases.sub(lambda m: PHRASES[m.group(1)], " ".join(words))
+        if text != (complaint or "").strip().lower():
+            self.changed += 1
+        return text
+
+    def stats(self) -> dict:
+        info = self.correct.cache_info()
+        return {
+            "vocabulary": len(self.vocabulary),
+            "lexicon": len(self._lexicon) if isinstance(self._lexicon, frozenset) else None,
+            "index_keys": len(self._index),
+            "normalized": self.normalized,
+            "changed": self.changed,
+            "corrections": self.corrections,
+            "token_cache_hits": info.hits,
+            "token_cache_size": info.currsize,
+        }
@@ -0,0 +1,408 @@
+"""
+PARS - Data Store
+Pluggable data access for the doctor rosters and triage records.
+
+  - SupabaseStore: the hosted Supabase project (one table per department).
+  - SQLiteStore:   embedded stand-in for on-prem, offline and test deployments.
+                   Its schema and seed data are built from supabase/migrations;
+                   the 13 per-department tables become a single `doctors` roster
+                   keyed by department, indexed for "available doctors in X by
+                   experience".
+
+Reads use the Supabase publishable key. Writes of triage records
+(persistence_service.py) go through get_write_store(), which uses the
+service-role key (SUPABASE_SERVICE_ROLE_KEY): the patients RLS policy only
+admits authenticated users writing their own rows, so the anon key cannot
+insert them. The backend trusts the User_ID sent with /predict for those rows.
+
+Environment:
+  - PARS_DATA_STORE     "supabase" (default) or "sqlite"
+  - SUPABASE_SERVICE_ROLE_KEY   service-role key for server-side writes (backend only)
+  - PARS_SQLITE_PATH    database file for the SQLite store (default: pars_local.db, ":memory:" for tests)
+"""
+
+import os
+import re
+import glob
+import sqlite3
+import threading
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(base_dir), "supabase", "migrations")
+
+
+def _doctor(row) -> dict:
+    return {
+        "id": row.get("doc_id"),
+        "name": row.get("doc_name"),
+        "experience": row.get("experience_years"),
+        "available": row.get("is_available"),
+    }
+
+
+# ============================================================
+# ------------------- SUPABASE -------------------------------
+# ============================================================
+
+class SupabaseStore:
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def doctors(self, department: str) -> list:
+        response = self.client.table(department.lower()).select("*").execute()
+        return [_doctor(row) for row in response.data]
+
+    def available_doctors(self, department: str, limit: int = None) -> list:
+        query = (
+            self.client.table(department.lower()).select("*")
+            .eq("is_available", True)
+            .order("experience_years", desc=True)
+        )
+        if limit:
+            query = query.limit(limit)
+        return [_doctor(row) for row in query.execute().data]
+
+    def upsert(self, table: str, rows: list):
+        self.client.table(table).upsert(rows).execute()
+
+    def labelled_complaints(self) -> list:
+        """
+        Past visits with both a chief complaint and a department (for the complaint index).
+        """
+        response = (
+            self.client.table("patients").select("chief_complaint, department")
+            .not_.is_("chief_complaint", "null").not_.is_("department", "null")
+            .execute()
+        )
+        return [{"complaint": r["chief_complaint"], "department": r["department"]} for r in response.data]
+
+
+# ============================================================
+# ------------------- MIGRATION TRANSLATION ------------------
+# ============================================================
+
+_TYPE_MAP = {
+    "uuid": "TEXT", "text": "TEXT", "varchar": "TEXT", "character": "TEXT",
+    "integer": "INTEGER", "int": "INTEGER", "serial": "INTEGER", "bigint": "INTEGER",
+    "boolean": "INTEGER", "numeric": "REAL", "real": "REAL", "float": "REAL",
+    "timestamptz": "TEXT", "timestamp": "TEXT",
+}
+# Column names that mark a per-department doctor table
+_ROSTER_COLUMNS = {"doc_id", "doc_name", "experience_years", "is_available"}
+
+
+def _split_statements(sql: str) -> list:
+    """
+    Split a migration into statements, ignoring ';' inside quotes, comments and $$ bodies.
+    """
+    statements, current, i = [], [], 0
+    in_quote = in_dollar = False
+    while i < len(sql):
+        ch = sql[i]
+        if not in_quote and not in_dollar and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        if not in_quote and sql.startswith("$$", i):
+            in_dollar = not in_dollar
+            current.append("$$")
+            i += 2
+            continue
+        if ch == "'" and not in_dollar:
+            in_quote = not in_quote
+        if ch == ";" and not in_quote and not in_dollar:
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    if "".join(current).strip():
+        statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+def _split_top_level(text: str, sep=",") -> list:
+    parts, depth, current, in_quote = [], 0, [], False
+    for ch in text:
+        if ch == "'":
+            in_quote = not in_quote
+        elif not in_quote and ch == "(":
+            depth += 1
+        elif not in_quote and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not in_quote:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _table_name(name: str) -> str:
+    return name.split(".")[-1].strip('"')
+
+
+def _column_sql(definition: str):
+    """
+    Translate one Postgres column definition to SQLite. Returns (name, sql) or None for constraints.
+    """
+    tokens = definition.split()
+    if not tokens or tokens[0].upper() in ("PRIMARY", "FOREIGN", "UNIQUE", "CONSTRAINT", "CHECK"):
+        return None
+    name = tokens[0].strip('"').lower()
+    pg_type = re.match(r"[a-zA-Z]+", tokens[1]).group(0).lower()
+    parts = [name, _TYPE_MAP.get(pg_type, "TEXT")]
+
+    upper = definition.upper()
+    if "PRIMARY KEY" in upper:
+        # SERIAL -> INTEGER PRIMARY KEY gives SQLite's auto-increment rowid
+        parts.append("PRIMARY KEY")
+    if "NOT NULL" in upper:
+        parts.append("NOT NULL")
+
+    default = re.search(r"DEFAULT\s+('(?:[^']|'')*'|[-\w.]+(?:\([^)]*\))?)", definition, re.IGNORECASE)
+    if default:
+        value = default.group(1)
+        lowered = value.lower()
+        if lowered in ("true", "false"):
+            parts.append(f"DEFAULT {1 if lowered == 'true' else 0}")
+        elif "now()" in lowered or lowered.startswith("timezone"):
+            parts.append("DEFAULT CURRENT_TIMESTAMP")
+        elif value.startswith("'") or re.fullmatch(r"-?\d+(\.\d+)?", value):
+            parts.append(f"DEFAULT {value}")
+        # Other function defaults (gen_random_uuid()) are supplied by the application
+    return name, " ".join(parts)
+
+
+def _sql_literal(value: str):
+    value = value.strip()
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    if value.startswith("'") and value.endswith("'"):
+        return value[1:-1].replace("''", "'")
+    return float(value) if "." in value else int(value)
+
+
+# ============================================================
+# ------------------- SQLITE ---------------------------------
+# ============================================================
+
+class SQLiteStore:
+    name = "sqlite"
+
+    def __init__(self, path=":memory:", migrations_dir=MIGRATIONS_DIR):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._columns = {}  # table -> set of columns (upsert whitelist)
+        self.departments = {}  # lower-case department -> canonical name
+        self._migrate(migrations_dir)
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("PARS_SQLITE_PATH", "pars_local.db")
+        if path != ":memory:" and not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        return cls(path)
+
+    # --------------------------------------------------------
+    # Schema
+    # --------------------------------------------------------
+
+    def _migrate(self, migrations_dir):
+        db = self._db
+        db.execute("CREATE TABLE IF NOT EXISTS _migrations (name TEXT PRIMARY KEY)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS doctors ("
+            " doc_id INTEGER PRIMARY KEY,"
+            " department TEXT NOT NULL COLLATE NOCASE,"
+            " doc_name TEXT NOT NULL,"
+            " experience_years INTEGER NOT NULL,"
+            " is_available INTEGER NOT NULL DEFAULT 1)"
+        )
+        # Covers the hot query: WHERE department = ? AND is_available = 1 ORDER BY experience_years DESC
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_doctors_department_available_experience"
+            " ON doctors (department, is_available, experience_years DESC)"
+        )
+        applied = {row[0] for row in db.execute("SELECT name FROM _migrations")}
+
+        with self._lock:
+            db.execute("BEGIN")
+            try:
+                for path in sorted(glob.glob(os.path.join(migrations_dir, "*.sql"))):
+                    name = os.path.basename(path)
+                    with open(path, encoding="utf-8") as f:
+                        statements = _split_statements(f.read())
+                    # Roster tables are recognised on every run so department names are known
+                    for statement in statements:
+                        self._apply(statement, seed=name not in applied)
+                    if name not in applied:
+                        db.execute("INSERT INTO _migrations (name) VALUES (?)", (name,))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+        for table in [r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]:
+            self._columns[table] = {r[1] for r in db.execute(f"PRAGMA table_info({table})")}
+
+    def _apply(self, statement, seed):
+        create = re.match(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w.\"]+)\s*\((.*)\)\s*$",
+                          statement, re.IGNORECASE | re.DOTALL)
+        if create:
+            table = _table_name(create.group(1))
+            columns = [c for c in map(_column_sql, _split_top_level(create.group(2))) if c]
+            if {name for name, _ in columns} >= _ROSTER_COLUMNS:
+                self.departments[table.lower()] = table
+            elif seed:
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(sql for _, sql in columns)})")
+            return
+
+        alter = re.match(r"ALTER\s+TABLE\s+([\w.\"]+)\s+ADD\s+COLUMN\s+(?:IF\s+NOT\s+EXISTS\s+)?(.*)$",
+                         statement, re.IGNORECASE | re.DOTALL)
+        if alter and seed:
+            table = _table_name(alter.group(1))
+            column = _column_sql(alter.group(2))
+            existing = {r[1] for r in self._db.execute(f"PRAGMA table_info({table})")}
+            if column and column[0] not in existing:
+                self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column[1]}")
+            return
+
+        insert = re.match(r"INSERT\s+INTO\s+([\w.\"]+)\s*\(([^)]*)\)\s*VALUES\s*(.*)$",
+                          statement, re.IGNORECASE | re.DOTALL)
+        if insert and seed:
+            table = _table_name(insert.group(1))
+            columns = [c.strip().strip('"').lower() for c in insert.group(2).split(",")]
+            rows = [
+                [_sql_literal(v) for v in _split_top_level(group.strip()[1:-1])]
+                for group in _split_top_level(insert.group(3))
+            ]
+            department = self.departments.get(table.lower())
+            if department:
+                table, columns = "doctors", ["department"] + columns
+                rows = [[department] + row for row in rows]
+            placeholders = ", ".join("?" for _ in columns)
+            self._db.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        # RLS policies, functions, triggers and publications have no SQLite equivalent
+
+    # --------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def doctors(self, department: str) -> list:
+        rows = self._query(
+            "SELECT doc_id, doc_name, experience_years, is_available FROM doctors"
+            " WHERE department = ? ORDER BY is_available DESC, experience_years DESC",
+            (department,),
+        )
+        return [_doctor({**row, "is_available": bool(row["is_available"])}) for row in rows]
+
+    def available_doctors(self, department: str, limit: int = None) -> list:
+        rows = self._query(
+            "SELECT doc_id, doc_name, experience_years, is_available FROM doctors"
+            " WHERE department = ? AND is_available = 1 ORDER BY experience_years DESC LIMIT ?",
+            (department, limit if limit else -1),
+        )
+        return [_doctor({**row, "is_available": True}) for row in rows]
+
+    def set_availability(self, doc_id: int, available: bool):
+        with self._lock:
+            self._db.execute("UPDATE doctors SET is_available = ? WHERE doc_id = ?", (int(available), doc_id))
+
+    def upsert(self, table: str, rows: list):
+        if not rows:
+            return
+        known = self._columns.get(table)
+        if known is None:
+            raise ValueError(f"Unknown table: {table}")
+        columns = [c for c in rows[0] if c in known]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+            f" ON CONFLICT(id) DO UPDATE SET {updates}"
+        )
+        with self._lock:
+            self._db.executemany(sql, [[row.get(c) for c in columns] for row in rows])
+
+    def labelled_complaints(self) -> list:
+        """
+        Past visits with both a chief complaint and a department (for the complaint index).
+        """
+        rows = self._query(
+            "SELECT chief_complaint, department FROM patients"
+            " WHERE chief_complaint IS NOT NULL AND department IS NOT NULL"
+        )
+        return [{"complaint": r["chief_complaint"], "department": r["department"]} for r in rows]
+
+    def explain(self, sql, params=()) -> list:
+        """
+        SQLite query plan (used to verify the roster lookups hit the index).
+        """
+        with self._lock:
+            return [row[-1] for row in self._db.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+# ============================================================
+# ------------------- FACTORY --------------------------------
+# ============================================================
+
+_STORE = None
+_WRITE_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_data_store():
+    """
+    The configured store (PARS_DATA_STORE), created once. None if Supabase is unreachable.
+    """
+    global _STORE
+    if _STORE is not None:
+        return _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            backend = os.getenv("PARS_DATA_STORE", "supabase").lower()
+            if backend == "sqlite":
+                _STORE = SQLiteStore.from_env()
+                log.info("Using embedded SQLite data store (%s).", _STORE.path)
+            elif backend == "supabase":
+                from dept_service import get_supabase
+                client = get_supabase()
+                _STORE = SupabaseStore(client) if client else None
+            else:
+                raise ValueError(f"Unknown data store: {backend} (expected 'supabase' or 'sqlite')")
+    return _STORE
+
+
+def get_write_store():
+    """
+    Store for server-side writes: the configured store, except that Supabase
+    gets a client with the service-role key. None if that key is not set.
+    """
+    global _WRITE_STORE
+    if os.getenv("PARS_DATA_STORE", "supabase").lower() != "supabase":
+        return get_data_store()
+    with _STORE_LOCK:
+        if _WRITE_STORE is None:
+            from dept_service import get_supabase
+            client = get_supabase(service_role=True)
+            _WRITE_STORE = SupabaseStore(client) if client else None
+    return _WRITE_STORE
@@ -1,31 +1,51 @@
 import os
 import re
 import json
-import google.generativeai as genai
-from pypdf import PdfReader
 from io import BytesIO
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from log_config import get_logger
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("VITE_GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    print("[PARS] WARNING: GEMINI_API_KEY not found in environment variables.")
+log = get_logger(__name__)
+
+# google.generativeai, pypdf and dotenv are imported on first use:
+# genai alone adds ~1s to every worker boot.
+GEMINI_API_KEY = None
+genai = None
+_gemini_configured = False
+
+def _configure_gemini():
+    """Load environment variables and configure Gemini once, on first document."""
+    global GEMINI_API_KEY, genai, _gemini_configured
+    if _gemini_configured:
+        return GEMINI_API_KEY
+    _gemini_configured = True
+
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+
+    # Configure Gemini
+    GEMINI_API_KEY = os.getenv("VITE_GEMINI_API_KEY")
+    if GEMINI_API_KEY:
+        import google.generativeai
+        genai = google.generativeai
+        genai.configure(api_key=GEMINI_API_KEY)
+    else:
+        log.warning("GEMINI_API_KEY not found in environment variables.")
+    return GEMINI_API_KEY
 
 def extract_text_from_pdf(file_bytes):
     """Extracts raw text from a PDF file."""
     try:
+        from pypdf import PdfReader
         reader = PdfReader(BytesIO(file_bytes))
         text = ""
         for page in reader.pages:
             text += page.extract_text() + "\n"
         return text
     except Exception as e:
-        print(f"PDF Text Extraction Error: {e}")
+        log.error("PDF Text Extraction Error: %s", e)
         return ""
 
 def extract_vitals_from_pdf(file_bytes):
@@ -33,9 +53,9 @@ def extract_vitals_from_pdf(file_bytes):
     Scans a PDF for medical details using Google Gemini API.
     Returns a dictionary of structured patient data.
     """
-    print(f"[PARS] Extracting text from PDF (Size: {len(file_bytes)} bytes)...")
+    log.debug("Extracting text from PDF (Size: %d bytes)...", len(file_bytes))
     text = extract_text_from_pdf(file_bytes)
-    print(f"[PARS] Extracted text length: {len(text)}")
+    log.debug("Extracted text length: %d", len(text))
     
     # If text is empty, it might be a scan.
     # For now, we unfortunately rely on text. If empty, we can't do much without OCR/Vision.
@@ -44,15 +64,15 @@ def extract_vitals_from_pdf(file_bytes):
     # For this fix, let's just Log it clearly.
     
     if not text or len(text.strip()) < 50:
-        print("[PARS] WARNING: Extracted text is very short or empty. Likely a scanned PDF/Image.")
+        log.warning("Extracted text is very short or empty. Likely a scanned PDF/Image.")
         # Proceed anyway? Gemini might halluncinate if we send empty text. 
         # Better: Return specific error so frontend knows.
         # OR: Try to use a "cleaner" approach if I can (e.g. sending the bytes?).
         # genai.GenerativeModel.generate_content supports 'blob' for PDF?
         # Yes, standard Gemini API supports PDF as a "part".
         
-    if not GEMINI_API_KEY:
-        print("[PARS] Fallback to legacy regex parser (No API Key)")
+    if not _configure_gemini():
+        log.debug("Fallback to legacy regex parser (No API Key)")
         return extract_vitals_regex_fallback(text)
 
     # List of models to try in order of preference (Fastest -> Most Capable -> Legacy)
@@ -70,7 +90,7 @@ def extract_vitals_from_pdf(file_bytes):
 
     for model_name in models_to_try:
         try:
-            print(f"[PARS] Attempting to use model: {model_name}...")
+            log.debug("Attempting to use model: %s...", model_name)
             model = genai.GenerativeModel(model_name)
             
             # 1. Try extracting text first to check if it's a digital PDF
@@ -81,7 +101,7 @@ def extract_vitals_from_pdf(file_bytes):
             request_parts = []
             
             if is_digital:
-                print("[PARS] Digital PDF detected. Prioritizing Text extraction...")
+                log.debug("Digital PDF detected. Prioritizing Text extraction...")
                 prompt_content = f"""
                 You are a specialized medical OCR assistant. Extract patient data from this clinical text.
                 
@@ -109,7 +129,7 @@ def extract_vitals_from_pdf(file_bytes):
                 """
                 request_parts = [prompt_content]
             else:
-                print("[PARS] Scanned/Image PDF detected. Using VISION extraction (Multimodal)...")
+                log.debug("Scanned/Image PDF detected. Using VISION extraction (Multimodal)...")
                 prompt_content = """
                 Analyze this medical document image (Prescription/Report). 
                 Extract structured patient data into JSON format.
@@ -148,7 +168,7 @@ def extract_vitals_from_pdf(file_bytes):
             # Call Gemini
             response = model.generate_content(request_parts)
             
-            print(f"[PARS] Success with model: {model_name}")
+            log.info("Success with model: %s", model_name)
             response_text = response.text.strip()
             
             if response_text.startswith("```json"):
@@ -157,17 +177,17 @@ def extract_vitals_from_pdf(file_bytes):
                 response_text = response_text[:-3]
                 
             data = json.loads(response_text)
-            print(f"[PARS] Extracted: {list(data.keys())}")
+            log.debug("Extracted: %s", list(data.keys()))
             return data
 
         except Exception as e:
-            print(f"[PARS] Failed with model {model_name}: {e}")
+            log.warning("Failed with model %s: %s", model_name, e)
             last_exception = e
             continue  # Try next model
 
     # If all models failed
     error_msg = f"All Gemini models failed. Last error: {str(last_exception)}"
-    print(error_msg)
+    log.error(error_msg)
     with open("ocr_debug.log", "a") as f:
         f.write(f"\n[ERROR] {error_msg}\n")
     
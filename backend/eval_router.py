@@ -0,0 +1,269 @@
+"""
+Offline evaluation of department-router configurations on a labelled complaint
+corpus: accuracy, per-department recall, confusion matrix and complaints/sec,
+side by side, so speed/accuracy trade-offs are measurable.
+
+Each configuration runs in a fresh subprocess (routing settings are read from the
+environment at import), loads its encoder outside the timed region, then routes
+the whole corpus. Routers:
+
+  legacy      get_department_legacy() per complaint (substring map)
+  keyword     route_batch(use_nlp=False): weighted keyword scores only
+  single      get_department() per complaint (one encode() call each)
+  batched     route_batch() over --batch-size complaints per encode() call
+  cached      batched, but each distinct complaint is routed once
+  knn         batched with mode="knn" (needs a complaint index, see complaint_index.py)
+
+A configuration is "name=router" optionally followed by environment overrides,
+e.g. "protos=batched:PARS_DEPT_EMBEDDINGS=prototypes" or
+"torch=batched:PARS_DEPT_ENCODER=torch".
+
+Corpus (first match): --corpus FILE (.csv or .jsonl with complaint and department
+fields), --store (labelled visits from the data store), otherwise router_cases.py
+expanded with --variants phrasing templates per case.
+
+Usage:
+  python eval_router.py [--corpus FILE | --store] [--variants 6] [--batch-size 64]
+                        [--configs "legacy,keyword,single,batched,..."]
+                        [--confusion batched] [--json results.json]
+"""
+import sys
+import os
+import io
+import csv
+import json
+import time
+import argparse
+import contextlib
+import subprocess
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+DEFAULT_CONFIGS = (
+    "legacy=legacy,keyword=keyword,single=single,batched=batched,cached=cached,"
+    "prototypes=batched:PARS_DEPT_EMBEDDINGS=prototypes,knn=knn"
+)
+ROUTERS = ("legacy", "keyword", "single", "batched", "cached", "knn")
+NLP_ROUTERS = ("single", "batched", "cached", "knn")
+
+# Label-preserving rephrasings used to grow router_cases.py into a larger corpus
+TEMPLATES = (
+    "{}",
+    "patient reports {}",
+    "{} since this morning",
+    "complains of {}",
+    "brought in with {}",
+    "{} for two days",
+    "sudden {}",
+    "{}, getting worse",
+)
+
+
+def parse_configs(spec):
+    configs = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, rest = item.partition("=")
+        router, _, env = rest.partition(":")
+        router = router or name
+        if router not in ROUTERS:
+            raise SystemExit(f"Unknown router '{router}' in config '{item}' (choose from {', '.join(ROUTERS)})")
+        overrides = dict(kv.split("=", 1) for kv in env.split(";") if "=" in kv)
+        configs.append({"name": name, "router": router, "env": overrides})
+    return configs
+
+
+def load_corpus(args):
+    if args.corpus:
+        if args.corpus.endswith(".jsonl"):
+            with open(args.corpus) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            with open(args.corpus, newline="") as f:
+                rows = list(csv.DictReader(f))
+        source = args.corpus
+    elif args.store:
+        from data_store import get_data_store
+        store = get_data_store()
+        if store is None:
+            raise SystemExit("No data store available")
+        rows = store.labelled_complaints()
+        source = f"data store ({type(store).__name__})"
+    else:
+        from router_cases import ROUTER_CASES
+        templates = TEMPLATES[:max(args.variants, 1)]
+        rows = [{"complaint": t.format(c), "department": d} for c, d in ROUTER_CASES for t in templates]
+        source = f"router_cases.py x {len(templates)} phrasings"
+
+    corpus = [
+        (str(r[args.text_field]).strip(), str(r[args.label_field]).strip())
+        for r in rows if r.get(args.text_field) and r.get(args.label_field)
+    ]
+    if not corpus:
+        raise SystemExit(f"Empty corpus from {source}")
+    return corpus, source
+
+
+# ============================================================
+# ------------------- CHILD: ROUTE THE CORPUS ----------------
+# ============================================================
+
+def route(dept_service, router, complaints, batch_size):
+    if router == "legacy":
+        return [dept_service.get_department_legacy(c) for c in complaints]
+    if router == "single":
+        return [dept_service.get_department(c) for c in complaints]
+    if router == "cached":
+        distinct = list(dict.fromkeys(complaints))
+        routed = dict(zip(distinct, route(dept_service, "batched", distinct, batch_size)))
+        return [routed[c] for c in complaints]
+
+    options = {"use_nlp": router != "keyword", "mode": "knn" if router == "knn" else "hybrid"}
+    departments = []
+    for start in range(0, len(complaints), batch_size):
+        batch = complaints[start:start + batch_size]
+        departments += [r["department"] for r in dept_service.route_batch(batch, top_k=1, **options)]
+    return departments
+
+
+def run_child(router, corpus_path, batch_size):
+    with open(corpus_path) as f:
+        complaints = json.load(f)
+
+    # Routing logs per call/batch; keep stdout for the JSON result
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        import dept_service
+        encoder = None
+        if router in NLP_ROUTERS:
+            encoder = dept_service.get_active_model()
+            if encoder is None:
+                raise SystemExit("Department encoder failed to load")
+            if router == "knn" and dept_service.get_complaint_index() is None:
+                raise SystemExit("Complaint index not built (python complaint_index.py build)")
+            dept_service.route_batch(complaints[:2])
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predictions = route(dept_service, router, complaints, batch_size)
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "load_s": load_s,
+        "seconds": elapsed,
+        "encoder": f"{dept_service.ENCODER_BACKEND}:{dept_service.DEPT_EMBEDDINGS}" if encoder else "-",
+        "predictions": predictions,
+    }))
+
+
+# ============================================================
+# ------------------- PARENT: METRICS + REPORT ---------------
+# ============================================================
+
+def metrics(labels, predictions, departments):
+    index = {d: i for i, d in enumerate(departments)}
+    confusion = [[0] * len(departments) for _ in departments]
+    for expected, predicted in zip(labels, predictions):
+        confusion[index[expected]][index.get(predicted, index["General_Medicine"])] += 1
+    recall = {
+        d: (confusion[i][i] / sum(confusion[i]) if sum(confusion[i]) else None)
+        for d, i in index.items()
+    }
+    correct = sum(p == e for p, e in zip(predictions, labels))
+    return {"accuracy": correct / len(labels), "recall": recall, "confusion": confusion}
+
+
+def print_confusion(name, confusion, departments):
+    short = [d[:6] for d in departments]
+    print(f"\nConfusion matrix: {name} (rows = expected, columns = predicted)")
+    print(" " * 20 + "".join(f"{s:>7}" for s in short))
+    for d, row in zip(departments, confusion):
+        if sum(row):
+            print(f"{d:<20}" + "".join(f"{v if v else '.':>7}" for v in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="labelled .csv or .jsonl")
+    parser.add_argument("--store", action="store_true", help="use labelled visits from the data store")
+    parser.add_argument("--text-field", default="complaint")
+    parser.add_argument("--label-field", default="department")
+    parser.add_argument("--variants", type=int, default=len(TEMPLATES),
+                        help="phrasing templates per router_cases.py case")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--confusion", default="batched", help="configuration whose confusion matrix is printed")
+    parser.add_argument("--json", help="write full results (including predictions) here")
+    parser.add_argument("--child", choices=ROUTERS, help=argparse.SUPPRESS)
+    parser.add_argument("--child-corpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.child_corpus, args.batch_size)
+        return
+
+    from dept_service import DEPARTMENT_NAMES
+    configs = parse_configs(args.configs)
+    corpus, source = load_corpus(args)
+    complaints = [c for c, _ in corpus]
+    labels = [d for _, d in corpus]
+    unknown = sorted(set(labels) - set(DEPARTMENT_NAMES))
+    if unknown:
+        raise SystemExit(f"Corpus labels not in DEPARTMENTS: {', '.join(unknown)}")
+    print(f"Corpus: {len(corpus)} complaints ({len(set(complaints))} distinct) from {source}")
+
+    import tempfile
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(complaints, f)
+        corpus_path = f.name
+
+    results = []
+    try:
+        for config in configs:
+            print(f"Evaluating {config['name']} ({config['router']}"
+                  f"{''.join(f', {k}={v}' for k, v in config['env'].items())})...")
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", config["router"],
+                 "--child-corpus", corpus_path, "--batch-size", str(args.batch_size)],
+                capture_output=True, text=True, env={**os.environ, **config["env"]},
+            )
+            if out.returncode != 0:
+                print(f"❌ {config['name']} failed: {(out.stderr.strip() or out.stdout.strip())[-500:]}")
+                continue
+            child = json.loads(out.stdout.strip().splitlines()[-1])
+            results.append({**config, **child, **metrics(labels, child["predictions"], DEPARTMENT_NAMES),
+                            "per_s": len(corpus) / max(child["seconds"], 1e-9)})
+    finally:
+        os.unlink(corpus_path)
+
+    if not results:
+        raise SystemExit(1)
+
+    width = 20 + 11 * len(results)
+    print("\n" + "=" * width)
+    print(f"{'':<20}" + "".join(f"{r['name'][:10]:>11}" for r in results))
+    print("-" * width)
+    print(f"{'encoder':<20}" + "".join(f"{r['encoder'][:10]:>11}" for r in results))
+    print(f"{'accuracy':<20}" + "".join(f"{r['accuracy']:>11.1%}" for r in results))
+    print(f"{'complaints/sec':<20}" + "".join(f"{r['per_s']:>11.0f}" for r in results))
+    print(f"{'load (s)':<20}" + "".join(f"{r['load_s']:>11.2f}" for r in results))
+    print("-" * width)
+    print("Recall per department")
+    for d in DEPARTMENT_NAMES:
+        support = labels.count(d)
+        if support:
+            print(f"{d[:14]:<14}{support:>6}" + "".join(f"{r['recall'][d]:>11.1%}" for r in results))
+    print("=" * width)
+
+    for r in results:
+        if r["name"] == args.confusion:
+            print_confusion(r["name"], r["confusion"], DEPARTMENT_NAMES)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"source": source, "corpus": corpus, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
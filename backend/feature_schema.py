@@ -0,0 +1,226 @@
+"""
+PARS - Compiled Feature Schema
+Compiled once from the fitted ColumnTransformer (preprocessor_nn.pkl) so inference
+can map a patient record straight into a float32 feature vector, with the
+StandardScaler and OneHotEncoder steps baked in. Replaces the per-request
+DataFrame construction, column renames and ColumnTransformer.transform call.
+"""
+
+import math
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+# Training column -> API field name (PatientInput)
+FIELD_ALIASES = {
+    "Temp": "Temperature",
+    "History_Diabetes": "Diabetes",
+    "History_Hypertension": "Hypertension",
+    "History_Heart_Disease": "Heart_Disease",
+}
+
+# Training columns that the API does not collect
+COLUMN_DEFAULTS = {
+    "Unnamed: 0": 0.0,  # Placeholder index column the model was trained with
+    "BMI": 25.0,        # No height/weight in input, default to average
+}
+
+
+def field_getter(data):
+    """
+    Returns a get(key, default) accessor for a dict or an attribute record (e.g. PatientInput).
+    """
+    if isinstance(data, Mapping):
+        return data.get
+    return lambda key, default=None: getattr(data, key, default)
+
+
+class FeatureSchema:
+    def __init__(self, numeric_columns, mean, scale, categorical_columns, categories,
+                 ignore_unknown=True, scaled=True):
+        self.numeric_columns = list(numeric_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.categories = [[str(c) for c in cats] for cats in categories]
+        self.ignore_unknown = ignore_unknown
+        # scaled=False leaves numeric columns raw (for graphs that scale internally)
+        self.scaled = scaled
+
+        n_num = len(self.numeric_columns)
+        self.mean = np.asarray(mean if mean is not None else np.zeros(n_num), dtype=np.float64)
+        self.scale = np.asarray(scale if scale is not None else np.ones(n_num), dtype=np.float64)
+        self.n_numeric = n_num
+        self.n_features = n_num + sum(len(c) for c in self.categories)
+
+        # Per numeric column: (api field, training column, default, mean, scale)
+        self._numeric_sources = [
+            (FIELD_ALIASES.get(col, col), col, COLUMN_DEFAULTS.get(col),
+             float(self.mean[i]), float(self.scale[i]))
+            for i, col in enumerate(self.numeric_columns)
+        ]
+
+        # Per categorical column: (api field, offset in vector, value -> index)
+        self._categorical_sources = []
+        offset = n_num
+        for col, cats in zip(self.categorical_columns, self.categories):
+            lookup = {value: idx for idx, value in enumerate(cats)}
+            self._categorical_sources.append((FIELD_ALIASES.get(col, col), col, offset, lookup))
+            offset += len(cats)
+
+        self._local = threading.local()
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor, scaled=True):
+        """
+        Compile the schema from a fitted ColumnTransformer of
+        StandardScaler (numeric) + OneHotEncoder (categorical) blocks.
+        """
+        numeric_columns, means, scales = [], [], []
+        categorical_columns, categories = [], []
+        ignore_unknown = True
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == "remainder":
+                if transformer != "drop":
+                    raise ValueError("FeatureSchema only supports remainder='drop'")
+                continue
+
+            kind = type(transformer).__name__
+            columns = list(columns)
+            if kind == "StandardScaler":
+                if categorical_columns:
+                    raise ValueError("Numeric block must precede categorical block")
+                numeric_columns += columns
+                mean = transformer.mean_ if transformer.with_mean else None
+                scale = transformer.scale_ if transformer.with_std else None
+                means += list(mean) if mean is not None else [0.0] * len(columns)
+                scales += list(scale) if scale is not None else [1.0] * len(columns)
+            elif kind == "OneHotEncoder":
+                if getattr(transformer, "drop", None) is not None:
+                    raise ValueError("FeatureSchema does not support OneHotEncoder(drop=...)")
+                ignore_unknown = transformer.handle_unknown != "error"
+                categorical_columns += columns
+                categories += [list(c) for c in transformer.categories_]
+            else:
+                raise ValueError(f"Unsupported transformer in preprocessor: {kind}")
+
+        return cls(numeric_columns, means, scales, categorical_columns, categories,
+                   ignore_unknown=ignore_unknown, scaled=scaled)
+
+    def to_dict(self) -> dict:
+        """
+        JSON-serializable description (embedded in exported ONNX graphs).
+        """
+        return {
+            "numeric_columns": self.numeric_columns,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "categorical_columns": self.categorical_columns,
+            "categories": self.categories,
+            "ignore_unknown": self.ignore_unknown,
+        }
+
+    @classmethod
+    def from_dict(cls, spec: dict, scaled=True):
+        return cls(spec["numeric_columns"], spec["mean"], spec["scale"],
+                   spec["categorical_columns"], spec["categories"],
+                   ignore_unknown=spec.get("ignore_unknown", True), scaled=scaled)
+
+    # --------------------------------------------------------
+    # Single record
+    # --------------------------------------------------------
+
+    def _fill(self, out, data):
+        get = field_getter(data)
+
+        for i, (field, col, default, mean, scale) in enumerate(self._numeric_sources):
+            value = get(field)
+            if value is None and field != col:
+                value = get(col)
+            if value is None:
+                if default is None:
+                    raise ValueError(f"Missing required feature: {field}")
+                value = default
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value for {field}: {value!r}")
+            if not math.isfinite(value):
+                raise ValueError(f"Non-finite value for {field}: {value!r}")
+            out[i] = (value - mean) / scale if self.scaled else value
+
+        out[self.n_numeric:] = 0.0
+        for field, col, offset, lookup in self._categorical_sources:
+            value = get(field)
+            if value is None and field != col:
+                value = get(col)
+            idx = lookup.get(str(value)) if value is not None else None
+            if idx is not None:
+                out[offset + idx] = 1.0
+            elif not self.ignore_unknown:
+                raise ValueError(f"Unknown category for {field}: {value!r}")
+
+    def build(self, data) -> np.ndarray:
+        """
+        Returns a (1, n_features) float32 array for a dict or attribute record.
+        The buffer is reused per thread; copy it if you need to keep it.
+        """
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.zeros((1, self.n_features), dtype=np.float32)
+        self._fill(buf[0], data)
+        return buf
+
+    # --------------------------------------------------------
+    # Batches
+    # --------------------------------------------------------
+
+    def build_batch(self, records, out=None) -> np.ndarray:
+        """
+        Returns an (n, n_features) float32 array for a sequence of records.
+        """
+        n = len(records)
+        if out is None:
+            out = np.empty((n, self.n_features), dtype=np.float32)
+        for row, data in zip(out, records):
+            self._fill(row, data)
+        return out
+
+    def build_columns(self, columns: Mapping, n: int = None) -> np.ndarray:
+        """
+        Vectorized build from column arrays keyed by API field (or training column) name.
+        """
+        if n is None:
+            n = len(next(iter(columns.values())))
+        out = np.zeros((n, self.n_features), dtype=np.float32)
+
+        for i, (field, col, default, mean, scale) in enumerate(self._numeric_sources):
+            values = columns.get(field)
+            if values is None:
+                values = columns.get(col)
+            if values is None:
+                if default is None:
+                    raise ValueError(f"Missing required feature: {field}")
+                values = np.full(n, default, dtype=np.float64)
+            values = np.asarray(values, dtype=np.float64)
+            if not np.isfinite(values).all():
+                raise ValueError(f"Non-finite value for {field}")
+            out[:, i] = (values - mean) / scale if self.scaled else values
+
+        for field, col, offset, lookup in self._categorical_sources:
+            values = columns.get(field)
+            if values is None:
+                values = columns.get(col)
+            if values is None:
+                raise ValueError(f"Missing required feature: {field}")
+            values = np.asarray(values).astype(str)
+            matched = np.zeros(n, dtype=bool)
+            for value, idx in lookup.items():
+                hit = values == value
+                out[:, offset + idx] = hit
+                matched |= hit
+            if not self.ignore_unknown and not matched.all():
+                bad = values[~matched][0]
+                raise ValueError(f"Unknown category for {field}: {bad!r}")
+
+        return out
@@ -0,0 +1,284 @@
+"""
+PARS - Logging
+Non-blocking structured logging for the API and its services.
+
+Modules log through get_logger(__name__) instead of print(). Records are put on
+a bounded in-memory queue by the calling thread (message args merged, nothing
+written) and a single QueueListener thread formats them and writes to stdout,
+so a slow container log driver never stalls a request. When the queue is full
+records are dropped and counted rather than blocking.
+
+Every record carries the current request id (RequestIdMiddleware takes it from
+X-Request-ID or a W3C traceparent header, or generates one, and echoes it in
+the response), so one triage decision can be followed through scoring, routing
+and persistence. DEBUG records can be sampled per request: a sampled request
+keeps all of its debug records, the others keep none.
+
+Environment:
+  - PARS_LOG_LEVEL          default level for PARS loggers (default: INFO)
+  - PARS_LOG_LEVELS         per-module levels, e.g. "dept_service=DEBUG,doc_parser=WARNING"
+  - PARS_LOG_FORMAT         text ("[PARS] message") or json (one object per line) (default: text)
+  - PARS_LOG_DEBUG_SAMPLE   fraction of requests whose DEBUG records are kept (default: 1.0)
+  - PARS_LOG_QUEUE_SIZE     records buffered before new ones are dropped (default: 10000)
+"""
+
+import os
+import sys
+import json
+import uuid
+import zlib
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT = "pars"
+
+# Request / trace id of the request being handled (set by RequestIdMiddleware)
+REQUEST_ID = contextvars.ContextVar("pars_request_id", default=None)
+
+REQUEST_ID_HEADER = b"x-request-id"
+TRACEPARENT_HEADER = b"traceparent"
+
+# LogRecord attributes that are not structured "extra" fields
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+def get_logger(name):
+    """
+    Logger for a PARS module ("dept_service" -> "pars.dept_service"); sets up
+    the pipeline on first use.
+    """
+    if _handler is None:
+        setup_logging()
+    return logging.getLogger(f"{ROOT}.{name}" if name != "__main__" else ROOT)
+
+
+# ============================================================
+# ------------------- FILTERS / FORMATTERS -------------------
+# ============================================================
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps the request id and drops DEBUG records of unsampled requests.
+    Runs in the calling thread, before the record is queued.
+    """
+
+    def __init__(self, debug_sample=1.0):
+        super().__init__()
+        self.debug_sample = debug_sample
+        self._threshold = int(debug_sample * 0xFFFFFFFF)
+        self._unkeyed = 0
+
+    def filter(self, record):
+        request_id = REQUEST_ID.get()
+        record.request_id = request_id
+        if record.levelno > logging.DEBUG or self.debug_sample >= 1.0:
+            return True
+        if request_id is not None:
+            return zlib.crc32(request_id.encode()) <= self._threshold
+        # Outside a request: keep every 1/rate-th debug record
+        self._unkeyed += 1
+        return self.debug_sample > 0 and self._unkeyed % max(int(round(1 / self.debug_sample)), 1) == 0
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"[PARS] {record.getMessage()}"
+        if record.levelno >= logging.WARNING:
+            line = f"[PARS] {record.levelname}: {record.getMessage()}"
+        if record.request_id:
+            line += f" [{record.request_id}]"
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# ============================================================
+# ------------------- QUEUE PIPELINE -------------------------
+# ============================================================
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller: formatting is left to the
+    listener thread and a full queue drops the record.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge args now (they may be mutated after the call returns), but
+        # leave formatting to the listener; tracebacks are rendered here
+        # because exc_info cannot outlive the frame safely.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Stopping waits for room behind the queued records instead of failing on a full queue
+        self.queue.put(self._sentinel)
+
+
+def _parse_levels(text):
+    levels = {}
+    for item in filter(None, (p.strip() for p in (text or "").split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level=None, levels=None, fmt=None, debug_sample=None, queue_size=None, stream=None):
+    """
+    Configures the "pars" logger tree once (later calls only re-apply levels).
+    Arguments override the environment.
+    """
+    global _handler, _listener
+    with _lock:
+        root = logging.getLogger(ROOT)
+        root.setLevel(level or os.getenv("PARS_LOG_LEVEL", "INFO").upper())
+        module_levels = levels if levels is not None else _parse_levels(os.getenv("PARS_LOG_LEVELS", ""))
+        for name, module_level in module_levels.items():
+            logging.getLogger(f"{ROOT}.{name}").setLevel(module_level)
+        if _handler is not None:
+            return _handler
+
+        fmt = fmt or os.getenv("PARS_LOG_FORMAT", "text")
+        sample = float(os.getenv("PARS_LOG_DEBUG_SAMPLE", "1.0")) if debug_sample is None else debug_sample
+        size = int(os.getenv("PARS_LOG_QUEUE_SIZE", "10000")) if queue_size is None else queue_size
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+        _handler = NonBlockingQueueHandler(queue.Queue(size))
+        _handler.addFilter(RequestContextFilter(sample))
+        root.addHandler(_handler)
+        # PARS records are not duplicated into whatever the host (uvicorn) set up on the root logger
+        root.propagate = False
+
+        _listener = _Listener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(flush_logging)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_listener)
+        return _handler
+
+
+def _restart_listener():
+    # A forked worker (prefork_server.py) inherits the handler but not the
+    # listener thread; give it a fresh queue and listener of its own.
+    global _listener
+    if _handler is None or _listener is None:
+        return
+    _handler.queue = queue.Queue(_handler.queue.maxsize)
+    _listener = _Listener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def flush_logging():
+    """
+    Writes out everything queued so far (shutdown, tests). The listener is
+    restarted, so logging keeps working afterwards.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = _Listener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+def logging_stats():
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+        "level": logging.getLevelName(logging.getLogger(ROOT).level),
+    }
+
+
+# ============================================================
+# ------------------- REQUEST IDS ----------------------------
+# ============================================================
+
+def _valid_id(value):
+    return 0 < len(value) <= 64 and all(c.isalnum() or c in "-_.:" for c in value)
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware: binds a request id for the request (and the
+    threadpool work it starts) and returns it as X-Request-ID.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1").strip()
+                if _valid_id(candidate):
+                    request_id = candidate
+                    break
+            elif key == TRACEPARENT_HEADER and request_id is None:
+                # version-traceid-parentid-flags
+                parts = value.decode("latin-1").split("-")
+                if len(parts) == 4 and len(parts[1]) == 32:
+                    request_id = parts[1]
+        request_id = request_id or uuid.uuid4().hex[:16]
+        header = request_id.encode()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (REQUEST_ID_HEADER, header)]}
+            await send(message)
+
+        token = REQUEST_ID.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id if scope["type"] == "http" else send)
+        finally:
+            REQUEST_ID.reset(token)
@@ -3,20 +3,41 @@ PARS - FastAPI Backend
 Run with: uvicorn main:app --reload --port 8000
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
 from typing import Optional, List, Dict, Any
 from ml_service import TriageModel
 from fastapi import FastAPI, UploadFile, File
 from doc_parser import extract_vitals_from_pdf
-from dept_service import get_referral, get_department
+from dept_service import (
+    get_referral, get_department, nlp_model_loaded, route_batch, DEPARTMENTS,
+    encode_complaints, get_complaint_index, load_failure,
+)
 from audio_service import AudioService
+from shadow_service import create_shadow_scorer
+from model_manager import MANAGER
+from queue_service import TriageQueue
+from persistence_service import create_persistence_service, patient_row, assignment_row
+from assignment_service import create_assignment_engine
+from admission_control import AdmissionController, ArrivalTimeMiddleware, DEGRADED
+from rule_engine import RULES
+from vitals_stream import create_vitals_stream, decode_samples
+from profiler_service import create_profiler, profiled, admin_token, ProfileMiddleware
+from log_config import get_logger, RequestIdMiddleware, flush_logging, logging_stats
+import asyncio
 import os
 import shutil
+import threading
+import orjson
+
+log = get_logger(__name__)
 
-app = FastAPI(title="PARS Triage API", version="1.0.0")
+# ORJSON serializes responses several times faster than the stdlib encoder
+app = FastAPI(title="PARS Triage API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS - allow your Lovable frontend
 app.add_middleware(
@@ -34,21 +55,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stamps request arrival so /predict can measure its own queueing delay
+app.add_middleware(ArrivalTimeMiddleware)
+admission = AdmissionController.from_env()
+
+# Admin-gated sampling / per-request profiling (off unless PARS_ADMIN_TOKEN is set)
+try:
+    profiler = create_profiler()
+except Exception as e:
+    log.error("Profiler Error: %s", e)
+    profiler = None
+if profiler:
+    app.add_middleware(ProfileMiddleware, profiler=profiler)
+
+# Binds a request id (X-Request-ID / traceparent) to every log record of the request
+app.add_middleware(RequestIdMiddleware)
+
 # Load model on startup
 try:
     model = TriageModel()
-    print("[PARS] Model loaded successfully.")
+    log.info("Model loaded successfully.")
 except Exception as e:
-    print(f"[PARS] WARNING: Could not load model: {e}")
+    log.warning("Could not load model: %s", e)
     model = None
 
 # Load Audio Service
 try:
     audio_service = AudioService()
 except Exception as e:
-    print(f"[PARS] Audio Service Error: {e}")
+    log.error("Audio Service Error: %s", e)
     audio_service = None
 
+# Shadow scoring for a candidate model (off unless PARS_SHADOW_MODEL_PATH is set)
+try:
+    shadow_scorer = create_shadow_scorer()
+except Exception as e:
+    log.error("Shadow Scoring Error: %s", e)
+    shadow_scorer = None
+
+
+# Live ED queue (see queue_service.py); restored from its last snapshot at startup
+triage_queue = TriageQueue.from_env()
+
+# Load-aware doctor assignment; rosters are loaded from the data store by the
+# reconcile thread started at startup (after prefork workers fork)
+try:
+    assignment_engine = create_assignment_engine()
+except Exception as e:
+    log.error("Assignment Engine Error: %s", e)
+    assignment_engine = None
+
+# Write-behind persistence of results to Supabase (off unless PARS_PERSIST=1).
+# Created in the startup hook: the journal and the store's connection must be
+# opened in the worker, not inherited from a prefork parent.
+persistence = None
+
+
+def _score_vitals(columns, n):
+    # Monitored beds are re-scored on the model path once it is ready
+    if model is None or not ml_ready.is_set():
+        return RULES.fallback_results(RULES.column_matrix(columns, n))
+    return model.predict_columns(columns, n)
+
+
+# Continuous bedside vitals with incremental re-scoring (off unless PARS_VITALS_STREAM=1)
+try:
+    vitals_stream = create_vitals_stream(_score_vitals)
+except Exception as e:
+    log.error("Vitals Stream Error: %s", e)
+    vitals_stream = None
+
 
 class PatientInput(BaseModel):
     Age: int
@@ -66,6 +142,15 @@ class PatientInput(BaseModel):
     Hypertension: bool = False
     Heart_Disease: bool = False
     Chief_Complaint: Optional[str] = None
+    # When set, the patient is added to (or re-scored in) the live queue and persisted
+    Patient_ID: Optional[str] = None
+    Patient_Name: Optional[str] = None
+    # Owner of the `patients` row; without it only the assignment is persisted
+    User_ID: Optional[str] = None
+
+
+# Request fields that are not model features
+NON_FEATURE_FIELDS = ("Chief_Complaint", "Patient_ID", "Patient_Name", "User_ID")
 
 
 class TriageResponse(BaseModel):
@@ -73,68 +158,690 @@ class TriageResponse(BaseModel):
     risk_label: str
     details: str
     referral: Optional[Dict[str, Any]] = None
+    assigned_doctor: Optional[Dict[str, Any]] = None
+    # Set when the server was overloaded and answered on the rule-based path
+    degraded: bool = False
+
+
+# ============================================================
+# ---------------- STARTUP / READINESS -----------------------
+# ============================================================
+
+# PARS_WARMUP=1 loads the triage and NLP models in a background thread at startup.
+# Until they are ready, /predict answers on the rule-based path and keyword routing,
+# so traffic can be routed to the worker immediately.
+WARMUP = os.getenv("PARS_WARMUP", "0") == "1"
+ml_ready = threading.Event()
+
+
+def _warmup():
+    try:
+        if model is not None:
+            MANAGER.load(model.managed_name)
+        MANAGER.load("dept_encoder")
+    except Exception as e:
+        log.error("Warmup failed: %s", e)
+    finally:
+        ml_ready.set()
+        log.info("Warmup complete.")
+
+
+@app.on_event("startup")
+def start_queue():
+    global persistence
+    try:
+        persistence = create_persistence_service()
+    except Exception as e:
+        log.error("Persistence Error: %s", e)
+        persistence = None
+    triage_queue.restore()
+    triage_queue.start_snapshots()
+    if assignment_engine:
+        assignment_engine.start()
+    if persistence:
+        persistence.start()
+    if vitals_stream:
+        vitals_stream.start()
+
+
+@app.on_event("shutdown")
+def save_queue():
+    triage_queue.snapshot()
+    if persistence:
+        persistence.stop()
+    if vitals_stream:
+        vitals_stream.stop()
+    flush_logging()
+
+
+@app.on_event("startup")
+def start_warmup():
+    if WARMUP:
+        threading.Thread(target=_warmup, name="pars-warmup", daemon=True).start()
+    else:
+        # Without warmup, models load lazily on the first request (original behaviour)
+        ml_ready.set()
 
 
 @app.get("/")
-def health():
+def root_health():
     return {"status": "ok", "model_loaded": model is not None}
 
 
+@app.get("/health")
+def health():
+    """
+    Liveness: the process is up and serving HTTP.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready(require_ml: bool = False):
+    """
+    Readiness: the rule-based triage path is usable as soon as the app has started.
+    Pass require_ml=true to only report ready once the ML models are loaded.
+    """
+    status = {
+        "ready": True,
+        "mode": "ml" if model is not None and ml_ready.is_set() else "rule_based",
+        "triage_model_loaded": model is not None and model.is_loaded(),
+        "nlp_model_loaded": nlp_model_loaded(),
+        "warming_up": WARMUP and not ml_ready.is_set(),
+    }
+    nlp_failure = load_failure()
+    if nlp_failure:
+        status["nlp_load_failure"] = nlp_failure
+    # Models evicted by the model manager still count: they reload on the next request
+    triage_available = model is not None and MANAGER.available(model.managed_name)
+    nlp_available = MANAGER.available("dept_encoder")
+    if require_ml and not (triage_available and nlp_available):
+        status["ready"] = False
+        return ORJSONResponse(status, status_code=503)
+    return status
+
+
+def rule_based_assessment(data) -> dict:
+    """
+    Simple rule-based risk assessment used when the ML model isn't loaded.
+    Accepts a dict or a PatientInput. Thresholds come from triage_rules.json.
+    """
+    return RULES.fallback(data)
+
+
 @app.post("/predict", response_model=TriageResponse)
 def predict(patient: PatientInput):
     # Fallback mode: Use rule-based risk assessment if ML model isn't loaded
     if model is None:
-        print("[PARS] WARNING: Using fallback mode (ML model not available)")
-        # Simple rule-based risk assessment
-        hr = patient.Heart_Rate
-        systolic = patient.Systolic_BP
-        o2 = patient.O2_Saturation
-        gcs = patient.GCS_Score
-        
-        # Determine risk based on critical thresholds
-        critical_reasons = []
-        if hr > 180 or hr < 40:
-            critical_reasons.append("Abnormal heart rate")
-        if systolic < 70:
-            critical_reasons.append("Severe hypotension")
-        if o2 < 85:
-            critical_reasons.append("Critical hypoxia")
-        if gcs <= 8:
-            critical_reasons.append("Reduced consciousness")
-        
-        if critical_reasons:
-            risk_score = 0.95
-            risk_label = "HIGH"
-            details = "⚠️ Critical vitals detected: " + ", ".join(critical_reasons)
-        elif hr > 100 or systolic < 90 or o2 < 94:
-            risk_score = 0.55
-            risk_label = "MEDIUM"
-            details = "Elevated vitals requiring attention"
-        else:
-            risk_score = 0.15
-            risk_label = "LOW"
-            details = "Vitals within acceptable range"
-        
-        result = {
-            "risk_score": risk_score,
-            "risk_label": risk_label,
-            "details": details
-        }
+        log.warning("Using fallback mode (ML model not available)")
+        result = rule_based_assessment(patient)
+    elif not ml_ready.is_set():
+        # Startup warmup still loading the model
+        result = rule_based_assessment(patient)
     else:
-        # Use ML model if available
-        result = model.predict(patient.dict())
+        # Admission control: under overload, non-critical patients skip ML inference
+        # and NLP routing; guardrail-critical patients always get the full path.
+        critical = RULES.is_critical(patient)
+        mode, _ = admission.decide(critical)
+        if mode == DEGRADED:
+            result = rule_based_assessment(patient)
+            result["degraded"] = True
+        else:
+            with admission.full_path(), profiled("TriageModel.predict"):
+                # Use ML model if available (reads the validated PatientInput directly)
+                result = model.predict(patient)
+
+            # Candidate model scores a copy in the background; never affects the decision
+            if shadow_scorer:
+                shadow_scorer.submit(patient, result)
+    result.setdefault("degraded", False)
     
     # 2. Determine Referral Logic
     # Use Chief Complaint if provided, otherwise fallback to the generated "details"
     referral_reason = patient.Chief_Complaint if patient.Chief_Complaint else result["details"]
     
     # 3. Get Department & Doctor List (THIS IS THE KEY PART - NLP DEPARTMENT CLASSIFICATION)
-    referral_data = get_referral(referral_reason)
+    # Doctors come from the assignment engine's in-memory rosters when available
+    with profiled("get_referral"):
+        referral_data = get_referral(
+            referral_reason,
+            roster=assignment_engine.roster if assignment_engine else None,
+            fast=result["degraded"],
+        )
     
     # 4. Merge Results
     result["referral"] = referral_data
+
+    # Concrete doctor: counted against their load when the patient is identified
+    if assignment_engine:
+        department = referral_data["department"]
+        result["assigned_doctor"] = (
+            assignment_engine.assign(department, patient.Patient_ID) if patient.Patient_ID
+            else assignment_engine.recommend(department)
+        )
+
+    log.info("Triage %s (%.3f) -> %s", result["risk_label"], result["risk_score"], referral_data["department"],
+             extra={"patient_id": patient.Patient_ID, "risk_label": result["risk_label"],
+                    "risk_score": result["risk_score"], "department": referral_data["department"],
+                    "degraded": result["degraded"]})
+
+    # 5. Admit to (or re-score in) the live queue
+    if patient.Patient_ID:
+        # A monitored bed is re-scored with this patient's profile from now on
+        if vitals_stream and vitals_stream.monitored(patient.Patient_ID):
+            vitals_stream.set_profile(patient.Patient_ID, patient.dict())
+
+        triage_queue.admit(
+            patient.Patient_ID, result["risk_score"], result["risk_label"],
+            referral_data["department"], result["details"],
+        )
+
+        # 6. Journal the result; written to Supabase in bulk off the request path.
+        # The patients row needs its owner (RLS: auth.uid() = user_id), and the
+        # assignment needs the patients row (FK), so anonymous results are not persisted.
+        if persistence and patient.User_ID:
+            persistence.record_many([
+                ("patients", patient_row(patient, result, referral_data)),
+                ("patient_assignments", assignment_row(patient, referral_data, result.get("assigned_doctor"))),
+            ])
     
-    return result
+    # Returning a response directly skips re-validating through TriageResponse;
+    # response_model still documents the shape in OpenAPI.
+    return ORJSONResponse(result)
+
+
+# Compact batch format for machine-to-machine clients (e.g. ambulance telemetry gateways):
+#   {"fields": [...optional column order...], "rows": [[30, "M", 75, 120, 80, 98.0, 37.0, 16], ...]}
+# Fields omitted from "fields" fall back to the PatientInput defaults.
+BATCH_FIELDS = [
+    "Age", "Gender", "Heart_Rate", "Systolic_BP", "Diastolic_BP",
+    "O2_Saturation", "Temperature", "Respiratory_Rate", "Pain_Score",
+    "GCS_Score", "Arrival_Mode", "Diabetes", "Hypertension", "Heart_Disease",
+]
+MAX_BATCH_ROWS = int(os.getenv("PARS_MAX_BATCH_ROWS", "10000"))
+
+
+def _decode_batch(body: bytes):
+    """
+    Decode a compact batch payload into validated columns (field -> list).
+    """
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("rows"), list):
+        raise HTTPException(status_code=422, detail='Expected {"fields": [...], "rows": [[...], ...]}')
+
+    fields = payload.get("fields") or BATCH_FIELDS
+    unknown = [f for f in fields if f not in PatientInput.__fields__]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {unknown}")
+
+    rows = payload["rows"]
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_ROWS} rows")
+    if any(not isinstance(r, list) or len(r) != len(fields) for r in rows):
+        raise HTTPException(status_code=422, detail=f"Every row must have {len(fields)} values")
+
+    columns = {f: list(col) for f, col in zip(fields, zip(*rows))} if rows else {f: [] for f in fields}
+
+    # Fill omitted optional fields with the PatientInput defaults
+    for name, field in PatientInput.__fields__.items():
+        if name in columns or name in NON_FEATURE_FIELDS:
+            continue
+        # pydantic v2 FieldInfo.is_required() / v1 ModelField.required
+        required = field.is_required() if hasattr(field, "is_required") else field.required
+        default = getattr(field, "default", None)
+        if required or default is None:
+            raise HTTPException(status_code=422, detail=f"Missing required field: {name}")
+        columns[name] = [default] * len(rows)
+
+    return columns, len(rows)
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Scores a compact array-based batch. Returns columnar arrays in row order.
+    Referral routing is not included; use /predict for a full triage decision.
+    """
+    columns, n = _decode_batch(await request.body())
+    if n == 0:
+        return {"risk_scores": [], "risk_labels": [], "details": []}
+
+    try:
+        if model is None or not ml_ready.is_set():
+            results = RULES.fallback_results(RULES.column_matrix(columns, n))
+        else:
+            results = await run_in_threadpool(model.predict_columns, columns, n)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return ORJSONResponse({
+        "risk_scores": [r["risk_score"] for r in results],
+        "risk_labels": [r["risk_label"] for r in results],
+        "details": [r["details"] for r in results],
+    })
+
+class RouteBatchInput(BaseModel):
+    complaints: List[str]
+    top_k: int = 3
+    # "hybrid" or "knn"; defaults to PARS_DEPT_ROUTER
+    mode: Optional[str] = None
+
+
+@app.post("/route/batch")
+def route_complaints(data: RouteBatchInput):
+    """
+    Routes many complaints in one encoder call. Returns the top_k departments
+    with hybrid scores for every complaint, in request order.
+    """
+    if len(data.complaints) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_ROWS} complaints")
+    if not 1 <= data.top_k <= len(DEPARTMENTS):
+        raise HTTPException(status_code=422, detail=f"top_k must be between 1 and {len(DEPARTMENTS)}")
+    if data.mode not in (None, "hybrid", "knn"):
+        raise HTTPException(status_code=422, detail="mode must be 'hybrid' or 'knn'")
+    return {"results": route_batch(data.complaints, top_k=data.top_k, mode=data.mode)}
+
+
+class LabelledVisit(BaseModel):
+    complaint: str
+    department: str
+
+
+class ComplaintIndexAppend(BaseModel):
+    visits: List[LabelledVisit]
+
+
+@app.get("/complaint-index")
+def complaint_index_stats():
+    """
+    Size and layout of the historical complaint index used for kNN routing.
+    """
+    index = get_complaint_index()
+    if index is None:
+        return {"enabled": False}
+    return index.stats()
+
+@app.post("/complaint-index/append")
+def complaint_index_append(request: Request, data: ComplaintIndexAppend):
+    """
+    Adds labelled visits (e.g. clinician-confirmed departments) to the complaint index.
+    Admin only: the labels steer kNN routing for every later patient.
+    """
+    _require_admin(request)
+    index = get_complaint_index()
+    if index is None:
+        raise HTTPException(status_code=404, detail="Complaint index is not built.")
+    if not data.visits:
+        return {"rows": index.count}
+    embeddings = encode_complaints([v.complaint for v in data.visits])
+    if embeddings is None:
+        raise HTTPException(status_code=503, detail="Department encoder unavailable.")
+    try:
+        rows = index.append(embeddings, [v.department for v in data.visits])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"rows": rows}
+
+@app.get("/shadow")
+def shadow_stats():
+    """
+    Aggregated comparison of the candidate (shadow) model against the live model.
+    """
+    if not shadow_scorer:
+        return {"enabled": False}
+    return shadow_scorer.stats()
+
+@app.post("/shadow/sample-rate")
+def shadow_sample_rate(rate: float):
+    if not shadow_scorer:
+        raise HTTPException(status_code=404, detail="Shadow scoring is not enabled.")
+    shadow_scorer.set_sample_rate(rate)
+    return {"sample_rate": shadow_scorer.sample_rate}
+
+@app.post("/shadow/reset")
+def shadow_reset():
+    if not shadow_scorer:
+        raise HTTPException(status_code=404, detail="Shadow scoring is not enabled.")
+    shadow_scorer.reset()
+    return shadow_scorer.stats()
+
+@app.get("/models")
+def models_status():
+    """
+    Resident size, last use and load/evict history of the managed ML models.
+    """
+    return MANAGER.stats()
+
+@app.post("/models/{name:path}/unload")
+def unload_model(name: str):
+    if name not in MANAGER.stats()["models"]:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    return {"model": name, "unloaded": MANAGER.unload(name)}
+
+@app.get("/score-cache")
+def score_cache_stats():
+    """
+    Hit ratio and size of the triage model's score cache.
+    """
+    if model is None or not model.score_cache:
+        return {"enabled": False}
+    return model.score_cache.stats()
+
+@app.get("/rules")
+def rules_stats():
+    """
+    Guardrail and explanation rules with per-rule hit counters.
+    """
+    return RULES.stats()
+
+@app.get("/admission")
+def admission_stats():
+    """
+    Admission-control state and degraded-mode counters.
+    """
+    return admission.stats()
+
+@app.get("/logging")
+def logging_status():
+    """
+    Log queue depth and records dropped because the queue was full.
+    """
+    return logging_stats()
+
+@app.get("/persistence")
+def persistence_stats():
+    """
+    Write-behind journal backlog and flush statistics.
+    """
+    if not persistence:
+        return {"enabled": False}
+    return persistence.stats()
+
+# ============================================================
+# ------------------- LIVE QUEUE -----------------------------
+# ============================================================
+
+@app.get("/queue")
+def get_queue(department: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Patients in priority order (highest risk first, then earliest arrival).
+    """
+    view = triage_queue.view(department, limit)
+    view.update(triage_queue.summary())
+    return view
+
+@app.get("/queue/stream")
+async def stream_queue(request: Request, department: Optional[str] = None, since: Optional[int] = None):
+    """
+    Server-Sent Events feed of queue changes. Starts with a `snapshot` event unless the
+    client resumes (Last-Event-ID header or ?since=) within the buffered change history,
+    then sends `upsert` / `remove` events. A `resync` event means the client fell behind
+    and a fresh snapshot follows.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    events, backlog = triage_queue.subscribe(since)
+
+    def sse(event_type, version, payload):
+        return f"id: {version}\nevent: {event_type}\ndata: {orjson.dumps(payload).decode()}\n\n"
+
+    def snapshot():
+        view = triage_queue.view(department)
+        return view["version"], sse("snapshot", view["version"], view)
+
+    async def generate():
+        try:
+            if backlog is None:
+                version, message = snapshot()
+                yield message
+            else:
+                version = since
+                for event in backlog:
+                    if not department or event["entry"]["department"] == department:
+                        yield sse(event["op"], event["version"], event["entry"])
+                    version = event["version"]
+
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["op"] == "resync":
+                    version, message = snapshot()
+                    yield message
+                    continue
+                # Changes already contained in the snapshot
+                if event["version"] <= version:
+                    continue
+                if department and event["entry"]["department"] != department:
+                    continue
+                yield sse(event["op"], event["version"], event["entry"])
+        finally:
+            triage_queue.unsubscribe(events)
+
+    return StreamingResponse(
+        generate(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/queue/next")
+def queue_next(department: Optional[str] = None):
+    """
+    Call the next (highest-priority) patient and remove them from the queue.
+    """
+    entry = triage_queue.pop_next(department)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Queue is empty.")
+    # Seen: free the slot on the assigned doctor's load
+    if assignment_engine:
+        assignment_engine.release(entry["patient_id"])
+    return entry
+
+@app.delete("/queue/{patient_id}")
+def queue_remove(patient_id: str):
+    # Discharged: free the slot on the assigned doctor's load, even if the
+    # patient already left the queue (release is idempotent)
+    released = assignment_engine.release(patient_id) if assignment_engine else False
+    if not triage_queue.remove(patient_id) and not released:
+        raise HTTPException(status_code=404, detail=f"Patient {patient_id} is not in the queue.")
+    return {"patient_id": patient_id, "removed": True}
+
+# ============================================================
+# ------------------- VITALS STREAM --------------------------
+# ============================================================
+
+class VitalsProfile(BaseModel):
+    Age: int
+    Gender: str
+    Arrival_Mode: str = "Walk-in"
+    Diabetes: bool = False
+    Hypertension: bool = False
+    Heart_Disease: bool = False
+
+
+def _require_vitals_stream():
+    if not vitals_stream:
+        raise HTTPException(status_code=503, detail="Vitals streaming is disabled (set PARS_VITALS_STREAM=1).")
+    return vitals_stream
+
+
+@app.get("/vitals")
+def vitals_stats():
+    """
+    Monitored beds, ingestion and re-scoring counters.
+    """
+    if not vitals_stream:
+        return {"enabled": False}
+    return vitals_stream.stats()
+
+@app.post("/vitals/batch")
+async def vitals_batch(request: Request):
+    """
+    Ingests a batch of bedside samples (see vitals_stream.decode_samples for the
+    accepted shapes). Guardrails run on every sample; alerts raised by the batch
+    are returned and pushed to /vitals/ws subscribers.
+    """
+    stream = _require_vitals_stream()
+    try:
+        patient_ids, times, vitals = decode_samples(orjson.loads(await request.body()))
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if len(patient_ids) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_ROWS} samples")
+    return stream.ingest(patient_ids, vitals, times)
+
+@app.websocket("/vitals/ws")
+async def vitals_socket(websocket: WebSocket, alerts: bool = True):
+    """
+    Bedside gateway / monitor socket. Every text message is a sample batch (same
+    shapes as /vitals/batch); with ?alerts=true (default) every alert is pushed
+    back as {"alert": {...}}. Malformed messages get {"error": ...}.
+    """
+    await websocket.accept()
+    if not vitals_stream:
+        await websocket.close(code=1013, reason="Vitals streaming is disabled")
+        return
+    queue = vitals_stream.subscribe() if alerts else None
+
+    async def receive():
+        while True:
+            message = await websocket.receive_text()
+            try:
+                patient_ids, times, vitals = decode_samples(orjson.loads(message))
+                vitals_stream.ingest(patient_ids, vitals, times)
+            except (orjson.JSONDecodeError, ValueError, TypeError) as e:
+                await websocket.send_text(orjson.dumps({"error": str(e)}).decode())
+
+    async def push():
+        while True:
+            alert = await queue.get()
+            await websocket.send_text(orjson.dumps({"alert": alert}).decode())
+
+    tasks = [asyncio.ensure_future(receive())] + ([asyncio.ensure_future(push())] if queue else [])
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if queue:
+            vitals_stream.unsubscribe(queue)
+
+@app.get("/vitals/alerts")
+def vitals_alerts(since: Optional[int] = None, patient_id: Optional[str] = None):
+    """
+    Recent alerts (oldest first); `since` resumes after an alert id.
+    """
+    return {"alerts": _require_vitals_stream().recent_alerts(since, patient_id)}
+
+@app.post("/vitals/{patient_id}/profile")
+def vitals_profile(patient_id: str, profile: VitalsProfile):
+    """
+    Age, gender and comorbidities for a monitored patient; enables model re-scoring.
+    """
+    _require_vitals_stream().set_profile(patient_id, profile.dict())
+    return {"patient_id": patient_id, "profile": profile.dict()}
+
+@app.get("/vitals/{patient_id}")
+def vitals_window(patient_id: str):
+    """
+    Buffered samples, current vitals and last risk score of one bed.
+    """
+    view = _require_vitals_stream().window_view(patient_id)
+    if view is None:
+        raise HTTPException(status_code=404, detail=f"Patient {patient_id} is not monitored.")
+    return view
+
+@app.delete("/vitals/{patient_id}")
+def vitals_discharge(patient_id: str):
+    stream = _require_vitals_stream()
+    released = assignment_engine.release(patient_id) if assignment_engine else False
+    if not stream.discharge(patient_id) and not released:
+        raise HTTPException(status_code=404, detail=f"Patient {patient_id} is not monitored.")
+    return {"patient_id": patient_id, "removed": True}
+
+@app.get("/assignments")
+def assignment_stats():
+    """
+    Per-department doctor load and assignment counters.
+    """
+    if not assignment_engine:
+        return {"enabled": False}
+    return assignment_engine.stats()
+
+# ============================================================
+# ------------------- PROFILING (ADMIN) ----------------------
+# ============================================================
+
+def _require_admin(request: Request):
+    if not profiler:
+        raise HTTPException(status_code=503, detail="Admin endpoints are disabled (set PARS_ADMIN_TOKEN).")
+    headers = {k.lower(): v for k, v in request.headers.raw}
+    if not profiler.authorized(admin_token(headers)):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+    return profiler
+
+
+@app.get("/admin/profiler")
+def profiler_status(request: Request):
+    """
+    Profiler counters and the profiles currently held in the ring.
+    """
+    if not profiler:
+        return {"enabled": False}
+    prof = _require_admin(request)
+    return {**prof.stats(), "ring": prof.list()}
+
+@app.post("/admin/profiler/start")
+def profiler_start(request: Request, seconds: float = 30, hz: Optional[float] = None, idle: bool = False):
+    """
+    Starts a sampling window of all threads; fetch the result from
+    /admin/profiles/{id}?format=collapsed once it finishes (or after /stop).
+    """
+    prof = _require_admin(request)
+    try:
+        profile_id = prof.start_sampler(seconds, hz=hz, idle=idle)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"id": profile_id, **prof.get(profile_id).summary()}
+
+@app.post("/admin/profiler/stop")
+def profiler_stop(request: Request):
+    prof = _require_admin(request)
+    profile_id = prof.stop_sampler()
+    if profile_id is None:
+        raise HTTPException(status_code=409, detail="No sampling window is running.")
+    return {"id": profile_id, **prof.get(profile_id).summary()}
+
+@app.get("/admin/profiles/{profile_id}")
+def profile_detail(request: Request, profile_id: int, format: str = "json", limit: int = 30):
+    """
+    One profile from the ring. Sampling windows are also available as
+    collapsed stacks (format=collapsed) for flamegraph.pl / speedscope.
+    """
+    prof = _require_admin(request)
+    entry = prof.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} is not in the ring.")
+    if format == "collapsed":
+        if not hasattr(entry, "collapsed"):
+            raise HTTPException(status_code=400, detail="Collapsed stacks are only available for sampling windows.")
+        return PlainTextResponse(entry.collapsed())
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'collapsed'.")
+    return {"id": profile_id, **entry.summary(), "top_functions": entry.top_functions(limit)}
 
 class SelfCheckInInput(BaseModel):
     name: str
@@ -149,10 +856,12 @@ def self_check_in(data: SelfCheckInInput):
     Always returns LOW risk and determines department based on symptoms.
     """
     # 1. Determine Department
-    dept = get_department(data.symptoms)
+    with profiled("get_department"):
+        dept = get_department(data.symptoms)
     
     # 2. Get Doctors/Referral Data
-    referral_data = get_referral(data.symptoms)
+    with profiled("get_referral"):
+        referral_data = get_referral(data.symptoms)
     
     # 3. Construct Response
     return {
@@ -178,6 +887,15 @@ async def parse_document(file: UploadFile = File(...)):
         "data": extracted_data
     }
 
+@app.get("/audio")
+def audio_stats():
+    """
+    Transcription counters: audio skipped by the VAD and Whisper windows saved.
+    """
+    if not audio_service:
+        return {"enabled": False}
+    return audio_service.stats()
+
 @app.post("/transcribe")
 async def transcribe_audio(file: UploadFile = File(...)):
     """
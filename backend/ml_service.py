@@ -1,36 +1,100 @@
 """
 PARS - ML Service
-Loads the Keras triage model and preprocessor, applies hybrid guardrails.
+Loads the Keras triage model and preprocessor, applies hybrid guardrails
+(safety overrides and explanations come from the rule engine, rule_engine.py).
 Place your trained model files in the same directory:
   - triage_model_nn.keras
   - preprocessor_nn.pkl
+
+Set PARS_TRIAGE_BACKEND=onnx to serve the exported graph (see onnx_export.py)
+through ONNX Runtime instead of TensorFlow:
+  - PARS_ONNX_MODEL_PATH          (default: triage_model.onnx)
+  - PARS_ONNX_INTRA_OP_THREADS    (default: 1)
+
+PARS_SCORE_CACHE=exact memoizes network scores per feature vector
+(see score_cache.py; binned mode is offline-only and refused here).
+
+Each TriageModel registers with the model manager (model_manager.py), which may
+unload it when idle or over the memory budget; it is reloaded on the next call.
+Names must be unique: a second model on the same artifact (e.g. a shadow
+candidate) passes its own `managed_name`.
 """
 
+import os
+import json
+import threading
 import numpy as np
-import pandas as pd
-import joblib
+from feature_schema import FeatureSchema
+from model_manager import MANAGER
+from rule_engine import RULES
+from score_cache import ScoreCache
+from log_config import get_logger
+
+log = get_logger(__name__)
 # import tensorflow as tf  <-- Removed top-level import to save memory at startup
 
+BACKENDS = ("keras", "onnx")
+
 
 class TriageModel:
-    def __init__(self, model_path="triage_model_nn.keras", preprocessor_path="preprocessor_nn.pkl"):
+    def __init__(self, model_path="triage_model_nn.keras", preprocessor_path="preprocessor_nn.pkl",
+                 backend=None, onnx_path=None, intra_op_threads=None, score_cache=None, managed_name=None):
         self.model = None
         self.preprocessor = None
+        self.schema = None
         self.model_path = model_path
         self.preprocessor_path = preprocessor_path
+
+        self.backend = (backend or os.getenv("PARS_TRIAGE_BACKEND", "keras")).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown triage backend: {self.backend} (expected one of {BACKENDS})")
+        self.onnx_path = onnx_path or os.getenv("PARS_ONNX_MODEL_PATH", "triage_model.onnx")
+        self.intra_op_threads = int(
+            intra_op_threads if intra_op_threads is not None
+            else os.getenv("PARS_ONNX_INTRA_OP_THREADS", "1")
+        )
+        self._input_name = None
+        self._load_lock = threading.Lock()
+        self.score_cache = score_cache if score_cache is not None else ScoreCache.from_env()
+
+        self.artifact = self.onnx_path if self.backend == "onnx" else self.model_path
+        self.managed_name = managed_name or f"triage:{self.artifact}"
+        MANAGER.register(self.managed_name, self._load_resources_if_needed, self.unload, self.is_loaded)
+
+    def is_loaded(self) -> bool:
+        return self.model is not None and self.schema is not None
         
     def _load_resources_if_needed(self):
         """
         Lazy load resources only when needed.
         """
-        if self.model is not None and self.preprocessor is not None:
+        if self.is_loaded():
             return
 
-        print("[PARS] Loading TensorFlow & Keras Model (Lazy Load)...")
+        with self._load_lock:
+            if self.is_loaded():
+                return
+            if self.backend == "onnx":
+                self._load_onnx()
+            else:
+                self._load_keras()
+
+    def unload(self):
+        """
+        Drop the network and preprocessor; the next prediction reloads them.
+        """
+        with self._load_lock:
+            self.model = None
+            self.preprocessor = None
+            self.schema = None
+            self._input_name = None
+
+    def _load_keras(self):
+        log.info("Loading TensorFlow & Keras Model (Lazy Load)...")
         try:
             # Lazy import to avoid heavy startup cost
             import tensorflow as tf
-            import os
+            import joblib
             
             base_dir = os.path.dirname(os.path.abspath(__file__))
             model_full_path = os.path.join(base_dir, self.model_path)
@@ -38,130 +102,143 @@ class TriageModel:
 
             self.model = tf.keras.models.load_model(model_full_path, compile=False)
             self.preprocessor = joblib.load(preprocessor_full_path)
-            print(f"[PARS] Model loaded successfully.")
+            # Compile the preprocessor once into a direct record -> vector mapping
+            self.schema = FeatureSchema.from_preprocessor(self.preprocessor)
+            log.info("Model loaded successfully.")
         except Exception as e:
-            print(f"[PARS] Error loading model: {e}")
+            log.error("Error loading model: %s", e)
             raise e
 
-    def predict(self, data: dict) -> dict:
+    def _load_onnx(self):
+        """
+        Load the exported preprocessor + network graph with ONNX Runtime (no TensorFlow).
+        """
+        log.info("Loading ONNX triage model (Lazy Load)...")
+        try:
+            import onnxruntime as ort
+            from onnx_export import SCHEMA_METADATA_KEY
+
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            onnx_full_path = os.path.join(base_dir, self.onnx_path)
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.intra_op_threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(onnx_full_path, options, providers=["CPUExecutionProvider"])
+
+            spec = session.get_modelmeta().custom_metadata_map.get(SCHEMA_METADATA_KEY)
+            if not spec:
+                raise ValueError(f"{self.onnx_path} has no embedded feature schema; re-run onnx_export.py")
+
+            # The graph applies the scaler itself, so feed raw (unscaled) features
+            self.schema = FeatureSchema.from_dict(json.loads(spec), scaled=False)
+            self._input_name = session.get_inputs()[0].name
+            self.model = session
+            log.info("ONNX model loaded successfully (%d intra-op threads).", self.intra_op_threads)
+        except Exception as e:
+            log.error("Error loading ONNX model: %s", e)
+            raise e
+
+    def _infer(self, X: np.ndarray) -> np.ndarray:
+        """
+        Run the network on an (n, n_features) float32 matrix.
+        """
+        if self.backend == "onnx":
+            return self.model.run(None, {self._input_name: X})[0]
+        if len(X) == 1:
+            # Direct call avoids Keras predict()'s per-call dataset setup for a single row
+            return np.asarray(self.model(X, training=False))
+        return self.model.predict(X, verbose=0, batch_size=256)
+
+    def predict(self, data) -> dict:
         """
-        Takes patient vitals dict, returns { risk_score, risk_label, details }.
+        Takes patient vitals (dict or PatientInput), returns { risk_score, risk_label, details }.
         Applies hybrid guardrails before neural network inference.
         """
-        # Ensure model is loaded
-        self._load_resources_if_needed()
+        with MANAGER.use(self.managed_name):
+            # Ensure model is loaded
+            self._load_resources_if_needed()
+
+            # --- Guardrails (Rule-based override) ---
+            override = RULES.guardrail(data)
+            if override:
+                return override
+
+            # --- Neural Network Prediction (memoized when the score cache is on) ---
+            cache = self.score_cache
+            X = self.schema.build(cache.record(data) if cache else data)
+            key = cache.key(X[0]) if cache else None
+            risk_score = cache.get(key) if cache else None
+            if risk_score is None:
+                risk_score = self._score_from_prediction(self._infer(X)[0])
+                if cache:
+                    cache.put(key, risk_score)
+
+        return RULES.result(data, risk_score)
+
+    def predict_batch(self, records: list) -> list:
+        """
+        Batch version of predict(). Guardrail overrides are resolved for the whole
+        batch at once; all remaining records go through the network in a single call.
+        """
+        record = self.score_cache.record if self.score_cache else (lambda data: data)
+        return self._predict_matrix(
+            RULES.matrix(records),
+            lambda pending: self.schema.build_batch([record(records[i]) for i in pending]),
+        )
 
-        # --- Guardrails (Rule-based override) ---
-        # Critical thresholds as per test.py logic
-        hr = data.get("Heart_Rate", 80)
-        systolic = data.get("Systolic_BP", 120)
-        o2 = data.get("O2_Saturation", 98)
-        gcs = data.get("GCS_Score", 15)
+    def predict_columns(self, columns: dict, n: int) -> list:
+        """
+        Columnar version of predict() for compact batch payloads.
+        `columns` maps API field names to equal-length sequences.
+        """
+        features = self.score_cache.columns(columns) if self.score_cache else columns
+        return self._predict_matrix(
+            RULES.column_matrix(columns, n),
+            lambda pending: self.schema.build_columns(
+                {field: np.asarray(values)[pending] for field, values in features.items()},
+                n=len(pending),
+            ),
+        )
+
+    def _predict_matrix(self, vitals: np.ndarray, build) -> list:
+        """
+        Guardrails are evaluated over the whole vitals matrix in one pass; the
+        remaining rows (built into features by `build(pending)`) go through the
+        network in a single call.
+        """
+        results = RULES.override_results(RULES.guardrail_hits(vitals))
+        pending = np.array([i for i, r in enumerate(results) if r is None], dtype=np.intp)
 
-        critical_reasons = []
-        
-        # Test.py Logic:
-        # Critical Tachycardia (>180 BPM)
-        if hr > 180:
-            critical_reasons.append("Critical Tachycardia (>180 BPM)")
-        # Critical Bradycardia (<40 BPM)
-        elif hr < 40:
-            critical_reasons.append("Critical Bradycardia (<40 BPM)")
-            
-        # Severe Hypotension / Shock (<70 mmHg)
-        if systolic < 70:
-            critical_reasons.append("Severe Hypotension / Shock (<70 mmHg)")
-            
-        # Critical Hypoxia (<85%)
-        if o2 < 85:
-            critical_reasons.append("Critical Hypoxia (<85%)")
-            
-        # Unconscious / Coma (GCS <= 8)
-        if gcs <= 8:
-            critical_reasons.append("Unconscious / Coma (GCS <= 8)")
-
-        if critical_reasons:
-            return {
-                "risk_score": 0.99,
-                "risk_label": "HIGH",
-                "details": "⚠️ Critical vitals detected (SAFETY OVERRIDE): " + ". ".join(critical_reasons) + ".",
-            }
-
-        # --- Neural Network Prediction ---
-        df = pd.DataFrame([data])
-
-        # Rename Temperature -> Temp if model expects it (Logic from test.py)
-        # Rename Temperature -> Temp if model expects it (Logic from test.py)
-        if "Temperature" in df.columns:
-            df = df.rename(columns={"Temperature": "Temp"})
-
-        # Rename History fields to match model training data
-        rename_map = {
-            "Diabetes": "History_Diabetes", 
-            "Hypertension": "History_Hypertension", 
-            "Heart_Disease": "History_Heart_Disease"
-        }
-        df = df.rename(columns=rename_map)
-
-        # Add placeholder column if model was trained with it (Logic from test.py)
-        if "Unnamed: 0" not in df.columns:
-            df["Unnamed: 0"] = 0
-            
-        # Add BMI if missing (Default to average 25.0 since we don't have height/weight in input)
-        if "BMI" not in df.columns:
-            df["BMI"] = 25.0
-
-        # Ensure boolean columns are int (using new names)
-        for col in ["History_Diabetes", "History_Hypertension", "History_Heart_Disease"]:
-            if col in df.columns:
-                df[col] = df[col].astype(int)
-
-        # Scale features
-        # Ensure columns are in the correct order as expected by the preprocessor if necessary
-        # The preprocessor (ColumnTransformer) usually handles columns by name, but let's be safe.
-        
-        try:
-             X = self.preprocessor.transform(df)
-        except Exception as e:
-             # Debugging: Print columns if transform fails
-             print(f"[PARS] Columns in DF: {df.columns.tolist()}")
-             raise e
-
-        # Predict
-        prediction = self.model.predict(X, verbose=0)
-        risk_score = float(prediction[0][0]) if prediction.shape[-1] == 1 else float(np.max(prediction[0]))
-
-        # Classify
-        # Classify based on new thresholds from test.py
-        if risk_score >= 0.75:
-            risk_label = "HIGH"
-        elif risk_score >= 0.40:
-            risk_label = "MEDIUM"
-        else:
-            risk_label = "LOW"
-
-        # Generate explanation
-        details = []
-        if hr > 100:
-            details.append("Elevated heart rate")
-        if systolic < 90:
-            details.append("Low blood pressure")
-        if o2 < 94:
-            details.append("Low oxygen saturation")
-        gcs = data.get("GCS_Score", 15)
-        if gcs <= 12:
-            details.append("Reduced consciousness (GCS ≤ 12)")
-        temp = data.get("Temperature", 37)
-        if temp > 39:
-            details.append("Fever detected")
-        pain = data.get("Pain_Score", 0)
-        if pain >= 7:
-            details.append("Significant pain reported")
-        if not details:
-            details.append("Vitals within acceptable range")
-
-        return {
-            "risk_score": round(risk_score, 4),
-            "risk_label": risk_label,
-            "details": ". ".join(details) + ".",
-        }
+        if len(pending):
+            with MANAGER.use(self.managed_name):
+                self._load_resources_if_needed()
+                X = build(pending)
+                scores = self._cached_scores(X)
+            for i, scored in zip(pending, RULES.scored_results(vitals[pending], scores)):
+                results[i] = scored
+
+        return results
+
+    def _cached_scores(self, X: np.ndarray) -> list:
+        """
+        Scores for feature rows; only score-cache misses go through the network.
+        """
+        cache = self.score_cache
+        if not cache:
+            return [self._score_from_prediction(row) for row in self._infer(X)]
+
+        keys = [cache.key(row) for row in X]
+        scores = [cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            prediction = self._infer(X[missing])
+            for i, row in zip(missing, prediction):
+                scores[i] = self._score_from_prediction(row)
+                cache.put(keys[i], scores[i])
+        return scores
+
+    @staticmethod
+    def _score_from_prediction(row) -> float:
+        return float(row[0]) if row.shape[-1] == 1 else float(np.max(row))
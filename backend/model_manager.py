@@ -0,0 +1,274 @@
+"""
+PARS - Model Manager
+Central registry for the lazily loaded ML models (triage network, department
+encoder, Whisper). Tracks each model's resident size and last use, unloads idle
+models in LRU order to stay within a memory budget, and reloads them on demand.
+
+Environment:
+  - PARS_MODEL_MEMORY_BUDGET_MB   total resident budget for managed models (default: 0 = unlimited)
+  - PARS_MODEL_IDLE_SECONDS       unload models unused for this long (default: 0 = never)
+"""
+
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def release_freed_memory():
+    """
+    Collect garbage and ask glibc to return freed arenas to the OS
+    (with MALLOC_ARENA_MAX=2 freed model memory otherwise stays resident).
+    """
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class _Entry:
+    def __init__(self, name, loader, unloader, is_loaded):
+        self.name = name
+        self.loader = loader
+        self.unloader = unloader
+        self.is_loaded = is_loaded
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.size_bytes = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_seconds = None
+
+
+class ModelManager:
+    def __init__(self, budget_mb: float = 0, idle_seconds: float = 0, max_events: int = 200):
+        self.budget_bytes = int(budget_mb * 1e6)
+        self.idle_seconds = idle_seconds
+        # LRU order: least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.events = deque(maxlen=max_events)
+        self._reaper_pid = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            budget_mb=float(os.getenv("PARS_MODEL_MEMORY_BUDGET_MB", "0")),
+            idle_seconds=float(os.getenv("PARS_MODEL_IDLE_SECONDS", "0")),
+        )
+
+    # --------------------------------------------------------
+    # Registration
+    # --------------------------------------------------------
+
+    def register(self, name, loader, unloader, is_loaded):
+        """
+        Register a model. `loader()` must be idempotent, `unloader()` drops all references,
+        `is_loaded()` reports residency (models may also be loaded outside the manager).
+        Raises ValueError if `name` is already registered.
+        """
+        with self._lock:
+            if name in self._entries:
+                raise ValueError(f"Model {name!r} is already registered")
+            self._entries[name] = _Entry(name, loader, unloader, is_loaded)
+            self._entries.move_to_end(name, last=False)
+        self._ensure_reaper()
+
+    # --------------------------------------------------------
+    # Use / load
+    # --------------------------------------------------------
+
+    @contextmanager
+    def use(self, name):
+        """
+        Pin a model for the duration of a call, loading it if it was evicted.
+        Pinned models are never unloaded.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            yield
+            return
+
+        self._ensure_reaper()
+        with self._lock:
+            entry.in_use += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(name)
+        try:
+            if not entry.is_loaded():
+                self._load(entry)
+            yield
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+            self.enforce_budget()
+
+    def load(self, name):
+        """
+        Load a model ahead of use (startup warmup / pre-fork preload) so its size is tracked.
+        """
+        with self.use(name):
+            pass
+
+    def available(self, name) -> bool:
+        """
+        True if the model is resident or was evicted after a successful load (reloadable).
+        """
+        entry = self._entries.get(name)
+        return entry is not None and (entry.is_loaded() or entry.loads > 0)
+
+    def _load(self, entry):
+        with entry.lock:
+            if entry.is_loaded():
+                return
+            # Make room first using the size observed on the previous load
+            if entry.size_bytes:
+                self.enforce_budget(incoming_bytes=entry.size_bytes)
+
+            rss_before = current_rss_bytes()
+            started = time.perf_counter()
+            try:
+                entry.loader()
+            except Exception as e:
+                self._event("load_failed", entry, error=str(e))
+                raise
+            if not entry.is_loaded():
+                self._event("load_failed", entry)
+                return
+            entry.last_load_seconds = time.perf_counter() - started
+            # The first load also pays for importing the runtime (never freed), so later
+            # reloads give the better estimate of what evicting the model gives back
+            delta = current_rss_bytes() - rss_before
+            if delta > 0:
+                entry.size_bytes = delta
+            entry.loads += 1
+            self._event("load", entry, seconds=round(entry.last_load_seconds, 3))
+
+    # --------------------------------------------------------
+    # Eviction
+    # --------------------------------------------------------
+
+    def resident_bytes(self) -> int:
+        return sum(e.size_bytes for e in self._entries.values() if e.is_loaded())
+
+    def enforce_budget(self, incoming_bytes: int = 0):
+        """
+        Unload least recently used idle models until resident size (+ incoming) fits the budget.
+        """
+        if not self.budget_bytes:
+            return
+        with self._lock:
+            candidates = [e for e in self._entries.values()]  # LRU first
+        for entry in candidates:
+            if self.resident_bytes() + incoming_bytes <= self.budget_bytes:
+                return
+            self._evict(entry, reason="budget")
+
+    def evict_idle(self):
+        if not self.idle_seconds:
+            return
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            candidates = [e for e in self._entries.values() if e.last_used and e.last_used < cutoff]
+        for entry in candidates:
+            self._evict(entry, reason="idle")
+
+    def unload(self, name) -> bool:
+        entry = self._entries.get(name)
+        return bool(entry) and self._evict(entry, reason="manual")
+
+    def _evict(self, entry, reason) -> bool:
+        # Never block a request: skip models that are busy loading or pinned
+        if not entry.lock.acquire(blocking=False):
+            return False
+        try:
+            rss_before = current_rss_bytes()
+            # Hold the registry lock so no request can pin the model between the check and the unload
+            with self._lock:
+                if entry.in_use or not entry.is_loaded():
+                    return False
+                entry.unloader()
+            release_freed_memory()
+            entry.evictions += 1
+            freed = max(rss_before - current_rss_bytes(), 0)
+            self._event("evict", entry, reason=reason, freed_mb=round(freed / 1e6, 1))
+            return True
+        finally:
+            entry.lock.release()
+
+    def _ensure_reaper(self):
+        # Threads don't survive fork(), so pre-fork workers start their own reaper
+        if not self.idle_seconds or self._reaper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+        interval = max(1.0, min(self.idle_seconds / 2, 30.0))
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    log.error("Model reaper error: %s", e)
+
+        threading.Thread(target=reap, name="pars-model-reaper", daemon=True).start()
+
+    # --------------------------------------------------------
+    # Reporting
+    # --------------------------------------------------------
+
+    def _event(self, kind, entry, **extra):
+        event = {"time": time.time(), "event": kind, "model": entry.name,
+                 "size_mb": round(entry.size_bytes / 1e6, 1), **extra}
+        self.events.append(event)
+        details = ", ".join(f"{k}={v}" for k, v in extra.items())
+        log.info("Model %s: %s (%s MB%s)", kind, entry.name, event["size_mb"], ", " + details if details else "",
+                 extra={"model": entry.name, "event": kind})
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "budget_mb": round(self.budget_bytes / 1e6, 1) if self.budget_bytes else None,
+            "idle_seconds": self.idle_seconds or None,
+            "resident_mb": round(self.resident_bytes() / 1e6, 1),
+            "process_rss_mb": round(current_rss_bytes() / 1e6, 1),
+            "models": {
+                e.name: {
+                    "loaded": e.is_loaded(),
+                    "size_mb": round(e.size_bytes / 1e6, 1),
+                    "in_use": e.in_use,
+                    "idle_seconds": round(now - e.last_used, 1) if e.last_used else None,
+                    "loads": e.loads,
+                    "evictions": e.evictions,
+                    "last_load_seconds": e.last_load_seconds,
+                }
+                for e in reversed(entries)  # most recently used first
+            },
+            "events": list(self.events),
+        }
+
+
+MANAGER = ModelManager.from_env()
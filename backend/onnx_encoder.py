@@ -0,0 +1,226 @@
+"""
+PARS - ONNX Sentence Encoder
+Int8-quantized ONNX export of the department-routing SentenceTransformer
+(paraphrase-MiniLM-L6-v2), served through ONNX Runtime with a Rust "fast"
+tokenizer. Drop-in replacement for SentenceTransformer.encode() in dept_service,
+without loading PyTorch.
+
+Export once (needs sentence-transformers, torch, onnx, onnxruntime):
+  python onnx_encoder.py [--model paraphrase-MiniLM-L6-v2] [--output-dir minilm_onnx]
+
+The export measures the int8 model against the SentenceTransformer it came from
+on the router_cases.py complaints and the department descriptions (per-sentence
+cosine, and agreement of the top department by embedding similarity) and stores
+the result under "validation" in encoder_config.json. Exports without it are
+logged as unvalidated when served.
+
+Serve with PARS_DEPT_ENCODER=onnx (needs onnxruntime and tokenizers only). The
+default backend stays torch: the real export and its torch agreement have not
+been measured yet.
+"""
+
+import os
+import json
+import argparse
+
+import numpy as np
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+MODEL_FILE = "model_int8.onnx"
+FP32_MODEL_FILE = "model_fp32.onnx"
+CONFIG_FILE = "encoder_config.json"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxSentenceEncoder:
+    def __init__(self, model_dir: str, intra_op_threads: int = 1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.model_dir = os.path.join(base_dir, model_dir)
+
+        with open(os.path.join(self.model_dir, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.pooling = self.config.get("pooling", "mean")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config.get("max_seq_length", 128))
+        self.tokenizer.enable_padding(
+            pad_id=self.config.get("pad_token_id", 0),
+            pad_token=self.config.get("pad_token", "[PAD]"),
+        )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(self.model_dir, self.config.get("model_file", MODEL_FILE)),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        if "validation" not in self.config:
+            log.warning("ONNX encoder in %s has no recorded agreement with the torch model "
+                        "(re-export with onnx_encoder.py to measure it).", model_dir)
+
+    def encode(self, sentences, batch_size: int = 64, **kwargs) -> np.ndarray:
+        """
+        Same contract as SentenceTransformer.encode(..., convert_to_numpy=True):
+        a str returns a 1-D vector, a list returns an (n, dim) float32 matrix.
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        chunks = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(list(sentences[start:start + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            chunks.append(self._pool(token_embeddings, attention_mask))
+
+        embeddings = np.concatenate(chunks) if chunks else np.zeros((0, self.config.get("dim", 384)), np.float32)
+        return embeddings[0] if single else embeddings
+
+    def _pool(self, token_embeddings, attention_mask):
+        if self.pooling == "cls":
+            return token_embeddings[:, 0].astype(np.float32)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return (summed / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+
+# ============================================================
+# ------------------- EXPORT ---------------------------------
+# ============================================================
+
+def export(model_name, output_dir, opset=14):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    out_dir = os.path.join(base_dir, output_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    print(f"[PARS] Exporting {model_name} to ONNX...")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError(f"{model_name} has no fast tokenizer; cannot export tokenizer.json")
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, TOKENIZER_FILE))
+
+    pooling_module = st_model[1] if len(st_model) > 1 else None
+    pooling = "cls" if getattr(pooling_module, "pooling_mode_cls_token", False) else "mean"
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    dummy = tokenizer(["chest pain and difficulty breathing"], return_tensors="pt")
+    fp32_path = os.path.join(out_dir, FP32_MODEL_FILE)
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["token_embeddings"],
+            dynamic_axes={
+                "input_ids": dynamic, "attention_mask": dynamic,
+                "token_type_ids": dynamic, "token_embeddings": dynamic,
+            },
+            opset_version=opset,
+        )
+
+    print("[PARS] Applying dynamic int8 quantization...")
+    int8_path = os.path.join(out_dir, MODEL_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+
+    config = {
+        "source_model": model_name,
+        "model_file": MODEL_FILE,
+        "pooling": pooling,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    with open(os.path.join(out_dir, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+
+    print("[PARS] Measuring int8 agreement with the torch model...")
+    config["validation"] = validate(st_model, output_dir)
+    with open(os.path.join(out_dir, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    v = config["validation"]
+    print(f"[PARS] Cosine to torch embeddings: mean {v['cosine_mean']:.4f}, min {v['cosine_min']:.4f} "
+          f"({v['sentences']} sentences)")
+    print(f"[PARS] Top-department agreement: {v['argmax_agreement']:.1%} "
+          f"({v['argmax_disagreements']} of {v['complaints']} complaints differ)")
+
+    print(f"[PARS] Saved {out_dir} ({os.path.getsize(int8_path) / 1e6:.1f} MB int8 model)")
+    return out_dir
+
+
+def validate(st_model, model_dir) -> dict:
+    """
+    Agreement of the exported int8 encoder with the SentenceTransformer it was
+    exported from: per-sentence cosine over complaints and department
+    descriptions, and how often both pick the same most-similar department for
+    a complaint (the NLP half of the hybrid router).
+    """
+    from router_cases import ROUTER_CASES
+    from dept_service import DEPARTMENTS
+
+    complaints = [c for c, _ in ROUTER_CASES]
+    sentences = complaints + list(DEPARTMENTS)
+    reference = st_model.encode(sentences, convert_to_numpy=True)
+    quantized = OnnxSentenceEncoder(model_dir).encode(sentences)
+
+    def unit(x):
+        return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+    reference, quantized = unit(reference), unit(quantized)
+    cosine = (reference * quantized).sum(axis=1)
+    n = len(complaints)
+    top_reference = (reference[:n] @ reference[n:].T).argmax(axis=1)
+    top_quantized = (quantized[:n] @ quantized[n:].T).argmax(axis=1)
+    agree = top_reference == top_quantized
+    return {
+        "sentences": len(sentences),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        "complaints": n,
+        "argmax_agreement": round(float(agree.mean()), 5),
+        "argmax_disagreements": int((~agree).sum()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the department-routing encoder to quantized ONNX")
+    parser.add_argument("--model", default="paraphrase-MiniLM-L6-v2")
+    parser.add_argument("--output-dir", default="minilm_onnx")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export(args.model, args.output_dir, args.opset)
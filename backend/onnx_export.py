@@ -0,0 +1,103 @@
+"""
+PARS - ONNX Exporter
+Converts the preprocessor (preprocessor_nn.pkl) plus the Keras network
+(triage_model_nn.keras) into one ONNX graph for the ONNX Runtime backend.
+
+The graph takes the raw (unscaled) feature vector from FeatureSchema(scaled=False)
+and applies the StandardScaler as its first Sub/Div nodes, followed by the network.
+The compiled feature schema is embedded in the model metadata, so serving needs
+neither scikit-learn nor TensorFlow.
+
+Export-time dependencies (not needed for serving): tensorflow, tf2onnx, onnx
+
+Usage:
+  python onnx_export.py [--model triage_model_nn.keras] [--preprocessor preprocessor_nn.pkl]
+                        [--output triage_model.onnx] [--opset 13]
+"""
+
+import os
+import json
+import argparse
+
+import numpy as np
+
+from feature_schema import FeatureSchema
+
+SCHEMA_METADATA_KEY = "pars_feature_schema"
+RAW_INPUT_NAME = "pars_raw_features"
+SCALED_NAME = "pars_scaled_features"
+
+
+def build_scaler_graph(schema: FeatureSchema, opset_imports, ir_version):
+    """
+    ONNX graph: raw features -> (x - mean) / scale on the numeric slice, one-hot columns unchanged.
+    """
+    from onnx import helper, numpy_helper, TensorProto
+
+    n = schema.n_features
+    mean = np.zeros(n, dtype=np.float32)
+    scale = np.ones(n, dtype=np.float32)
+    mean[:schema.n_numeric] = schema.mean
+    scale[:schema.n_numeric] = schema.scale
+
+    graph = helper.make_graph(
+        nodes=[
+            helper.make_node("Sub", [RAW_INPUT_NAME, "pars_mean"], ["pars_centered"]),
+            helper.make_node("Div", ["pars_centered", "pars_scale"], [SCALED_NAME]),
+        ],
+        name="pars_preprocessor",
+        inputs=[helper.make_tensor_value_info(RAW_INPUT_NAME, TensorProto.FLOAT, ["N", n])],
+        outputs=[helper.make_tensor_value_info(SCALED_NAME, TensorProto.FLOAT, ["N", n])],
+        initializer=[
+            numpy_helper.from_array(mean, "pars_mean"),
+            numpy_helper.from_array(scale, "pars_scale"),
+        ],
+    )
+    return helper.make_model(graph, opset_imports=opset_imports, ir_version=ir_version)
+
+
+def export(model_path, preprocessor_path, output_path, opset=13):
+    import joblib
+    import onnx
+    import tensorflow as tf
+    import tf2onnx
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    preprocessor = joblib.load(os.path.join(base_dir, preprocessor_path))
+    schema = FeatureSchema.from_preprocessor(preprocessor)
+
+    print(f"[PARS] Converting {model_path} to ONNX (opset {opset})...")
+    keras_model = tf.keras.models.load_model(os.path.join(base_dir, model_path), compile=False)
+    spec = (tf.TensorSpec((None, schema.n_features), tf.float32, name="features"),)
+
+    # Convert a traced function rather than from_keras(), which breaks on Keras 3 models
+    @tf.function(input_signature=spec)
+    def serve(features):
+        return keras_model(features, training=False)
+
+    nn_model, _ = tf2onnx.convert.from_function(serve, input_signature=spec, opset=opset)
+
+    scaler = build_scaler_graph(schema, nn_model.opset_import, nn_model.ir_version)
+    nn_input = nn_model.graph.input[0].name
+    merged = onnx.compose.merge_models(scaler, nn_model, io_map=[(SCALED_NAME, nn_input)])
+
+    onnx.helper.set_model_props(merged, {
+        SCHEMA_METADATA_KEY: json.dumps(schema.to_dict()),
+        "pars_source_model": os.path.basename(model_path),
+    })
+    onnx.checker.check_model(merged)
+
+    output_full_path = os.path.join(base_dir, output_path)
+    onnx.save(merged, output_full_path)
+    print(f"[PARS] Saved {output_full_path} ({os.path.getsize(output_full_path) / 1024:.1f} KB)")
+    return output_full_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the PARS triage model to ONNX")
+    parser.add_argument("--model", default="triage_model_nn.keras")
+    parser.add_argument("--preprocessor", default="preprocessor_nn.pkl")
+    parser.add_argument("--output", default="triage_model.onnx")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+    export(args.model, args.preprocessor, args.output, args.opset)
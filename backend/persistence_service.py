@@ -0,0 +1,514 @@
+"""
+PARS - Persistence Service
+Write-behind persistence of triage results and department assignments.
+
+/predict hands each result to `record()`, which appends it to a local SQLite
+journal (WAL mode) and returns; the request never waits on the remote store.
+A background flusher drains the journal in batches and writes them to the store
+as bulk upserts (one call per table), flushing when `max_batch` rows are pending
+or every `flush_interval` seconds. Rows stay in the journal until the store
+accepts them, so a slow or unreachable store (or a restart) loses nothing;
+flushes that fail on connectivity are retried with exponential backoff.
+
+A batch the store rejects for its content (FK or RLS violation, bad value) is
+split in halves until the offending rows are isolated; the rest of the batch is
+written. A rejected row is retried on later flushes up to `max_attempts` times,
+then moved to the `dead_letter` table of the journal with the store's error, so
+one bad row never blocks the rows behind it. Child rows are only journaled
+together with their parent (see PARENTS).
+
+Environment:
+  - PARS_PERSIST                    enable write-behind persistence (default: 0); on
+                                    Supabase it needs SUPABASE_SERVICE_ROLE_KEY (see data_store.py)
+  - PARS_PERSIST_JOURNAL            journal path (default: persist_journal.db)
+  - PARS_PERSIST_BATCH              rows per bulk upsert (default: 200)
+  - PARS_PERSIST_FLUSH_SECONDS      max delay before pending rows are flushed (default: 1.0)
+  - PARS_PERSIST_MAX_ATTEMPTS       attempts before a rejected row is dead-lettered (default: 3)
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import threading
+
+import orjson
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+# Rows are flushed parent-first so foreign keys resolve (patient_assignments -> patients)
+TABLE_ORDER = ("patients", "patient_assignments")
+
+# child table -> (parent table, column holding the parent id); a child row is
+# only journaled when its parent row is recorded with it
+PARENTS = {"patient_assignments": ("patients", "patient_id")}
+
+# Deterministic ids: re-triaging the same patient upserts the same rows
+_ID_NAMESPACE = uuid.UUID("6f1c3a52-4b8e-4a53-9a0e-5c7d2b8e9f10")
+
+
+def row_id(*parts) -> str:
+    """
+    Stable UUID for a row; ids that already are UUIDs are kept as-is.
+    """
+    if len(parts) == 1:
+        try:
+            return str(uuid.UUID(str(parts[0])))
+        except ValueError:
+            pass
+    return str(uuid.uuid5(_ID_NAMESPACE, "|".join(str(p) for p in parts)))
+
+
+# ============================================================
+# ------------------- ROW BUILDERS ---------------------------
+# ============================================================
+
+def patient_row(patient, result: dict, referral: dict) -> dict:
+    """
+    Map a PatientInput + triage result to a `patients` row (see supabase/migrations).
+    """
+    row = {
+        "id": row_id(patient.Patient_ID),
+        "name": patient.Patient_Name or "Unknown",
+        "age": patient.Age,
+        "gender": patient.Gender,
+        "heart_rate": patient.Heart_Rate,
+        "systolic_bp": patient.Systolic_BP,
+        "diastolic_bp": patient.Diastolic_BP,
+        "o2_saturation": patient.O2_Saturation,
+        "temperature": patient.Temperature,
+        "respiratory_rate": patient.Respiratory_Rate,
+        "pain_score": patient.Pain_Score,
+        "gcs_score": patient.GCS_Score,
+        "arrival_mode": patient.Arrival_Mode,
+        "diabetes": patient.Diabetes,
+        "hypertension": patient.Hypertension,
+        "heart_disease": patient.Heart_Disease,
+        "risk_score": result["risk_score"],
+        "risk_label": result["risk_label"],
+        "explanation": result["details"],
+        "department": referral.get("department"),
+        "chief_complaint": patient.Chief_Complaint,
+    }
+    if patient.User_ID:
+        row["user_id"] = patient.User_ID
+    return row
+
+
+def assignment_row(patient, referral: dict, assigned_doctor: dict = None) -> dict:
+    department = referral.get("department") or "General_Medicine"
+    if assigned_doctor is None:
+        doctors = [d for d in referral.get("doctors", []) if d.get("available")]
+        assigned_doctor = doctors[0] if doctors else None
+    return {
+        "id": row_id(patient.Patient_ID, department),
+        "patient_id": row_id(patient.Patient_ID),
+        "patient_name": patient.Patient_Name or "Unknown",
+        "department": department,
+        "doctor_name": assigned_doctor["name"] if assigned_doctor else "Assigned via Triage",
+    }
+
+
+# ============================================================
+# ------------------- STORES ---------------------------------
+# ============================================================
+
+class MemoryStore:
+    """
+    Local stand-in for the remote store (tests, offline development).
+    `latency` simulates a slow store; `fail_next` makes the next N calls raise
+    a connection error; `reject(table, row)` returning True fails the whole
+    call with a data error, like a constraint violation.
+    """
+
+    def __init__(self, latency=0.0, reject=None):
+        self.tables = {}
+        self.calls = 0
+        self.latency = latency
+        self.fail_next = 0
+        self.reject = reject
+
+    def upsert(self, table: str, rows: list):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_next:
+            self.fail_next -= 1
+            raise ConnectionError("simulated store outage")
+        if self.reject:
+            for row in rows:
+                if self.reject(table, row):
+                    raise ValueError(f"{table} row {row['id']} rejected")
+        target = self.tables.setdefault(table, {})
+        for row in rows:
+            target[row["id"]] = row
+
+
+# HTTP statuses that say "try again later" rather than "this row is wrong":
+# auth expiry (the client refreshes its token), timeouts, rate limits, 5xx.
+TRANSIENT_STATUS = {401, 408, 429}
+
+# SQLSTATE classes for the same on the database side: connection exceptions,
+# transaction rollback (serialization/deadlock), insufficient resources,
+# operator intervention (statement timeout, shutdown).
+TRANSIENT_SQLSTATE = ("08", "40", "53", "57")
+
+# postgrest's message when the error body was not JSON (an HTML page from a
+# gateway or load balancer); the HTTP status is then in `code`.
+NON_JSON_ERROR = "JSON could not be generated"
+
+
+def _status(error):
+    """
+    HTTP status of a store error, if it carries one: postgrest's APIError puts
+    it in `code` for non-JSON bodies, httpx errors on `response.status_code`.
+    """
+    for value in (getattr(error, "status_code", None), getattr(error, "code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        try:
+            status = int(value)
+        except (TypeError, ValueError):
+            continue
+        if 100 <= status < 600:
+            return status
+    return None
+
+
+def _transient(error) -> bool:
+    """
+    Connectivity and server-side failures (retried as a whole batch) vs. rows
+    the store rejects.
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(error, "message", None) == NON_JSON_ERROR:
+        return True
+    status = _status(error)
+    if status is not None:
+        return status >= 500 or status in TRANSIENT_STATUS
+    code = getattr(error, "code", None)
+    if isinstance(code, str) and code.startswith(TRANSIENT_SQLSTATE):
+        return True
+    if code == "PGRST301":  # JWT expired
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+# ============================================================
+# ------------------- WRITE-BEHIND BUFFER --------------------
+# ============================================================
+
+class PersistenceService:
+    def __init__(self, store, journal_path=":memory:", max_batch=200, flush_interval=1.0,
+                 max_backoff=30.0, max_attempts=3):
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+
+        self._db = sqlite3.connect(journal_path, check_same_thread=False, isolation_level=None)
+        if journal_path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL survives process crashes; only an OS crash can drop the last commits
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " table_name TEXT NOT NULL,"
+            " row_id TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " created REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "attempts" not in {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}:
+            # Journals written before rejected rows were tracked
+            self._db.execute("ALTER TABLE outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            " seq INTEGER PRIMARY KEY,"
+            " table_name TEXT NOT NULL,"
+            " row_id TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " created REAL NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " error TEXT,"
+            " failed_at REAL NOT NULL)"
+        )
+        self._db_lock = threading.Lock()
+        self._pending = self._count()
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.dead_lettered = 0
+        self.orphans_skipped = 0
+        self.last_error = None
+        self.last_flush_seconds = None
+        self._backoff = 0.0
+
+    @classmethod
+    def from_env(cls, store):
+        path = os.getenv("PARS_PERSIST_JOURNAL", "persist_journal.db")
+        if path != ":memory:" and not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        return cls(
+            store,
+            journal_path=path,
+            max_batch=int(os.getenv("PARS_PERSIST_BATCH", "200")),
+            flush_interval=float(os.getenv("PARS_PERSIST_FLUSH_SECONDS", "1.0")),
+            max_attempts=int(os.getenv("PARS_PERSIST_MAX_ATTEMPTS", "3")),
+        )
+
+    def _count(self) -> int:
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    # --------------------------------------------------------
+    # Request path
+    # --------------------------------------------------------
+
+    def record(self, table: str, row: dict):
+        self.record_many([(table, row)])
+
+    def record_many(self, items):
+        """
+        Journal rows for write-behind; returns as soon as they are durable locally.
+        `items` is an iterable of (table, row) with row["id"] set. Child rows
+        (PARENTS) without their parent row in `items` are skipped: the store
+        would reject them on the foreign key forever.
+        """
+        items = list(items)
+        recorded = {(table, row["id"]) for table, row in items}
+        kept = []
+        for table, row in items:
+            parent = PARENTS.get(table)
+            if parent and (parent[0], row.get(parent[1])) not in recorded:
+                self.orphans_skipped += 1
+                continue
+            kept.append((table, row))
+        if not kept:
+            return
+        now = time.time()
+        params = [(table, row["id"], orjson.dumps(row), now) for table, row in kept]
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT INTO outbox (table_name, row_id, payload, created) VALUES (?, ?, ?, ?)", params
+            )
+            self._pending += len(params)
+            pending = self._pending
+        self.recorded += len(params)
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    # --------------------------------------------------------
+    # Flushing
+    # --------------------------------------------------------
+
+    def flush(self) -> int:
+        """
+        Write one batch of journaled rows to the store. Returns rows taken out
+        of the journal (written or dead-lettered). Connectivity errors propagate
+        with the batch kept for retry; rows the store rejects are isolated.
+        """
+        with self._flush_lock:
+            with self._db_lock:
+                batch = self._db.execute(
+                    "SELECT seq, table_name, row_id, payload, attempts FROM outbox ORDER BY seq LIMIT ?",
+                    (self.max_batch,),
+                ).fetchall()
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            written, rejected = [], []
+            try:
+                self._write_isolating(batch, written, rejected)
+            finally:
+                # Only drop rows from the journal once the store has accepted them
+                dead = self._settle(written, rejected)
+            self.last_flush_seconds = time.perf_counter() - started
+            self.flushed += len(written)
+            self.flushes += 1
+            return len(written) + dead
+
+    def _write(self, rows):
+        # Coalesce: a row re-triaged several times in the window is written once (latest wins)
+        by_table = {}
+        for _, table, rid, payload, _ in rows:
+            by_table.setdefault(table, {})[rid] = orjson.loads(payload)
+        ordered = sorted(by_table, key=lambda t: TABLE_ORDER.index(t) if t in TABLE_ORDER else len(TABLE_ORDER))
+        for table in ordered:
+            self.store.upsert(table, list(by_table[table].values()))
+
+    def _write_isolating(self, rows, written, rejected):
+        """
+        Write `rows`; if the store rejects them, bisect (in journal order, so
+        parents still precede their children) down to the offending rows.
+        """
+        try:
+            self._write(rows)
+        except Exception as e:
+            if _transient(e):
+                raise
+            if len(rows) == 1:
+                rejected.append((rows[0], str(e)))
+                return
+            middle = len(rows) // 2
+            self._write_isolating(rows[:middle], written, rejected)
+            self._write_isolating(rows[middle:], written, rejected)
+            return
+        written.extend(rows)
+
+    def _settle(self, written, rejected) -> int:
+        """
+        Removes written rows from the journal, counts an attempt on rejected
+        ones and moves those out of attempts to the dead-letter table.
+        Returns the number dead-lettered.
+        """
+        now = time.time()
+        dead = [(row, error) for row, error in rejected if row[4] + 1 >= self.max_attempts]
+        retry = [row for row, error in rejected if row[4] + 1 < self.max_attempts]
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM outbox WHERE seq = ?", [(row[0],) for row in written])
+            self._db.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE seq = ?", [(row[0],) for row in retry])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO dead_letter (seq, table_name, row_id, payload, created, attempts, error, failed_at)"
+                " SELECT seq, table_name, row_id, payload, created, attempts + 1, ?, ? FROM outbox WHERE seq = ?",
+                [(error, now, row[0]) for row, error in dead],
+            )
+            self._db.executemany("DELETE FROM outbox WHERE seq = ?", [(row[0],) for row, _ in dead])
+            self._db.execute("COMMIT")
+            self._pending = max(0, self._pending - len(written) - len(dead))
+        if rejected:
+            self.rejected += len(rejected)
+            self.last_error = rejected[-1][1]
+        for (_, table, rid, _, attempts), error in dead:
+            self.dead_lettered += 1
+            log.error("Persistence: %s row %s dead-lettered after %d attempts: %s", table, rid, attempts + 1, error)
+        return len(dead)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._backoff or self.flush_interval)
+            self._wake.clear()
+            try:
+                # Drain full batches back to back, then wait for the next threshold
+                while self.flush() and self._pending >= self.max_batch and not self._stop.is_set():
+                    pass
+                self._backoff = 0.0
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                self._backoff = min(self.max_backoff, max(self.flush_interval, self._backoff * 2))
+                log.warning("Persistence flush failed (%d rows pending, retrying in %.1fs): %s",
+                            self.pending(), self._backoff, e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pars-persistence", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the flusher after a final best-effort drain; anything left stays journaled.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        deadline = time.time() + timeout
+        try:
+            while self.pending() and time.time() < deadline and self.flush():
+                pass
+        except Exception as e:
+            log.error("Final persistence flush failed, %d rows kept in journal: %s", self.pending(), e)
+
+    # --------------------------------------------------------
+    # Reporting
+    # --------------------------------------------------------
+
+    def pending(self) -> int:
+        return self._pending
+
+    def dead_letters(self, limit=100) -> list:
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT seq, table_name, row_id, attempts, error, failed_at FROM dead_letter ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+        keys = ("seq", "table", "row_id", "attempts", "error", "failed_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def requeue_dead_letters(self) -> int:
+        """
+        Move dead-lettered rows back to the journal (after fixing the cause).
+        """
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            moved = self._db.execute(
+                "INSERT INTO outbox (seq, table_name, row_id, payload, created, attempts)"
+                " SELECT seq, table_name, row_id, payload, created, 0 FROM dead_letter"
+            ).rowcount
+            self._db.execute("DELETE FROM dead_letter")
+            self._db.execute("COMMIT")
+            self._pending += moved
+        self._wake.set()
+        return moved
+
+    def stats(self) -> dict:
+        with self._db_lock:
+            oldest = self._db.execute("SELECT MIN(created) FROM outbox").fetchone()[0]
+            dead_letters = self._db.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return {
+            "pending": self._pending,
+            "dead_letters": dead_letters,
+            "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else None,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "dead_lettered": self.dead_lettered,
+            "orphans_skipped": self.orphans_skipped,
+            "last_error": self.last_error,
+            "last_flush_seconds": self.last_flush_seconds,
+            "batch_size": self.max_batch,
+            "flush_interval": self.flush_interval,
+        }
+
+
+def create_persistence_service():
+    """
+    Build the write-behind service from env (None unless PARS_PERSIST=1).
+    Rows go to the configured data store (PARS_DATA_STORE); on Supabase with
+    the service-role key (see data_store.get_write_store).
+    """
+    if os.getenv("PARS_PERSIST", "0") != "1":
+        return None
+
+    from data_store import get_write_store
+    store = get_write_store()
+    if store is None:
+        log.warning("Persistence disabled: no writable data store "
+                    "(Supabase needs SUPABASE_SERVICE_ROLE_KEY; the publishable key fails the patients RLS policy).")
+        return None
+
+    service = PersistenceService.from_env(store)
+    log.info("Write-behind persistence enabled to %s (%d journaled rows pending).", store.name, service.pending())
+    return service
@@ -0,0 +1,254 @@
+"""
+PARS - Pre-fork Server
+Loads the triage model, the department-routing encoder and (optionally) Whisper
+once in a parent process, then forks N uvicorn workers that share the read-only
+weights copy-on-write and accept on one listening socket.
+
+Usage:
+  python prefork_server.py [--workers 1] [--host 0.0.0.0] [--port 8000] [--preload triage,nlp,whisper]
+
+Environment (used when flags are omitted):
+  - PARS_WORKERS   number of workers (default: 1)
+  - PORT           listen port (default: 8000)
+  - PARS_PRELOAD   comma-separated models to load in the parent (default: triage,nlp)
+
+Notes:
+  - TensorFlow is not fork-safe once its runtime has started (children deadlock
+    on the inherited thread pools), so the Keras triage backend is never preloaded;
+    each worker loads its own copy. Use PARS_TRIAGE_BACKEND=onnx to share it.
+  - Torch intra-op threads are pinned to 1 in the parent before loading so no
+    OpenMP pool is inherited across fork().
+  - Send SIGUSR1 to the parent to log per-worker memory.
+  - The live queue, doctor assignment counts, vitals buffers and the persistence
+    journal are per-process state: with several workers each would hold its own
+    queue and load counters while all of them snapshot to the same queue file and
+    flush the same journal. More than one worker is refused while any of them is
+    enabled (the queue and assignment engine always are); --allow-split-state
+    overrides this for load benchmarks of /predict only.
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+from log_config import get_logger, flush_logging
+
+log = get_logger(__name__)
+
+
+# ============================================================
+# ------------------- MEMORY REPORTING -----------------------
+# ============================================================
+
+def read_smaps_rollup(pid) -> dict:
+    """
+    Returns memory counters in MB for a process:
+      rss, pss (proportional share), shared and private (= incremental cost of the process).
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def memory_report(parent_pid, worker_pids):
+    """
+    Log a memory table (RSS / PSS / shared / private MB) for the parent and each
+    worker; sent on SIGUSR1. Each row also carries the numbers as structured fields.
+    """
+    log.info("%-18s %10s %10s %12s %13s", "process", "RSS (MB)", "PSS (MB)", "shared (MB)", "private (MB)")
+    total_pss = 0.0
+    for name, pid in [("parent", parent_pid)] + [(f"worker {i} ({pid})", pid) for i, pid in enumerate(worker_pids)]:
+        m = read_smaps_rollup(pid)
+        total_pss += m.get("pss", 0.0)
+        log.info("%-18s %10.1f %10.1f %12.1f %13.1f", name, m.get("rss", 0), m.get("pss", 0),
+                 m.get("shared", 0), m.get("private", 0),
+                 extra={"pid": pid, **{f"{k}_mb": round(v, 1) for k, v in m.items()}})
+    log.info("Total PSS (actual memory used): %.1f MB", total_pss, extra={"total_pss_mb": round(total_pss, 1)})
+
+
+# ============================================================
+# ------------------- PRELOAD --------------------------------
+# ============================================================
+
+def _pin_torch_threads():
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+# SDKs that the app imports lazily on first request; importing them in the
+# parent shares their module pages instead of paying for them in every worker.
+SHARED_IMPORTS = ["supabase", "pypdf"]
+
+
+def preload(components):
+    """
+    Import the app and load the requested models in the parent process.
+    """
+    import importlib
+    import main
+    import dept_service
+
+    for name in SHARED_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    if "triage" in components and main.model is not None:
+        if main.model.backend == "keras":
+            log.warning("Skipping triage preload: TensorFlow is not fork-safe "
+                        "(set PARS_TRIAGE_BACKEND=onnx to share it across workers).")
+        else:
+            main.MANAGER.load(main.model.managed_name)
+
+    if "nlp" in components:
+        if dept_service.ENCODER_BACKEND == "torch":
+            _pin_torch_threads()
+        main.MANAGER.load("dept_encoder")
+
+    if "whisper" in components and main.audio_service is not None:
+        _pin_torch_threads()
+        main.MANAGER.load("whisper")
+
+    # Move everything allocated so far out of the GC's reach, so collections in
+    # the workers don't write to (and un-share) the inherited pages.
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def per_process_state():
+    """
+    Enabled subsystems whose state lives in the worker process (see Notes).
+    """
+    import main
+
+    state = []
+    if main.triage_queue is not None:
+        state.append("queue")
+    if main.assignment_engine is not None:
+        state.append("assignment")
+    if main.vitals_stream is not None:
+        state.append("vitals")
+    # Created in the worker's startup hook, so only the setting is known here
+    if os.getenv("PARS_PERSIST", "0") == "1":
+        state.append("persistence")
+    return state
+
+
+# ============================================================
+# ------------------- WORKERS --------------------------------
+# ============================================================
+
+def run_worker(app, sock, index):
+    import uvicorn
+
+    # Drop the supervisor's handlers inherited across fork(); uvicorn installs its own
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level="info", lifespan="on")
+    server = uvicorn.Server(config)
+    log.info("Worker %d started (pid %d)", index, os.getpid())
+    server.run(sockets=[sock])
+    # os._exit skips atexit, so write out queued log records first
+    flush_logging()
+    os._exit(0)
+
+
+def serve(host, port, workers, components, allow_split_state=False):
+    started = time.perf_counter()
+    app = preload(components)
+    log.info("Parent preloaded %s in %.1fs", sorted(components) or "nothing", time.perf_counter() - started)
+
+    state = per_process_state()
+    if workers > 1 and state:
+        if not allow_split_state:
+            flush_logging()
+            raise SystemExit(f"Refusing to start {workers} workers: {', '.join(state)} state is per-process "
+                             "and would diverge between workers. Run a single worker.")
+        log.warning("Running %d workers with per-process %s state (--allow-split-state); "
+                    "queue and assignment views will differ between workers.", workers, ", ".join(state))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    log.info("Listening on http://%s:%d with %d worker(s)", host, port, workers)
+
+    children = {}  # pid -> worker index
+    shutting_down = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(app, sock, index)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, lambda s, f: memory_report(os.getpid(), list(children)))
+
+    for i in range(workers):
+        spawn(i)
+
+    # Supervise: restart workers that die unexpectedly
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not shutting_down:
+            log.warning("Worker %d (pid %d) exited with status %d; restarting", index, pid, status)
+            spawn(index)
+
+    sock.close()
+    log.info("All workers stopped.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PARS pre-fork server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PARS_WORKERS", "1")))
+    parser.add_argument("--preload", default=os.getenv("PARS_PRELOAD", "triage,nlp"))
+    parser.add_argument("--allow-split-state", action="store_true",
+                        help="allow several workers despite per-process state (benchmarks only)")
+    args = parser.parse_args()
+
+    components = {c.strip() for c in args.preload.split(",") if c.strip()}
+    serve(args.host, args.port, max(1, args.workers), components, args.allow_split_state)
@@ -0,0 +1,465 @@
+"""
+PARS - Profiler Service
+Admin-gated profiling for production latency investigations.
+
+Two tools, both off the request path until an admin asks for them:
+
+  - StackSampler: a background thread that snapshots every thread's Python
+    stack (sys._current_frames) at a fixed rate for a time window and counts
+    identical stacks. The result is a collapsed-stack profile
+    ("thread;file:func;file:func <count>" per line) that flamegraph.pl,
+    speedscope and similar tools read directly. Sampling costs a few tens of
+    microseconds per tick and nothing between windows.
+
+  - Per-request profiling: a request carrying "X-PARS-Profile: 1" and a valid
+    admin token runs the profiled() sections it reaches (TriageModel.predict,
+    get_department, get_referral) under cProfile. Its section wall times and
+    hottest functions are stored, and the response carries X-PARS-Profile-Id
+    to fetch them. Requests without the header pay one ContextVar lookup per
+    section.
+
+Finished profiles of both kinds are kept in one bounded in-memory ring.
+
+Environment:
+  - PARS_ADMIN_TOKEN            enables profiling; required on admin requests as
+                                "X-PARS-Admin-Token: <token>" or "Authorization: Bearer <token>"
+  - PARS_PROFILE_RING           profiles kept in memory (default: 32)
+  - PARS_PROFILE_HZ             default sampling rate (default: 100)
+  - PARS_PROFILE_MAX_SECONDS    longest sampling window allowed (default: 300)
+"""
+
+import os
+import sys
+import time
+import hmac
+import pstats
+import cProfile
+import itertools
+import threading
+import contextvars
+from collections import deque, Counter
+from contextlib import contextmanager
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+PROFILE_HEADER = b"x-pars-profile"
+PROFILE_ID_HEADER = b"x-pars-profile-id"
+TOKEN_HEADER = b"x-pars-admin-token"
+
+# Leaf frames of threads that are parked, not working; dropped unless idle=True
+IDLE_LEAVES = frozenset({
+    "threading.py:Condition.wait",
+    "threading.py:Event.wait",
+    "threading.py:Thread._wait_for_tstate_lock",
+    "queue.py:Queue.get",
+    "selectors.py:EpollSelector.select",
+    "selectors.py:KqueueSelector.select",
+    "selectors.py:PollSelector.select",
+    "selectors.py:SelectSelector.select",
+    "thread.py:_worker",
+})
+# Distinct stacks kept per sampling window; the rest are counted as "[truncated]"
+MAX_STACKS = 50_000
+
+# Active per-request profile (set by ProfileMiddleware for opted-in requests)
+REQUEST_PROFILE = contextvars.ContextVar("pars_request_profile", default=None)
+
+
+def _label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_qualname}"
+
+
+# ============================================================
+# ------------------- STACK SAMPLER --------------------------
+# ============================================================
+
+class StackSampler:
+    """
+    One sampling window. start() launches the sampler thread, which stops by
+    itself after `seconds` (or on stop()); collapsed() renders the counts.
+    """
+
+    def __init__(self, seconds, hz=100, idle=False, on_finish=None):
+        self.seconds = seconds
+        self.interval = 1.0 / hz
+        self.hz = hz
+        self.idle = idle
+        self.on_finish = on_finish
+
+        self.stacks = Counter()
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.started = None
+        self.finished = None
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._run, name="pars-stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait and self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        deadline = time.perf_counter() + self.seconds
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            self._sample(own, names)
+            self.sampling_time += time.perf_counter() - now
+            # Fixed schedule: a slow tick does not shift the later ones
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.perf_counter()
+        self.finished = time.time()
+        if self.on_finish:
+            self.on_finish(self)
+
+    def _sample(self, own, names):
+        labels = self._labels
+        frames = sys._current_frames()
+        if len(names) != len(frames):
+            names.clear()
+            names.update((t.ident, t.name) for t in threading.enumerate())
+        for ident, frame in frames.items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if not stack or (not self.idle and stack[0] in IDLE_LEAVES):
+                continue
+            stack.append(names.get(ident, f"thread-{ident}"))
+            key = tuple(reversed(stack))
+            if key in self.stacks or len(self.stacks) < MAX_STACKS:
+                self.stacks[key] += 1
+            else:
+                self.stacks[("[truncated]",)] += 1
+        self.samples += 1
+
+    def _snapshot(self):
+        # dict() copies in one step, safe while the sampler thread is counting
+        return dict(self.stacks)
+
+    def collapsed(self):
+        """
+        Collapsed-stack text: one "frame;frame;frame count" line per stack.
+        """
+        return "\n".join(
+            f"{';'.join(stack)} {count}" for stack, count in Counter(self._snapshot()).most_common()
+        ) + "\n"
+
+    def top_functions(self, limit=20):
+        """
+        Self time (leaf) and total time (anywhere on stack) as sample counts.
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self._snapshot().items():
+            own[stack[-1]] += count
+            for frame in set(stack[1:]):
+                total[frame] += count
+        return [
+            {"function": name, "self_samples": own[name], "total_samples": total[name]}
+            for name, _ in own.most_common(limit)
+        ]
+
+    def summary(self):
+        wall = (self.finished or time.time()) - self.started
+        return {
+            "kind": "sampler",
+            "started": self.started,
+            "finished": self.finished,
+            "running": self.running,
+            "hz": self.hz,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "overhead_pct": round(100 * self.sampling_time / wall, 3) if wall > 0 else 0.0,
+        }
+
+
+# ============================================================
+# ------------------- PER-REQUEST PROFILE --------------------
+# ============================================================
+
+class RequestProfile:
+    """
+    cProfile data for one opted-in request. Nested sections share one
+    profiler, enabled by the outermost section on the handler's thread.
+    """
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.duration_ms = None
+        self.status = None
+        self.sections = []
+        self.error = None
+        self._profiler = cProfile.Profile()
+        self._depth = 0
+
+    @contextmanager
+    def section(self, name):
+        outer = self._depth == 0
+        if outer:
+            try:
+                self._profiler.enable()
+            except ValueError as e:
+                # Another profiling tool already owns this interpreter/thread
+                self.error = str(e)
+                outer = False
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append({"name": name, "ms": round((time.perf_counter() - started) * 1e3, 3),
+                                  "depth": self._depth - 1})
+            self._depth -= 1
+            if outer:
+                self._profiler.disable()
+
+    def top_functions(self, limit=30):
+        try:
+            stats = pstats.Stats(self._profiler)
+        except TypeError:
+            # Nothing was profiled (no section reached)
+            return []
+        rows = []
+        for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+                "calls": nc,
+                "self_ms": round(tt * 1e3, 3),
+                "total_ms": round(ct * 1e3, 3),
+            })
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows[:limit]
+
+    def summary(self):
+        return {
+            "kind": "request",
+            "started": self.started,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "sections": self.sections,
+        }
+
+
+@contextmanager
+def profiled(name):
+    """
+    Marks a hot call for per-request profiling; a no-op unless the current
+    request opted in.
+    """
+    profile = REQUEST_PROFILE.get()
+    if profile is None:
+        yield
+        return
+    with profile.section(name):
+        yield
+
+
+# ============================================================
+# ------------------- PROFILER (RING + ADMIN) ----------------
+# ============================================================
+
+class Profiler:
+    def __init__(self, admin_token, ring_size=32, hz=100, max_seconds=300):
+        self.admin_token = admin_token
+        self.hz = hz
+        self.max_seconds = max_seconds
+
+        self._lock = threading.Lock()
+        self._ring = deque(maxlen=ring_size)
+        self._ids = itertools.count(1)
+        self.sampler = None
+        self.sampler_id = None
+        self.counters = {"sampler_windows": 0, "request_profiles": 0, "denied": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            admin_token=os.getenv("PARS_ADMIN_TOKEN", ""),
+            ring_size=int(os.getenv("PARS_PROFILE_RING", "32")),
+            hz=float(os.getenv("PARS_PROFILE_HZ", "100")),
+            max_seconds=float(os.getenv("PARS_PROFILE_MAX_SECONDS", "300")),
+        )
+
+    def authorized(self, token):
+        if token and self.admin_token and hmac.compare_digest(str(token), self.admin_token):
+            return True
+        with self._lock:
+            self.counters["denied"] += 1
+        return False
+
+    # ------------------------------------------------------------
+    # Ring
+    # ------------------------------------------------------------
+
+    def _store(self, entry):
+        with self._lock:
+            profile_id = next(self._ids)
+            self._ring.append((profile_id, entry))
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            if profile_id == self.sampler_id and self.sampler.running:
+                return self.sampler
+            for stored_id, entry in self._ring:
+                if stored_id == profile_id:
+                    return entry
+        return None
+
+    def list(self):
+        with self._lock:
+            entries = list(self._ring)
+            if self.sampler is not None and self.sampler.running:
+                entries.append((self.sampler_id, self.sampler))
+        return [{"id": profile_id, **entry.summary()} for profile_id, entry in entries]
+
+    # ------------------------------------------------------------
+    # Sampling windows
+    # ------------------------------------------------------------
+
+    def start_sampler(self, seconds, hz=None, idle=False):
+        """
+        Starts a sampling window; raises RuntimeError if one is running.
+        """
+        seconds = min(float(seconds), self.max_seconds)
+        hz = min(float(hz or self.hz), 1000.0)
+        if seconds <= 0 or hz <= 0:
+            raise ValueError("seconds and hz must be positive")
+        with self._lock:
+            if self.sampler is not None and self.sampler.running:
+                raise RuntimeError(f"Sampling window {self.sampler_id} is already running")
+            self.sampler_id = next(self._ids)
+            self.sampler = StackSampler(seconds, hz=hz, idle=idle, on_finish=self._sampler_finished)
+            self.counters["sampler_windows"] += 1
+            self.sampler.start()
+        log.info("Profiler: sampling %gs at %g Hz (profile %d).", seconds, hz, self.sampler_id)
+        return self.sampler_id
+
+    def _sampler_finished(self, sampler):
+        with self._lock:
+            if sampler is self.sampler:
+                self._ring.append((self.sampler_id, sampler))
+
+    def stop_sampler(self):
+        sampler = self.sampler
+        if sampler is None or not sampler.running:
+            return None
+        sampler.stop()
+        return self.sampler_id
+
+    # ------------------------------------------------------------
+    # Per-request profiles
+    # ------------------------------------------------------------
+
+    def register_request(self, profile):
+        with self._lock:
+            self.counters["request_profiles"] += 1
+        return self._store(profile)
+
+    def stats(self):
+        with self._lock:
+            running = self.sampler is not None and self.sampler.running
+            return {
+                "enabled": True,
+                "ring_size": self._ring.maxlen,
+                "profiles": len(self._ring),
+                "sampling": running,
+                "sampling_id": self.sampler_id if running else None,
+                **self.counters,
+            }
+
+
+class ProfileMiddleware:
+    """
+    Pure ASGI middleware: opts a request into per-request profiling when it
+    carries X-PARS-Profile: 1 and a valid admin token (header ignored otherwise).
+    """
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        flag = headers.get(PROFILE_HEADER)
+        if flag is None or flag.strip().lower() in (b"0", b"false", b""):
+            return await self.app(scope, receive, send)
+        if not self.profiler.authorized(admin_token(headers)):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        # Reserve the id up front so it can go out in the response headers
+        profile_id = self.profiler.register_request(profile)
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (PROFILE_ID_HEADER, str(profile_id).encode())]}
+            await send(message)
+
+        token = REQUEST_PROFILE.set(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            REQUEST_PROFILE.reset(token)
+            profile.duration_ms = round((time.perf_counter() - started) * 1e3, 3)
+
+
+def admin_token(headers):
+    """
+    Token from X-PARS-Admin-Token or an "Authorization: Bearer" header
+    (raw ASGI header dict with lower-case byte keys).
+    """
+    token = headers.get(TOKEN_HEADER)
+    if token is None:
+        auth = headers.get(b"authorization", b"")
+        if auth[:7].lower() == b"bearer ":
+            token = auth[7:]
+    return token.decode("latin-1").strip() if token else None
+
+
+def create_profiler():
+    """
+    Build the profiler from env (None unless PARS_ADMIN_TOKEN is set).
+    """
+    if not os.getenv("PARS_ADMIN_TOKEN"):
+        return None
+    profiler = Profiler.from_env()
+    log.info("Profiling enabled (ring of %d, %g Hz sampler).", profiler._ring.maxlen, profiler.hz)
+    return profiler
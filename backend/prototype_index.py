@@ -0,0 +1,142 @@
+"""
+PARS - Department Prototype Index
+Multi-prototype department embeddings for routing: every MEDICAL_KEYWORDS phrase
+and every synonym listed in DEPARTMENTS is embedded once, as its own prototype,
+instead of one blurred vector per comma-joined department description.
+
+Prototypes are stored as one contiguous unit-norm matrix grouped by department,
+with a department-id vector and a weight per prototype (the keyword weight;
+description synonyms get SYNONYM_WEIGHT). A complaint's score for a department
+is the weighted max similarity over that department's prototypes:
+
+    score[n, d] = max_{p in d} weight[p] * cos(complaint[n], prototype[p])
+
+computed for N complaints with one (N, dim) x (dim, P) matmul and a segmented max.
+
+The matrix is cached on disk and rebuilt only when the keyword tables, the
+department list or the encoder change (the cache key is a hash of all three).
+
+Environment:
+  - PARS_DEPT_PROTOTYPE_CACHE    cache file (default: dept_prototypes.npz)
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Weight of a synonym taken from a DEPARTMENTS description (keywords carry their own)
+SYNONYM_WEIGHT = 0.85
+
+
+def collect_prototypes(departments, keywords) -> list:
+    """
+    (phrase, department index, weight) for every keyword phrase and description
+    synonym, grouped by department; a phrase listed twice keeps its highest weight.
+    """
+    prototypes = []
+    for dept_id, dept_full in enumerate(departments):
+        name, _, synonyms = dept_full.partition(" (")
+        name = name.strip()
+        phrases = {name.replace("_", " ").lower(): SYNONYM_WEIGHT}
+        for synonym in synonyms.rstrip(")").split(","):
+            synonym = synonym.strip().lower()
+            if synonym:
+                phrases[synonym] = max(phrases.get(synonym, 0.0), SYNONYM_WEIGHT)
+        for phrase, weight in keywords.get(name, {}).items():
+            phrase = phrase.lower()
+            phrases[phrase] = max(phrases.get(phrase, 0.0), weight)
+        prototypes += [(phrase, dept_id, weight) for phrase, weight in phrases.items()]
+    return prototypes
+
+
+def cache_key(departments, keywords, encoder_id: str) -> str:
+    payload = json.dumps([list(departments), keywords, encoder_id, SYNONYM_WEIGHT], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PrototypeIndex:
+    def __init__(self, matrix, dept_ids, weights, phrases, n_departments, key=None):
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.dept_ids = np.asarray(dept_ids, dtype=np.intp)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.phrases = list(phrases)
+        self.n_departments = n_departments
+        self.key = key
+        if np.any(np.diff(self.dept_ids) < 0):
+            raise ValueError("Prototypes must be grouped by department")
+        # Start column of each department's run (for the segmented max)
+        self.offsets = np.searchsorted(self.dept_ids, np.arange(n_departments))
+        self.has_prototypes = np.isin(np.arange(n_departments), self.dept_ids)
+
+    @classmethod
+    def build(cls, encode, departments, keywords, encoder_id=""):
+        """
+        Embed every prototype phrase with `encode(list_of_str) -> (n, dim)` in one call.
+        """
+        prototypes = collect_prototypes(departments, keywords)
+        phrases = [p for p, _, _ in prototypes]
+        vectors = np.asarray(encode(phrases), dtype=np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return cls(
+            vectors, [d for _, d, _ in prototypes], [w for _, _, w in prototypes], phrases,
+            len(departments), key=cache_key(departments, keywords, encoder_id),
+        )
+
+    @classmethod
+    def load_or_build(cls, encode, departments, keywords, encoder_id="", path=None):
+        """
+        The cached index if its key still matches the keyword tables and encoder;
+        otherwise rebuild it and replace the cache.
+        """
+        path = path or os.getenv("PARS_DEPT_PROTOTYPE_CACHE", "dept_prototypes.npz")
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+        key = cache_key(departments, keywords, encoder_id)
+
+        if os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as cached:
+                    if str(cached["key"]) == key:
+                        return cls(cached["matrix"], cached["dept_ids"], cached["weights"],
+                                   cached["phrases"].tolist(), len(departments), key=key)
+            except Exception as e:
+                log.warning("Ignoring unreadable prototype cache %s: %s", path, e)
+
+        index = cls.build(encode, departments, keywords, encoder_id)
+        try:
+            index.save(path)
+        except OSError as e:
+            log.warning("Could not cache department prototypes at %s: %s", path, e)
+        log.info("Built %d department prototypes.", len(index.phrases))
+        return index
+
+    def save(self, path):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, key=np.array(self.key), matrix=self.matrix, dept_ids=self.dept_ids,
+                 weights=self.weights, phrases=np.array(self.phrases))
+        os.replace(tmp, path)
+
+    def scores(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        (N, dim) unit-norm complaints -> (N, departments) weighted max similarity.
+        """
+        weighted = (np.asarray(embeddings, dtype=np.float32) @ self.matrix.T) * self.weights
+        scores = np.maximum.reduceat(weighted, np.minimum(self.offsets, len(self.phrases) - 1), axis=1)
+        scores[:, ~self.has_prototypes] = 0.0
+        return scores.astype(np.float64)
+
+    def best_prototypes(self, embedding: np.ndarray, k: int = 5) -> list:
+        """
+        Closest prototypes for one complaint (for debugging routing decisions).
+        """
+        weighted = (self.matrix @ np.asarray(embedding, dtype=np.float32)) * self.weights
+        top = np.argsort(-weighted)[:k]
+        return [(self.phrases[i], int(self.dept_ids[i]), float(weighted[i])) for i in top]
@@ -0,0 +1,387 @@
+"""
+PARS - Queue Service
+Live, priority-ordered ED queue kept in memory on the backend.
+
+Patients are ordered by (risk score desc, arrival time asc) in an indexed binary
+heap, with one heap for the whole ED and one per department, so admitting,
+re-scoring and discharging a patient are O(log n). Every change is published as
+an incremental event to subscribers (the /queue/stream SSE endpoint), so
+dashboards no longer re-fetch and re-sort the whole patients table.
+
+The queue is snapshotted to disk (atomic JSON write) when it changes, and the
+snapshot is reloaded at startup. The queue lives in one process: behind the
+pre-fork server, run a single worker (PARS_WORKERS=1) for the queue endpoints.
+
+Environment:
+  - PARS_QUEUE_SNAPSHOT_PATH      (default: queue_snapshot.json, empty disables snapshots)
+  - PARS_QUEUE_SNAPSHOT_SECONDS   minimum interval between snapshots (default: 2)
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import threading
+from collections import deque
+
+import orjson
+
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+
+# ============================================================
+# ------------------- INDEXED HEAP ---------------------------
+# ============================================================
+
+class IndexedHeap:
+    """
+    Binary min-heap of (key, item_id) with a position index, so an arbitrary item
+    can be updated or removed in O(log n).
+    """
+
+    def __init__(self):
+        self._heap = []      # [(key, item_id)]
+        self._pos = {}       # item_id -> index in _heap
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item_id):
+        return item_id in self._pos
+
+    def push(self, item_id, key):
+        if item_id in self._pos:
+            self.update(item_id, key)
+            return
+        self._heap.append((key, item_id))
+        self._pos[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def update(self, item_id, key):
+        i = self._pos[item_id]
+        old_key = self._heap[i][0]
+        self._heap[i] = (key, item_id)
+        if key < old_key:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, item_id):
+        i = self._pos.pop(item_id)
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+
+    def peek(self):
+        return self._heap[0][1] if self._heap else None
+
+    def top(self, k):
+        """
+        The k smallest items in order, in O(k log k) without disturbing the heap:
+        walks the heap tree with a frontier heap of candidate nodes.
+        """
+        result = []
+        if not self._heap or k <= 0:
+            return result
+        frontier = [(self._heap[0][0], 0)]
+        while frontier and len(result) < k:
+            _, i = heapq.heappop(frontier)
+            result.append(self._heap[i][1])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child][0], child))
+        return result
+
+    def _swap(self, i, j):
+        h = self._heap
+        h[i], h[j] = h[j], h[i]
+        self._pos[h[i][1]] = i
+        self._pos[h[j][1]] = j
+
+    def _sift_up(self, i):
+        h = self._heap
+        while i > 0:
+            parent = (i - 1) // 2
+            if h[i][0] < h[parent][0]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                break
+
+    def _sift_down(self, i):
+        h = self._heap
+        n = len(h)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and h[child][0] < h[smallest][0]:
+                    smallest = child
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+
+
+# ============================================================
+# ------------------- TRIAGE QUEUE ---------------------------
+# ============================================================
+
+ENTRY_FIELDS = ("patient_id", "risk_score", "risk_label", "department", "details", "arrival", "updated")
+
+
+class TriageQueue:
+    def __init__(self, snapshot_path=None, snapshot_interval=2.0, max_events=1000):
+        self._entries = {}                # patient_id -> entry dict
+        self._all = IndexedHeap()
+        self._by_dept = {}                # department -> IndexedHeap
+        self._seq = 0                     # tie-breaker for identical (risk, arrival)
+        self._lock = threading.RLock()
+
+        self.version = 0
+        self._events = deque(maxlen=max_events)   # recent events for SSE resume
+        self._subscribers = set()                 # (loop, asyncio.Queue)
+
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._dirty = threading.Event()
+        self._snapshotter = None
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("PARS_QUEUE_SNAPSHOT_PATH", "queue_snapshot.json")
+        if path and not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        return cls(
+            snapshot_path=path or None,
+            snapshot_interval=float(os.getenv("PARS_QUEUE_SNAPSHOT_SECONDS", "2")),
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(entry, seq):
+        return (-entry["risk_score"], entry["arrival"], seq)
+
+    # --------------------------------------------------------
+    # Mutations
+    # --------------------------------------------------------
+
+    def admit(self, patient_id, risk_score, risk_label, department, details="", arrival=None) -> dict:
+        """
+        Add a patient, or re-score/re-route one already in the queue (arrival time is kept).
+        """
+        patient_id = str(patient_id)
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry is None:
+                self._seq += 1
+                entry = {
+                    "patient_id": patient_id,
+                    "arrival": arrival if arrival is not None else time.time(),
+                    "seq": self._seq,
+                }
+                self._entries[patient_id] = entry
+            elif entry["department"] != department:
+                self._remove_from_department(patient_id, entry["department"])
+
+            entry.update(
+                risk_score=float(risk_score),
+                risk_label=risk_label,
+                department=department,
+                details=details,
+                updated=time.time(),
+            )
+            key = self._key(entry, entry["seq"])
+            self._all.push(patient_id, key)
+            self._by_dept.setdefault(department, IndexedHeap()).push(patient_id, key)
+            self._publish("upsert", entry)
+            return self._public(entry)
+
+    def rescore(self, patient_id, risk_score, risk_label=None, details=None):
+        with self._lock:
+            entry = self._entries.get(str(patient_id))
+            if entry is None:
+                return None
+            return self.admit(
+                entry["patient_id"], risk_score,
+                risk_label if risk_label is not None else entry["risk_label"],
+                entry["department"],
+                details if details is not None else entry["details"],
+            )
+
+    def remove(self, patient_id) -> bool:
+        patient_id = str(patient_id)
+        with self._lock:
+            entry = self._entries.pop(patient_id, None)
+            if entry is None:
+                return False
+            self._all.remove(patient_id)
+            self._remove_from_department(patient_id, entry["department"])
+            self._publish("remove", entry)
+            return True
+
+    def _remove_from_department(self, patient_id, department):
+        dept_heap = self._by_dept[department]
+        dept_heap.remove(patient_id)
+        if not len(dept_heap):
+            del self._by_dept[department]
+
+    def pop_next(self, department=None):
+        """
+        Remove and return the highest-priority patient (optionally within a department).
+        """
+        with self._lock:
+            heap = self._by_dept.get(department) if department else self._all
+            patient_id = heap.peek() if heap else None
+            if patient_id is None:
+                return None
+            entry = self._public(self._entries[patient_id])
+            self.remove(patient_id)
+            return entry
+
+    # --------------------------------------------------------
+    # Reads
+    # --------------------------------------------------------
+
+    def get(self, patient_id):
+        entry = self._entries.get(str(patient_id))
+        return self._public(entry) if entry else None
+
+    def ordered(self, department=None, limit=None) -> list:
+        with self._lock:
+            heap = self._by_dept.get(department) if department else self._all
+            if not heap:
+                return []
+            ids = heap.top(limit if limit is not None else len(heap))
+            return [self._public(self._entries[i]) for i in ids]
+
+    def view(self, department=None, limit=None) -> dict:
+        """
+        Ordered entries together with the version they reflect (consistent under concurrent updates).
+        """
+        with self._lock:
+            return {"version": self.version, "entries": self.ordered(department, limit)}
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "departments": {dept: len(heap) for dept, heap in sorted(self._by_dept.items())},
+            }
+
+    @staticmethod
+    def _public(entry) -> dict:
+        return {field: entry[field] for field in ENTRY_FIELDS}
+
+    # --------------------------------------------------------
+    # Change feed
+    # --------------------------------------------------------
+
+    def _publish(self, op, entry):
+        self.version += 1
+        event = {"version": self.version, "op": op, "entry": self._public(entry)}
+        self._events.append(event)
+        self._dirty.set()
+        for loop, queue in list(self._subscribers):
+            loop.call_soon_threadsafe(self._deliver, loop, queue, event)
+
+    def _deliver(self, loop, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop its backlog and tell it to resync from a full snapshot
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"version": event["version"], "op": "resync"})
+
+    def subscribe(self, since_version=None, max_pending=1000):
+        """
+        Register an SSE/WebSocket consumer on the running event loop.
+        Returns (queue, backlog): backlog is the events missed since `since_version`,
+        or None if they are no longer buffered and the client needs a full snapshot.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=max_pending)
+        with self._lock:
+            backlog = None
+            if since_version is not None:
+                oldest = self._events[0]["version"] if self._events else self.version + 1
+                if oldest - 1 <= since_version <= self.version:
+                    backlog = [e for e in self._events if e["version"] > since_version]
+            self._subscribers.add((loop, queue))
+        return queue, backlog
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {(l, q) for l, q in self._subscribers if q is not queue}
+
+    # --------------------------------------------------------
+    # Snapshots
+    # --------------------------------------------------------
+
+    def snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            self._dirty.clear()
+            data = orjson.dumps({
+                "version": self.version,
+                "seq": self._seq,
+                "saved_at": time.time(),
+                "entries": list(self._entries.values()),
+            })
+        # Write-then-rename so a crash never leaves a truncated snapshot
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def restore(self) -> int:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                data = orjson.loads(f.read())
+        except (OSError, ValueError) as e:
+            log.warning("Could not read queue snapshot: %s", e)
+            return 0
+
+        with self._lock:
+            for entry in data.get("entries", []):
+                entry = {field: entry[field] for field in ENTRY_FIELDS + ("seq",)}
+                key = self._key(entry, entry["seq"])
+                self._entries[entry["patient_id"]] = entry
+                self._all.push(entry["patient_id"], key)
+                self._by_dept.setdefault(entry["department"], IndexedHeap()).push(entry["patient_id"], key)
+            self._seq = max(self._seq, data.get("seq", 0))
+            self.version = max(self.version, data.get("version", 0))
+        log.info("Restored %d queued patients from snapshot (version %d).", len(self._entries), self.version)
+        return len(self._entries)
+
+    def start_snapshots(self):
+        """
+        Background thread writing a snapshot at most every `snapshot_interval` seconds while the queue changes.
+        """
+        if not self.snapshot_path or self._snapshotter is not None:
+            return
+
+        def run():
+            while True:
+                self._dirty.wait()
+                try:
+                    self.snapshot()
+                except OSError as e:
+                    log.warning("Queue snapshot failed: %s", e)
+                time.sleep(self.snapshot_interval)
+
+        self._snapshotter = threading.Thread(target=run, name="pars-queue-snapshot", daemon=True)
+        self._snapshotter.start()
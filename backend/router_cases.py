@@ -0,0 +1,42 @@
+"""Labelled complaint -> department cases from test_dept_comprehensive.py and verify_nlp.py"""
+
+ROUTER_CASES = [
+    # test_dept_comprehensive.py
+    ("snake bite", "Toxicology"),
+    ("scorpion sting", "Toxicology"),
+    ("drug overdose", "Toxicology"),
+    ("accidentally drank poison", "Toxicology"),
+    ("chemical exposure at work", "Toxicology"),
+    ("car accident with severe bleeding", "Emergency_Trauma"),
+    ("fell from height", "Emergency_Trauma"),
+    ("gunshot wound", "Emergency_Trauma"),
+    ("chest pain and difficulty breathing", "Cardiology"),
+    ("heart attack symptoms", "Cardiology"),
+    ("high blood pressure", "Cardiology"),
+    ("severe headache and dizziness", "Neurology"),
+    ("stroke symptoms", "Neurology"),
+    ("seizure", "Neurology"),
+    ("stomach pain and vomiting", "Gastroenterology"),
+    ("severe abdominal pain", "Gastroenterology"),
+    ("difficulty breathing and cough", "Pulmonology"),
+    ("asthma attack", "Pulmonology"),
+    ("broken arm", "Orthopedics"),
+    ("sprained ankle", "Orthopedics"),
+    ("suicidal thoughts", "Psychiatry"),
+    ("severe depression", "Psychiatry"),
+    ("high fever and weakness", "General_Medicine"),
+    ("flu symptoms", "General_Medicine"),
+
+    # verify_nlp.py
+    ("severe chest pain", "Cardiology"),
+    ("I feel very dizzy and my head hurts", "Neurology"),
+    ("I can't stop vomiting", "Gastroenterology"),
+    ("hard to breathe", "Pulmonology"),
+    ("broke my leg", "Orthopedics"),
+    ("car crash severe bleeding", "Emergency_Trauma"),
+    ("skin rash all over", "Dermatology"),
+    ("ear pain", "ENT"),
+    ("pain when urinating", "Urology_Nephrology"),
+    ("feeling very depressed", "Psychiatry"),
+    ("swallowed poison", "Toxicology"),
+]
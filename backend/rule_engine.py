@@ -0,0 +1,407 @@
+"""
+PARS - Triage Rule Engine
+Guardrail (safety override) and explanation rules loaded from one declarative
+definition (triage_rules.json) and shared by every scoring path: TriageModel,
+the rule-based fallback in main.py, the batch endpoints and test.py.
+
+Rules are compiled into NumPy comparisons grouped by operator, so a rule group
+is evaluated over an (n, fields) matrix of vitals with one vectorized compare
+per operator (batches, up to 100k rows). A single patient goes through a
+separate scalar path over the same compiled rules (plain Python comparisons,
+where NumPy call overhead would dominate); verify_rule_engine.py checks that
+both paths agree for every rule, including at each threshold. Missing, None
+and NaN vitals take the field default. Every counted evaluation updates
+per-rule hit counters (GET /rules).
+
+Rule format:
+  {"id": "...", "field": "<PatientInput field>", "op": ">|>=|<|<=|==|!=", "value": <number>,
+   "message": "...",
+   "fallback_message": "..."   (guardrails: wording used by the rule-based fallback)
+   "elevates": true}           (explanations: raises the fallback to MEDIUM)
+
+Environment:
+  - PARS_TRIAGE_RULES    path to the rule definition (default: triage_rules.json)
+"""
+
+import os
+import json
+import operator
+import threading
+import numpy as np
+from feature_schema import FIELD_ALIASES, field_getter
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+# Scalar twins of OPERATORS for single records, where NumPy call overhead dominates
+SCALAR_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# API field -> training column, for records keyed like the training CSV (e.g. "Temp")
+_TRAINING_NAMES = {api: col for col, api in FIELD_ALIASES.items()}
+
+# Hit patterns are packed into one int64 per row to share joined messages
+MAX_RULES_PER_GROUP = 63
+
+
+class Rule:
+    __slots__ = ("id", "field", "op", "value", "message", "fallback_message", "elevates")
+
+    def __init__(self, spec: dict):
+        missing = [k for k in ("id", "field", "op", "value", "message") if k not in spec]
+        if missing:
+            raise ValueError(f"Rule {spec.get('id', spec)} is missing {missing}")
+        if spec["op"] not in OPERATORS:
+            raise ValueError(f"Rule {spec['id']}: unknown operator {spec['op']!r} (expected one of {list(OPERATORS)})")
+        self.id = spec["id"]
+        self.field = spec["field"]
+        self.op = spec["op"]
+        self.value = float(spec["value"])
+        self.message = spec["message"]
+        self.fallback_message = spec.get("fallback_message", spec["message"])
+        self.elevates = bool(spec.get("elevates", False))
+
+    def public(self) -> dict:
+        return {"id": self.id, "field": self.field, "op": self.op, "value": self.value}
+
+
+class _RuleGroup:
+    """
+    One rule group compiled to per-operator blocks of
+    (compare, field columns, thresholds, rule positions).
+    """
+
+    def __init__(self, rules, field_index):
+        if len(rules) > MAX_RULES_PER_GROUP:
+            raise ValueError(f"At most {MAX_RULES_PER_GROUP} rules per group")
+        self.rules = rules
+        by_op = {}
+        for position, rule in enumerate(rules):
+            by_op.setdefault(rule.op, []).append((field_index[rule.field], rule.value, position))
+        self.blocks = [
+            (
+                OPERATORS[op],
+                np.array([column for column, _, _ in entries], dtype=np.intp),
+                np.array([value for _, value, _ in entries], dtype=np.float64),
+                np.array([position for _, _, position in entries], dtype=np.intp),
+            )
+            for op, entries in by_op.items()
+        ]
+        self.scalar = [(SCALAR_OPERATORS[r.op], field_index[r.field], r.value) for r in rules]
+        self.hits = np.zeros(len(rules), dtype=np.int64)
+        self.evaluated = 0
+
+    def evaluate(self, X: np.ndarray) -> np.ndarray:
+        """
+        (n, fields) vitals -> (n, rules) boolean hits.
+        """
+        out = np.empty((len(X), len(self.rules)), dtype=bool)
+        for compare, columns, thresholds, positions in self.blocks:
+            out[:, positions] = compare(X[:, columns], thresholds)
+        return out
+
+    def evaluate_row(self, row: list) -> list:
+        """
+        One record's vitals -> list of boolean hits (same rules, no array setup).
+        """
+        return [compare(row[column], value) for compare, column, value in self.scalar]
+
+    def stats(self) -> dict:
+        return {
+            "evaluated": self.evaluated,
+            "rules": [
+                {**rule.public(), "hits": int(hits),
+                 "hit_rate": round(int(hits) / self.evaluated, 4) if self.evaluated else 0.0}
+                for rule, hits in zip(self.rules, self.hits)
+            ],
+        }
+
+
+class RuleEngine:
+    def __init__(self, spec: dict, source=None):
+        self.source = source
+        self.defaults = {field: float(value) for field, value in spec.get("defaults", {}).items()}
+
+        guardrails = [Rule(r) for r in spec.get("guardrails", [])]
+        explanations = [Rule(r) for r in spec.get("explanations", [])]
+        ids = [r.id for r in guardrails + explanations]
+        duplicates = sorted({i for i in ids if ids.count(i) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate rule ids: {duplicates}")
+
+        # One matrix column per field referenced by any rule
+        self.fields = list(dict.fromkeys(r.field for r in guardrails + explanations))
+        field_index = {field: i for i, field in enumerate(self.fields)}
+        self._default_row = np.array([self.defaults.get(f, np.nan) for f in self.fields], dtype=np.float64)
+
+        self.guardrails = _RuleGroup(guardrails, field_index)
+        self.explanations = _RuleGroup(explanations, field_index)
+        self._elevating = np.array([i for i, r in enumerate(explanations) if r.elevates], dtype=np.intp)
+
+        # Descending (min_score, label); scores below every threshold get the last label
+        self.labels = sorted(
+            ((float(l["min_score"]), l["label"]) for l in spec.get("labels", [])), reverse=True,
+        ) or [(0.0, "LOW")]
+        self.override = spec["override"]
+        self.explanation = spec["explanation"]
+        self.fallback_spec = spec["fallback"]
+
+        self._guardrail_messages = [r.message for r in guardrails]
+        self._fallback_messages = [r.fallback_message for r in guardrails]
+        self._explanation_messages = [r.message for r in explanations]
+        self._joined = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=None):
+        path = path or os.getenv("PARS_TRIAGE_RULES", "triage_rules.json")
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), source=path)
+
+    # --------------------------------------------------------
+    # Vitals matrix
+    # --------------------------------------------------------
+
+    def _row(self, data) -> list:
+        get = field_getter(data)
+        row = []
+        for field, default in zip(self.fields, self._default_row):
+            value = get(field)
+            if value is None and field in _TRAINING_NAMES:
+                value = get(_TRAINING_NAMES[field])
+            row.append(default if value is None else value)
+        return row
+
+    def _fill_defaults(self, X: np.ndarray) -> np.ndarray:
+        missing = np.isnan(X)
+        if missing.any():
+            X = np.where(missing, self._default_row, X)
+        return X
+
+    def matrix(self, records) -> np.ndarray:
+        """
+        (n, fields) float64 vitals from dicts or PatientInput records.
+        """
+        if not len(records):
+            return np.empty((0, len(self.fields)), dtype=np.float64)
+        return self._fill_defaults(np.array([self._row(r) for r in records], dtype=np.float64))
+
+    def column_matrix(self, columns: dict, n: int) -> np.ndarray:
+        """
+        (n, fields) float64 vitals from a field -> sequence mapping.
+        """
+        X = np.empty((n, len(self.fields)), dtype=np.float64)
+        for i, field in enumerate(self.fields):
+            values = columns.get(field)
+            if values is None and field in _TRAINING_NAMES:
+                values = columns.get(_TRAINING_NAMES[field])
+            X[:, i] = self._default_row[i] if values is None else np.asarray(values, dtype=np.float64)
+        return self._fill_defaults(X)
+
+    # --------------------------------------------------------
+    # Evaluation
+    # --------------------------------------------------------
+
+    def _evaluate(self, group, X, count):
+        hits = group.evaluate(X)
+        if count and len(hits):
+            totals = hits.sum(axis=0)
+            with self._lock:
+                group.hits += totals
+                group.evaluated += len(hits)
+        return hits
+
+    def _evaluate_record(self, group, data, count):
+        row = self._row(data)
+        # NaN (e.g. from a float column) also means "not provided"
+        row = [default if value != value else value for value, default in zip(row, self._default_row)]
+        hits = group.evaluate_row(row)
+        if count:
+            with self._lock:
+                for i, hit in enumerate(hits):
+                    if hit:
+                        group.hits[i] += 1
+                group.evaluated += 1
+        return hits
+
+    def guardrail_hits(self, X: np.ndarray, count=True) -> np.ndarray:
+        return self._evaluate(self.guardrails, X, count)
+
+    def explanation_hits(self, X: np.ndarray, count=True) -> np.ndarray:
+        return self._evaluate(self.explanations, X, count)
+
+    def critical_mask(self, X: np.ndarray, count=True) -> np.ndarray:
+        return self.guardrail_hits(X, count).any(axis=1)
+
+    @staticmethod
+    def _join(hits, messages, template) -> str:
+        selected = list(dict.fromkeys(m for m, hit in zip(messages, hits) if hit))
+        if not selected and template.get("none"):
+            selected = [template["none"]]
+        return template.get("prefix", "") + template["separator"].join(selected) + template.get("suffix", "")
+
+    def _joined_messages(self, kind, hits, messages, template) -> list:
+        """
+        Joined details per row. Rows with the same hit pattern share one string,
+        so a large batch only formats each distinct pattern once.
+        """
+        codes = hits.astype(np.int64) @ np.left_shift(1, np.arange(hits.shape[1], dtype=np.int64))
+        patterns, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        texts = []
+        for code, row in zip(patterns.tolist(), first):
+            key = (kind, code)
+            text = self._joined.get(key)
+            if text is None:
+                text = self._joined[key] = self._join(hits[row], messages, template)
+            texts.append(text)
+        return [texts[i] for i in inverse.ravel()]
+
+    def label(self, score: float) -> str:
+        for threshold, label in self.labels:
+            if score >= threshold:
+                return label
+        return self.labels[-1][1]
+
+    def label_for(self, scores) -> np.ndarray:
+        scores = np.asarray(scores, dtype=np.float64)
+        labels = np.full(len(scores), self.labels[-1][1], dtype=object)
+        assigned = np.zeros(len(scores), dtype=bool)
+        for threshold, label in self.labels:
+            mask = (scores >= threshold) & ~assigned
+            labels[mask] = label
+            assigned |= mask
+        return labels
+
+    def _override(self, details) -> dict:
+        return {"risk_score": self.override["risk_score"], "risk_label": self.override["risk_label"],
+                "details": details}
+
+    def _fallback_band(self, band, details=None) -> dict:
+        spec = self.fallback_spec[band]
+        return {"risk_score": spec["risk_score"], "risk_label": spec["risk_label"],
+                "details": spec["details"] if details is None else details}
+
+    # --------------------------------------------------------
+    # Results (vitals matrix)
+    # --------------------------------------------------------
+
+    def override_results(self, hits: np.ndarray) -> list:
+        """
+        Safety-override result per row, or None where no guardrail fired.
+        """
+        results = [None] * len(hits)
+        critical = np.flatnonzero(hits.any(axis=1))
+        if len(critical):
+            details = self._joined_messages("override", hits[critical], self._guardrail_messages, self.override)
+            for i, text in zip(critical, details):
+                results[i] = self._override(text)
+        return results
+
+    def scored_results(self, X: np.ndarray, scores, count=True) -> list:
+        """
+        Label + explanation for rows scored by the model.
+        """
+        if not len(X):
+            return []
+        hits = self.explanation_hits(X, count)
+        details = self._joined_messages("explanation", hits, self._explanation_messages, self.explanation)
+        labels = self.label_for(scores)
+        return [
+            {"risk_score": round(float(score), 4), "risk_label": label, "details": text}
+            for score, label, text in zip(scores, labels, details)
+        ]
+
+    def fallback_results(self, X: np.ndarray, count=True) -> list:
+        """
+        Rule-only assessment (no model): critical guardrails -> HIGH,
+        any elevating explanation -> MEDIUM, otherwise LOW.
+        """
+        if not len(X):
+            return []
+        guard_hits = self.guardrail_hits(X, count)
+        critical = guard_hits.any(axis=1)
+        elevated = self.explanation_hits(X, count)[:, self._elevating].any(axis=1)
+
+        out = [self._fallback_band("elevated" if e else "normal") for e in elevated]
+        rows = np.flatnonzero(critical)
+        if len(rows):
+            details = self._joined_messages("fallback", guard_hits[rows], self._fallback_messages,
+                                            self.fallback_spec["critical"])
+            for i, text in zip(rows, details):
+                out[i] = self._fallback_band("critical", text)
+        return out
+
+    # --------------------------------------------------------
+    # Results (single record)
+    # --------------------------------------------------------
+
+    def guardrail(self, data, count=True):
+        """
+        Safety-override result for one patient, or None.
+        """
+        hits = self._evaluate_record(self.guardrails, data, count)
+        if not any(hits):
+            return None
+        return self._override(self._join(hits, self._guardrail_messages, self.override))
+
+    def is_critical(self, data) -> bool:
+        """
+        Whether any guardrail fires (not counted; used for routing decisions).
+        """
+        return any(self._evaluate_record(self.guardrails, data, count=False))
+
+    def guardrail_reasons(self, data, count=True) -> list:
+        hits = self._evaluate_record(self.guardrails, data, count)
+        return [m for m, hit in zip(self._guardrail_messages, hits) if hit]
+
+    def result(self, data, risk_score: float, count=True) -> dict:
+        hits = self._evaluate_record(self.explanations, data, count)
+        return {
+            "risk_score": round(risk_score, 4),
+            "risk_label": self.label(risk_score),
+            "details": self._join(hits, self._explanation_messages, self.explanation),
+        }
+
+    def fallback(self, data, count=True) -> dict:
+        guard_hits = self._evaluate_record(self.guardrails, data, count)
+        hits = self._evaluate_record(self.explanations, data, count)
+        if any(guard_hits):
+            return self._fallback_band(
+                "critical", self._join(guard_hits, self._fallback_messages, self.fallback_spec["critical"]))
+        return self._fallback_band("elevated" if any(hits[i] for i in self._elevating) else "normal")
+
+    # --------------------------------------------------------
+    # Reporting
+    # --------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "source": self.source,
+                "fields": self.fields,
+                "guardrails": self.guardrails.stats(),
+                "explanations": self.explanations.stats(),
+            }
+
+    def reset(self):
+        with self._lock:
+            for group in (self.guardrails, self.explanations):
+                group.hits[:] = 0
+                group.evaluated = 0
+
+
+RULES = RuleEngine.from_file()
@@ -0,0 +1,247 @@
+"""
+PARS - Score Cache
+Bounded LRU memoization of network risk scores for TriageModel.
+
+The cache is keyed on the model's feature vector, so a repeated profile skips
+the network call:
+  - exact:   the feature vector as sent by the client
+  - binned:  EXPERIMENTAL, offline analysis only (analyze_score_cache.py); the
+             live model refuses it. The feature vector of the record snapped
+             to clinical bins (age band, vitals at instrument precision, kept
+             within each field's physical range, see VALID_RANGES); every
+             patient in a bin gets the score of the bin's snapped record, so
+             results do not depend on arrival order
+Only the score is cached; guardrails, labels and explanations are still
+evaluated on the patient's actual vitals.
+
+Measured on the first 3,000 rows of patients_data.csv (analyze_score_cache.py
+--rows 3000; 2,832 reach the network), repeated profiles are rare: exact keys
+give 2,832 distinct keys for 2,832 records, a 0% hit ratio. The default bins
+do no better (2,832 distinct keys, 0% hits) while changing scores by up to
+0.154 (p99 0.033) and flipping 44 risk labels (1.6%); doubling the widths
+flips 203 labels (7.2%; 556 before snapped values were clamped to
+VALID_RANGES) and still hits 0%. On this data binning buys nothing and costs
+label accuracy, so PARS_SCORE_CACHE=binned is refused (caching stays off)
+until a bin configuration shows hits without label flips in
+analyze_score_cache.py on representative traffic.
+
+Environment:
+  - PARS_SCORE_CACHE         off | exact (default: off); binned is refused
+  - PARS_SCORE_CACHE_SIZE    maximum cached scores (default: 10000)
+
+Bin widths other than DEFAULT_BINS are evaluated with analyze_score_cache.py --bins.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+from feature_schema import FIELD_ALIASES, field_getter
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+MODES = ("off", "exact", "binned")
+
+# Bin width per API field; fields not listed (flags, categories) are keyed exactly
+DEFAULT_BINS = {
+    "Age": 5,
+    "Heart_Rate": 2,
+    "Systolic_BP": 2,
+    "Diastolic_BP": 2,
+    "O2_Saturation": 1,
+    "Temperature": 0.2,
+    "Respiratory_Rate": 1,
+    "Pain_Score": 1,
+    "GCS_Score": 1,
+}
+
+# Physically valid values per API field: snapping never leaves this range
+# (e.g. GCS 15 in bins of 2 would otherwise become 16, SpO2 99 in bins of 2 -> 100 is kept)
+VALID_RANGES = {
+    "Age": (0, 120),
+    "Heart_Rate": (0, 300),
+    "Systolic_BP": (0, 300),
+    "Diastolic_BP": (0, 200),
+    "O2_Saturation": (0, 100),
+    "Temperature": (25, 45),
+    "Respiratory_Rate": (0, 80),
+    "Pain_Score": (0, 10),
+    "GCS_Score": (3, 15),
+}
+
+# API field -> training column, so snapped values also apply to CSV-keyed records
+_TRAINING_NAMES = {api: col for col, api in FIELD_ALIASES.items()}
+
+
+def parse_bins(text: str) -> dict:
+    """
+    "Age=10,Heart_Rate=5" -> {"Age": 10.0, "Heart_Rate": 5.0}
+    """
+    bins = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        field, sep, width = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid bin {item!r} (expected Field=width)")
+        bins[field.strip()] = float(width)
+    return bins
+
+
+def snap(value, width, valid_range=None):
+    """
+    Round to the centre of a bin of the given width (instrument precision),
+    clamped to `valid_range`. A value already outside the range is not moved
+    further out.
+    """
+    snapped = round(round(float(value) / width) * width, 6)
+    if valid_range is not None:
+        low, high = valid_range
+        snapped = min(max(snapped, min(low, value)), max(high, value))
+    return snapped
+
+
+class BinnedRecord(Mapping):
+    """
+    Read-only view of a record (dict or PatientInput) with binned fields snapped.
+    """
+
+    __slots__ = ("_get", "_bins", "_ranges")
+
+    def __init__(self, data, bins, ranges=None):
+        self._get = field_getter(data)
+        self._bins = bins
+        self._ranges = ranges or {}
+
+    def get(self, key, default=None):
+        value = self._get(key)
+        if value is None:
+            return default
+        width = self._bins.get(key)
+        if width is None or isinstance(value, (bool, str)):
+            return value
+        return snap(value, width, self._ranges.get(key))
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self._bins)
+
+    def __len__(self):
+        return len(self._bins)
+
+
+class ScoreCache:
+    def __init__(self, mode="exact", max_entries=10000, bins=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown score cache mode: {mode} (expected one of {MODES})")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.bins = dict(DEFAULT_BINS if bins is None else bins)
+        self.ranges = dict(VALID_RANGES)
+        # Training-column spellings snap the same way (e.g. "Temp")
+        for table in (self.bins, self.ranges):
+            for field, value in list(table.items()):
+                if field in _TRAINING_NAMES:
+                    table.setdefault(_TRAINING_NAMES[field], value)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Cache configured from PARS_SCORE_CACHE*, or None when caching is off.
+        This is the serving configuration, so binned mode is refused.
+        """
+        mode = os.getenv("PARS_SCORE_CACHE", "off").lower()
+        if mode == "off":
+            return None
+        if mode == "binned":
+            log.error("PARS_SCORE_CACHE=binned is refused for the live model: binned scores differ from exact "
+                      "scoring and flip risk labels (see analyze_score_cache.py). Score caching is off.")
+            return None
+        return cls(mode, max_entries=int(os.getenv("PARS_SCORE_CACHE_SIZE", "10000")))
+
+    # --------------------------------------------------------
+    # Keys
+    # --------------------------------------------------------
+
+    def record(self, data):
+        """
+        The record whose feature vector is scored and used as the key.
+        """
+        return BinnedRecord(data, self.bins, self.ranges) if self.mode == "binned" else data
+
+    def columns(self, columns: dict) -> dict:
+        """
+        Columnar version of record(): binned columns snapped in one vectorized pass.
+        """
+        if self.mode != "binned":
+            return columns
+        snapped = dict(columns)
+        for field, values in columns.items():
+            width = self.bins.get(field)
+            if width is None:
+                continue
+            values = np.asarray(values)
+            if values.dtype.kind in "iuf":
+                result = np.round(np.round(values / width) * width, 6)
+                valid_range = self.ranges.get(field)
+                if valid_range is not None:
+                    low, high = valid_range
+                    result = np.clip(result, np.minimum(low, values), np.maximum(high, values))
+                snapped[field] = result
+        return snapped
+
+    @staticmethod
+    def key(row: np.ndarray) -> bytes:
+        return row.tobytes()
+
+    # --------------------------------------------------------
+    # Lookup
+    # --------------------------------------------------------
+
+    def get(self, key):
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key, score: float):
+        with self._lock:
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "bins": {f: w for f, w in self.bins.items() if f not in FIELD_ALIASES} if self.mode == "binned" else None,
+        }
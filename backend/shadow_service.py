@@ -0,0 +1,184 @@
+"""
+PARS - Shadow Scoring Service
+Scores live /predict traffic with a candidate TriageModel off the critical path.
+The candidate never affects the returned decision; its scores are compared with
+the live model and the differences are aggregated in memory.
+
+The candidate has its own backend and artifact, independent of the live
+PARS_TRIAGE_BACKEND / PARS_ONNX_MODEL_PATH, and registers with the model
+manager under its own name ("shadow:<artifact>").
+
+Configure with environment variables:
+  - PARS_SHADOW_BACKEND            candidate backend, keras|onnx (default: keras)
+  - PARS_SHADOW_MODEL_PATH         candidate .keras file (keras backend)
+  - PARS_SHADOW_PREPROCESSOR_PATH  candidate preprocessor (default: preprocessor_nn.pkl)
+  - PARS_SHADOW_ONNX_PATH          candidate .onnx file (onnx backend)
+    Shadow mode is off unless the candidate artifact for the backend is set.
+  - PARS_SHADOW_SAMPLE_RATE        fraction of requests to shadow-score (default: 1.0)
+  - PARS_SHADOW_MAX_PENDING        max queued shadow jobs before dropping (default: 32)
+"""
+
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ml_service import TriageModel
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+LABELS = ["LOW", "MEDIUM", "HIGH"]
+
+
+class ShadowScorer:
+    def __init__(self, candidate: TriageModel, sample_rate: float = 1.0, max_pending: int = 32):
+        self.candidate = candidate
+        self.sample_rate = 0.0
+        self.set_sample_rate(sample_rate)
+        self.max_pending = max_pending
+
+        # A single background worker keeps shadow inference from competing
+        # with live requests for more than one core.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pars-shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.reset()
+
+    def set_sample_rate(self, rate: float):
+        self.sample_rate = min(1.0, max(0.0, float(rate)))
+
+    def reset(self):
+        with self._lock:
+            self._seen = 0
+            self._sampled = 0
+            self._scored = 0
+            self._dropped = 0
+            self._skipped_override = 0
+            self._errors = 0
+            self._sum_diff = 0.0
+            self._sum_abs_diff = 0.0
+            self._max_abs_diff = 0.0
+            self._agreements = 0
+            # confusion[live_label][candidate_label] -> count
+            self._confusion = {live: {cand: 0 for cand in LABELS} for live in LABELS}
+
+    def submit(self, data: dict, live_result: dict) -> bool:
+        """
+        Queue a shadow scoring job for this request. Never blocks and never raises;
+        returns True if the request was handed to the candidate model.
+        """
+        with self._lock:
+            self._seen += 1
+
+            # Safety overrides are rule-based in both models, so they carry no signal.
+            if "SAFETY OVERRIDE" in live_result.get("details", ""):
+                self._skipped_override += 1
+                return False
+
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return False
+
+            if self._pending >= self.max_pending:
+                self._dropped += 1
+                return False
+
+            self._sampled += 1
+            self._pending += 1
+
+        try:
+            self._executor.submit(
+                self._score,
+                dict(data),
+                live_result["risk_score"],
+                live_result["risk_label"],
+            )
+        except RuntimeError:
+            # Executor shut down (process exiting)
+            with self._lock:
+                self._pending -= 1
+                self._dropped += 1
+            return False
+        return True
+
+    def _score(self, data: dict, live_score: float, live_label: str):
+        try:
+            result = self.candidate.predict(data)
+        except Exception as e:
+            log.error("Shadow scoring error: %s", e)
+            with self._lock:
+                self._errors += 1
+                self._pending -= 1
+            return
+
+        diff = result["risk_score"] - live_score
+        cand_label = result["risk_label"]
+
+        with self._lock:
+            self._pending -= 1
+            self._scored += 1
+            self._sum_diff += diff
+            self._sum_abs_diff += abs(diff)
+            self._max_abs_diff = max(self._max_abs_diff, abs(diff))
+            if cand_label == live_label:
+                self._agreements += 1
+            if live_label in self._confusion and cand_label in self._confusion[live_label]:
+                self._confusion[live_label][cand_label] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            scored = self._scored
+            disagreements = {
+                f"{live}->{cand}": count
+                for live, row in self._confusion.items()
+                for cand, count in row.items()
+                if live != cand and count
+            }
+            return {
+                "enabled": True,
+                "candidate_model": self.candidate.artifact,
+                "sample_rate": self.sample_rate,
+                "requests_seen": self._seen,
+                "sampled": self._sampled,
+                "scored": scored,
+                "pending": self._pending,
+                "dropped": self._dropped,
+                "skipped_override": self._skipped_override,
+                "errors": self._errors,
+                "mean_diff": round(self._sum_diff / scored, 4) if scored else None,
+                "mean_abs_diff": round(self._sum_abs_diff / scored, 4) if scored else None,
+                "max_abs_diff": round(self._max_abs_diff, 4) if scored else None,
+                "label_agreement": round(self._agreements / scored, 4) if scored else None,
+                "label_disagreements": disagreements,
+                "confusion": {live: dict(row) for live, row in self._confusion.items()},
+            }
+
+
+def create_shadow_scorer():
+    """
+    Build the shadow scorer from environment config. Returns None if shadow mode is off.
+    """
+    backend = os.getenv("PARS_SHADOW_BACKEND", "keras").lower()
+    model_path = os.getenv("PARS_SHADOW_MODEL_PATH")
+    onnx_path = os.getenv("PARS_SHADOW_ONNX_PATH")
+    artifact = onnx_path if backend == "onnx" else model_path
+    if not artifact:
+        if model_path or onnx_path:
+            log.warning("Shadow scoring disabled: no candidate artifact for the %s backend", backend)
+        return None
+
+    # Explicit backend and paths: the live model's env config must not leak into the candidate
+    candidate = TriageModel(
+        model_path=model_path or "triage_model_nn.keras",
+        preprocessor_path=os.getenv("PARS_SHADOW_PREPROCESSOR_PATH", "preprocessor_nn.pkl"),
+        backend=backend,
+        onnx_path=onnx_path or "triage_model.onnx",
+        managed_name=f"shadow:{artifact}",
+    )
+    scorer = ShadowScorer(
+        candidate,
+        sample_rate=float(os.getenv("PARS_SHADOW_SAMPLE_RATE", "1.0")),
+        max_pending=int(os.getenv("PARS_SHADOW_MAX_PENDING", "32")),
+    )
+    log.info("Shadow scoring enabled: %s (%s, sample rate %s)", artifact, backend, scorer.sample_rate)
+    return scorer
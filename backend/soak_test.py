@@ -0,0 +1,284 @@
+"""
+Open-loop soak / load test for the PARS API with synthetic patients
+(synth_patients.py).
+
+Requests are sent on a fixed schedule (Poisson or constant arrivals) that does
+not wait for earlier responses, so a slow server shows up as growing latency
+instead of a quietly reduced request rate. Latency is measured from each
+request's *scheduled* send time, which avoids coordinated omission. The offered
+rate steps through --rates; each stage reports achieved throughput, latency
+percentiles and errors per endpoint. A stage is saturated when throughput falls
+below 95% of the rate actually sent, the error rate exceeds --max-error-rate, or p99
+exceeds --slo-ms. The last sustainable and first saturated rates are printed at
+the end.
+
+Endpoint mix (weights): predict, self-check-in, parse-document, transcribe.
+PDF and WAV uploads are drawn from a fixture pool rendered from the same
+synthetic patients.
+
+Usage:
+  python soak_test.py [--url http://localhost:8000 | --in-process]
+                      [--rates 5,10,20,50] [--duration 30] [--arrivals poisson|constant]
+                      [--mix predict=0.8,self-check-in=0.15,parse-document=0.04,transcribe=0.01]
+                      [--patients 100000] [--fixtures 32] [--slo-ms 500] [--json soak.json]
+"""
+import sys
+import os
+import time
+import json
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+from synth_patients import PatientSynthesizer, DEFAULT_CSV, DEFAULT_MODEL, pdf_bytes, patient_report, speech_like_wav
+
+ENDPOINTS = ("predict", "self-check-in", "parse-document", "transcribe")
+PREDICT_FIELDS = (
+    "Age", "Gender", "Heart_Rate", "Systolic_BP", "Diastolic_BP", "O2_Saturation", "Temperature",
+    "Respiratory_Rate", "Pain_Score", "GCS_Score", "Arrival_Mode", "Diabetes", "Hypertension",
+    "Heart_Disease", "Chief_Complaint",
+)
+
+
+def parse_mix(text):
+    mix = {}
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    return {name: weight / total for name, weight in mix.items() if weight > 0}
+
+
+# ============================================================
+# ------------------- WORKLOAD -------------------------------
+# ============================================================
+
+class Workload:
+    """
+    Pre-rendered request bodies: every request picks a synthetic patient (and a
+    fixture file for uploads) by index, so the send loop does no generation work.
+    """
+
+    def __init__(self, n_patients, n_fixtures, seed, with_ids=False, csv=DEFAULT_CSV, model=DEFAULT_MODEL):
+        synth = PatientSynthesizer.from_csv_or_model(csv, model)
+        started = time.perf_counter()
+        df = synth.sample(n_patients, seed=seed, complaint_variants=0.3, id_prefix=f"soak-{seed}")
+        fields = list(PREDICT_FIELDS) + (["Patient_ID"] if with_ids else [])
+        self.predict = [
+            {k: (v.item() if hasattr(v, "item") else v) for k, v in row.items()}
+            for row in df[fields].to_dict("records")
+        ]
+        self.check_in = [
+            {"name": f"Synthetic {p}", "age": int(a), "gender": g, "symptoms": c}
+            for p, a, g, c in zip(df["Patient_ID"], df["Age"], df["Gender"], df["Chief_Complaint"])
+        ]
+        rng = np.random.default_rng(seed)
+        sample = df.head(n_fixtures).to_dict("records")
+        self.pdfs = [(f"report_{i}.pdf", pdf_bytes(patient_report(p))) for i, p in enumerate(sample)]
+        self.wavs = [(f"complaint_{i}.wav", speech_like_wav(rng.uniform(2, 12), seed=seed + i)) for i in range(n_fixtures)]
+        print(f"Workload: {n_patients} patients, {n_fixtures} PDF/WAV fixtures "
+              f"({time.perf_counter() - started:.1f} s)")
+
+    def request(self, endpoint, i):
+        if endpoint == "predict":
+            return {"method": "POST", "url": "/predict", "json": self.predict[i % len(self.predict)]}
+        if endpoint == "self-check-in":
+            return {"method": "POST", "url": "/self-check-in", "json": self.check_in[i % len(self.check_in)]}
+        if endpoint == "parse-document":
+            name, body = self.pdfs[i % len(self.pdfs)]
+            return {"method": "POST", "url": "/parse-document", "files": {"file": (name, body, "application/pdf")}}
+        name, body = self.wavs[i % len(self.wavs)]
+        return {"method": "POST", "url": "/transcribe", "files": {"file": (name, body, "audio/wav")}}
+
+
+# ============================================================
+# ------------------- OPEN-LOOP DRIVER -----------------------
+# ============================================================
+
+def schedule(rate, duration, arrivals, rng):
+    """
+    Send offsets (seconds from stage start) for one stage.
+    """
+    if arrivals == "constant":
+        return np.arange(0, duration, 1.0 / rate)
+    gaps = rng.exponential(1.0 / rate, int(rate * duration * 1.5) + 10)
+    offsets = np.cumsum(gaps)
+    return offsets[offsets < duration]
+
+
+async def run_stage(client, workload, rate, duration, mix, arrivals, max_inflight, timeout, rng, counter):
+    offsets = schedule(rate, duration, arrivals, rng)
+    endpoints = rng.choice(list(mix), size=len(offsets), p=list(mix.values()))
+    records = []
+    inflight = set()
+
+    async def send(endpoint, scheduled):
+        request = workload.request(endpoint, next(counter))
+        try:
+            response = await client.request(timeout=timeout, **request)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        records.append((endpoint, scheduled, time.perf_counter(), status))
+
+    start = time.perf_counter()
+    for offset, endpoint in zip(offsets, endpoints):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        scheduled = start + offset
+        if len(inflight) >= max_inflight:
+            # Client-side shedding: the server is not keeping up with the offered rate
+            records.append((endpoint, scheduled, scheduled, "shed"))
+            continue
+        task = asyncio.ensure_future(send(endpoint, scheduled))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    if inflight:
+        await asyncio.wait(inflight, timeout=timeout)
+    return summarize(records, rate, duration, start)
+
+
+def summarize(records, rate, duration, start):
+    def stats(rows):
+        ok = [(done - scheduled) * 1e3 for _, scheduled, done, status in rows if status == 200]
+        errors = {}
+        for _, _, _, status in rows:
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        latency = np.array(ok) if ok else np.array([np.nan])
+        finished = [done for _, _, done, status in rows if status == 200]
+        elapsed = max(max(finished, default=start) - start, duration)
+        return {
+            "sent": len(rows),
+            "ok": len(ok),
+            "throughput": len(ok) / elapsed,
+            "error_rate": (len(rows) - len(ok)) / len(rows) if rows else 0.0,
+            "errors": errors,
+            "p50_ms": float(np.nanpercentile(latency, 50)),
+            "p90_ms": float(np.nanpercentile(latency, 90)),
+            "p99_ms": float(np.nanpercentile(latency, 99)),
+            "p999_ms": float(np.nanpercentile(latency, 99.9)),
+            "max_ms": float(np.nanmax(latency)),
+        }
+
+    by_endpoint = {e: stats([r for r in records if r[0] == e]) for e in ENDPOINTS if any(r[0] == e for r in records)}
+    # Poisson arrivals send a little more or less than rate x duration
+    return {"offered_rate": rate, "sent_rate": len(records) / duration, "total": stats(records),
+            "endpoints": by_endpoint}
+
+
+def saturated(stage, slo_ms, max_error_rate):
+    total = stage["total"]
+    reasons = []
+    if total["throughput"] < 0.95 * stage["sent_rate"]:
+        reasons.append(f"throughput {total['throughput']:.1f}/s < 95% of {stage['sent_rate']:.1f}/s sent")
+    if total["error_rate"] > max_error_rate:
+        reasons.append(f"error rate {total['error_rate']:.1%}")
+    if not total["p99_ms"] <= slo_ms:
+        reasons.append(f"p99 {total['p99_ms']:.0f} ms > SLO {slo_ms:.0f} ms")
+    return reasons
+
+
+def print_stage(stage, reasons):
+    print(f"\n--- offered {stage['offered_rate']:g} req/s "
+          f"{'(SATURATED: ' + '; '.join(reasons) + ')' if reasons else '(sustained)'}")
+    print(f"{'endpoint':<16}{'sent':>7}{'ok/s':>8}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'p99 ms':>9}{'p99.9 ms':>10}{'max ms':>9}")
+    for name, s in [*stage["endpoints"].items(), ("total", stage["total"])]:
+        print(f"{name:<16}{s['sent']:>7}{s['throughput']:>8.1f}{s['error_rate']:>8.1%}{s['p50_ms']:>9.1f}"
+              f"{s['p90_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['p999_ms']:>10.1f}{s['max_ms']:>9.1f}")
+    errors = stage["total"]["errors"]
+    if errors:
+        print("errors: " + ", ".join(f"{k} x{v}" for k, v in sorted(errors.items())))
+
+
+async def soak(args):
+    import httpx
+    from itertools import count
+
+    mix = parse_mix(args.mix)
+    workload = Workload(args.patients, args.fixtures, args.seed, args.with_ids)
+    rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    rng = np.random.default_rng(args.seed)
+    counter = count()
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+
+    if args.in_process:
+        import contextlib
+        import io
+        with contextlib.redirect_stdout(io.StringIO()):
+            import main
+        transport = httpx.ASGITransport(app=main.app)
+        lifespan = main.app.router.lifespan_context(main.app)
+        base_url = "http://pars.test"
+    else:
+        transport, lifespan, base_url = None, None, args.url
+
+    stages = []
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits) as client:
+        if lifespan:
+            await lifespan.__aenter__()
+        try:
+            if args.warmup:
+                # Load the models before measuring (first requests pay the lazy loads)
+                for endpoint in mix:
+                    await client.request(timeout=args.timeout * 4, **workload.request(endpoint, 0))
+            print(f"Target: {base_url}{' (in-process)' if args.in_process else ''}, mix: "
+                  + ", ".join(f"{k} {v:.0%}" for k, v in mix.items()))
+            for rate in rates:
+                stage = await run_stage(client, workload, rate, args.duration, mix, args.arrivals,
+                                        args.max_inflight, args.timeout, rng, counter)
+                reasons = saturated(stage, args.slo_ms, args.max_error_rate)
+                stage["saturated"] = reasons
+                stages.append(stage)
+                print_stage(stage, reasons)
+                if reasons and args.stop_on_saturation:
+                    break
+        finally:
+            if lifespan:
+                await lifespan.__aexit__(None, None, None)
+
+    sustained = [s["offered_rate"] for s in stages if not s["saturated"]]
+    first_saturated = next((s["offered_rate"] for s in stages if s["saturated"]), None)
+    print("\n" + "=" * 60)
+    print(f"Highest sustained rate: {max(sustained):g} req/s" if sustained else "No stage was sustained.")
+    print(f"Saturation point: {first_saturated:g} req/s" if first_saturated else "No saturation within the tested rates.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "stages": stages}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="drive main.app directly (no network, one process)")
+    parser.add_argument("--rates", default="5,10,20,50", help="offered request rates, one stage each")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per stage")
+    parser.add_argument("--arrivals", choices=["poisson", "constant"], default="poisson")
+    parser.add_argument("--mix", default="predict=0.8,self-check-in=0.15,parse-document=0.04,transcribe=0.01")
+    parser.add_argument("--patients", type=int, default=100_000, help="synthetic patients in the request pool")
+    parser.add_argument("--fixtures", type=int, default=32, help="PDF and WAV fixtures in the upload pool")
+    parser.add_argument("--with-ids", action="store_true",
+                        help="send Patient_ID so /predict admits patients to the live queue")
+    parser.add_argument("--max-inflight", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p99 latency objective")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--stop-on-saturation", action="store_true")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write per-stage results here")
+    asyncio.run(soak(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+PARS - Synthetic Patients
+Gaussian-copula generator for realistic triage traffic beyond patients_data.csv.
+
+fit() learns every column's marginal distribution (quantile table for continuous
+columns, category frequencies for discrete ones) plus the correlation of their
+normal scores; sample() draws correlated normals, maps them through the normal
+CDF and inverts each marginal, so millions of patients are generated as numpy
+columns without a per-row loop. Categories are laid out as intervals of the
+unit line (discrete numbers in value order), which keeps e.g. Arrival_Mode and
+Chief_Complaint correlated with the vitals.
+
+Fixtures for the upload endpoints are rendered from sampled patients: small
+text PDFs in the layout the regex fallback of doc_parser.py reads, and 16 kHz
+mono WAV files with speech-like bursts (syllable-rate modulated harmonics and
+pauses; there is no speech to transcribe, they exercise decoding, VAD and the
+transcription path).
+
+Usage:
+  python synth_patients.py fit [--csv ../patients_data.csv] [--model synth_model.json]
+  python synth_patients.py generate --n 1000000 [--out synth_patients.csv] [--seed 0]
+  python synth_patients.py fixtures [--n 32] [--out-dir synth_fixtures]
+"""
+
+import os
+import io
+import sys
+import json
+import wave
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(base_dir)
+
+from feature_schema import FIELD_ALIASES
+
+DEFAULT_CSV = os.path.join(os.path.dirname(base_dir), "patients_data.csv")
+DEFAULT_MODEL = os.path.join(base_dir, "synth_model.json")
+
+# Identifiers and labels are not sampled
+SKIP_COLUMNS = ("Unnamed: 0", "Patient_ID", "Risk_Score", "Risk_Level")
+# Integer columns with at most this many values are sampled as exact frequencies
+MAX_DISCRETE_VALUES = 32
+QUANTILES = 1001
+
+BOOLEAN_FIELDS = ("Diabetes", "Hypertension", "Heart_Disease")
+
+# Label-preserving rephrasings applied to a share of sampled complaints
+COMPLAINT_TEMPLATES = (
+    "{}", "severe {}", "{} since this morning", "{} for two days", "sudden {}", "mild {}",
+    "patient reports {}", "{}, getting worse",
+)
+
+
+def _decimals(values: np.ndarray) -> int:
+    """
+    Decimal places that represent at least 95% of the values (recording precision).
+    """
+    for decimals in range(7):
+        scaled = values * 10 ** decimals
+        if np.mean(np.abs(scaled - np.round(scaled)) < 1e-6) >= 0.95:
+            return decimals
+    return 6
+
+
+def _nearest_correlation(matrix: np.ndarray) -> np.ndarray:
+    """
+    Positive-definite correlation matrix closest in eigenvalues (sampling needs a Cholesky factor).
+    """
+    eigenvalues, vectors = np.linalg.eigh((matrix + matrix.T) / 2)
+    matrix = vectors @ np.diag(np.clip(eigenvalues, 1e-6, None)) @ vectors.T
+    d = np.sqrt(np.diag(matrix))
+    return matrix / np.outer(d, d)
+
+
+class PatientSynthesizer:
+    def __init__(self, columns: list, correlation: np.ndarray):
+        """
+        columns: [{"name", "kind": "continuous"|"discrete"|"categorical", ...marginal}]
+        """
+        self.columns = columns
+        self.correlation = np.asarray(correlation, dtype=np.float64)
+        self._cholesky = np.linalg.cholesky(self.correlation)
+        self._grid = np.linspace(0.0, 1.0, QUANTILES)
+
+    # --------------------------------------------------------
+    # Fitting
+    # --------------------------------------------------------
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, seed: int = 0, calibrate: int = 4):
+        rng = np.random.default_rng(seed)
+        columns, scores = [], []
+        for name in df.columns:
+            if name in SKIP_COLUMNS:
+                continue
+            values = df[name].dropna()
+            numeric = pd.api.types.is_numeric_dtype(values)
+            integral = numeric and np.all(np.mod(values, 1) == 0)
+            if numeric and not (integral and values.nunique() <= MAX_DISCRETE_VALUES):
+                column = {
+                    "name": name, "kind": "continuous", "decimals": _decimals(values.to_numpy(dtype=float)),
+                    "quantiles": np.quantile(values, np.linspace(0, 1, QUANTILES)).tolist(),
+                }
+                # Mid-ranks -> uniforms (ties share one score)
+                u = (values.rank(method="average").to_numpy() - 0.5) / len(values)
+            else:
+                counts = values.value_counts()
+                # Numbers in value order (neighbouring values stay neighbours), labels by frequency
+                counts = counts.sort_index() if numeric else counts
+                probs = (counts / counts.sum()).to_numpy()
+                cum = np.concatenate([[0.0], np.cumsum(probs)[:-1]])
+                index = {v: i for i, v in enumerate(counts.index)}
+                codes = values.map(index).to_numpy()
+                column = {
+                    "name": name, "kind": "discrete" if numeric else "categorical",
+                    "values": [v.item() if hasattr(v, "item") else v for v in counts.index],
+                    "probs": probs.tolist(),
+                }
+                # A uniform draw inside the category's interval
+                u = cum[codes] + probs[codes] * rng.uniform(0.02, 0.98, len(codes))
+            columns.append(column)
+            scores.append(ndtri(np.clip(u, 1e-9, 1 - 1e-9)))
+
+        synth = cls(columns, _nearest_correlation(np.corrcoef(np.vstack(scores))))
+        synth._calibrate(df, calibrate, rng)
+        return synth
+
+    def _calibrate(self, df, iterations, rng, n=50_000):
+        """
+        Discretizing attenuates correlations (e.g. between binary comorbidities):
+        nudge the latent correlation until sampled numeric columns reproduce the
+        data's Pearson correlations (NORTA-style fixed-point iteration).
+        """
+        numeric = [j for j, c in enumerate(self.columns) if c["kind"] != "categorical"]
+        if len(numeric) < 2 or iterations <= 0:
+            return
+        names = [self.columns[j]["name"] for j in numeric]
+        target = df[names].astype(float).corr().to_numpy()
+        block = np.ix_(numeric, numeric)
+        for _ in range(iterations):
+            sample = self.sample_columns(n, int(rng.integers(1 << 31)))
+            current = np.corrcoef(np.vstack([sample[name].astype(float) for name in names]))
+            latent = self.correlation.copy()
+            latent[block] += target - current
+            self.correlation = _nearest_correlation(np.clip(latent, -0.999, 0.999))
+            self._cholesky = np.linalg.cholesky(self.correlation)
+
+    def save(self, path=DEFAULT_MODEL):
+        with open(path, "w") as f:
+            json.dump({"columns": self.columns, "correlation": self.correlation.tolist()}, f)
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL):
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec["columns"], spec["correlation"])
+
+    @classmethod
+    def from_csv_or_model(cls, csv_path=DEFAULT_CSV, model_path=DEFAULT_MODEL):
+        if model_path and os.path.exists(model_path):
+            return cls.load(model_path)
+        return cls.fit(pd.read_csv(csv_path))
+
+    # --------------------------------------------------------
+    # Sampling
+    # --------------------------------------------------------
+
+    def sample_columns(self, n: int, seed=None) -> dict:
+        """
+        n correlated patients as training-named numpy columns.
+        """
+        rng = np.random.default_rng(seed)
+        u = ndtr(rng.standard_normal((n, len(self.columns))) @ self._cholesky.T)
+        out = {}
+        for j, column in enumerate(self.columns):
+            if column["kind"] == "continuous":
+                values = np.round(np.interp(u[:, j], self._grid, column["quantiles"]), column["decimals"])
+                out[column["name"]] = values.astype(np.int64) if column["decimals"] == 0 else values
+            else:
+                edges = np.cumsum(column["probs"])
+                codes = np.minimum(np.searchsorted(edges, u[:, j], side="right"), len(edges) - 1)
+                out[column["name"]] = np.asarray(column["values"], dtype=object if column["kind"] == "categorical" else None)[codes]
+        return out
+
+    def sample(self, n: int, seed=None, complaint_variants: float = 0.0, id_prefix="synth", start=0) -> pd.DataFrame:
+        """
+        n patients with API field names (PatientInput), a Patient_ID, and optionally
+        a share of complaints rephrased with COMPLAINT_TEMPLATES.
+        """
+        rng = np.random.default_rng(None if seed is None else seed + 1)
+        columns = self.sample_columns(n, seed)
+        df = pd.DataFrame({FIELD_ALIASES.get(name, name): values for name, values in columns.items()})
+        for field in BOOLEAN_FIELDS:
+            if field in df:
+                df[field] = df[field].astype(bool)
+        if complaint_variants > 0 and "Chief_Complaint" in df:
+            rephrase = rng.random(n) < complaint_variants
+            templates = np.asarray(COMPLAINT_TEMPLATES, dtype=object)[rng.integers(0, len(COMPLAINT_TEMPLATES), n)]
+            complaints = df["Chief_Complaint"].astype(str).str.lower().to_numpy(dtype=object)
+            df.loc[rephrase, "Chief_Complaint"] = [
+                t.format(c) for t, c in zip(templates[rephrase], complaints[rephrase])
+            ]
+        df.insert(0, "Patient_ID", [f"{id_prefix}-{i}" for i in range(start, start + n)])
+        return df
+
+    def iter_chunks(self, n: int, chunk: int = 100_000, seed: int = 0, **kwargs):
+        """
+        Generate n patients in chunks (bounded memory for millions of rows).
+        """
+        for k, start in enumerate(range(0, n, chunk)):
+            yield self.sample(min(chunk, n - start), seed=seed + k * 7919,
+                              id_prefix=f"synth-{seed}", start=start, **kwargs)
+
+    def fidelity(self, df: pd.DataFrame, n: int = 100_000, seed: int = 0) -> dict:
+        """
+        Marginal means/stds and the largest correlation error of a synthetic sample vs the data.
+        """
+        synth = self.sample_columns(n, seed)
+        numeric = [c["name"] for c in self.columns if c["kind"] != "categorical"]
+        real = df[numeric].astype(float)
+        fake = pd.DataFrame({c: synth[c].astype(float) for c in numeric})
+        corr_error = np.abs(real.corr().to_numpy() - fake.corr().to_numpy())
+        return {
+            "marginals": {
+                c: {"real_mean": real[c].mean(), "synth_mean": fake[c].mean(),
+                    "real_std": real[c].std(), "synth_std": fake[c].std()}
+                for c in numeric
+            },
+            "max_correlation_error": float(np.nanmax(corr_error)),
+            "mean_correlation_error": float(np.nanmean(corr_error)),
+        }
+
+
+# ============================================================
+# ------------------- FIXTURES -------------------------------
+# ============================================================
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(lines: list) -> bytes:
+    """
+    One-page text PDF (Helvetica) with the given lines; readable by pypdf.
+    """
+    stream = "BT /F1 11 Tf 14 TL 56 780 Td\n" + "".join(
+        f"({_pdf_escape(line)}) Tj T*\n" for line in lines
+    ) + "ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{o:010d} 00000 n \n" for o in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def patient_report(patient: dict) -> list:
+    """
+    Referral-letter lines for one patient (labels match doc_parser's regex fallback).
+    """
+    return [
+        "Referral Report",
+        f"Patient ID: {patient['Patient_ID']}",
+        f"Age: {int(patient['Age'])}    Gender: {patient['Gender']}",
+        f"Heart Rate: {int(patient['Heart_Rate'])} bpm",
+        f"Blood Pressure: {int(patient['Systolic_BP'])}/{int(patient['Diastolic_BP'])} mmHg",
+        f"O2 Saturation: {patient['O2_Saturation']:g}%",
+        f"Temperature: {patient['Temperature']:.1f} C",
+        f"Respiratory Rate: {int(patient['Respiratory_Rate'])} /min",
+        f"Pain Score: {int(patient['Pain_Score'])}/10    GCS: {int(patient['GCS_Score'])}",
+        f"Arrival: {patient['Arrival_Mode']}",
+        f"Chief Complaint: {patient['Chief_Complaint']}",
+    ]
+
+
+def speech_like_wav(seconds: float, seed=None, sample_rate: int = 16000, speech_ratio: float = 0.6) -> bytes:
+    """
+    16-bit mono WAV: bursts of syllable-rate modulated harmonics (speech-like
+    energy envelope) separated by low-level noise, about speech_ratio active.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+
+    # Alternating speech / pause segments of 0.3-1.5 s
+    lengths = rng.uniform(0.3, 1.5, int(seconds / 0.3) + 2)
+    bounds = np.minimum(np.cumsum(lengths) * sample_rate, n).astype(np.int64)
+    segment = np.searchsorted(bounds, np.arange(n), side="right")
+    active = (segment % 2 == 0) if rng.random() < speech_ratio else (segment % 2 == 1)
+
+    pitch = rng.uniform(100, 220)
+    voiced = sum(np.sin(2 * np.pi * pitch * k * t + rng.uniform(0, 2 * np.pi)) / k for k in range(1, 6))
+    syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3, 5) * t))
+    signal = np.where(active, 0.3 * voiced * syllables, 0.0) + rng.normal(0, 0.003, n)
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return out.getvalue()
+
+
+def write_fixtures(patients: pd.DataFrame, out_dir: str, seed: int = 0) -> dict:
+    """
+    One PDF report and one WAV per patient row in out_dir; returns the file lists.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pdfs, wavs = [], []
+    for i, patient in enumerate(patients.to_dict("records")):
+        pdf_path = os.path.join(out_dir, f"report_{i:04d}.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes(patient_report(patient)))
+        wav_path = os.path.join(out_dir, f"complaint_{i:04d}.wav")
+        with open(wav_path, "wb") as f:
+            f.write(speech_like_wav(rng.uniform(2, 12), seed=seed + i))
+        pdfs.append(pdf_path)
+        wavs.append(wav_path)
+    return {"pdf": pdfs, "wav": wavs}
+
+
+# ============================================================
+# ------------------- CLI ------------------------------------
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fit = sub.add_parser("fit", help="fit the copula on the CSV and save it")
+    fit.add_argument("--csv", default=DEFAULT_CSV)
+    fit.add_argument("--model", default=DEFAULT_MODEL)
+
+    generate = sub.add_parser("generate", help="write N synthetic patients to CSV")
+    generate.add_argument("--n", type=int, default=1_000_000)
+    generate.add_argument("--out", default="synth_patients.csv")
+    generate.add_argument("--chunk", type=int, default=100_000)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--complaint-variants", type=float, default=0.3,
+                          help="share of complaints rephrased with a template")
+    generate.add_argument("--csv", default=DEFAULT_CSV)
+    generate.add_argument("--model", default=DEFAULT_MODEL)
+
+    fixtures = sub.add_parser("fixtures", help="write PDF reports and WAV recordings for N patients")
+    fixtures.add_argument("--n", type=int, default=32)
+    fixtures.add_argument("--out-dir", default="synth_fixtures")
+    fixtures.add_argument("--seed", type=int, default=0)
+    fixtures.add_argument("--csv", default=DEFAULT_CSV)
+    fixtures.add_argument("--model", default=DEFAULT_MODEL)
+
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        import time
+        df = pd.read_csv(args.csv)
+        started = time.perf_counter()
+        synth = PatientSynthesizer.fit(df)
+        print(f"Fitted {len(synth.columns)} columns on {len(df)} rows in {time.perf_counter() - started:.2f} s")
+        synth.save(args.model)
+        report = synth.fidelity(df)
+        print(f"{'column':<24}{'real mean':>11}{'synth mean':>12}{'real std':>10}{'synth std':>11}")
+        for name, m in report["marginals"].items():
+            print(f"{name:<24}{m['real_mean']:>11.2f}{m['synth_mean']:>12.2f}{m['real_std']:>10.2f}{m['synth_std']:>11.2f}")
+        print(f"Correlation error: max {report['max_correlation_error']:.3f}, mean {report['mean_correlation_error']:.4f}")
+        print(f"Model written to {args.model}")
+        return
+
+    synth = PatientSynthesizer.from_csv_or_model(args.csv, args.model)
+
+    if args.command == "generate":
+        import time
+        started = time.perf_counter()
+        for k, df in enumerate(synth.iter_chunks(args.n, args.chunk, args.seed,
+                                                 complaint_variants=args.complaint_variants)):
+            df.to_csv(args.out, mode="w" if k == 0 else "a", header=k == 0, index=False)
+        elapsed = time.perf_counter() - started
+        print(f"Wrote {args.n} patients to {args.out} in {elapsed:.1f} s ({args.n / elapsed:,.0f} rows/s)")
+    elif args.command == "fixtures":
+        files = write_fixtures(synth.sample(args.n, seed=args.seed), args.out_dir, args.seed)
+        print(f"Wrote {len(files['pdf'])} PDF reports and {len(files['wav'])} WAV recordings to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import requests
 import json
+import sys
 
 url = "http://localhost:8000/predict"
 payload = {
@@ -28,3 +29,86 @@ try:
     print(json.dumps(response.json(), indent=2))
 except Exception as e:
     print(f"Request failed: {e}")
+
+
+# ============================================================
+# /predict/batch: compact payloads must score like per-record /predict
+# ============================================================
+base_url = url.rsplit("/", 1)[0]
+batch_url = f"{base_url}/predict/batch"
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def post_batch(body):
+    return requests.post(batch_url, data=body if isinstance(body, str) else json.dumps(body),
+                         headers={"Content-Type": "application/json"})
+
+
+# Stable, elevated, guardrail-critical (hypoxia) and reduced-consciousness patients
+patients = [
+    payload,
+    {**payload, "Age": 72, "Heart_Rate": 118, "Systolic_BP": 88, "O2_Saturation": 92, "Temperature": 38.9,
+     "Respiratory_Rate": 26, "Pain_Score": 6, "Arrival_Mode": "Ambulance", "Hypertension": True},
+    {**payload, "Age": 55, "O2_Saturation": 82.0, "Respiratory_Rate": 30, "Heart_Disease": True},
+    {**payload, "Age": 40, "GCS_Score": 7, "Arrival_Mode": "Ambulance", "Diabetes": True},
+]
+BATCH_FIELDS = [
+    "Age", "Gender", "Heart_Rate", "Systolic_BP", "Diastolic_BP",
+    "O2_Saturation", "Temperature", "Respiratory_Rate", "Pain_Score",
+    "GCS_Score", "Arrival_Mode", "Diabetes", "Hypertension", "Heart_Disease",
+]
+
+try:
+    singles = [requests.post(url, json=p).json() for p in patients]
+    expected = {
+        "risk_scores": [s["risk_score"] for s in singles],
+        "risk_labels": [s["risk_label"] for s in singles],
+        "details": [s["details"] for s in singles],
+    }
+
+    # Rows in the default column order ("fields" omitted)
+    r = post_batch({"rows": [[p[f] for f in BATCH_FIELDS] for p in patients]})
+    check("rows in the default field order match /predict", r.status_code == 200 and r.json() == expected,
+          f"{r.status_code}")
+
+    # Compact rows: a custom column order with optional fields left to their defaults
+    fields = ["Temperature", "Age", "Gender", "O2_Saturation", "Heart_Rate", "Systolic_BP",
+              "Diastolic_BP", "Respiratory_Rate", "GCS_Score"]
+    compact = [{**payload, **{f: p[f] for f in fields}} for p in patients]
+    singles = [requests.post(url, json=p).json() for p in compact]
+    r = post_batch({"fields": fields, "rows": [[p[f] for f in fields] for p in patients]})
+    check("compact rows with defaulted fields match /predict",
+          r.status_code == 200 and r.json()["risk_scores"] == [s["risk_score"] for s in singles]
+          and r.json()["risk_labels"] == [s["risk_label"] for s in singles], f"{r.status_code}")
+
+    r = post_batch({"rows": []})
+    check("empty batch", r.status_code == 200 and r.json() == {"risk_scores": [], "risk_labels": [], "details": []})
+
+    rows = [[p[f] for f in BATCH_FIELDS] for p in patients]
+    rows[2] = rows[2][:-1]
+    check("row with a missing value rejected", post_batch({"rows": rows}).status_code == 422)
+    check("row with an extra value rejected",
+          post_batch({"fields": fields, "rows": [[p[f] for f in fields] + [1] for p in patients]}).status_code == 422)
+    check("missing required field rejected",
+          post_batch({"fields": fields[1:], "rows": [[p[f] for f in fields[1:]] for p in patients]}).status_code == 422)
+    check("unknown field rejected",
+          post_batch({"fields": fields + ["Blood_Type"], "rows": [[p[f] for f in fields] + ["O+"] for p in patients]}
+                     ).status_code == 422)
+    check("non-numeric vital rejected",
+          post_batch({"fields": fields, "rows": [[37.0, 30, "M", 98.0, "fast", 120, 80, 16, 15]]}).status_code == 422)
+    check("rows must be a list", post_batch({"fields": fields, "rows": {"Age": [30]}}).status_code == 422)
+    check("invalid JSON", post_batch("{not json").status_code == 400)
+except requests.RequestException as e:
+    check("server reachable", False, str(e))
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ /predict/batch matches /predict.")
@@ -0,0 +1,209 @@
+"""
+Test the write-behind persistence layer against the local stand-in store (MemoryStore):
+batching, coalescing of re-triaged rows, durability across an outage and a restart,
+that recording stays off the store's critical path, that rows the store rejects
+are isolated and dead-lettered instead of blocking the journal, and that HTTP
+failures (5xx, 429) are retried as a whole batch.
+
+Usage:
+  python test_persistence.py
+"""
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from postgrest.exceptions import APIError
+
+from persistence_service import PersistenceService, MemoryStore, row_id, _transient
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def patient(i, risk=0.5):
+    return {"id": row_id(f"patient-{i}"), "name": f"Patient {i}", "risk_score": risk}
+
+
+journal_dir = tempfile.mkdtemp()
+journal = os.path.join(journal_dir, "journal.db")
+
+# 1. Size threshold: 500 rows with batch 100 -> bulk upserts, not 500 round trips
+store = MemoryStore()
+service = PersistenceService(store, journal_path=journal, max_batch=100, flush_interval=60)
+for i in range(500):
+    service.record("patients", patient(i))
+service.start()
+check("size-triggered flush writes every row",
+      wait_for(lambda: len(store.tables.get("patients", {})) == 500),
+      f"{len(store.tables.get('patients', {}))} rows")
+check("rows written in bulk", store.calls == 5, f"{store.calls} upsert calls for 500 rows")
+service.stop()
+
+# 2. Time threshold: a few rows below the batch size still flush within the interval
+store = MemoryStore()
+service = PersistenceService(store, journal_path=journal, max_batch=100, flush_interval=0.2)
+service.start()
+for i in range(3):
+    service.record("patients", patient(i))
+check("time-triggered flush", wait_for(lambda: len(store.tables.get("patients", {})) == 3, timeout=2))
+service.stop()
+
+# 3. Coalescing + parent-first table order
+store = MemoryStore()
+service = PersistenceService(store, journal_path=":memory:", max_batch=100, flush_interval=60)
+for risk in (0.2, 0.6, 0.9):
+    service.record_many([
+        ("patient_assignments", {"id": row_id("patient-1", "Cardiology"), "patient_id": row_id("patient-1")}),
+        ("patients", patient(1, risk)),
+    ])
+calls = []
+store.upsert = lambda table, rows, _orig=store.upsert: (calls.append((table, len(rows))), _orig(table, rows))
+service.flush()
+check("re-triaged rows coalesced, latest wins",
+      store.tables["patients"][row_id("patient-1")]["risk_score"] == 0.9 and calls[0] == ("patients", 1),
+      f"upserts: {calls}")
+check("patients flushed before assignments", [t for t, _ in calls] == ["patients", "patient_assignments"])
+
+# 4. Outage: rows stay journaled and are retried; a restart recovers them from disk
+os.remove(journal)
+store = MemoryStore()
+store.fail_next = 10**6
+service = PersistenceService(store, journal_path=journal, max_batch=50, flush_interval=0.05, max_backoff=0.1)
+service.start()
+for i in range(120):
+    service.record("patients", patient(i))
+wait_for(lambda: service.failures >= 3)
+check("nothing dropped while the store is down", service.pending() == 120, f"{service.pending()} pending")
+service._stop.set()
+service._wake.set()
+service._thread.join()
+
+store = MemoryStore()
+restarted = PersistenceService(store, journal_path=journal, max_batch=50, flush_interval=0.05)
+check("journal survives restart", restarted.pending() == 120, f"{restarted.pending()} pending")
+restarted.start()
+check("backlog drains once the store recovers",
+      wait_for(lambda: len(store.tables.get("patients", {})) == 120 and restarted.pending() == 0))
+restarted.stop()
+
+# 5. Recording latency is independent of a slow store
+store = MemoryStore(latency=0.5)
+service = PersistenceService(store, journal_path=journal, max_batch=10, flush_interval=0.05)
+service.start()
+started = time.perf_counter()
+for i in range(200):
+    service.record("patients", patient(i))
+per_record_ms = (time.perf_counter() - started) / 200 * 1e3
+check("record() does not wait on a slow store", per_record_ms < 5, f"{per_record_ms:.3f} ms per record")
+service.stop(timeout=0.1)
+
+# 6. A rejected row is isolated, retried a bounded number of times, then dead-lettered
+poison = row_id("patient-13")
+store = MemoryStore(reject=lambda table, row: row["id"] == poison)
+service = PersistenceService(store, journal_path=":memory:", max_batch=50, flush_interval=60, max_attempts=3)
+for i in range(40):
+    service.record("patients", patient(i))
+service.flush()
+check("rest of the batch written around a rejected row",
+      len(store.tables["patients"]) == 39 and service.pending() == 1, f"{service.pending()} pending")
+check("rejected row isolated in a few calls", store.calls <= 2 * 6 + 1, f"{store.calls} upsert calls")
+for i in range(40, 60):
+    service.record("patients", patient(i))
+service.flush()
+service.flush()
+check("later rows not blocked by the rejected one", len(store.tables["patients"]) == 59)
+letters = service.dead_letters()
+check("rejected row dead-lettered after max_attempts",
+      service.pending() == 0 and [d["row_id"] for d in letters] == [poison] and letters[0]["attempts"] == 3,
+      str(letters))
+check("dead letters reported", service.stats()["dead_letters"] == 1 and "rejected" in letters[0]["error"])
+
+store.reject = None
+check("dead letters can be requeued", service.requeue_dead_letters() == 1 and service.flush() == 1
+      and poison in store.tables["patients"] and service.stats()["dead_letters"] == 0)
+
+# 7. Children are only journaled with their parent; a rejected parent takes its child with it
+store = MemoryStore()
+# RLS rejects patient-2; assignments need their patient written (foreign key)
+store.reject = lambda table, row: (
+    row["id"] == row_id("patient-2") if table == "patients"
+    else row["patient_id"] not in store.tables.get("patients", {})
+)
+service = PersistenceService(store, journal_path=":memory:", max_batch=50, flush_interval=60, max_attempts=1)
+service.record("patient_assignments", {"id": row_id("patient-9", "Cardiology"), "patient_id": row_id("patient-9")})
+check("assignment without its patient row not journaled",
+      service.pending() == 0 and service.stats()["orphans_skipped"] == 1)
+for i in (1, 2, 3):
+    service.record_many([
+        ("patients", patient(i)),
+        ("patient_assignments", {"id": row_id(f"patient-{i}", "Cardiology"), "patient_id": row_id(f"patient-{i}")}),
+    ])
+service.flush()
+check("good parent/child pairs written",
+      len(store.tables.get("patients", {})) == 2 and len(store.tables.get("patient_assignments", {})) == 2)
+check("rejected parent and its child dead-lettered",
+      sorted(d["table"] for d in service.dead_letters()) == ["patient_assignments", "patients"] and service.pending() == 0)
+
+# 8. HTTP failures are transient: the whole batch is retried, not bisected or dead-lettered
+class FlakyStore(MemoryStore):
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+
+    def upsert(self, table, rows):
+        if self.errors:
+            self.calls += 1
+            raise self.errors.pop(0)
+        super().upsert(table, rows)
+
+
+store = FlakyStore([
+    # gateway HTML page: postgrest reports the status in `code`
+    APIError({"message": "JSON could not be generated", "code": 503, "details": "b'<html>503</html>'"}),
+    APIError({"message": "Too Many Requests", "code": "429"}),
+])
+service = PersistenceService(store, journal_path=":memory:", max_batch=50, flush_interval=60, max_attempts=1)
+for i in range(40):
+    service.record("patients", patient(i))
+outcomes = []
+for _ in range(2):
+    try:
+        service.flush()
+        outcomes.append("ok")
+    except APIError as e:
+        outcomes.append(str(e.code))
+check("503 and 429 propagate for backoff", outcomes == ["503", "429"], str(outcomes))
+check("batch not bisected on HTTP failures", store.calls == 2, f"{store.calls} calls")
+check("nothing rejected or dead-lettered", service.pending() == 40 and service.dead_letters() == []
+      and service.stats()["rejected"] == 0)
+check("batch written once the store recovers", service.flush() == 40 and len(store.tables["patients"]) == 40)
+
+check("constraint and RLS violations are still per-row rejections",
+      not _transient(APIError({"message": "insert or update violates foreign key constraint", "code": "23503"}))
+      and not _transient(APIError({"message": "new row violates row-level security policy", "code": "42501"})))
+check("statement timeout and expired JWT are transient",
+      _transient(APIError({"message": "canceling statement due to statement timeout", "code": "57014"}))
+      and _transient(APIError({"message": "JWT expired", "code": "PGRST301"})))
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ All persistence checks passed.")
@@ -0,0 +1,114 @@
+"""
+Verify latency-budget admission control (admission_control.py): decide() degrades
+non-critical requests past the queueing-delay and in-flight thresholds and
+recovers below them, guardrail-critical patients are never degraded, and the
+degraded /predict path answers with the rule-based fallback.
+
+Usage:
+  python verify_admission_control.py
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+
+from admission_control import AdmissionController, FULL, DEGRADED, REQUEST_ARRIVAL, queue_delay
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+# 1. Queueing delay: a single very late request, then the smoothed delay
+ac = AdmissionController(max_queue_ms=100, max_inflight=4, smoothing=0.2)
+check("below budget is admitted", ac.decide(False, delay=0.01) == (FULL, None))
+check("a request over 2x the budget degrades at once", ac.decide(False, delay=0.25) == (DEGRADED, "queue_delay"))
+
+ac = AdmissionController(max_queue_ms=100, max_inflight=4, smoothing=0.2)
+modes = [ac.decide(False, delay=0.15)[0] for _ in range(20)]
+first = modes.index(DEGRADED) if DEGRADED in modes else None
+check("sustained delay over budget degrades once the EWMA crosses it",
+      first is not None and first > 0 and all(m == DEGRADED for m in modes[first:]), f"first degraded at {first}")
+check("critical patients are admitted while degrading", all(ac.decide(True, delay=5.0) == (FULL, None) for _ in range(5)))
+recovered = [ac.decide(False, delay=0.0)[0] for _ in range(30)]
+check("recovers once the delay drops", recovered[-1] == FULL)
+
+# 2. In-flight cap
+ac = AdmissionController(max_queue_ms=100, max_inflight=2)
+with ac.full_path(), ac.full_path():
+    check("saturated ML path degrades non-critical requests", ac.decide(False, delay=0.0) == (DEGRADED, "inflight"))
+    check("critical patients bypass the in-flight cap", ac.decide(True, delay=0.0) == (FULL, None))
+check("in-flight count released", ac.inflight == 0 and ac.decide(False, delay=0.0) == (FULL, None))
+try:
+    with ac.full_path():
+        raise RuntimeError("inference failed")
+except RuntimeError:
+    pass
+check("in-flight count released on error", ac.inflight == 0)
+
+stats = ac.stats()
+check("stats", stats["critical_full"] == 1 and stats["degraded"] == 1
+      and stats["degraded_reasons"] == {"queue_delay": 0, "inflight": 1}, str(stats))
+
+# 3. Disabled, and the arrival stamp
+ac = AdmissionController(max_queue_ms=100, max_inflight=0, enabled=False)
+check("disabled admission control never degrades", ac.decide(False, delay=10.0) == (FULL, None))
+token = REQUEST_ARRIVAL.set(time.perf_counter() - 0.5)
+check("queue delay measured from the arrival stamp", 0.5 <= queue_delay() < 1.0)
+REQUEST_ARRIVAL.reset(token)
+check("no arrival stamp means no delay", queue_delay() == 0.0)
+
+# 4. /predict: degraded answers are the rule fallback; critical patients keep the full path
+import main
+from fastapi.testclient import TestClient
+from main import PatientInput
+from dept_service import get_department_fast
+
+STABLE = {
+    "Age": 45, "Gender": "F", "Heart_Rate": 88, "Systolic_BP": 124, "Diastolic_BP": 80,
+    "O2_Saturation": 97, "Temperature": 37.2, "Respiratory_Rate": 16, "Chief_Complaint": "twisted ankle",
+}
+CRITICAL = {**STABLE, "O2_Saturation": 80, "Heart_Rate": 190, "Chief_Complaint": "shortness of breath"}
+
+with TestClient(main.app) as c:
+    main.ml_ready.set()
+    live = main.admission
+    try:
+        # max_inflight=0: every non-critical request is over the cap
+        main.admission = AdmissionController(max_queue_ms=250, max_inflight=0)
+        r = c.post("/predict", json=STABLE)
+        body = r.json()
+        fallback = main.rule_based_assessment(PatientInput(**STABLE))
+        check("degraded /predict succeeds", r.status_code == 200 and body["degraded"] is True, str(r.status_code))
+        check("degraded path returns the rule fallback",
+              (body["risk_label"], body["risk_score"], body["details"])
+              == (fallback["risk_label"], fallback["risk_score"], fallback["details"]))
+        check("degraded path routes on keywords",
+              body["referral"]["department"] == get_department_fast(STABLE["Chief_Complaint"]))
+
+        r = c.post("/predict", json=CRITICAL)
+        body = r.json()
+        check("critical patient never degraded", r.status_code == 200 and body["degraded"] is False
+              and body["risk_label"] == "HIGH")
+        check("/admission reports the decisions",
+              main.admission.stats()["degraded"] == 1 and main.admission.stats()["critical_full"] == 1)
+
+        main.admission = AdmissionController(max_queue_ms=250, max_inflight=16)
+        check("full path below the thresholds", c.post("/predict", json=STABLE).json()["degraded"] is False)
+    finally:
+        main.admission = live
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Admission control verified.")
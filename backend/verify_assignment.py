@@ -0,0 +1,123 @@
+"""
+Verify the doctor assignment engine (assignment_service.py): importing main.py
+opens no data store, rosters load in the reconcile thread started at startup,
+concurrent assigns for one patient take a single slot, and a doctor's load is
+released when the patient is called, removed from the queue or discharged
+from monitoring (idempotently).
+
+Usage:
+  python verify_assignment.py
+"""
+import sys
+import os
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+os.environ.setdefault("PARS_VITALS_STREAM", "1")
+
+import data_store
+from assignment_service import AssignmentEngine
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+class RosterStore:
+    def __init__(self, rosters):
+        self.rosters = rosters
+        self.reads = 0
+
+    def doctors(self, department):
+        self.reads += 1
+        return self.rosters.get(department, [])
+
+
+def doctor(i, experience=5, available=True):
+    return {"id": i, "name": f"Dr. {i}", "experience": experience, "available": available}
+
+
+# 1. The store is resolved by the reconcile thread, not at construction
+store = RosterStore({"Cardiology": [doctor(1, 10), doctor(2, 2)]})
+engine = AssignmentEngine(departments=["Cardiology"], store_factory=lambda: store, reconcile_interval=3600)
+check("no store read before start", engine.store is None and store.reads == 0)
+engine.start()
+check("first reconcile loads the rosters", engine.wait_loaded(5) and store.reads == 1)
+
+# 2. Concurrent assigns for one patient take one slot
+barrier = threading.Barrier(8)
+results = []
+
+
+def assign():
+    barrier.wait()
+    results.append(engine.assign("Cardiology", "p-1"))
+
+
+threads = [threading.Thread(target=assign) for _ in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+load = engine.stats()["departments"]["Cardiology"]["active_patients"]
+check("concurrent assigns for one patient count once", load == 1 and len({r["name"] for r in results}) == 1,
+      f"{load} active")
+
+# 3. Release is idempotent
+check("release frees the slot", engine.release("p-1") and engine.stats()["departments"]["Cardiology"]["active_patients"] == 0)
+check("second release is a no-op", not engine.release("p-1") and engine.stats()["releases"] == 1)
+
+# 4. API: importing main opens no store; the doctor is released whenever the patient leaves
+import main
+from fastapi.testclient import TestClient
+
+check("importing main opens no data store", data_store._STORE is None)
+
+PATIENT = {
+    "Age": 67, "Gender": "M", "Heart_Rate": 118, "Systolic_BP": 92, "Diastolic_BP": 60,
+    "O2_Saturation": 91, "Temperature": 38.4, "Respiratory_Rate": 26, "Chief_Complaint": "chest pain",
+}
+with TestClient(main.app) as c:
+    main.ml_ready.set()
+    engine = main.assignment_engine
+    check("engine warmed by the startup hook", engine.wait_loaded(10) and engine.stats()["reconciles"] >= 1)
+
+    def active():
+        return engine.stats()["active_assignments"]
+
+    c.post("/predict", json={**PATIENT, "Patient_ID": "q-1"})
+    c.post("/predict", json={**PATIENT, "Patient_ID": "q-2"})
+    c.post("/predict", json={**PATIENT, "Patient_ID": "q-3"})
+    check("identified patients assigned", active() == 3, str(engine.stats()["active_assignments"]))
+
+    called = c.post("/queue/next").json()["patient_id"]
+    check("/queue/next releases the called patient", active() == 2 and called not in engine._assigned)
+    check("DELETE /queue after /queue/next is a 404, not a double release",
+          c.delete(f"/queue/{called}").status_code == 404 and active() == 2)
+
+    c.delete("/queue/q-2" if called != "q-2" else "/queue/q-1")
+    check("DELETE /queue releases", active() == 1)
+
+    remaining = next(iter(engine._assigned))
+    triage_queue_removed = main.triage_queue.remove(remaining)
+    r = c.delete(f"/queue/{remaining}")
+    check("DELETE /queue releases a patient already out of the queue",
+          triage_queue_removed and r.status_code == 200 and active() == 0)
+
+    c.post("/predict", json={**PATIENT, "Patient_ID": "v-1"})
+    c.post("/vitals/batch", json={"patient_id": "v-1", "Heart_Rate": 90})
+    check("vitals discharge releases", c.delete("/vitals/v-1").status_code == 200 and active() == 0)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Doctor assignment verified.")
@@ -0,0 +1,157 @@
+"""
+Verify the VAD front end of audio_service.py: speech regions are found on
+noisy recordings, silence-only files never load Whisper, long speech is split
+and short regions are packed into <=30 s chunks, and the skipped audio /
+Whisper-window savings are reported, and batched decoding is off by default.
+With Whisper installed, also checks that transcribe() returns text through the
+sequential and the (experimental) batched path.
+
+Usage:
+  python verify_audio_vad.py
+"""
+import sys
+import os
+import wave
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from audio_service import (
+    AudioService, VoiceActivityDetector, SAMPLE_RATE, WINDOW_SAMPLES, load_audio, pack_segments,
+)
+from model_manager import MANAGER
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+rng = np.random.default_rng(0)
+
+
+def speech(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = rng.uniform(100, 220)
+    voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+    return 0.3 * voiced * 0.5 * (1 - np.cos(2 * np.pi * 4 * t))
+
+
+def recording(parts, noise=0.01):
+    """
+    parts: [("speech" | "silence", seconds), ...] -> (audio, true speech spans in seconds)
+    """
+    pieces, spans, at = [], [], 0.0
+    for kind, seconds in parts:
+        pieces.append(speech(seconds) if kind == "speech" else np.zeros(int(seconds * SAMPLE_RATE)))
+        if kind == "speech":
+            spans.append((at, at + seconds))
+        at += seconds
+    audio = np.concatenate(pieces)
+    return (audio + rng.normal(0, noise, len(audio))).astype(np.float32), spans
+
+
+def write_wav(path, audio, rate=SAMPLE_RATE, channels=1):
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+
+
+vad = VoiceActivityDetector()
+
+# 1. Speech regions on a noisy ward recording
+audio, truth = recording([("silence", 1.0), ("speech", 2.0), ("silence", 3.0), ("speech", 1.5), ("silence", 2.0)])
+found = [(s / SAMPLE_RATE, e / SAMPLE_RATE) for s, e in vad.segments(audio)]
+check("two speech regions found", len(found) == 2, str([(round(s, 2), round(e, 2)) for s, e in found]))
+check("regions cover the speech with <=0.3 s slack",
+      len(found) == 2 and all(fs <= ts and fe >= te and ts - fs <= 0.3 and fe - te <= 0.3
+                              for (fs, fe), (ts, te) in zip(found, truth)))
+loud, _ = recording([("silence", 2.0), ("speech", 2.0), ("silence", 2.0)], noise=0.03)
+check("louder background noise (-30 dBFS) still separated", len(vad.segments(loud)) == 1)
+
+# 2. Short pauses inside speech are bridged, blips are dropped
+audio, _ = recording([("silence", 1.0), ("speech", 1.0), ("silence", 0.25), ("speech", 1.0), ("silence", 1.0)])
+check("pauses shorter than PARS_VAD_MIN_SILENCE_MS bridged", len(vad.segments(audio)) == 1)
+audio, _ = recording([("silence", 2.0), ("speech", 2.0), ("silence", 2.0), ("speech", 0.08), ("silence", 2.0)])
+check("blips shorter than PARS_VAD_MIN_SPEECH_MS dropped", len(vad.segments(audio)) == 1)
+
+# 3. Long speech is split at a quiet frame; chunks never exceed one Whisper window
+audio, _ = recording([("speech", 70.0)])
+segments = vad.segments(audio)
+longest = max(e - s for s, e in segments) / SAMPLE_RATE
+check("70 s of speech split into <=29 s regions", len(segments) == 3 and longest <= 29.0,
+      f"{len(segments)} regions, longest {longest:.1f} s")
+check("split regions are contiguous", all(a[1] == b[0] for a, b in zip(segments, segments[1:])))
+
+# 4. Many short utterances over a long silent recording pack into one window
+parts = []
+for _ in range(15):
+    parts += [("silence", 3.0), ("speech", 1.0)]
+audio, _ = recording(parts)
+segments = vad.segments(audio)
+chunks = pack_segments(audio, segments)
+windows = int(np.ceil(len(audio) / WINDOW_SAMPLES))
+check("15 utterances in 60 s packed into one chunk", len(segments) == 15 and len(chunks) == 1
+      and all(len(c) <= WINDOW_SAMPLES for c in chunks), f"{len(segments)} regions -> {len(chunks)} chunk(s), {windows} windows unpacked")
+
+# 5. File decoding (stdlib WAV path when Whisper is not installed) and silent files
+service = AudioService()
+with tempfile.TemporaryDirectory() as tmp:
+    stereo = os.path.join(tmp, "stereo.wav")
+    write_wav(stereo, 0.3 * np.sin(2 * np.pi * 220 * np.arange(44100) / 44100), rate=44100, channels=2)
+    decoded = load_audio(stereo)
+    check("44.1 kHz stereo WAV decoded to 16 kHz mono", abs(len(decoded) - SAMPLE_RATE) <= 2, str(len(decoded)))
+
+    silent = os.path.join(tmp, "silent.wav")
+    write_wav(silent, rng.normal(0, 0.01, 20 * SAMPLE_RATE))
+    text = service.transcribe(silent)
+    check("noise-only recording skipped without loading Whisper",
+          text == "" and service.model is None and not MANAGER.stats()["models"].get("whisper", {}).get("loads"))
+
+    # 6. Savings over ward-like recordings: long, mostly silent, with bursts of speech
+    files = []
+    for i in range(30):
+        parts = []
+        while sum(s for _, s in parts) < rng.uniform(20, 180):
+            parts += [("silence", rng.uniform(1, 12)), ("speech", rng.uniform(0.5, 6))]
+        path = os.path.join(tmp, f"ward_{i}.wav")
+        write_wav(path, recording(parts, noise=rng.uniform(0.003, 0.02))[0])
+        files.append(path)
+    for path in files:
+        service.speech_chunks(load_audio(path))
+    stats = service.stats()
+    check("audio skipped and window savings reported", stats["skipped_pct"] > 30 and stats["window_speedup"] > 1,
+          f"{stats['audio_seconds']:.0f} s audio, {stats['skipped_pct']}% skipped, "
+          f"{stats['windows_full']} -> {stats['windows_decoded']} Whisper windows ({stats['window_speedup']}x)")
+    check("VAD is cheap next to Whisper", stats["vad_seconds"] / stats["audio_seconds"] < 0.01,
+          f"{1e3 * stats['vad_seconds'] / (stats['audio_seconds'] / 60):.1f} ms per minute of audio")
+
+    check("batched decoding off by default", not service.batched and not service.stats()["batched"])
+
+    # 7. End to end through Whisper, when installed
+    try:
+        import whisper  # noqa: F401
+    except ImportError:
+        print("⚠️  Whisper not installed; skipping transcription checks.")
+    else:
+        text = service.transcribe(files[0])
+        check("transcribe() runs the sequential path", isinstance(text, str) and service.stats()["batches"] == 0)
+        service.batched = True
+        text = service.transcribe(files[0])
+        check("transcribe() runs the batched path", isinstance(text, str) and service.stats()["batches"] >= 1)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Audio VAD verified.")
@@ -0,0 +1,179 @@
+"""
+Verify the historical complaint index (complaint_index.py): exact and IVF search
+over a memory-mapped int8/float16 index, sub-millisecond queries at 100k rows,
+crash-safe appends, kNN-vote routing through dept_service.route_batch, that
+build input with unknown departments is skipped, that an index built with a
+different encoder is not served, and that /complaint-index/append requires
+the admin token.
+
+Usage:
+  python verify_complaint_index.py
+"""
+import sys
+import os
+import time
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+os.environ.setdefault("PARS_ADMIN_TOKEN", "verify-admin")
+
+from complaint_index import ComplaintIndex
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def unit(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+rng = np.random.default_rng(0)
+departments = [f"Dept_{i}" for i in range(13)]
+dim = 384
+
+# Clustered synthetic complaints: each department owns a few topic centres
+centres = unit(rng.normal(size=(13 * 8, dim)))
+n = 100_000
+topic = rng.integers(0, len(centres), n)
+vectors = unit(centres[topic] + 0.35 * rng.normal(size=(n, dim)) / np.sqrt(dim) * 8)
+labels = topic // 8
+queries_topic = rng.integers(0, len(centres), 200)
+queries = unit(centres[queries_topic] + 0.35 * rng.normal(size=(200, dim)) / np.sqrt(dim) * 8)
+
+# 1. IVF vs scanning every list: same neighbours for most queries, much faster
+ivf_dir = tempfile.mkdtemp()
+started = time.perf_counter()
+ComplaintIndex.create(ivf_dir, vectors, labels, np.ones(n), departments)
+build_s = time.perf_counter() - started
+ivf = ComplaintIndex(ivf_dir, nprobe=8)
+flat = ComplaintIndex(ivf_dir, nprobe=10**6)
+check("IVF built by default at 100k rows", ivf.stats()["nlist"] > 0,
+      f"nlist={ivf.stats()['nlist']}, {build_s:.1f} s, {ivf.stats()['bytes'] / 1e6:.1f} MB on disk")
+
+exact = [set(flat.search(q)[0].tolist()) for q in queries]
+approx = [set(ivf.search(q)[0].tolist()) for q in queries]
+recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+check("IVF recall@10 vs exact scan", recall >= 0.9, f"{recall:.3f}")
+
+for q in queries[:20]:
+    ivf.search(q)
+timings = []
+for q in queries:
+    t0 = time.perf_counter()
+    ivf.search(q)
+    timings.append(time.perf_counter() - t0)
+p50 = np.percentile(timings, 50) * 1e3
+check("IVF query is sub-millisecond", p50 < 1.0, f"p50 {p50:.3f} ms, p99 {np.percentile(timings, 99) * 1e3:.3f} ms")
+
+votes, nearest = ivf.vote(queries)
+accuracy = np.mean(np.argmax(votes, axis=1) == queries_topic // 8)
+check("kNN vote recovers the department", accuracy >= 0.95, f"{accuracy:.3f}")
+
+# 2. int8 storage: half the size of float16, same neighbours
+int8_dir = tempfile.mkdtemp()
+ComplaintIndex.create(int8_dir, vectors[:20_000], labels[:20_000], np.ones(20_000), departments, nlist=0)
+small_dir = tempfile.mkdtemp()
+ComplaintIndex.create(small_dir, vectors[:20_000], labels[:20_000], np.ones(20_000), departments,
+                      dtype="float16", nlist=0)
+int8_index, f16_index = ComplaintIndex(int8_dir), ComplaintIndex(small_dir)
+same = np.mean([
+    len(set(int8_index.search(q)[0].tolist()) & set(f16_index.search(q)[0].tolist())) / 10 for q in queries
+])
+check("int8 index matches float16 neighbours", same >= 0.9,
+      f"overlap {same:.3f}, {int8_index.stats()['bytes'] / 1e6:.1f} vs {f16_index.stats()['bytes'] / 1e6:.1f} MB")
+
+# 3. Appends: visible immediately, persisted, and an interrupted append is discarded
+before = ivf.count
+new = unit(centres[[5]] + 0.01)
+ivf.append(np.repeat(new, 3, axis=0), ["Dept_12"] * 3)
+rows, _ = ivf.search(new[0], k=3)
+check("appended rows are searchable", ivf.count == before + 3 and set(rows.tolist()) >= {before, before + 1, before + 2})
+with open(os.path.join(ivf_dir, "labels.bin"), "ab") as f:
+    f.write(b"\x07" * 5)  # torn write: labels without vectors or meta
+reopened = ComplaintIndex(ivf_dir)
+check("reopen ignores an interrupted append", reopened.count == before + 3)
+reopened.append(new, ["Dept_0"])
+check("next append truncates the torn tail",
+      os.path.getsize(os.path.join(ivf_dir, "labels.bin")) == before + 4 and reopened.count == before + 4)
+try:
+    reopened.append(new, ["Nope"])
+    check("unknown department rejected", False)
+except ValueError:
+    check("unknown department rejected", True)
+
+# 4. kNN routing through dept_service (needs the department encoder)
+import dept_service
+
+texts = ["chest pain", "crushing chest pain", "snake bite on leg", "bitten by a snake", "broke my wrist"]
+embeddings = dept_service.encode_complaints(texts)
+if embeddings is None:
+    print("⚠️  Department encoder unavailable; skipping routing checks.")
+else:
+    route_dir = tempfile.mkdtemp()
+    names = dept_service.DEPARTMENT_NAMES
+    ComplaintIndex.create(route_dir, embeddings, [names.index(d) for d in (
+        "Cardiology", "Cardiology", "Toxicology", "Toxicology", "Orthopedics")], np.ones(5), names)
+    dept_service._COMPLAINT_INDEX = ComplaintIndex(route_dir, k=2)
+    dept_service._COMPLAINT_INDEX_LOADED = True
+    routed = dept_service.route_batch(["crushing chest pain", ""], mode="knn")
+    check("route_batch uses kNN votes", routed[0]["method"] == "knn" and routed[0]["department"] == "Cardiology",
+          str(routed[0]))
+    check("hybrid mode unaffected", dept_service.route_batch(["crushing chest pain"], mode="hybrid")[0]["method"]
+          == "hybrid")
+
+# 5. Build input with unknown departments is reported, not fatal; the serving encoder must match
+from complaint_index import _prepare
+
+texts, departments, weights = _prepare([
+    ("chest pain", "Cardiology"), ("chest pain", "Cardiology"), ("itchy rash", "Skin Clinic"),
+    ("snake bite", "Toxicology"), ("ear ache", "ent"),
+])
+check("unknown departments skipped", departments == ["Cardiology", "Toxicology"] and weights.tolist() == [2.0, 1.0],
+      str(departments))
+
+rng = np.random.default_rng(5)
+vectors = rng.normal(size=(8, 16)).astype(np.float32)
+vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+names = dept_service.DEPARTMENT_NAMES
+for encoder, expected in (("torch:some-other-model", False), (dept_service.encoder_id(), True), (None, False)):
+    encoder_dir = tempfile.mkdtemp()
+    ComplaintIndex.create(encoder_dir, vectors, [0] * 8, np.ones(8), names, encoder=encoder)
+    os.environ["PARS_COMPLAINT_INDEX"] = encoder_dir
+    dept_service._COMPLAINT_INDEX_LOADED = False
+    check(f"index built with encoder {encoder} {'served' if expected else 'refused'}",
+          (dept_service.get_complaint_index() is not None) == expected)
+dept_service._COMPLAINT_INDEX, dept_service._COMPLAINT_INDEX_LOADED = None, True
+
+# 6. Appending labels is admin-only
+import main
+from fastapi.testclient import TestClient
+
+visits = {"visits": [{"complaint": "crushing chest pain", "department": "Cardiology"}]}
+with TestClient(main.app) as c:
+    check("append without a token rejected", c.post("/complaint-index/append", json=visits).status_code == 403)
+    check("append with a wrong token rejected", c.post(
+        "/complaint-index/append", json=visits, headers={"X-PARS-Admin-Token": "guess"}).status_code == 403)
+    r = c.post("/complaint-index/append", json=visits,
+               headers={"Authorization": f"Bearer {os.environ['PARS_ADMIN_TOKEN']}"})
+    check("append with the admin token accepted", r.status_code != 403, str(r.status_code))
+    profiler, main.profiler = main.profiler, None
+    check("append disabled without PARS_ADMIN_TOKEN",
+          c.post("/complaint-index/append", json=visits).status_code == 503)
+    main.profiler = profiler
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Complaint index verified.")
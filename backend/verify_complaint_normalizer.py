@@ -0,0 +1,100 @@
+"""
+Verify complaint normalization (complaint_normalizer.py): typos, abbreviations
+and British spellings land on MEDICAL_KEYWORDS phrases, ordinary English is left
+alone (real words close to a clinical term are not "corrected" into it, and
+routing them is the same with and without normalization), and warm lookups
+take microseconds.
+
+Usage:
+  python verify_complaint_normalizer.py
+"""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import dept_service
+from complaint_normalizer import ComplaintNormalizer
+from dept_service import DEPARTMENTS, MEDICAL_KEYWORDS, keyword_score_matrix, DEPARTMENT_NAMES
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+started = time.perf_counter()
+normalizer = ComplaintNormalizer.from_keywords(MEDICAL_KEYWORDS, DEPARTMENTS)
+check("index built", normalizer.stats()["index_keys"] > 0,
+      f"{normalizer.stats()['vocabulary']} words, {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+CASES = [
+    ("chest pian", "chest pain", "Cardiology"),
+    ("Vomitting since morning", "vomiting since morning", "Gastroenterology"),
+    ("Diarrhoea and N/V", "diarrhea and nausea vomiting", "Gastroenterology"),
+    ("breathlessnes", "shortness of breath", "Pulmonology"),
+    ("SOB, CP", "shortness of breath chest pain", "Cardiology"),
+    ("LOC after fall", "loss of consciousness after fall", "Neurology"),
+    ("astma attack", "asthma attack", "Pulmonology"),
+    ("kidny stone", "kidney stone", "Urology_Nephrology"),
+    ("pt c/o abd pain", "patient complains of abdominal pain", "Gastroenterology"),
+]
+for raw, expected, department in CASES:
+    normalized = normalizer.normalize(raw)
+    check(f"'{raw}' -> '{expected}'", normalized == expected, normalized)
+    scores = keyword_score_matrix([normalized])[0]
+    check(f"'{raw}' routes on keywords to {department}",
+          scores.max() > 0.5 and DEPARTMENT_NAMES[scores.argmax()] == department)
+
+for text in ("I could not feel my leg", "hard to breathe", "broke my arm"):
+    check(f"'{text}' left alone", normalizer.normalize(text) == text.lower())
+
+# Real English words within an edit or two of the clinical vocabulary
+REAL_WORDS = [
+    "heat exhaustion", "heat cramps after running", "strike to head", "fear of needles",
+    "sweating at night", "drunk and fell", "rush of blood to the head", "car crash",
+    "hart bite", "felt faint after the heat", "stiff neck", "sore throat and fever",
+]
+for text in REAL_WORDS:
+    check(f"'{text}' left alone", normalizer.normalize(text) == text, normalizer.normalize(text))
+
+normalizer_in_use = dept_service.NORMALIZER
+dept_service.NORMALIZER = normalizer
+normalized_keyword = [r["department"] for r in dept_service.route_batch(REAL_WORDS, use_nlp=False)]
+normalized_full = [r["department"] for r in dept_service.route_batch(REAL_WORDS)]
+dept_service.NORMALIZER = None
+raw_keyword = [r["department"] for r in dept_service.route_batch(REAL_WORDS, use_nlp=False)]
+raw_full = [r["department"] for r in dept_service.route_batch(REAL_WORDS)]
+dept_service.NORMALIZER = normalizer_in_use
+check("keyword routing of real words unchanged by normalization", normalized_keyword == raw_keyword,
+      str([(t, a, b) for t, a, b in zip(REAL_WORDS, raw_keyword, normalized_keyword) if a != b]))
+check("hybrid routing of real words unchanged by normalization", normalized_full == raw_full,
+      str([(t, a, b) for t, a, b in zip(REAL_WORDS, raw_full, normalized_full) if a != b]))
+check("heat exhaustion / cramps not routed to Cardiology",
+      "Cardiology" not in normalized_keyword[:2], str(normalized_keyword[:2]))
+check("'strike to head' not routed to Neurology as a stroke",
+      normalized_keyword[2] == raw_keyword[2], normalized_keyword[2])
+
+no_lexicon = ComplaintNormalizer.from_keywords(MEDICAL_KEYWORDS, DEPARTMENTS)
+no_lexicon._lexicon = lambda: None
+check("no typo correction without an English lexicon",
+      no_lexicon.normalize("chest pian, heat") == "chest pian heat"
+      and no_lexicon.normalize("SOB") == "shortness of breath")
+
+complaint = "severe chest pian and vomitting"
+normalizer.normalize(complaint)
+started = time.perf_counter()
+for _ in range(1000):
+    normalizer.normalize(complaint)
+per_call = (time.perf_counter() - started) * 1e3
+check("warm normalize() in microseconds", per_call < 50, f"{per_call:.1f} µs per complaint")
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Complaint normalizer verified.")
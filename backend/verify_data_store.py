@@ -0,0 +1,88 @@
+"""
+Verify the embedded SQLite data store built from supabase/migrations:
+every department roster is seeded, roster lookups use the covering index,
+triage tables accept upserts, and get_referral works against it offline.
+
+Usage:
+  python verify_data_store.py
+"""
+import sys
+import os
+import time
+import tempfile
+
+os.environ["PARS_DATA_STORE"] = "sqlite"
+os.environ["PARS_SQLITE_PATH"] = ":memory:"
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_store import SQLiteStore
+from dept_service import DEPARTMENTS, get_referral
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+started = time.perf_counter()
+store = SQLiteStore(":memory:")
+print(f"Built schema from migrations in {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+# 1. One roster per department in DEPARTMENTS, 5 seeded doctors each
+expected = {d.split(" (")[0].strip() for d in DEPARTMENTS}
+check("all departments recognised", set(store.departments.values()) == expected,
+      f"{len(store.departments)} rosters")
+counts = {dept: len(store.doctors(dept)) for dept in expected}
+check("every roster seeded", all(n == 5 for n in counts.values()), str(counts))
+
+# 2. Available-by-experience is one indexed query
+available = store.available_doctors("Cardiology")
+check("only available doctors, most experienced first",
+      all(d["available"] for d in available)
+      and [d["experience"] for d in available] == sorted((d["experience"] for d in available), reverse=True),
+      ", ".join(f"{d['name']} ({d['experience']}y)" for d in available))
+check("department lookup is case-insensitive", store.available_doctors("cardiology") == available)
+plan = store.explain(
+    "SELECT doc_id, doc_name, experience_years, is_available FROM doctors"
+    " WHERE department = ? AND is_available = 1 ORDER BY experience_years DESC LIMIT ?",
+    ("Cardiology", 3),
+)
+check("query uses the roster index without sorting",
+      any("idx_doctors_department_available_experience" in p for p in plan)
+      and not any("TEMP B-TREE" in p for p in plan), " | ".join(plan))
+
+# 3. Triage tables from the migrations accept upserts (ALTER TABLE columns included)
+store.upsert("patients", [{
+    "id": "p-1", "user_id": "u-1", "age": 40, "gender": "F", "heart_rate": 90, "systolic_bp": 120,
+    "diastolic_bp": 80, "o2_saturation": 97, "temperature": 37.0, "respiratory_rate": 16,
+    "department": "Cardiology", "chief_complaint": "chest pain", "risk_score": 0.4,
+}])
+store.upsert("patients", [{
+    "id": "p-1", "user_id": "u-1", "age": 40, "gender": "F", "heart_rate": 90, "systolic_bp": 120,
+    "diastolic_bp": 80, "o2_saturation": 97, "temperature": 37.0, "respiratory_rate": 16,
+    "department": "Cardiology", "chief_complaint": "chest pain", "risk_score": 0.8,
+}])
+rows = store._query("SELECT risk_score, chief_complaint, gcs_score FROM patients WHERE id = 'p-1'")
+check("patients upsert (defaults applied, latest wins)",
+      rows == [{"risk_score": 0.8, "chief_complaint": "chest pain", "gcs_score": 15}], str(rows))
+
+# 4. Re-opening a file database does not re-seed
+path = os.path.join(tempfile.mkdtemp(), "pars_local.db")
+SQLiteStore(path)
+reopened = SQLiteStore(path)
+check("re-open keeps one copy of the seed data", len(reopened.doctors("Neurology")) == 5)
+
+# 5. get_referral answers from the embedded store (no network)
+referral = get_referral("chest pain radiating to left arm")
+check("get_referral uses the embedded roster",
+      referral["doctors"] and "Mock" not in referral["doctors"][0]["name"],
+      f"{referral['department']}: {[d['name'] for d in referral['doctors']]}")
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Embedded data store verified.")
@@ -0,0 +1,58 @@
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import joblib
+
+# Set up path to import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from feature_schema import FeatureSchema
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+preprocessor = joblib.load(os.path.join(base_dir, "preprocessor_nn.pkl"))
+schema = FeatureSchema.from_preprocessor(preprocessor)
+print(f"Compiled schema: {schema.n_numeric} numeric + {schema.n_features - schema.n_numeric} one-hot features")
+
+# 1. Training-format rows from patients_data.csv (vectorized path)
+df = pd.read_csv(os.path.join(os.path.dirname(base_dir), "patients_data.csv"))
+expected = np.asarray(preprocessor.transform(df), dtype=np.float32)
+actual = schema.build_columns({col: df[col].to_numpy() for col in df.columns})
+print(f"CSV build_columns max abs diff: {np.abs(expected - actual).max():.2e}")
+
+# 2. API-format records (single + batch paths), same rename rules as the old DataFrame code
+records = []
+for row in df.head(500).to_dict("records"):
+    records.append({
+        "Age": row["Age"], "Gender": row["Gender"], "Heart_Rate": row["Heart_Rate"],
+        "Systolic_BP": row["Systolic_BP"], "Diastolic_BP": row["Diastolic_BP"],
+        "O2_Saturation": row["O2_Saturation"], "Temperature": row["Temp"],
+        "Respiratory_Rate": row["Respiratory_Rate"], "Pain_Score": row["Pain_Score"],
+        "GCS_Score": row["GCS_Score"], "Arrival_Mode": row["Arrival_Mode"],
+        "Diabetes": bool(row["History_Diabetes"]), "Hypertension": bool(row["History_Hypertension"]),
+        "Heart_Disease": bool(row["History_Heart_Disease"]),
+    })
+
+legacy = pd.DataFrame(records).rename(columns={
+    "Temperature": "Temp", "Diabetes": "History_Diabetes",
+    "Hypertension": "History_Hypertension", "Heart_Disease": "History_Heart_Disease",
+})
+legacy["Unnamed: 0"] = 0
+legacy["BMI"] = 25.0
+for col in ["History_Diabetes", "History_Hypertension", "History_Heart_Disease"]:
+    legacy[col] = legacy[col].astype(int)
+expected = np.asarray(preprocessor.transform(legacy), dtype=np.float32)
+
+batch = schema.build_batch(records)
+single = np.vstack([schema.build(r).copy() for r in records])
+print(f"API build_batch max abs diff: {np.abs(expected - batch).max():.2e}")
+print(f"API build (single) max abs diff: {np.abs(expected - single).max():.2e}")
+
+# 3. Validation
+for bad in ({"Age": 30}, dict(records[0], Heart_Rate=float("nan")), dict(records[0], Age="abc")):
+    try:
+        schema.build(bad)
+        print("❌ Invalid record accepted")
+    except ValueError as e:
+        print(f"✅ Rejected invalid record: {e}")
@@ -0,0 +1,160 @@
+"""
+Verify the logging pipeline (log_config.py): callers never wait on a slow log
+sink, a full queue drops instead of blocking, JSON records carry request ids
+and extra fields, per-module levels and per-request DEBUG sampling apply, a
+forked worker keeps logging, and /predict records can be correlated by the
+X-Request-ID it echoes.
+
+Usage:
+  python verify_logging.py
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log_config import setup_logging, get_logger, flush_logging, logging_stats, REQUEST_ID
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+class SlowSink:
+    """
+    File-backed log stream whose writes can be slowed down (a stalled log driver).
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "a", buffering=1)
+        self.delay = 0.0
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+
+path = tempfile.mktemp(suffix=".log")
+sink = SlowSink(path)
+setup_logging(level="INFO", levels={"dept_service": "DEBUG", "verify.sampled": "DEBUG"},
+              fmt="json", debug_sample=0.5, queue_size=200, stream=sink)
+log = get_logger("verify")
+
+
+def records():
+    flush_logging()
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.startswith("{")]
+
+
+# 1. A slow sink does not slow the caller
+sink.delay = 0.01
+started = time.perf_counter()
+for i in range(100):
+    log.info("record %d", i)
+elapsed = (time.perf_counter() - started) * 1e3
+check("100 records logged without waiting on a 10 ms/write sink", elapsed < 50, f"{elapsed:.1f} ms")
+sink.delay = 0.0
+check("all records written once drained", sum(r["msg"].startswith("record ") for r in records()) == 100)
+
+# 2. A full queue drops instead of blocking
+sink.delay = 0.05
+started = time.perf_counter()
+for i in range(1000):
+    log.info("burst %d", i)
+elapsed = (time.perf_counter() - started) * 1e3
+dropped = logging_stats()["dropped"]
+sink.delay = 0.0
+check("full queue never blocks the caller", elapsed < 100, f"{elapsed:.1f} ms for 1000 records")
+check("overflow is counted as dropped", dropped > 0, f"{dropped} dropped")
+records()
+
+# 3. JSON records: level, logger, request id, extra fields
+token = REQUEST_ID.set("req-42")
+log.warning("Triage %s", "HIGH", extra={"department": "Cardiology"})
+REQUEST_ID.reset(token)
+record = records()[-1]
+check("JSON record fields", record["level"] == "WARNING" and record["logger"] == "pars.verify"
+      and record["msg"] == "Triage HIGH", str(record))
+check("request id and extra fields attached", record.get("request_id") == "req-42"
+      and record.get("department") == "Cardiology")
+
+# 4. Per-module levels
+get_logger("verify").debug("hidden")
+for _ in range(4):
+    get_logger("dept_service").debug("shown")
+messages = [r["msg"] for r in records()]
+check("module at INFO drops DEBUG", "hidden" not in messages)
+# Outside a request, sampling at 0.5 keeps every other DEBUG record
+check("module set to DEBUG keeps (sampled) DEBUG", messages.count("shown") == 2, str(messages.count("shown")))
+
+# 5. DEBUG sampling is per request: all or nothing
+sampled = get_logger("verify.sampled")
+for i in range(400):
+    token = REQUEST_ID.set(f"sample-{i}")
+    for step in range(3):
+        sampled.debug("step %d", step)
+    REQUEST_ID.reset(token)
+    if i % 50 == 0:
+        # Stay under the 200-record queue
+        flush_logging()
+kept = {}
+for r in records():
+    if r["logger"] == "pars.verify.sampled":
+        kept[r["request_id"]] = kept.get(r["request_id"], 0) + 1
+check("sampled requests keep all their DEBUG records", set(kept.values()) == {3}, str(set(kept.values())))
+check("about half the requests sampled", 150 < len(kept) < 250, f"{len(kept)}/400")
+
+# 6. A forked worker restarts the listener
+pid = os.fork()
+if pid == 0:
+    get_logger("verify").info("from child %d", os.getpid())
+    flush_logging()
+    os._exit(0)
+os.waitpid(pid, 0)
+check("forked child logs through its own listener", f"from child {pid}" in [r["msg"] for r in records()])
+
+# 7. API: X-Request-ID is echoed and stamped on the records of that request
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+from fastapi.testclient import TestClient
+import main
+
+PATIENT = {
+    "Age": 67, "Gender": "M", "Heart_Rate": 118, "Systolic_BP": 92, "Diastolic_BP": 60,
+    "O2_Saturation": 91, "Temperature": 38.4, "Respiratory_Rate": 26, "Chief_Complaint": "chest pain",
+}
+with TestClient(main.app) as c:
+    main.ml_ready.set()
+    r = c.post("/predict", json=PATIENT, headers={"X-Request-ID": "triage-abc"})
+    check("X-Request-ID echoed", r.headers.get("x-request-id") == "triage-abc")
+    r = c.post("/predict", json=PATIENT, headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"})
+    check("traceparent trace id used", r.headers.get("x-request-id") == "4bf92f3577b34da6a3ce929d0e0e4736")
+    r = c.post("/predict", json=PATIENT)
+    check("request id generated when absent", len(r.headers.get("x-request-id", "")) == 16)
+
+    stages = [rec for rec in records() if rec.get("request_id") == "triage-abc"]
+    loggers = {rec["logger"] for rec in stages}
+    check("triage decision logged with structured fields",
+          any(rec["msg"].startswith("Triage") and rec.get("department") for rec in stages), str(stages[-1:]))
+    check("routing stage correlated by request id", "pars.dept_service" in loggers, str(sorted(loggers)))
+    check("GET /logging", c.get("/logging").json()["queued"] >= 0)
+
+os.remove(path)
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Logging verified.")
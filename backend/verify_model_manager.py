@@ -0,0 +1,138 @@
+"""
+Verify the model manager (model_manager.py) with synthetic models that allocate
+real memory: LRU eviction to stay within the memory budget (pinned models are
+never evicted), idle unload by the reaper, reload on next use, duplicate
+registration; and that a failing department encoder load (dept_service.py) is
+attempted once per backoff window instead of on every request.
+
+Usage:
+  python verify_model_manager.py
+"""
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_manager import ModelManager
+
+failures = []
+
+MODEL_MB = 40
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+class FakeModel:
+    """Holds MODEL_MB of touched memory while loaded."""
+
+    def __init__(self, manager, name):
+        self.weights = None
+        self.loads = 0
+        manager.register(name, self.load, self.unload, lambda: self.weights is not None)
+
+    def load(self):
+        if self.weights is None:
+            self.weights = np.ones(MODEL_MB * 1_000_000 // 8)
+            self.loads += 1
+
+    def unload(self):
+        self.weights = None
+
+
+def loaded(models):
+    return [name for name, m in models.items() if m.weights is not None]
+
+
+# 1. Budget: least recently used idle model is evicted
+manager = ModelManager(budget_mb=MODEL_MB * 2.5)
+models = {name: FakeModel(manager, name) for name in ("a", "b", "c")}
+for name in ("a", "b"):
+    manager.load(name)
+check("models within budget stay resident", loaded(models) == ["a", "b"])
+check("model size measured on load", all(
+    abs(manager._entries[n].size_bytes / 1e6 - MODEL_MB) < MODEL_MB * 0.25 for n in ("a", "b")),
+      str({n: round(manager._entries[n].size_bytes / 1e6, 1) for n in ("a", "b")}))
+with manager.use("a"):
+    pass
+manager.load("c")
+check("over budget evicts the least recently used", loaded(models) == ["a", "c"], str(loaded(models)))
+check("resident size within budget", manager.resident_bytes() <= manager.budget_bytes)
+
+with manager.use("b"):
+    check("evicted model reloads on use", models["b"].weights is not None and models["b"].loads == 2)
+    check("pinned model is not evicted while over budget", manager.unload("b") is False)
+    check("still reported available", manager.available("b"))
+check("budget enforced once unpinned", len(loaded(models)) == 2 and "b" in loaded(models), str(loaded(models)))
+check("evictions recorded", any(e["event"] == "evict" and e["reason"] == "budget" for e in manager.events))
+
+# 2. Idle unload, by evict_idle() and by the reaper thread
+manager = ModelManager(idle_seconds=0.3)
+models = {name: FakeModel(manager, name) for name in ("idle", "busy")}
+manager.load("idle")
+manager.load("busy")
+time.sleep(0.4)
+with manager.use("busy"):
+    manager.evict_idle()
+check("idle model unloaded, recently used one kept", loaded(models) == ["busy"])
+manager.load("idle")
+check("idle-unloaded model reloads", models["idle"].loads == 2 and models["idle"].weights is not None)
+deadline = time.time() + 5
+while loaded(models) and time.time() < deadline:
+    time.sleep(0.1)
+check("reaper unloads idle models in the background", loaded(models) == [],
+      str([e["reason"] for e in manager.events if e["event"] == "evict"]))
+
+# 3. Registration
+try:
+    FakeModel(manager, "idle")
+    check("duplicate registration rejected", False)
+except ValueError:
+    check("duplicate registration rejected", True)
+with manager.use("unknown"):
+    check("unregistered names are a no-op", True)
+
+# 4. A failing department encoder load backs off instead of retrying on every request
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+import dept_service
+
+attempts = []
+
+
+def broken_encoder(backend=None):
+    attempts.append(time.time())
+    raise OSError("encoder files missing")
+
+
+create_encoder = dept_service.create_encoder
+dept_service.create_encoder = broken_encoder
+try:
+    dept_service.unload_models()
+    complaints = ("crushing chest pain", "severe headache", "broken arm")
+    routed = [dept_service.get_department(c) for c in complaints]
+    check("requests routed on keywords while the encoder is down",
+          routed == [dept_service.get_department_fast(c) for c in complaints], str(routed))
+    check("one load attempt per backoff window", len(attempts) == 1, f"{len(attempts)} attempts")
+    failure = dept_service.load_failure()
+    check("failure and retry time recorded",
+          failure and "encoder files missing" in failure["error"] and failure["retry_in"] > 0, str(failure))
+
+    dept_service._LOAD_FAILURE["retry_at"] = time.time() - 1
+    dept_service.get_department("abdominal pain")
+    check("retried once the backoff expires", len(attempts) == 2)
+finally:
+    dept_service.create_encoder = create_encoder
+    dept_service._LOAD_FAILURE.update(error=None, failures=0, retry_at=0.0)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Model manager verified.")
@@ -0,0 +1,56 @@
+"""
+Parity check: Keras (TensorFlow) backend vs exported ONNX backend over patients_data.csv.
+Run onnx_export.py first.
+"""
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+# Set up path to import backend modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ml_service import TriageModel
+
+TOLERANCE = 1e-4
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+df = pd.read_csv(os.path.join(os.path.dirname(base_dir), "patients_data.csv"))
+columns = {col: df[col].to_numpy() for col in df.columns}
+print(f"Loaded {len(df)} rows from patients_data.csv")
+
+keras_model = TriageModel(backend="keras")
+onnx_model = TriageModel(backend="onnx")
+keras_model._load_resources_if_needed()
+onnx_model._load_resources_if_needed()
+
+# Raw network scores (no guardrails) so every row is compared
+keras_scores = keras_model._infer(keras_model.schema.build_columns(columns))[:, 0]
+onnx_scores = onnx_model._infer(onnx_model.schema.build_columns(columns))[:, 0]
+
+diff = np.abs(keras_scores - onnx_scores)
+print(f"Max abs diff:  {diff.max():.2e}")
+print(f"Mean abs diff: {diff.mean():.2e}")
+
+def labels(scores):
+    return np.where(scores >= 0.75, "HIGH", np.where(scores >= 0.40, "MEDIUM", "LOW"))
+
+agreement = (labels(keras_scores) == labels(onnx_scores)).mean()
+print(f"Label agreement: {agreement * 100:.3f}%")
+
+# Full predict() path (guardrails + explanations) on a sample of records
+sample = df.head(200).rename(columns={
+    "Temp": "Temperature", "History_Diabetes": "Diabetes",
+    "History_Hypertension": "Hypertension", "History_Heart_Disease": "Heart_Disease",
+}).to_dict("records")
+mismatches = sum(
+    keras_model.predict(r)["risk_label"] != onnx_model.predict(r)["risk_label"] for r in sample
+)
+print(f"predict() label mismatches on {len(sample)} records: {mismatches}")
+
+if diff.max() <= TOLERANCE and mismatches == 0:
+    print("✅ ONNX backend matches the Keras backend.")
+else:
+    print(f"❌ ONNX backend differs from Keras (tolerance {TOLERANCE}).")
+    sys.exit(1)
@@ -0,0 +1,122 @@
+"""
+Verify admin-gated profiling (profiler_service.py): the stack sampler finds a
+busy function and emits collapsed stacks, X-PARS-Profile opts a single request
+into cProfile of predict / get_department / get_referral, profiles stay in a
+bounded ring, and everything is refused without the admin token.
+
+Usage:
+  python verify_profiler.py
+"""
+import sys
+import os
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ["PARS_ADMIN_TOKEN"] = "verify-token"
+os.environ["PARS_PROFILE_RING"] = "4"
+
+from profiler_service import StackSampler, RequestProfile, REQUEST_PROFILE, profiled
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+# 1. Sampler: a thread spinning in one function dominates the profile
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+stop = threading.Event()
+worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+worker.start()
+sampler = StackSampler(seconds=1.0, hz=200).start()
+time.sleep(1.2)
+stop.set()
+worker.join()
+lines = sampler.collapsed().strip().splitlines()
+busy = sum(int(line.rsplit(" ", 1)[1]) for line in lines if "busy_loop" in line)
+check("sampler window ends by itself", not sampler.running and sampler.samples > 100, f"{sampler.samples} samples")
+check("collapsed stacks are 'frame;frame count' lines",
+      all(";" in line and line.rsplit(" ", 1)[1].isdigit() for line in lines))
+check("busy function dominates", busy > 0.8 * sampler.samples, f"{busy}/{sampler.samples} samples")
+check("stacks rooted at the thread name", any(line.startswith("busy-worker;") for line in lines))
+check("idle threads dropped", not any("Event.wait" in line.rsplit(";", 1)[-1] for line in lines))
+check("sampling overhead is low", sampler.summary()["overhead_pct"] < 5, f"{sampler.summary()['overhead_pct']}%")
+
+# 2. profiled(): a no-op outside an opted-in request, nested sections inside
+with profiled("noop"):
+    pass
+profile = RequestProfile("POST", "/predict")
+token = REQUEST_PROFILE.set(profile)
+with profiled("outer"):
+    with profiled("inner"):
+        sorted(range(10000), key=lambda x: -x)
+REQUEST_PROFILE.reset(token)
+check("nested sections recorded", [(s["name"], s["depth"]) for s in profile.sections] == [("inner", 1), ("outer", 0)])
+check("cProfile captured the work", any("sorted" in f["function"] for f in profile.top_functions()))
+
+# 3. API
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+from fastapi.testclient import TestClient
+import main
+
+ADMIN = {"X-PARS-Admin-Token": "verify-token"}
+PATIENT = {
+    "Age": 67, "Gender": "M", "Heart_Rate": 118, "Systolic_BP": 92, "Diastolic_BP": 60,
+    "O2_Saturation": 91, "Temperature": 38.4, "Respiratory_Rate": 26, "Chief_Complaint": "chest pain",
+}
+
+with TestClient(main.app) as c:
+    main.ml_ready.set()
+    check("admin endpoints refuse missing token", c.get("/admin/profiler").status_code == 403)
+    check("admin endpoints refuse wrong token",
+          c.post("/admin/profiler/start", headers={"Authorization": "Bearer nope"}).status_code == 403)
+
+    r = c.post("/predict", json=PATIENT, headers={"X-PARS-Profile": "1"})
+    check("profile header ignored without token", r.status_code == 200 and "x-pars-profile-id" not in r.headers)
+
+    r = c.post("/predict", json=PATIENT, headers={"X-PARS-Profile": "1", **ADMIN})
+    profile_id = r.headers.get("x-pars-profile-id")
+    check("opted-in request returns a profile id", r.status_code == 200 and profile_id is not None)
+    detail = c.get(f"/admin/profiles/{profile_id}", headers=ADMIN).json()
+    names = {s["name"] for s in detail.get("sections", [])}
+    expected = {"get_referral", "get_department"} | ({"TriageModel.predict"} if main.model else set())
+    check("predict / referral / department sections profiled", expected <= names, str(sorted(names)))
+    check("hottest functions listed", len(detail.get("top_functions", [])) > 0 and detail["duration_ms"] > 0)
+
+    r = c.post("/self-check-in", headers={"X-PARS-Profile": "1", "Authorization": "Bearer verify-token"},
+               json={"name": "A", "age": 30, "gender": "F", "symptoms": "headache and dizziness"})
+    detail = c.get(f"/admin/profiles/{r.headers['x-pars-profile-id']}", headers=ADMIN).json()
+    check("self-check-in profiled via bearer token", {"get_department", "get_referral"} <= {s["name"] for s in detail["sections"]})
+
+    r = c.post("/admin/profiler/start", params={"seconds": 30, "hz": 200}, headers=ADMIN)
+    window = r.json()["id"]
+    check("sampling window started", r.status_code == 200 and r.json()["running"])
+    check("second window refused while running", c.post("/admin/profiler/start", headers=ADMIN).status_code == 409)
+    for _ in range(20):
+        c.post("/predict", json=PATIENT)
+    check("window stopped early", c.post("/admin/profiler/stop", headers=ADMIN).json()["running"] is False)
+    r = c.get(f"/admin/profiles/{window}", params={"format": "collapsed"}, headers=ADMIN)
+    check("collapsed profile downloadable", r.status_code == 200 and r.text.count("\n") > 0
+          and r.headers["content-type"].startswith("text/plain"))
+
+    for _ in range(6):
+        c.post("/predict", json=PATIENT, headers={"X-PARS-Profile": "1", **ADMIN})
+    status = c.get("/admin/profiler", headers=ADMIN).json()
+    check("ring stays bounded", status["profiles"] == 4 and len(status["ring"]) == 4, str(status["profiles"]))
+    check("evicted profile is gone", c.get(f"/admin/profiles/{window}", headers=ADMIN).status_code == 404)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Profiler verified.")
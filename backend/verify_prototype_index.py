@@ -0,0 +1,80 @@
+"""
+Verify the department prototype index (prototype_index.py): one prototype per
+keyword phrase and synonym, the matmul weighted max matches a per-department
+loop, and the on-disk cache is reused until the keyword tables change.
+
+Usage:
+  python verify_prototype_index.py
+"""
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prototype_index import PrototypeIndex, collect_prototypes
+from dept_service import DEPARTMENTS, MEDICAL_KEYWORDS
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+# Deterministic stand-in encoder: a hashed bag of words, so the checks run without a model
+def encode(texts, dim=64):
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in text.lower().split():
+            out[i, hash(word) % dim] += 1.0
+    return out + 1e-3
+
+
+calls = []
+
+
+def counted_encode(texts):
+    calls.append(len(texts))
+    return encode(texts)
+
+
+prototypes = collect_prototypes(DEPARTMENTS, MEDICAL_KEYWORDS)
+n_keywords = sum(len(v) for v in MEDICAL_KEYWORDS.values())
+check("every keyword phrase is a prototype", len(prototypes) >= n_keywords,
+      f"{len(prototypes)} prototypes, {n_keywords} keywords")
+
+path = os.path.join(tempfile.mkdtemp(), "prototypes.npz")
+index = PrototypeIndex.load_or_build(counted_encode, DEPARTMENTS, MEDICAL_KEYWORDS, "test", path=path)
+check("prototypes embedded in one call", calls == [len(prototypes)], str(calls))
+
+queries = encode(["snake bite", "drank too much alcohol", "chest pain", "broken arm"])
+queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+scores = index.scores(queries)
+expected = np.zeros_like(scores)
+for n, q in enumerate(queries):
+    for d in range(len(DEPARTMENTS)):
+        members = index.dept_ids == d
+        if members.any():
+            expected[n, d] = np.max(index.weights[members] * (index.matrix[members] @ q))
+check("weighted max matches per-department loop", np.allclose(scores, expected, atol=1e-5))
+
+PrototypeIndex.load_or_build(counted_encode, DEPARTMENTS, MEDICAL_KEYWORDS, "test", path=path)
+check("unchanged tables reuse the cache", len(calls) == 1)
+
+changed = {k: dict(v) for k, v in MEDICAL_KEYWORDS.items()}
+changed["Toxicology"]["scorpion sting"] = 0.9
+rebuilt = PrototypeIndex.load_or_build(counted_encode, DEPARTMENTS, changed, "test", path=path)
+check("changed keywords rebuild the cache", len(calls) == 2 and "scorpion sting" in rebuilt.phrases)
+PrototypeIndex.load_or_build(counted_encode, DEPARTMENTS, changed, "other-encoder", path=path)
+check("changed encoder rebuilds the cache", len(calls) == 3)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Prototype index verified.")
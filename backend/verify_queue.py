@@ -0,0 +1,160 @@
+"""
+Verify the live ED queue (queue_service.py): IndexedHeap ordering under random
+pushes, updates and removals; TriageQueue ordering, re-scoring, re-routing and
+removal; snapshot save/restore; and change-feed resume by version number (the
+/queue/stream Last-Event-ID / ?since= path).
+
+Usage:
+  python verify_queue.py
+"""
+import sys
+import os
+import random
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from queue_service import IndexedHeap, TriageQueue
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def heap_is_valid(heap):
+    h = heap._heap
+    return (all(h[(i - 1) // 2][0] <= h[i][0] for i in range(1, len(h)))
+            and all(heap._pos[item] == i for i, (_, item) in enumerate(h)) and len(heap._pos) == len(h))
+
+
+# 1. IndexedHeap: random push/update/remove against a sorted reference
+rng = random.Random(7)
+heap, reference = IndexedHeap(), {}
+valid = True
+for step in range(5000):
+    op = rng.random()
+    if op < 0.5 or not reference:
+        item = rng.randrange(400)
+        key = rng.random()
+        heap.push(item, key)      # push on an existing item updates it
+        reference[item] = key
+    elif op < 0.8:
+        item = rng.choice(list(reference))
+        key = rng.random()
+        heap.update(item, key)
+        reference[item] = key
+    else:
+        item = rng.choice(list(reference))
+        heap.remove(item)
+        del reference[item]
+    if step % 250 == 0:
+        valid = valid and heap_is_valid(heap)
+expected = [item for item, _ in sorted(reference.items(), key=lambda kv: (kv[1], kv[0]))]
+check("heap invariant holds through push/update/remove", valid and heap_is_valid(heap))
+check("peek is the minimum", heap.peek() == expected[0])
+check("top(k) returns the k smallest in order", heap.top(25) == expected[:25])
+check("top(len) is a full ordering", heap.top(len(heap)) == expected and len(heap) == len(reference))
+check("top() leaves the heap intact", heap_is_valid(heap) and len(heap) == len(reference))
+check("membership tracks removals", all(i in heap for i in reference) and not any(
+    i in heap for i in range(400) if i not in reference))
+
+# 2. TriageQueue: risk desc, then arrival asc; re-score keeps arrival; re-route moves departments
+q = TriageQueue()
+q.admit("a", 0.40, "MEDIUM", "Cardiology", arrival=1.0)
+q.admit("b", 0.90, "HIGH", "Cardiology", arrival=2.0)
+q.admit("c", 0.40, "MEDIUM", "Neurology", arrival=0.5)
+q.admit("d", 0.10, "LOW", "Neurology", arrival=0.1)
+order = lambda dept=None: [e["patient_id"] for e in q.ordered(dept)]
+check("ordered by risk, then arrival", order() == ["b", "c", "a", "d"], str(order()))
+check("per-department order", order("Cardiology") == ["b", "a"] and order("Neurology") == ["c", "d"])
+
+q.rescore("d", 0.95, "HIGH")
+check("re-score moves the patient up", order() == ["d", "b", "c", "a"] and q.get("d")["arrival"] == 0.1)
+check("re-score of an unknown patient is a no-op", q.rescore("zz", 0.5) is None)
+
+q.admit("a", 0.40, "MEDIUM", "Neurology")
+check("re-route moves the patient between departments",
+      order("Cardiology") == ["b"] and order("Neurology") == ["d", "c", "a"] and q.get("a")["arrival"] == 1.0)
+
+check("remove", q.remove("c") and not q.remove("c") and order() == ["d", "b", "a"])
+check("pop_next by department", q.pop_next("Cardiology")["patient_id"] == "b"
+      and "Cardiology" not in q.summary()["departments"])
+check("pop_next overall", q.pop_next()["patient_id"] == "d" and order() == ["a"])
+check("limit", len(q.ordered(limit=0)) == 0 and q.view(limit=1)["entries"][0]["patient_id"] == "a")
+
+# 3. Snapshot save/restore keeps order, arrival ties and the version counter
+snapshot_path = os.path.join(tempfile.mkdtemp(), "queue_snapshot.json")
+q = TriageQueue(snapshot_path=snapshot_path)
+for i in range(50):
+    q.admit(f"p{i}", rng.choice([0.2, 0.5, 0.8]), "MEDIUM", rng.choice(["Cardiology", "Neurology"]), arrival=100.0)
+q.remove("p3")
+q.snapshot()
+restored = TriageQueue(snapshot_path=snapshot_path)
+check("restore count", restored.restore() == 49)
+check("restored order identical (ties broken by admission order)", restored.ordered() == q.ordered())
+check("restored department order identical",
+      all(restored.ordered(d) == q.ordered(d) for d in ("Cardiology", "Neurology")))
+check("restored version", restored.version == q.version)
+restored.admit("late", 0.5, "MEDIUM", "Cardiology", arrival=100.0)
+late = [e["patient_id"] for e in restored.ordered() if e["risk_score"] == 0.5]
+check("admissions after restore sort after restored ties", late[-1] == "late")
+check("missing snapshot restores nothing", TriageQueue(snapshot_path=snapshot_path + ".missing").restore() == 0)
+
+
+# 4. Change feed: resume by version within the buffered history, snapshot otherwise
+async def feed():
+    q = TriageQueue(max_events=10)
+    for i in range(5):
+        q.admit(f"s{i}", 0.5, "MEDIUM", "Cardiology")
+    seen = q.version
+
+    events, backlog = q.subscribe(since_version=seen - 2)
+    check("resume returns the missed events", [e["version"] for e in backlog] == [seen - 1, seen])
+    q.unsubscribe(events)
+
+    probes = []
+    events, backlog = q.subscribe(since_version=seen)
+    probes.append(events)
+    check("resume at the current version has an empty backlog", backlog == [])
+
+    for i in range(20):
+        q.rescore("s0", i / 20)
+    events, backlog = q.subscribe(since_version=seen)
+    probes.append(events)
+    check("resume past the buffered history needs a snapshot", backlog is None)
+    events, backlog = q.subscribe(since_version=q.version + 5)
+    probes.append(events)
+    check("resume from a future version needs a snapshot", backlog is None)
+
+    events, _ = q.subscribe()
+    q.remove("s1")
+    q.admit("s9", 0.9, "HIGH", "Neurology")
+    live = [await asyncio.wait_for(events.get(), 1) for _ in range(2)]
+    check("live events delivered in version order",
+          [(e["op"], e["entry"]["patient_id"]) for e in live] == [("remove", "s1"), ("upsert", "s9")]
+          and live[1]["version"] == live[0]["version"] + 1 == q.version)
+
+    small, _ = q.subscribe(max_pending=2)
+    for i in range(5):
+        q.rescore("s2", i / 10)
+    await asyncio.sleep(0.05)
+    drained = [small.get_nowait() for _ in range(small.qsize())]
+    check("slow consumer told to resync", drained[-1]["op"] == "resync", str([e["op"] for e in drained]))
+
+    for queue in probes + [events, small]:
+        q.unsubscribe(queue)
+    check("unsubscribe", len(q._subscribers) == 0)
+
+
+asyncio.run(feed())
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Triage queue verified.")
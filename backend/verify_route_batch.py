@@ -0,0 +1,92 @@
+"""
+Verify batched department routing (dept_service.route_batch) against the
+per-complaint entry points over the labelled router cases (router_cases.py):
+one batch must route every complaint exactly as get_department() /
+get_department_fast() route it alone, independent of batch order, and every
+result's "top" list must agree with the department it reports.
+
+Usage:
+  python verify_route_batch.py
+"""
+import sys
+import os
+import random
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+
+import dept_service
+from dept_service import route_batch, get_department, get_department_fast, DEPARTMENT_NAMES
+from router_cases import ROUTER_CASES
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def mismatches(batch, single, complaints):
+    return [(c, b, s) for c, b, s in zip(complaints, batch, single) if b != s]
+
+
+def top_consistent(results, top_k):
+    for r in results:
+        if r["method"] in ("legacy", "default"):
+            if r["top"]:
+                return False
+            continue
+        scores = [t["score"] for t in r["top"]]
+        if (len(r["top"]) != top_k or r["top"][0]["department"] != r["department"]
+                or scores != sorted(scores, reverse=True)):
+            return False
+    return True
+
+
+# Short / empty complaints exercise the "default" path, unmatched ones the legacy fallback
+complaints = [c for c, _ in ROUTER_CASES] + ["", "ab", "   ", "feeling generally unwell today"]
+
+# 1. Keyword-only routing (degraded mode)
+batch = [r["department"] for r in route_batch(complaints, use_nlp=False)]
+single = [get_department_fast(c) for c in complaints]
+diff = mismatches(batch, single, complaints)
+check(f"keyword batch matches get_department_fast() on {len(complaints)} complaints", not diff, str(diff[:3]))
+
+# 2. Full routing (NLP + keywords, or keywords if the encoder is unavailable)
+results = route_batch(complaints)
+nlp = any(r["method"] == "hybrid" for r in results)
+batch = [r["department"] for r in results]
+single = [get_department(c) for c in complaints]
+diff = mismatches(batch, single, complaints)
+check(f"batch matches get_department() ({'hybrid' if nlp else 'encoder unavailable'})", not diff, str(diff[:3]))
+
+shuffled = list(range(len(complaints)))
+random.Random(11).shuffle(shuffled)
+reordered = route_batch([complaints[i] for i in shuffled])
+check("routing independent of batch order",
+      all(reordered[k]["department"] == batch[i] for k, i in enumerate(shuffled)))
+
+# 3. "top" agrees with the reported department; legacy/default report none
+for top_k in (1, 3, len(DEPARTMENT_NAMES)):
+    check(f"top (k={top_k}) consistent with the department",
+          top_consistent(route_batch(complaints, top_k=top_k), top_k)
+          and top_consistent(route_batch(complaints, top_k=top_k, use_nlp=False), top_k))
+methods = {r["method"] for r in route_batch(complaints, use_nlp=False)}
+check("legacy and default paths exercised", {"legacy", "default"} <= methods, str(sorted(methods)))
+
+# 4. Labelled accuracy is the same through either entry point
+correct_batch = sum(d == label for d, (_, label) in zip(batch, ROUTER_CASES))
+correct_single = sum(d == label for d, (_, label) in zip(single, ROUTER_CASES))
+print(f"   Router cases correct: batch {correct_batch}/{len(ROUTER_CASES)}, "
+      f"single {correct_single}/{len(ROUTER_CASES)} (encoder: {dept_service.ENCODER_BACKEND})")
+check("same accuracy batched and per complaint", correct_batch == correct_single)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Batched routing matches per-complaint routing.")
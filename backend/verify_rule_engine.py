@@ -0,0 +1,115 @@
+"""
+Verify the triage rule engine (triage_rules.json): the safety-override,
+explanation and fallback texts are unchanged, single-record (scalar) and
+vectorized batch evaluation agree for every rule, at and around each threshold
+and for missing values, and per-rule hit counters add up.
+
+Usage:
+  python verify_rule_engine.py
+"""
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rule_engine import RuleEngine, RULES
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+engine = RuleEngine.from_file()
+
+# 1. Texts the API has always returned
+check("safety override",
+      engine.guardrail({"Heart_Rate": 30, "Systolic_BP": 60}) == {
+          "risk_score": 0.99, "risk_label": "HIGH",
+          "details": "⚠️ Critical vitals detected (SAFETY OVERRIDE): Critical Bradycardia (<40 BPM). "
+                     "Severe Hypotension / Shock (<70 mmHg).",
+      })
+check("no override for normal vitals", engine.guardrail({"Heart_Rate": 80}) is None)
+check("model result explanation",
+      engine.result({"Heart_Rate": 110, "O2_Saturation": 92, "Temp": 39.5}, 0.61234) == {
+          "risk_score": 0.6123, "risk_label": "MEDIUM",
+          "details": "Elevated heart rate. Low oxygen saturation. Fever detected.",
+      })
+check("model result without findings",
+      engine.result({}, 0.1)["details"] == "Vitals within acceptable range.")
+check("fallback critical",
+      engine.fallback({"Heart_Rate": 200, "GCS_Score": 7})["details"]
+      == "⚠️ Critical vitals detected: Abnormal heart rate, Reduced consciousness")
+check("fallback elevated", engine.fallback({"Systolic_BP": 85})["risk_label"] == "MEDIUM")
+check("fallback normal", engine.fallback({"Pain_Score": 9})["risk_score"] == 0.15)
+
+# 2. Batch evaluation matches record-by-record evaluation
+rng = np.random.default_rng(7)
+n = 100_000
+columns = {
+    "Heart_Rate": rng.integers(20, 230, n), "Systolic_BP": rng.integers(50, 200, n),
+    "O2_Saturation": rng.integers(70, 101, n).astype(float), "GCS_Score": rng.integers(3, 16, n),
+    "Temperature": rng.choice([36.5, 39.5, np.nan], n), "Pain_Score": rng.integers(0, 11, n),
+}
+scores = rng.random(n)
+started = time.perf_counter()
+X = engine.column_matrix(columns, n)
+critical = engine.critical_mask(X, count=False)
+elapsed = (time.perf_counter() - started) * 1e3
+check("100k-row guardrail pass", elapsed < 500, f"{elapsed:.1f} ms, {int(critical.sum())} critical")
+
+sample = rng.choice(n, 2000, replace=False)
+records = [{f: columns[f][i] for f in columns} for i in sample]
+batch_overrides = engine.override_results(engine.guardrail_hits(X[sample], count=False))
+batch_scored = engine.scored_results(X[sample], scores[sample], count=False)
+batch_fallback = engine.fallback_results(X[sample], count=False)
+check("batch overrides match single records",
+      batch_overrides == [engine.guardrail(r, count=False) for r in records])
+check("batch explanations match single records",
+      batch_scored == [engine.result(r, float(s), count=False) for r, s in zip(records, scores[sample])])
+check("batch fallback matches single records",
+      batch_fallback == [engine.fallback(r, count=False) for r in records])
+
+# Every rule on its own: at, just below and just above its threshold, and missing
+for kind, group in (("guardrail", engine.guardrails), ("explanation", engine.explanations)):
+    for position, rule in enumerate(group.rules):
+        values = [rule.value, rule.value - 1, rule.value + 1, rule.value - 0.01, rule.value + 0.01, None, np.nan]
+        records = [{rule.field: v} for v in values]
+        batch = group.evaluate(engine.matrix(records))[:, position].tolist()
+        single = [bool(engine._evaluate_record(group, r, count=False)[position]) for r in records]
+        check(f"{kind} {rule.id}: scalar and batch paths agree", single == batch,
+              "" if single == batch else f"values {values}: scalar {single}, batch {batch}")
+
+# 3. Hit counters
+engine.reset()
+engine.guardrail_hits(X)
+stats = engine.stats()["guardrails"]
+hits = {r["id"]: r["hits"] for r in stats["rules"]}
+check("hit counters", stats["evaluated"] == n
+      and hits["critical_tachycardia"] == int((X[:, engine.fields.index("Heart_Rate")] > 180).sum()),
+      str(hits))
+
+# 4. Invalid definitions fail at load time
+for name, spec in [
+    ("unknown operator", {"guardrails": [{"id": "x", "field": "Heart_Rate", "op": "~", "value": 1, "message": "m"}]}),
+    ("duplicate ids", {"guardrails": [{"id": "x", "field": "Heart_Rate", "op": ">", "value": 1, "message": "m"}] * 2}),
+]:
+    try:
+        RuleEngine({**spec, "override": {}, "explanation": {}, "fallback": {}})
+        check(f"rejects {name}", False)
+    except ValueError as e:
+        check(f"rejects {name}", True, str(e))
+
+check("shared instance loaded", RULES.source == engine.source)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Rule engine verified.")
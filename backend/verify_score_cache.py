@@ -0,0 +1,78 @@
+"""
+Verify the score cache (score_cache.py): snapped values stay within each
+field's physical range (per record and columnar, API and training spellings),
+out-of-range inputs are not moved further out, exact mode is unchanged, and
+the live model's env configuration refuses binned mode.
+
+Usage:
+  python verify_score_cache.py
+"""
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from score_cache import ScoreCache, VALID_RANGES, snap
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+# 1. snap() clamps to the valid range
+check("GCS 15 in bins of 2 stays 15", snap(15, 2, VALID_RANGES["GCS_Score"]) == 15, str(snap(15, 2)))
+check("SpO2 100 in bins of 6 stays 100", snap(100, 6, VALID_RANGES["O2_Saturation"]) == 100, str(snap(100, 6)))
+check("GCS 3 in bins of 7 stays 3", snap(3, 7, VALID_RANGES["GCS_Score"]) == 3, str(snap(3, 7)))
+check("in-range values snap as before", snap(97.4, 1, VALID_RANGES["O2_Saturation"]) == 97.0
+      and snap(37.33, 0.2, VALID_RANGES["Temperature"]) == 37.4)
+check("out-of-range input not pushed further out", snap(101, 6, VALID_RANGES["O2_Saturation"]) == 101,
+      str(snap(101, 6)))
+
+# 2. Binned records and columns never leave the range
+cache = ScoreCache("binned", bins={"GCS_Score": 2, "O2_Saturation": 6, "Pain_Score": 6, "Temperature": 0.2})
+record = cache.record({"GCS_Score": 15, "O2_Saturation": 100, "Pain_Score": 10, "Temperature": 37.33, "Age": 40})
+check("binned record clamped", (record["GCS_Score"], record["O2_Saturation"], record["Pain_Score"]) == (15, 100, 10),
+      str((record["GCS_Score"], record["O2_Saturation"], record["Pain_Score"])))
+check("unbinned fields unchanged", record["Age"] == 40)
+
+rng = np.random.default_rng(0)
+columns = {
+    "GCS_Score": rng.integers(3, 16, 1000),
+    "O2_Saturation": rng.uniform(80, 100, 1000),
+    "Pain_Score": rng.integers(0, 11, 1000),
+    "Temp": rng.uniform(35, 41, 1000),
+}
+snapped = cache.columns(columns)
+within = all(
+    (snapped[f] >= VALID_RANGES[f][0]).all() and (snapped[f] <= VALID_RANGES[f][1]).all()
+    for f in ("GCS_Score", "O2_Saturation", "Pain_Score")
+)
+check("binned columns within range", within, f"GCS max {snapped['GCS_Score'].max()}, SpO2 max {snapped['O2_Saturation'].max():.1f}")
+check("training spelling (Temp) binned like Temperature",
+      np.allclose(snapped["Temp"], [snap(v, 0.2, VALID_RANGES["Temperature"]) for v in columns["Temp"]]))
+check("columns match per-record snapping", all(
+    snapped[f][i] == cache.record({f: columns[f][i]})[f] for f in ("GCS_Score", "O2_Saturation") for i in range(50)))
+
+exact = ScoreCache("exact")
+check("exact mode leaves records and columns alone",
+      exact.record(record) is record and exact.columns(columns) is columns)
+
+# 3. The serving configuration refuses binned mode
+for mode, expected in (("off", None), ("exact", "exact"), ("binned", None)):
+    os.environ["PARS_SCORE_CACHE"] = mode
+    configured = ScoreCache.from_env()
+    check(f"PARS_SCORE_CACHE={mode} -> {expected or 'no cache'}",
+          (configured.mode if configured else None) == expected)
+del os.environ["PARS_SCORE_CACHE"]
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Score cache verified.")
@@ -0,0 +1,157 @@
+"""
+Verify shadow scoring (shadow_service.py) with stub candidate models: agreement
+metrics (score differences, label agreement, confusion), sampling, override
+skipping and the pending cap, and that a candidate that raises or disagrees
+never changes or breaks the live /predict response.
+
+Usage:
+  python verify_shadow.py
+"""
+import sys
+import os
+import time
+import random
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+
+from shadow_service import ShadowScorer
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def wait_idle(scorer, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if scorer.stats()["pending"] == 0:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class FixedCandidate:
+    """Scores every record with the same result."""
+    artifact = "stub.keras"
+
+    def __init__(self, score, label):
+        self.score, self.label = score, label
+        self.calls = 0
+
+    def predict(self, data):
+        self.calls += 1
+        return {"risk_score": self.score, "risk_label": self.label, "details": "stub"}
+
+
+class RaisingCandidate:
+    artifact = "broken.keras"
+
+    def predict(self, data):
+        raise RuntimeError("candidate failed to load")
+
+
+class BlockingCandidate(FixedCandidate):
+    def __init__(self):
+        super().__init__(0.5, "MEDIUM")
+        self.release = threading.Event()
+
+    def predict(self, data):
+        self.release.wait(5)
+        return super().predict(data)
+
+
+LIVE_MEDIUM = {"risk_score": 0.50, "risk_label": "MEDIUM", "details": "Elevated heart rate"}
+LIVE_HIGH = {"risk_score": 0.90, "risk_label": "HIGH", "details": "Low oxygen saturation"}
+OVERRIDE = {"risk_score": 0.99, "risk_label": "HIGH", "details": "SAFETY OVERRIDE: Critical Hypoxia (<85%)"}
+
+# 1. Agreement metrics
+scorer = ShadowScorer(FixedCandidate(0.60, "MEDIUM"))
+for _ in range(3):
+    scorer.submit({}, LIVE_MEDIUM)
+scorer.submit({}, LIVE_HIGH)
+wait_idle(scorer)
+stats = scorer.stats()
+check("all sampled requests scored", stats["scored"] == 4 and stats["sampled"] == 4 and stats["errors"] == 0)
+check("mean / abs / max score difference",
+      (stats["mean_diff"], stats["mean_abs_diff"], stats["max_abs_diff"]) == (0.0, 0.15, 0.3), str(stats))
+check("label agreement", stats["label_agreement"] == 0.75)
+check("confusion and disagreements",
+      stats["confusion"]["MEDIUM"]["MEDIUM"] == 3 and stats["label_disagreements"] == {"HIGH->MEDIUM": 1})
+scorer.reset()
+check("reset clears the metrics", scorer.stats()["scored"] == 0 and scorer.stats()["label_agreement"] is None)
+
+# 2. Sampling, override skipping and the pending cap
+candidate = FixedCandidate(0.5, "MEDIUM")
+scorer = ShadowScorer(candidate, sample_rate=0.0, max_pending=10**6)
+check("sample rate 0 scores nothing", not any(scorer.submit({}, LIVE_MEDIUM) for _ in range(50)) and candidate.calls == 0)
+scorer.set_sample_rate(0.25)
+random.seed(3)
+sampled = sum(scorer.submit({}, LIVE_MEDIUM) for _ in range(2000))
+check("sample rate is honoured", 400 <= sampled <= 600, f"{sampled}/2000")
+scorer.set_sample_rate(7)
+check("sample rate clamped to [0, 1]", scorer.sample_rate == 1.0)
+check("safety overrides are not shadow-scored",
+      not scorer.submit({}, OVERRIDE) and scorer.stats()["skipped_override"] == 1)
+wait_idle(scorer)
+
+blocking = BlockingCandidate()
+scorer = ShadowScorer(blocking, max_pending=4)
+accepted = [scorer.submit({}, LIVE_MEDIUM) for _ in range(10)]
+check("jobs past max_pending are dropped, not queued", sum(accepted) == 4 and scorer.stats()["dropped"] == 6)
+blocking.release.set()
+check("pending jobs drain", wait_idle(scorer) and scorer.stats()["scored"] == 4)
+
+# 3. A failing candidate is counted, never raised
+scorer = ShadowScorer(RaisingCandidate())
+check("submit with a failing candidate does not raise", scorer.submit({}, LIVE_MEDIUM))
+wait_idle(scorer)
+check("candidate failures counted", scorer.stats()["errors"] == 1 and scorer.stats()["scored"] == 0)
+
+# 4. /predict: the live response is the same with a raising or disagreeing candidate
+import main
+from fastapi.testclient import TestClient
+
+PATIENT = {
+    "Age": 61, "Gender": "M", "Heart_Rate": 112, "Systolic_BP": 98, "Diastolic_BP": 64,
+    "O2_Saturation": 93, "Temperature": 38.1, "Respiratory_Rate": 22, "Chief_Complaint": "fever and cough",
+}
+DECISION = ("risk_score", "risk_label", "details", "degraded", "referral")
+
+with TestClient(main.app) as c:
+    main.ml_ready.set()
+    live = main.shadow_scorer
+    try:
+        main.shadow_scorer = None
+        baseline = c.post("/predict", json=PATIENT).json()
+
+        for name, candidate in (("raising", RaisingCandidate()), ("disagreeing", FixedCandidate(0.01, "LOW"))):
+            main.shadow_scorer = ShadowScorer(candidate)
+            r = c.post("/predict", json=PATIENT)
+            wait_idle(main.shadow_scorer)
+            body = r.json()
+            check(f"{name} candidate leaves /predict unchanged",
+                  r.status_code == 200 and all(body[k] == baseline[k] for k in DECISION),
+                  f"{body['risk_label']} vs {baseline['risk_label']}")
+            check(f"{name} candidate visible only on /shadow",
+                  c.get("/shadow").json()["requests_seen"] == 1)
+
+        stats = c.get("/shadow").json()
+        check("disagreement recorded against the live label",
+              stats["label_disagreements"] == {f"{baseline['risk_label']}->LOW": 1}, str(stats["label_disagreements"]))
+    finally:
+        main.shadow_scorer = live
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Shadow scoring verified.")
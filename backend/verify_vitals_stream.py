@@ -0,0 +1,131 @@
+"""
+Verify continuous vitals ingestion (vitals_stream.py): forward-filled ring
+buffers, guardrail alerts on every sample, threshold/interval-driven model
+re-scoring in one batch, alerts pushed over the WebSocket, and ingestion
+throughput for thousands of beds.
+
+Usage:
+  PARS_VITALS_STREAM=1 python verify_vitals_stream.py
+"""
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("PARS_VITALS_STREAM", "1")
+
+from vitals_stream import VitalsStream, STREAM_FIELDS
+from rule_engine import RULES
+
+failures = []
+
+
+def check(name, condition, detail=""):
+    print(f"{'✅' if condition else '❌'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        failures.append(name)
+
+
+scored = []
+
+
+def score(columns, n):
+    # Stand-in model: risk grows with heart rate
+    scored.append(n)
+    risk = np.clip((np.asarray(columns["Heart_Rate"], dtype=float) - 60) / 100, 0, 0.98)
+    return [{"risk_score": float(r), "risk_label": RULES.label(r), "details": ""} for r in risk]
+
+
+# 1. Ring buffer + forward fill
+stream = VitalsStream(score_fn=score, max_beds=4, window=3)
+stream.ingest(["a", "a", "b"], {"Heart_Rate": np.array([80, 82, 90.]), "O2_Saturation": np.array([97, np.nan, 96.])})
+stream.ingest(["a", "a"], {"Heart_Rate": np.array([np.nan, 84.])})
+view = stream.window_view("a")
+check("window keeps the last N samples", view["samples"]["Heart_Rate"] == [82.0, 82.0, 84.0], str(view["samples"]["Heart_Rate"]))
+check("unmeasured vitals are forward-filled", view["samples"]["O2_Saturation"] == [97.0, 97.0, 97.0])
+
+# 2. Guardrails on every sample: a transient breach inside one batch still alerts
+result = stream.ingest(["b"] * 3, {"O2_Saturation": np.array([95, 80, 95.])})
+kinds = [a["type"] for a in result["alerts"]]
+check("critical + recovered alerts within one batch", kinds == ["critical", "recovered"], str(kinds))
+check("critical alert carries the breaching sample", result["alerts"][0]["vitals"]["O2_Saturation"] == 80.0)
+
+# 3. Re-scoring: only beds with a profile, batched, and only after a threshold move
+stream.rescore_due()
+check("beds without a profile are not scored", scored == [])
+stream.set_profile("a", {"Age": 60, "Gender": "F"})
+stream.set_profile("b", {"Age": 30, "Gender": "M"})
+stream.rescore_due()
+check("due beds scored in one batch", scored == [2], str(scored))
+stream.ingest(["a"], {"Heart_Rate": np.array([86.])})
+stream.rescore_due()
+check("small moves do not re-score", scored == [2], str(scored))
+stream.ingest(["a"], {"Heart_Rate": np.array([150.])})
+stream.rescore_due()
+alerts = stream.recent_alerts(patient_id="a")
+check("threshold move re-scores and raises deterioration",
+      scored == [2, 1] and alerts and alerts[-1]["type"] == "deterioration", str(alerts[-1:]))
+stream.rescore_interval = 0.0
+stream.rescore_due()
+check("interval re-scores quiet beds", scored[-1] == 2, str(scored))
+
+# 4. Capacity is fixed: extra beds are rejected, discharged slots are reused
+stream.ingest(["c", "d"], {"Heart_Rate": np.array([70, 70.])})
+check("beds beyond capacity rejected", stream.ingest(["e"], {"Heart_Rate": np.array([70.])})["rejected"] == 1)
+stream.discharge("c")
+check("discharged slot reused", stream.ingest(["e"], {"Heart_Rate": np.array([70.])})["accepted"] == 1
+      and stream.window_view("e")["samples"]["Heart_Rate"] == [70.0])
+
+# 5. Throughput: 1 Hz from 4000 beds, delivered in 1 s gateway batches
+beds = 4000
+big = VitalsStream(score_fn=score, max_beds=beds, window=120)
+rng = np.random.default_rng(0)
+ids = [f"bed-{i}" for i in range(beds)]
+big.ingest(ids, {"Heart_Rate": np.full(beds, 80.0)})
+timings = []
+for second in range(30):
+    vitals = {f: rng.normal(90, 5, beds) for f in ("Heart_Rate", "Systolic_BP", "O2_Saturation")}
+    t0 = time.perf_counter()
+    big.ingest(ids, vitals, times=np.full(beds, 1e9 + second))
+    timings.append(time.perf_counter() - t0)
+per_second = beds / np.median(timings)
+check("ingests thousands of beds per process", per_second > 100_000,
+      f"{per_second:,.0f} samples/s, {np.median(timings) * 1e3:.1f} ms per {beds}-bed batch, "
+      f"{big.stats()['buffer_mb']} MB buffers")
+
+# 6. API: batch ingest, profile, WebSocket alerts
+os.environ.setdefault("PARS_DATA_STORE", "sqlite")
+os.environ.setdefault("PARS_SQLITE_PATH", ":memory:")
+os.environ.setdefault("PARS_QUEUE_SNAPSHOT_PATH", "")
+from fastapi.testclient import TestClient
+import main
+
+if main.vitals_stream is None:
+    print("⚠️  Vitals stream disabled in main; skipping API checks.")
+else:
+    with TestClient(main.app) as c:
+        r = c.post("/vitals/batch", json={"fields": ["patient_id", "Heart_Rate", "O2_Saturation"],
+                                          "rows": [["p1", 88, 97], ["p2", 75, 99]]})
+        check("POST /vitals/batch", r.status_code == 200 and r.json()["accepted"] == 2, r.text)
+        check("unknown field rejected", c.post("/vitals/batch", json={"patient_id": "p1", "Pulse": 1}).status_code == 422)
+        check("GET /vitals/{id}", c.get("/vitals/p1").json()["vitals"]["Heart_Rate"] == 88.0)
+        with c.websocket_connect("/vitals/ws") as ws:
+            ws.send_json({"patient_id": "p1", "GCS_Score": 6})
+            message = ws.receive_json()
+            check("WebSocket pushes guardrail alert", message.get("alert", {}).get("type") == "critical", str(message))
+            ws.send_json({"samples": [{"nope": 1}]})
+            check("WebSocket reports malformed messages", "error" in ws.receive_json())
+        check("GET /vitals/alerts", len(c.get("/vitals/alerts", params={"patient_id": "p1"}).json()["alerts"]) >= 1)
+        check("profile enables re-scoring",
+              c.post("/vitals/p1/profile", json={"Age": 70, "Gender": "M"}).status_code == 200
+              and main.vitals_stream.rescore_due() >= 1 and c.get("/vitals/p1").json()["risk_label"] is not None)
+        check("GET /vitals", c.get("/vitals").json()["beds"] == 2)
+        check("DELETE /vitals/{id}", c.delete("/vitals/p2").status_code == 200 and c.get("/vitals/p2").status_code == 404)
+
+print("=" * 60)
+if failures:
+    print(f"❌ {len(failures)} check(s) failed: {', '.join(failures)}")
+    sys.exit(1)
+print("✅ Vitals stream verified.")
@@ -0,0 +1,517 @@
+"""
+PARS - Vitals Stream
+Continuous bedside vitals ingestion with incremental re-scoring.
+
+Each monitored patient owns a slot in fixed-size ring buffers held as one
+(beds, window, fields) float32 array, so memory is bounded up front and a batch
+of samples for many beds is written with a few vectorized numpy operations.
+
+Every sample goes through the triage guardrails (rule_engine.RULES) in one
+vectorized pass per batch; a bed that starts or stops breaching a guardrail
+raises a "critical" / "recovered" alert immediately. The risk model is only
+re-run for a bed when one of its vitals has moved past a threshold since it was
+last scored, or when the re-score interval has passed. A background scorer
+collects the due beds and scores them together in one batch; a rise in risk
+label (or in score by PARS_VITALS_ALERT_DELTA) raises a "deterioration" alert.
+
+Alerts are kept in a short history and pushed to subscribers (WebSocket / SSE)
+the same way the live queue publishes its changes. The model needs the
+patient's profile (Age, Gender, comorbidities): beds without one get guardrail
+checks only until set_profile() is called.
+
+Environment:
+  - PARS_VITALS_STREAM              enable streaming ingestion (default: 0)
+  - PARS_VITALS_MAX_BEDS            monitored beds per process (default: 4096)
+  - PARS_VITALS_WINDOW              samples kept per bed (default: 120)
+  - PARS_VITALS_RESCORE_SECONDS     re-score a bed at least this often (default: 60)
+  - PARS_VITALS_RESCORE_DELTA       per-field change that triggers a re-score,
+                                    e.g. "Heart_Rate=5,O2_Saturation=1" (overrides the defaults)
+  - PARS_VITALS_ALERT_DELTA         risk score rise that counts as deterioration (default: 0.15)
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+
+import numpy as np
+
+from rule_engine import RULES
+from score_cache import parse_bins
+from log_config import get_logger
+
+log = get_logger(__name__)
+
+# Vitals a monitor can stream, and the value assumed until a field is first seen
+STREAM_FIELDS = (
+    "Heart_Rate", "Systolic_BP", "Diastolic_BP", "O2_Saturation",
+    "Respiratory_Rate", "Temperature", "GCS_Score", "Pain_Score",
+)
+VITAL_DEFAULTS = {
+    "Heart_Rate": 80.0, "Systolic_BP": 120.0, "Diastolic_BP": 80.0, "O2_Saturation": 98.0,
+    "Respiratory_Rate": 16.0, "Temperature": 37.0, "GCS_Score": 15.0, "Pain_Score": 0.0,
+}
+
+# Change since the last model score that makes a bed due for re-scoring
+RESCORE_DELTAS = {
+    "Heart_Rate": 10.0, "Systolic_BP": 10.0, "Diastolic_BP": 10.0, "O2_Saturation": 2.0,
+    "Respiratory_Rate": 4.0, "Temperature": 0.5, "GCS_Score": 1.0, "Pain_Score": 2.0,
+}
+
+# Non-vital model inputs; Age and Gender have no sensible default
+PROFILE_FIELDS = ("Age", "Gender", "Arrival_Mode", "Diabetes", "Hypertension", "Heart_Disease")
+PROFILE_DEFAULTS = {"Arrival_Mode": "Walk-in", "Diabetes": False, "Hypertension": False, "Heart_Disease": False}
+
+LABEL_RANK = {"LOW": 0, "MEDIUM": 1, "HIGH": 2}
+
+
+def decode_samples(payload):
+    """
+    Samples from a request/message body -> (patient_ids, times or None, {field: float array}).
+
+    Accepted shapes:
+      {"patient_id": "p1", "t": 1700000000.0, "Heart_Rate": 88, ...}         one sample
+      {"samples": [{"patient_id": ..., ...}, ...]}                            list of samples
+      {"fields": ["patient_id", "t", "Heart_Rate", ...], "rows": [[...], ...]} compact rows
+    Omitted vitals (or null) keep the bed's last value. "t" is optional (epoch seconds).
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+
+    if "rows" in payload:
+        fields = payload.get("fields") or []
+        rows = payload["rows"]
+        if "patient_id" not in fields:
+            raise ValueError('Compact samples need "patient_id" in "fields"')
+        if not isinstance(rows, list) or any(not isinstance(r, list) or len(r) != len(fields) for r in rows):
+            raise ValueError(f"Every row must have {len(fields)} values")
+        columns = dict(zip(fields, zip(*rows))) if rows else {f: () for f in fields}
+    else:
+        samples = payload["samples"] if "samples" in payload else [payload]
+        if not isinstance(samples, list) or any(not isinstance(s, dict) or "patient_id" not in s for s in samples):
+            raise ValueError('Every sample needs a "patient_id"')
+        fields = {key for s in samples for key in s}
+        columns = {f: [s.get(f) for s in samples] for f in fields}
+
+    unknown = set(columns) - set(STREAM_FIELDS) - {"patient_id", "t"}
+    if unknown:
+        raise ValueError(f"Unknown vitals fields: {sorted(unknown)}")
+
+    patient_ids = [str(p) for p in columns["patient_id"]]
+    times = None
+    if "t" in columns:
+        times = np.array([np.nan if t is None else t for t in columns["t"]], dtype=np.float64)
+    vitals = {
+        field: np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        for field, values in columns.items() if field in STREAM_FIELDS
+    }
+    return patient_ids, times, vitals
+
+
+class VitalsStream:
+    def __init__(self, score_fn=None, max_beds=4096, window=120, rescore_interval=60.0,
+                 rescore_deltas=None, alert_delta=0.15, history=1000, tick=0.5):
+        """
+        score_fn(columns, n) -> list of {risk_score, risk_label, details}: the model
+        path used for re-scoring (columns map PatientInput fields to sequences).
+        """
+        self.score_fn = score_fn
+        self.max_beds = max_beds
+        self.window = window
+        self.rescore_interval = rescore_interval
+        self.alert_delta = alert_delta
+        self.tick = tick
+
+        deltas = {**RESCORE_DELTAS, **(rescore_deltas or {})}
+        self._deltas = np.array([deltas[f] for f in STREAM_FIELDS], dtype=np.float32)
+        self._defaults = np.array([VITAL_DEFAULTS[f] for f in STREAM_FIELDS], dtype=np.float32)
+
+        # --- Ring buffers (one slot per bed) ---
+        n_fields = len(STREAM_FIELDS)
+        self._samples = np.full((max_beds, window, n_fields), np.nan, dtype=np.float32)
+        self._times = np.zeros((max_beds, window), dtype=np.float64)
+        self._head = np.zeros(max_beds, dtype=np.int64)          # next write position
+        self._count = np.zeros(max_beds, dtype=np.int64)         # samples held (<= window)
+        self._latest = np.tile(self._defaults, (max_beds, 1))    # forward-filled current vitals
+        self._last_seen = np.zeros(max_beds, dtype=np.float64)
+
+        # --- Guardrail state ---
+        self._critical = np.zeros(max_beds, dtype=np.int64)      # bit code of breached guardrails
+        self._bits = np.left_shift(1, np.arange(len(RULES.guardrails.rules), dtype=np.int64))
+
+        # --- Model state ---
+        self._scored_features = np.full((max_beds, n_fields), np.nan, dtype=np.float32)
+        self._scored_at = np.zeros(max_beds, dtype=np.float64)
+        self._due = np.zeros(max_beds, dtype=bool)
+        self._score = np.full(max_beds, np.nan, dtype=np.float64)
+        self._label = [None] * max_beds
+        self._alert_score = np.full(max_beds, np.nan, dtype=np.float64)
+        self._has_profile = np.zeros(max_beds, dtype=bool)
+        self._profiles = {}
+
+        self._slots = {}                                         # patient_id -> slot
+        self._patients = [None] * max_beds
+        self._free = list(range(max_beds - 1, -1, -1))
+
+        self._alerts = deque(maxlen=history)
+        self._alert_seq = 0
+        self._subscribers = set()                                # (loop, asyncio.Queue)
+        self._lock = threading.Lock()
+
+        self.samples_ingested = 0
+        self.samples_rejected = 0
+        self.guardrail_checks = 0
+        self.rescored = 0
+        self.score_batches = 0
+        self.score_seconds = 0.0
+        self.alerts_raised = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, score_fn=None):
+        return cls(
+            score_fn=score_fn,
+            max_beds=int(os.getenv("PARS_VITALS_MAX_BEDS", "4096")),
+            window=int(os.getenv("PARS_VITALS_WINDOW", "120")),
+            rescore_interval=float(os.getenv("PARS_VITALS_RESCORE_SECONDS", "60")),
+            rescore_deltas=parse_bins(os.getenv("PARS_VITALS_RESCORE_DELTA", "")),
+            alert_delta=float(os.getenv("PARS_VITALS_ALERT_DELTA", "0.15")),
+        )
+
+    # --------------------------------------------------------
+    # Beds
+    # --------------------------------------------------------
+
+    def _slot(self, patient_id):
+        slot = self._slots.get(patient_id)
+        if slot is None and self._free:
+            slot = self._free.pop()
+            self._slots[patient_id] = slot
+            self._patients[slot] = patient_id
+            self._head[slot] = self._count[slot] = 0
+            self._samples[slot] = np.nan
+            self._latest[slot] = self._defaults
+            self._critical[slot] = 0
+            self._scored_features[slot] = np.nan
+            self._scored_at[slot] = 0.0
+            self._score[slot] = self._alert_score[slot] = np.nan
+            self._label[slot] = None
+            self._due[slot] = False
+            profile = self._profiles.get(patient_id)
+            self._has_profile[slot] = profile is not None
+        return slot
+
+    def set_profile(self, patient_id, profile: dict):
+        """
+        Non-vital model inputs for a patient (Age and Gender required). Beds with a
+        profile are re-scored by the model; the next tick scores this one.
+        """
+        missing = [f for f in ("Age", "Gender") if profile.get(f) is None]
+        if missing:
+            raise ValueError(f"Profile is missing {missing}")
+        with self._lock:
+            self._profiles[patient_id] = {
+                **PROFILE_DEFAULTS, **{f: profile[f] for f in PROFILE_FIELDS if profile.get(f) is not None},
+            }
+            slot = self._slots.get(patient_id)
+            if slot is not None:
+                self._has_profile[slot] = True
+                self._due[slot] = True
+
+    def discharge(self, patient_id) -> bool:
+        with self._lock:
+            self._profiles.pop(patient_id, None)
+            slot = self._slots.pop(patient_id, None)
+            if slot is None:
+                return False
+            self._patients[slot] = None
+            self._has_profile[slot] = self._due[slot] = False
+            self._free.append(slot)
+            return True
+
+    def monitored(self, patient_id) -> bool:
+        return patient_id in self._slots
+
+    # --------------------------------------------------------
+    # Ingestion + guardrails
+    # --------------------------------------------------------
+
+    def ingest(self, patient_ids, vitals: dict, times=None) -> dict:
+        """
+        Write a batch of samples (vitals: field -> (n,) array, NaN = not measured)
+        into the ring buffers and check every sample against the guardrails.
+        Returns {"accepted", "rejected", "alerts"}; alerts are also published.
+        """
+        n = len(patient_ids)
+        if n == 0:
+            return {"accepted": 0, "rejected": 0, "alerts": []}
+        now = time.time()
+        values = np.full((n, len(STREAM_FIELDS)), np.nan, dtype=np.float32)
+        for i, field in enumerate(STREAM_FIELDS):
+            if field in vitals:
+                values[:, i] = vitals[field]
+        stamps = np.full(n, now) if times is None else np.where(np.isnan(times), now, times)
+
+        with self._lock:
+            # Beds are allocated on first sample; samples beyond capacity are rejected
+            slots = [self._slot(p) for p in patient_ids]
+            accepted = np.array([s is not None for s in slots], dtype=bool)
+            rejected = int(n - accepted.sum())
+            slots = np.array([s for s in slots if s is not None], dtype=np.intp)
+            values, stamps = values[accepted], stamps[accepted]
+            alerts = self._write(slots, values, stamps) if len(slots) else []
+            self.samples_ingested += len(slots)
+            self.samples_rejected += rejected
+
+        self._publish(alerts)
+        return {"accepted": int(len(slots)), "rejected": rejected, "alerts": alerts}
+
+    def _write(self, slots, values, stamps) -> list:
+        # Group samples by bed, keeping arrival order within each bed
+        order = np.argsort(slots, kind="stable")
+        slots, values, stamps = slots[order], values[order], stamps[order]
+        beds, starts, counts = np.unique(slots, return_index=True, return_counts=True)
+        rank = np.arange(len(slots)) - np.repeat(starts, counts)
+
+        # Forward-fill unmeasured vitals: prefix each bed's group with its current
+        # vitals, then carry the last measured value down every column
+        filled = np.insert(values, starts, self._latest[beds], axis=0)
+        shift = np.repeat(np.arange(1, len(beds) + 1), counts)   # row offset after the inserts
+        known = ~np.isnan(filled)
+        index = np.where(known, np.arange(len(filled))[:, None], 0)
+        np.maximum.accumulate(index, axis=0, out=index)
+        filled = np.take_along_axis(filled, index, axis=0)[np.arange(len(slots)) + shift]
+
+        # Ring buffer writes
+        positions = (self._head[slots] + rank) % self.window
+        self._samples[slots, positions] = filled
+        self._times[slots, positions] = stamps
+        self._head[beds] = (self._head[beds] + counts) % self.window
+        self._count[beds] = np.minimum(self._count[beds] + counts, self.window)
+        last = starts + counts - 1
+        self._latest[beds] = filled[last]
+        self._last_seen[beds] = stamps[last]
+
+        # Guardrails on every sample, in one vectorized pass
+        X = RULES.column_matrix({f: filled[:, i] for i, f in enumerate(STREAM_FIELDS)}, len(filled))
+        hits = RULES.guardrail_hits(X, count=False)
+        codes = hits.astype(np.int64) @ self._bits
+        self.guardrail_checks += len(codes)
+        previous = np.empty_like(codes)
+        previous[1:] = codes[:-1]
+        previous[starts] = self._critical[beds]
+        self._critical[beds] = codes[last]
+
+        alerts = []
+        raised = np.flatnonzero((codes & ~previous) != 0)
+        for row, result in zip(raised, RULES.override_results(hits[raised])):
+            alerts.append(self._alert("critical", slots[row], stamps[row], result, filled[row]))
+        recovered = np.flatnonzero((codes == 0) & (previous != 0))
+        for row in recovered:
+            alerts.append(self._alert("recovered", slots[row], stamps[row],
+                                      {"details": "Guardrail vitals back in range."}, filled[row]))
+
+        # Model re-score when any vital moved past its threshold since the last score
+        moved = np.any(np.abs(self._latest[beds] - self._scored_features[beds]) >= self._deltas, axis=1)
+        stale = stamps[last] - self._scored_at[beds] >= self.rescore_interval
+        never = np.isnan(self._scored_features[beds, 0])
+        self._due[beds] |= moved | stale | never
+        return alerts
+
+    # --------------------------------------------------------
+    # Model re-scoring
+    # --------------------------------------------------------
+
+    def rescore_due(self) -> int:
+        """
+        Score every bed that is due (and has a profile) in one model batch.
+        """
+        if self.score_fn is None:
+            return 0
+        with self._lock:
+            now = time.time()
+            # Interval re-scores also apply to beds that have gone quiet
+            self._due |= (self._scored_at > 0) & (now - self._scored_at >= self.rescore_interval)
+            slots = np.flatnonzero(self._due & self._has_profile)
+            if not len(slots):
+                return 0
+            self._due[slots] = False
+            features = self._latest[slots].copy()
+            patients = [self._patients[s] for s in slots]
+            profiles = [self._profiles[p] for p in patients]
+
+        columns = {field: features[:, i] for i, field in enumerate(STREAM_FIELDS)}
+        for field in PROFILE_FIELDS:
+            columns[field] = [profile.get(field) for profile in profiles]
+        started = time.perf_counter()
+        results = self.score_fn(columns, len(slots))
+        elapsed = time.perf_counter() - started
+
+        alerts = []
+        with self._lock:
+            self.rescored += len(slots)
+            self.score_batches += 1
+            self.score_seconds += elapsed
+            for slot, patient_id, row, result in zip(slots, patients, features, results):
+                if self._patients[slot] != patient_id:
+                    continue  # discharged (and the slot reused) while scoring
+                self._scored_features[slot] = row
+                self._scored_at[slot] = now
+                previous_label, baseline = self._label[slot], self._alert_score[slot]
+                self._score[slot], self._label[slot] = result["risk_score"], result["risk_label"]
+                rose = previous_label is not None and (
+                    LABEL_RANK.get(result["risk_label"], 0) > LABEL_RANK.get(previous_label, 0)
+                    or result["risk_score"] - baseline >= self.alert_delta
+                )
+                if rose:
+                    alerts.append(self._alert("deterioration", slot, now, result, row, previous_label))
+                if rose or np.isnan(baseline) or result["risk_score"] < baseline:
+                    # Deterioration is measured from the last alert (or the lowest score since)
+                    self._alert_score[slot] = result["risk_score"]
+        self._publish(alerts)
+        return len(slots)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.rescore_due()
+            except Exception as e:
+                log.error("Vitals re-scoring failed: %s", e)
+
+    def start(self):
+        if self._thread is None and self.score_fn is not None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="pars-vitals-scorer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --------------------------------------------------------
+    # Alerts
+    # --------------------------------------------------------
+
+    def _alert(self, kind, slot, at, result, vitals, previous_label=None) -> dict:
+        self._alert_seq += 1
+        self.alerts_raised += 1
+        alert = {
+            "id": self._alert_seq,
+            "type": kind,
+            "patient_id": self._patients[slot],
+            "t": float(at),
+            "vitals": {f: round(float(v), 2) for f, v in zip(STREAM_FIELDS, vitals)},
+            "details": result.get("details"),
+        }
+        if "risk_score" in result:
+            alert.update(risk_score=result["risk_score"], risk_label=result["risk_label"])
+        if previous_label:
+            alert["previous_label"] = previous_label
+        self._alerts.append(alert)
+        return alert
+
+    def _publish(self, alerts):
+        if not alerts:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._deliver, queue, alerts)
+
+    @staticmethod
+    def _deliver(queue, alerts):
+        for alert in alerts:
+            try:
+                queue.put_nowait(alert)
+            except asyncio.QueueFull:
+                # Slow consumer: it can catch up from recent_alerts(since=...)
+                break
+
+    def subscribe(self, max_pending=1000):
+        """
+        Register an alert consumer on the running event loop.
+        """
+        queue = asyncio.Queue(maxsize=max_pending)
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {(l, q) for l, q in self._subscribers if q is not queue}
+
+    def recent_alerts(self, since=None, patient_id=None) -> list:
+        with self._lock:
+            alerts = list(self._alerts)
+        return [
+            a for a in alerts
+            if (since is None or a["id"] > since) and (patient_id is None or a["patient_id"] == patient_id)
+        ]
+
+    # --------------------------------------------------------
+    # Views
+    # --------------------------------------------------------
+
+    def window_view(self, patient_id) -> dict:
+        """
+        A bed's buffered samples (oldest first), current vitals and last model score.
+        """
+        with self._lock:
+            slot = self._slots.get(patient_id)
+            if slot is None:
+                return None
+            count, head = int(self._count[slot]), int(self._head[slot])
+            order = (np.arange(head - count, head)) % self.window
+            samples = self._samples[slot, order]
+            times = self._times[slot, order]
+            score = self._score[slot]
+            return {
+                "patient_id": patient_id,
+                "t": times.tolist(),
+                "samples": {f: np.round(samples[:, i], 2).tolist() for i, f in enumerate(STREAM_FIELDS)},
+                "vitals": {f: round(float(v), 2) for f, v in zip(STREAM_FIELDS, self._latest[slot])},
+                "critical": bool(self._critical[slot]),
+                "risk_score": None if np.isnan(score) else float(score),
+                "risk_label": self._label[slot],
+                "scored_at": float(self._scored_at[slot]) or None,
+                "has_profile": bool(self._has_profile[slot]),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = len(self._slots)
+            critical = int(np.count_nonzero(self._critical[[*self._slots.values()]])) if active else 0
+        return {
+            "enabled": True,
+            "beds": active,
+            "max_beds": self.max_beds,
+            "window": self.window,
+            "buffer_mb": round((self._samples.nbytes + self._times.nbytes) / 1e6, 1),
+            "critical_beds": critical,
+            "samples_ingested": self.samples_ingested,
+            "samples_rejected": self.samples_rejected,
+            "guardrail_checks": self.guardrail_checks,
+            "rescored": self.rescored,
+            "score_batches": self.score_batches,
+            "mean_score_batch_ms": round(self.score_seconds / self.score_batches * 1e3, 3) if self.score_batches else 0.0,
+            "alerts": self.alerts_raised,
+            "subscribers": len(self._subscribers),
+            "rescore_interval": self.rescore_interval,
+            "rescore_deltas": dict(zip(STREAM_FIELDS, self._deltas.tolist())),
+        }
+
+
+def create_vitals_stream(score_fn=None):
+    """
+    Build the stream from env (None unless PARS_VITALS_STREAM=1).
+    """
+    if os.getenv("PARS_VITALS_STREAM", "0") != "1":
+        return None
+    stream = VitalsStream.from_env(score_fn)
+    log.info("Vitals streaming enabled (%d beds x %d samples).", stream.max_beds, stream.window)
+    return stream
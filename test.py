@@ -3,6 +3,11 @@ import numpy as np
 import tensorflow as tf
 import joblib
 import os
+import sys
+
+# Guardrail thresholds are shared with the API (backend/triage_rules.json)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from rule_engine import RULES
 
 # Suppress TensorFlow logs
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -77,19 +82,9 @@ except Exception as e:
 
 # --- STEP B: RULE-BASED SAFETY OVERRIDE ---
 # This forces the model to respect critical "Death Zone" values
-forced_reason = None
-
-# Critical Thresholds (ESI Level 1 Logic)
-if input_df['Heart_Rate'].values[0] > 180:
-    forced_reason = "Critical Tachycardia (>180 BPM)"
-elif input_df['Heart_Rate'].values[0] < 40:
-    forced_reason = "Critical Bradycardia (<40 BPM)"
-elif input_df['Systolic_BP'].values[0] < 70:
-    forced_reason = "Severe Hypotension / Shock (<70 mmHg)"
-elif input_df['O2_Saturation'].values[0] < 85:
-    forced_reason = "Critical Hypoxia (<85%)"
-elif input_df['GCS_Score'].values[0] <= 8:
-    forced_reason = "Unconscious / Coma (GCS <= 8)"
+# Critical Thresholds (ESI Level 1 Logic), first matching rule is reported
+critical_reasons = RULES.guardrail_reasons(new_patient)
+forced_reason = critical_reasons[0] if critical_reasons else None
 
 # --- STEP C: FINALIZE RESULT ---
 if forced_reason: